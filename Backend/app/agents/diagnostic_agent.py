@@ -1,6 +1,11 @@
 from app.util.smart_ai_client import smart_ai_client
+from app.util.metrics import metrics
+from app.prompts.registry import prompt_registry
+from app.prompts.schemas import DIAGNOSTIC, language_instruction
+from app.util.structured_output import parse_document, schema_instructions, schema_key
 from pathlib import Path
 import os
+import time
 from dotenv import load_dotenv
 from app.services.vertex_ai_service import vertex_ai_service
 
@@ -10,18 +15,7 @@ load_dotenv()
 class DiagnosticAgent:
     def __init__(self):
         self.client = smart_ai_client
-        self.system_message = """You are a specialist Medical AI Diagnostic Assistant using advanced vision analysis.
-
-Your responsibilities:
-- Analyze the provided medical image (X-ray, MRI, retinal scan, etc.).
-- Identify potential abnormalities or diseases with high accuracy.
-- Provide a 'Doctor-Friendly Explanation': clear, professional, and concise.
-- Highlight specific regions of interest if possible (textual description).
-- Include a confidence score and any critical warning signs.
-- ALWAYS state: 'This is an AI-assisted analysis. Final diagnosis rests with a medical professional.'
-- Mention that Gemini Vision AI was used for analysis.
-
-Provide responses in markdown format for clarity."""
+        self.system_message = prompt_registry.get("diagnostic").system
         self.vertex_ai = vertex_ai_service
 
     def analyze_image(self, image_path: str, language: str = "en"):
@@ -32,57 +26,28 @@ Provide responses in markdown format for clarity."""
             image_path: Path to the medical image
             language: Language code (en, hi, mr) for report generation
         """
-        # Language-specific prompts
-        language_instructions = {
-            "en": """
-        Analyze this medical image for potential conditions or abnormalities.
-        
-        Provide:
-        1. **Primary Findings**: What do you observe?
-        2. **Potential Diagnosis**: What conditions might this indicate?
-        3. **Confidence Level**: How certain are you? (High/Medium/Low)
-        4. **Regions of Interest**: Describe specific areas of concern
-        5. **Recommendations**: What should the clinician investigate further?
-        
-        Remember: This is AI-assisted analysis to support, not replace, medical professionals.
-        """,
-            "hi": """
-        इस चिकित्सा छवि का विश्लेषण संभावित स्थितियों या असामान्यताओं के लिए करें।
-        
-        कृपया प्रदान करें:
-        1. **प्राथमिक निष्कर्ष**: आप क्या देखते हैं?
-        2. **संभावित निदान**: यह किन स्थितियों का संकेत दे सकता है?
-        3. **विश्वास स्तर**: आप कितने निश्चित हैं? (उच्च/मध्यम/निम्न)
-        4. **रुचि के क्षेत्र**: चिंता के विशिष्ट क्षेत्रों का वर्णन करें
-        5. **सिफारिशें**: चिकित्सक को आगे क्या जांच करनी चाहिए?
-        
-        याद रखें: यह चिकित्सा पेशेवरों को प्रतिस्थापित करने के लिए नहीं, बल्कि सहायता के लिए AI-सहायता प्राप्त विश्लेषण है।
-        
-        **महत्वपूर्ण**: कृपया पूरी रिपोर्ट हिंदी में लिखें।
-        """,
-            "mr": """
-        संभाव्य परिस्थिती किंवा विकृतींसाठी या वैद्यकीय प्रतिमेचे विश्लेषण करा.
-        
-        कृपया प्रदान करा:
-        1. **प्राथमिक निष्कर्ष**: तुम्हाला काय दिसते?
-        2. **संभाव्य निदान**: हे कोणत्या परिस्थितींचे संकेत देऊ शकते?
-        3. **विश्वास पातळी**: तुम्ही किती निश्चित आहात? (उच्च/मध्यम/कमी)
-        4. **स्वारस्याचे क्षेत्र**: चिंतेच्या विशिष्ट क्षेत्रांचे वर्णन करा
-        5. **शिफारसी**: चिकित्सकांनी पुढे काय तपासले पाहिजे?
-        
-        लक्षात ठेवा: हे वैद्यकीय व्यावसायिकांना बदलण्यासाठी नाही, तर समर्थन करण्यासाठी AI-सहाय्यित विश्लेषण आहे।
-        
-        **महत्त्वाचे**: कृपया संपूर्ण अहवाल मराठीत लिहा.
+        return self.analyze_image_with_source(image_path, language)[0]
+
+    def analyze_image_with_source(self, image_path: str, language: str = "en"):
         """
-        }
+        Markdown image analysis and where it came from
+
+        Returns:
+            Tuple of (markdown, source: vertex, ai or unavailable)
+        """
+        build_start = time.perf_counter()
         
-        medical_prompt = language_instructions.get(language, language_instructions["en"])
+        # Language-specific prompt, pre-rendered at startup
+        template = prompt_registry.get("diagnostic", language)
+        medical_prompt = template.render()
+        metrics.record_stage("prompt_build", build_start, agent="diagnostic")
         
         # Try Vertex AI Vision first
         vertex_result = self.vertex_ai.analyze_medical_image(image_path, medical_prompt)
         
         if vertex_result["success"] and not vertex_result["fallback"]:
             # Vertex AI Vision succeeded
+            format_start = time.perf_counter()
             analysis = f"""
 ## 🔬 Vertex AI Vision Analysis
 
@@ -92,16 +57,19 @@ Provide responses in markdown format for clarity."""
 **Analysis Method**: Vertex AI Vision (Medical Imaging Specialist Model)
 **Disclaimer**: This is an AI-assisted analysis. Final diagnosis must be made by a qualified medical professional.
 """
-            return analysis
+            metrics.record_stage("response_formatting", format_start, agent="diagnostic")
+            return analysis, "vertex"
         
         # Fallback to Gemini Vision
         try:
             response = self.client.vision_analysis(
                 image_path=image_path,
                 prompt=medical_prompt,
-                system_message=self.system_message
+                system_message=self.system_message,
+                context=template.key
             )
             
+            format_start = time.perf_counter()
             analysis = f"""
 ## 🔬 Medical Image Analysis
 
@@ -111,10 +79,12 @@ Provide responses in markdown format for clarity."""
 **Analysis Method**: Gemini Vision AI
 **Disclaimer**: This is an AI-assisted analysis. Final diagnosis must be made by a qualified medical professional.
 """
-            return analysis
+            metrics.record_stage("response_formatting", format_start, agent="diagnostic")
+            return analysis, "ai"
             
         except Exception as e:
             # Final fallback - simulated analysis
+            metrics.inc("fallbacks_total", source="diagnostic", target="demo_response")
             return f"""
 ## ⚠️ Analysis Unavailable
 
@@ -137,7 +107,35 @@ Based on the uploaded medical image, this system would normally provide:
 **Note**: This system uses Vertex AI (OAuth/Service Account) for vision analysis.
 
 **Disclaimer**: This is a demonstration. Always consult qualified medical professionals for diagnosis.
-"""
+""", "unavailable"
+
+    def analyze_image_structured(self, image_path: str, language: str = "en") -> dict:
+        """
+        Analyze a medical image into a typed report (see app.prompts.schemas.DIAGNOSTIC)
+        
+        Args:
+            image_path: Path to the medical image
+            language: Language code (en, hi, mr) for text values
+            
+        Returns:
+            Dict with report (None when no vision provider is available), source and error
+        """
+        template = prompt_registry.get("diagnostic", language)
+        # Static per language, so the whole prompt can live in the provider context cache
+        prompt = f"{template.render()}\n\n{schema_instructions(DIAGNOSTIC)}{language_instruction(language)}"
+        try:
+            response = self.client.vision_analysis(
+                image_path=image_path,
+                prompt=prompt,
+                system_message=self.system_message,
+                context=f"{template.key}#json:{schema_key(DIAGNOSTIC)}",
+                response_schema=DIAGNOSTIC
+            )
+            metrics.inc("structured_outputs_total", agent="diagnostic", outcome="valid")
+            return {"report": parse_document(response, DIAGNOSTIC), "source": "ai", "error": None}
+        except Exception as e:
+            metrics.inc("fallbacks_total", source="diagnostic", target="unavailable")
+            return {"report": None, "source": "unavailable", "error": str(e)}
 
 if __name__ == "__main__":
     agent = DiagnosticAgent()
@@ -1,10 +1,18 @@
 from app.util.smart_ai_client import smart_ai_client
+from app.util.metrics import metrics
 import random
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 import os
 from dotenv import load_dotenv
 from app.services.vertex_ai_service import vertex_ai_service
 from app.services.bigquery_service import bigquery_service
+from app.services.forecasting_service import forecasting_service, hour_index, hour_of_week, HOURS_PER_WEEK
+from app.services.timeseries_store import timeseries_store, to_timestamp, from_timestamp
+from app.services.staff_optimizer import staff_optimizer
+from app.services.inventory_service import inventory_service
+from app.services.or_scheduler import or_scheduler
+import numpy as np
 
 # Load environment variables
 load_dotenv()
@@ -25,37 +33,106 @@ Responsibilities:
 - Always prioritize patient safety and operational efficiency.
 
 Provide responses in markdown format for clarity."""
+        # Static system prompt is sent once per TTL as a provider-side cached context
+        self.client.context_cache.register("hospital", self.system_message)
+        self.store = timeseries_store
+
+    def forecast_load(self, current_time: datetime) -> dict:
+        """Next 24h OPD and ER arrival forecasts with rush windows, computed locally from the store"""
+        end_hour = hour_index(current_time)
+        start_hour = end_hour - 4 * HOURS_PER_WEEK
+        forecasts = {}
+        for stream, metric in (("opd", "opd_visits"), ("er", "er_arrivals")):
+            values = self.store.hourly_series(metric, start_hour, end_hour)
+            # OPD runs 08:00-20:00; the ER is open around the clock
+            open_hours = (0, 24) if stream == "er" else (8, 20)
+            result = vertex_ai_service.forecast_patient_load(values, start_index=start_hour,
+                                                             horizon=24, open_hours=open_hours)
+            forecasts[stream] = result["forecast"]
+        return forecasts
+
+    def today_hourly(self, metric: str, current_time: datetime, department: str = None,
+                     hours: range = range(8, 20)) -> list:
+        """
+        Hourly values for today's opening hours: recorded for elapsed hours,
+        the 4-week hour-of-week average for hours still to come
+        """
+        midnight = hour_index(current_time.replace(hour=0, minute=0, second=0, microsecond=0))
+        end_hour = hour_index(current_time)
+        start_hour = end_hour - 4 * HOURS_PER_WEEK
+        history = self.store.hourly_series(metric, start_hour, end_hour, department)
+        profile = forecasting_service.seasonal_profile(history, start_hour)
+        slots = hour_of_week(np.arange(midnight, midnight + 24))
+
+        values = []
+        for hour in hours:
+            index = midnight + hour
+            values.append(int(history[index - start_hour]) if index < end_hour else int(round(profile[slots[hour]])))
+        return values
+
+    def department_load(self, current_time: datetime, departments: list) -> dict:
+        """Expected patients per hour of today (24 values) for each department, from the 4-week profile"""
+        midnight = hour_index(current_time.replace(hour=0, minute=0, second=0, microsecond=0))
+        end_hour = hour_index(current_time)
+        start_hour = end_hour - 4 * HOURS_PER_WEEK
+        slots = hour_of_week(np.arange(midnight, midnight + 24))
+        return {
+            dept: forecasting_service.seasonal_profile(
+                self.store.hourly_series("department_patients", start_hour, end_hour, dept), start_hour)[slots]
+            for dept in departments
+        }
+
+    def plan_staffing(self, current_time: datetime, staff_availability: dict, departments: list) -> dict:
+        """Deterministic doctor/nurse allocation per department and shift for today"""
+        roster = staff_optimizer.build_roster(staff_availability, departments)
+        demand = staff_optimizer.shift_demand(self.department_load(current_time, departments))
+        plan = staff_optimizer.solve(demand, roster)
+        # Per-person assignments stay server-side; the dashboard gets slot totals
+        plan = {key: value for key, value in plan.items() if key != "assignments"}
+        plan["summary"] = staff_optimizer.summarize(plan)
+        return plan
+
+    def schedule_theatres(self, current_time: datetime):
+        """Pack a simulated case list into the theatres once per day"""
+        today = current_time.date()
+        if or_scheduler.day == today:
+            return
+        counts = {
+            "General": random.randint(8, 14),
+            "Orthopedic": random.randint(4, 8),
+            "Cardiac": random.randint(1, 3),
+            "Emergency": random.randint(3, 6),
+        }
+        or_scheduler.schedule_day(or_scheduler.generate_cases(counts), day=today)
+
+    def trend_days(self, metric: str, current_time: datetime, days: int = 7) -> list:
+        """Daily totals for the last complete days as (label, total) pairs"""
+        midnight = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = to_timestamp(midnight)
+        buckets, totals = self.store.downsample(metric, bucket="day", agg="sum",
+                                                start=end - days * 86400, end=end)
+        return [(from_timestamp(ts).strftime("%a"), int(total)) for ts, total in zip(buckets.tolist(), totals.tolist())]
 
     def simulate_hospital_data(self):
         """Generates comprehensive simulated hospital data for the dashboard."""
         current_time = datetime.now()
+        # Roll the metric store forward to the current hour
+        self.store.seed_synthetic(current_time)
         
-        # Simulate OPD Visits (Time-series like data)
-        opd_visits = []
-        total_opd_today = 0
-        for hour in range(8, 20): # 8 AM to 8 PM
-            visitors = random.randint(10, 50)
-            if hour in [10, 11, 17, 18]: # Peak hours
-                visitors += random.randint(20, 40)
-            opd_visits.append({"hour": f"{hour}:00", "visitors": visitors})
-            total_opd_today += visitors
-
-        # Simulate Surgery Schedule
-        surgeries = [
-            {"type": "General", "count": random.randint(2, 5), "avg_duration_mins": 90},
-            {"type": "Orthopedic", "count": random.randint(1, 3), "avg_duration_mins": 120},
-            {"type": "Cardiac", "count": random.randint(0, 2), "avg_duration_mins": 240},
-            {"type": "Emergency", "count": random.randint(1, 4), "avg_duration_mins": 60},
+        # OPD Visits: recorded hours so far today, typical load for the rest
+        opd_visits = [
+            {"hour": f"{hour}:00", "visitors": visitors}
+            for hour, visitors in zip(range(8, 20), self.today_hourly("opd_visits", current_time))
         ]
+        total_opd_today = sum(v["visitors"] for v in opd_visits)
 
-        # Simulate Pharmacy Inventory
-        inventory = [
-            {"item": "Paracetamol", "stock": random.randint(50, 500), "threshold": 100},
-            {"item": "Antibiotics (Amoxicillin)", "stock": random.randint(10, 100), "threshold": 30},
-            {"item": "Insulin", "stock": random.randint(5, 50), "threshold": 20},
-            {"item": "Bandages", "stock": random.randint(20, 200), "threshold": 50},
-            {"item": "Anesthetics", "stock": random.randint(2, 20), "threshold": 10},
-        ]
+        # Surgery Schedule: today's OR plan (cases added/cancelled through the API persist)
+        self.schedule_theatres(current_time)
+        surgeries = or_scheduler.type_summary()
+
+        # Pharmacy Inventory: headline items from the reorder engine (threshold = reorder point)
+        inventory_service.advance()
+        inventory = inventory_service.tracked_items()
 
         # NEW: KPI Metrics
         total_beds = 250
@@ -134,32 +211,31 @@ Provide responses in markdown format for clarity."""
             }
         }
 
-        # NEW: Historical Trends (Last 7 days)
+        # NEW: Historical Trends (Last 7 complete days, from the metric store)
         historical_trends = {
             "daily_patients": [
-                {"day": (current_time - timedelta(days=i)).strftime("%a"), 
-                 "patients": random.randint(200, 400)}
-                for i in range(6, -1, -1)
+                {"day": day, "patients": total}
+                for day, total in self.trend_days("opd_visits", current_time)
             ],
             "daily_emergencies": [
-                {"day": (current_time - timedelta(days=i)).strftime("%a"), 
-                 "emergencies": random.randint(20, 60)}
-                for i in range(6, -1, -1)
+                {"day": day, "emergencies": total}
+                for day, total in self.trend_days("er_arrivals", current_time)
             ]
         }
 
         # NEW: Patient Flow Heatmap Data
         patient_heatmap = []
         departments_list = ["Cardiology", "Orthopedics", "Pediatrics", "Emergency", "General"]
-        for hour in range(8, 20):
+        hourly_by_dept = {
+            dept: self.today_hourly("department_patients", current_time, department=dept)
+            for dept in departments_list
+        }
+        for i, hour in enumerate(range(8, 20)):
             for dept in departments_list:
-                intensity = random.randint(5, 30)
-                if hour in [10, 11, 17, 18]:  # Peak hours
-                    intensity += random.randint(10, 20)
                 patient_heatmap.append({
                     "hour": f"{hour}:00",
                     "department": dept,
-                    "patients": intensity
+                    "patients": hourly_by_dept[dept][i]
                 })
 
         return {
@@ -173,7 +249,12 @@ Provide responses in markdown format for clarity."""
             "er_metrics": er_metrics,
             "staff_availability": staff_availability,
             "historical_trends": historical_trends,
-            "patient_heatmap": patient_heatmap
+            "patient_heatmap": patient_heatmap,
+            "forecast": self.forecast_load(current_time),
+            "staff_plan": self.plan_staffing(current_time, staff_availability, departments_list),
+            "inventory_summary": inventory_service.prompt_summary(),
+            "or_utilization": or_scheduler.utilization(),
+            "or_summary": or_scheduler.prompt_summary()
         }
 
     def analyze_situation(self):
@@ -183,27 +264,45 @@ Provide responses in markdown format for clarity."""
         """
         data = self.simulate_hospital_data()
         
+        return {
+            "raw_data": data,
+            "analysis": self.generate_analysis(data)
+        }
+
+    def generate_analysis(self, data: dict) -> str:
+        """
+        Produce the optimization report for an already-built hospital snapshot.
+        
+        Args:
+            data: Output of simulate_hospital_data()
+        """
+        build_start = time.perf_counter()
         prompt = f"""
         Here is the current hospital status data:
         
         Timestamp: {data['timestamp']}
         
-        1. **OPD Visits Forecast (Next 12 Hours)**:
-        {data['opd_visits']}
+        1. **OPD Load Forecast (Next 24 Hours, computed)**:
+        Rush windows: {self._format_rush_hours(data['forecast']['opd'])}
+        ER rush windows: {self._format_rush_hours(data['forecast']['er'])}
+        
+        2. **Operating Theatres (computed schedule)**:
+        {data['or_summary']}
         
-        2. **Surgery Schedule**:
-        {data['surgery_schedule']}
+        3. **Pharmacy Reorder Analysis (computed, highest priority first)**:
+        {data['inventory_summary']}
         
-        3. **Pharmacy Inventory Status**:
-        {data['pharmacy_inventory']}
+        4. **Staffing Plan (computed; assigned/required per shift)**:
+        {data['staff_plan']['summary']}
         
         Based on this data, please provide a 'Hospital Operations Optimization Report' containing:
         
-        *   **Rush Hour Prediction**: Identify specifically when the hospital will be busiest and why.
-        *   **Staffing Recommendations**: Suggest how many doctors/nurses are needed for OPD vs Surgeries based on load.
-        *   **Inventory Alerts**: List any items below threshold that need immediate ordering.
+        *   **Rush Hour Prediction**: Explain the computed rush windows above and their operational impact.
+        *   **Staffing Recommendations**: Explain the computed staffing plan above and any gaps, including OR overruns. Do not change its numbers.
+        *   **Inventory Alerts**: Explain the reorder priorities above and what to order first.
         *   **Operational Advice**: One key strategy to improve flow today (e.g., 'Open extra counter at 10 AM').
         """
+        metrics.record_stage("prompt_build", build_start, agent="hospital")
         
         try:
             # Get response from the Grok client
@@ -211,11 +310,14 @@ Provide responses in markdown format for clarity."""
                 prompt=prompt,
                 system_message=self.system_message,
                 temperature=0.7,
-                max_tokens=2048
+                max_tokens=2048,
+                agent="hospital",
+                context="hospital"
             )
             analysis = response
         except Exception as e:
             # Fallback response if API fails (rate limit, network issues, etc.)
+            metrics.inc("fallbacks_total", source="hospital", target="demo_response")
             error_msg = str(e)
             if "429" in error_msg or "Too Many Requests" in error_msg:
                 analysis = """
@@ -224,17 +326,15 @@ Provide responses in markdown format for clarity."""
 **Note**: The Gemini API rate limit has been exceeded. Showing simulated analysis.
 
 ### Rush Hour Prediction
-Based on the OPD data, expect peak patient flow between **10:00-12:00** and **17:00-19:00**. 
-These times typically see 30-40% higher visitor counts.
+Forecast peak OPD windows: **""" + self._format_rush_hours(data['forecast']['opd']) + """**.
+Forecast peak ER windows: **""" + self._format_rush_hours(data['forecast']['er']) + """**.
 
 ### Staffing Recommendations
-- **OPD Department**: Deploy 8-10 doctors during peak hours
-- **Surgery Department**: Maintain 5-6 surgeons for scheduled procedures
-- **Nursing Staff**: Increase by 20% during rush hours
+Computed allocation (assigned/required):
+""" + data['staff_plan']['summary'] + """
 
 ### Inventory Alerts
-""" + "\n".join([f"- **{item['item']}**: Stock at {item['stock']} units (Threshold: {item['threshold']})" 
-                 for item in data['pharmacy_inventory'] if item['stock'] < item['threshold']]) + """
+""" + data['inventory_summary'] + """
 
 ### Operational Advice
 **Key Strategy**: Open additional registration counters at 9:30 AM to handle the morning rush efficiently.
@@ -243,12 +343,22 @@ These times typically see 30-40% higher visitor counts.
 *To get AI-powered analysis, please wait a few minutes and try again, or upgrade your API quota.*
 """
             else:
-                analysis = f"**Error**: Unable to generate AI analysis. {error_msg}"
+                analysis = (
+                    f"**Error**: Unable to generate AI analysis. {error_msg}\n\n"
+                    f"**Forecast OPD rush windows**: {self._format_rush_hours(data['forecast']['opd'])}\n"
+                    f"**Forecast ER rush windows**: {self._format_rush_hours(data['forecast']['er'])}\n\n"
+                    f"**Computed staffing plan**:\n{data['staff_plan']['summary']}\n\n"
+                    f"**Reorder priorities**:\n{data['inventory_summary']}"
+                )
         
-        return {
-            "raw_data": data,
-            "analysis": analysis
-        }
+        return analysis
+
+    @staticmethod
+    def _format_rush_hours(forecast) -> str:
+        """Compact 'HH:00-HH:00 (~N patients)' list for prompts and fallbacks"""
+        if not forecast or not forecast.get("rush_hours"):
+            return "none detected"
+        return ", ".join(f"{w['start']}-{w['end']} (~{w['expected']} patients)" for w in forecast["rush_hours"])
 
 if __name__ == "__main__":
     hospital_agent = HospitalAgent()
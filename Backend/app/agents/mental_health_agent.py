@@ -1,5 +1,11 @@
 from app.util.smart_ai_client import smart_ai_client
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+from app.util.token_budget import truncate_history
 import os
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 from typing import List, Dict
 import re
@@ -7,6 +13,17 @@ import re
 # Load environment variables
 load_dotenv()
 
+log = get_logger(__name__)
+
+# Conversation history allowance inside the mental health prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("MENTAL_HEALTH_HISTORY_TOKENS", "600"))
+
+# Conversations kept in memory; the least recently active is evicted beyond this
+MAX_SESSIONS = int(os.getenv("MENTAL_HEALTH_MAX_SESSIONS", "1000"))
+
+# Messages kept per conversation (only the last 5 reach the prompt)
+SESSION_HISTORY_LIMIT = 20
+
 class MentalHealthAgent:
     def __init__(self):
         self.client = smart_ai_client
@@ -22,7 +39,11 @@ Your responsibilities:
 - Provide coping strategies and emotional support.
 
 Provide responses in markdown format for clarity."""
-        self.conversation_history = []
+        # Cached provider-side; requests reference it instead of resending it
+        self.client.context_cache.register("mental_health", self.system_message)
+        # Per-session histories; chats run concurrently in the threadpool
+        self.sessions: "OrderedDict[str, List[Dict[str, str]]]" = OrderedDict()
+        self.lock = threading.Lock()
         
         # Enhanced risk detection keywords with severity levels
         self.risk_keywords = {
@@ -92,12 +113,36 @@ Provide responses in markdown format for clarity."""
             "action": "NORMAL_CONVERSATION"
         }
 
-    def chat(self, user_message: str, history: list = None):
+    def _append(self, session_id: str, role: str, content: str) -> List[Dict[str, str]]:
+        """
+        Add a message to a session's history
+
+        Returns:
+            Copy of the session's history including the new message
+        """
+        with self.lock:
+            history = self.sessions.pop(session_id, [])
+            history.append({"role": role, "content": content})
+            self.sessions[session_id] = history[-SESSION_HISTORY_LIMIT:]
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+            return list(self.sessions[session_id])
+
+    def history(self, session_id: str = "default") -> List[Dict[str, str]]:
+        """Copy of a session's conversation history"""
+        with self.lock:
+            return list(self.sessions.get(session_id, []))
+
+    def chat(self, user_message: str, history: list = None, session_id: str = "default"):
         """
         Handles a chat interaction with ADK-based risk monitoring
+
+        Args:
+            user_message: The user's message
+            session_id: Conversation the message belongs to; history never crosses sessions
         """
         # Update conversation history
-        self.conversation_history.append({"role": "user", "content": user_message})
+        conversation = self._append(session_id, "user", user_message)
         
         # Perform risk assessment
         risk_assessment = self.assess_risk_level(user_message)
@@ -123,7 +168,7 @@ Provide responses in markdown format for clarity."""
 
 Please reach out to one of the resources above immediately. I'm an AI and cannot provide emergency intervention, but real people who care are ready to help you right now.
 """
-            self.conversation_history.append({"role": "assistant", "content": emergency_response})
+            self._append(session_id, "assistant", emergency_response)
             
             # Log for human review (in production, this would alert a crisis team)
             self._log_critical_event(user_message, risk_assessment)
@@ -144,10 +189,12 @@ Please reach out to one of the resources above immediately. I'm an AI and cannot
             escalation_prefix = ""
         
         # Build context from history
-        context = "\n".join([
+        build_start = time.perf_counter()
+        # Last 5 messages before the current one (sent separately below), within the history budget
+        context = "\n".join(truncate_history([
             f"{msg['role'].capitalize()}: {msg['content']}" 
-            for msg in self.conversation_history[-5:]  # Last 5 messages
-        ])
+            for msg in conversation[-6:-1]
+        ], max_tokens=HISTORY_TOKEN_BUDGET))
         
         # Generate AI response
         try:
@@ -162,19 +209,25 @@ Risk Level: {risk_assessment['level']}
 Provide a compassionate, supportive response using CBT techniques. 
 If risk level is MODERATE or HIGH, gently encourage professional help while being supportive.
 """
+            metrics.record_stage("prompt_build", build_start, agent="mental_health")
             response = self.client.simple_prompt(
                 prompt=prompt,
                 system_message=self.system_message,
                 temperature=0.8,
-                max_tokens=1024
+                max_tokens=1024,
+                agent="mental_health",
+                context="mental_health",
+                # High-risk conversations jump the provider queue
+                priority="emergency" if risk_assessment["level"] == "HIGH" else None
             )
             ai_response = escalation_prefix + response
             
-            self.conversation_history.append({"role": "assistant", "content": ai_response})
+            self._append(session_id, "assistant", ai_response)
             return ai_response
             
         except Exception as e:
             # Enhanced fallback for rate limits or connection issues
+            metrics.inc("fallbacks_total", source="mental_health", target="supportive_template")
             error_msg = str(e)
             
             # Provide contextual fallback based on risk level
@@ -225,7 +278,7 @@ Would you like to share more about what's on your mind? I'm here to listen, even
 **If you need immediate professional support**: Call 1-800-273-8255 (24/7)
 """
             
-            self.conversation_history.append({"role": "assistant", "content": fallback})
+            self._append(session_id, "assistant", fallback)
             return fallback
     
     def _log_critical_event(self, message: str, risk_assessment: Dict):
@@ -233,15 +286,16 @@ Would you like to share more about what's on your mind? I'm here to listen, even
         Log critical events for human review (ADK monitoring layer)
         In production, this would trigger alerts to crisis response team
         """
-        import datetime
-        log_entry = {
-            "timestamp": datetime.datetime.now().isoformat(),
-            "message": message,
-            "risk_assessment": risk_assessment,
-            "action_taken": "EMERGENCY_PROTOCOL_ACTIVATED"
-        }
+        # Message text is redacted by the logger; only a fingerprint is emitted
         # In production: Send to monitoring system, alert crisis team
-        print(f"🚨 CRITICAL EVENT LOGGED: {log_entry}")
+        log.critical(
+            "mental_health.critical_event",
+            message=message,
+            risk_level=risk_assessment["level"],
+            severity=risk_assessment["severity"],
+            trigger=risk_assessment["trigger"],
+            action_taken="EMERGENCY_PROTOCOL_ACTIVATED"
+        )
 
 if __name__ == "__main__":
     agent = MentalHealthAgent()
@@ -1,6 +1,12 @@
 from app.util.smart_ai_client import smart_ai_client
+from app.util.metrics import metrics
+from app.prompts.registry import prompt_registry
 from app.services.vertex_ai_service import vertex_ai_service
+from app.services.interaction_index import interaction_index, prompt_summary
+from app.services.dosage_calculator import dosage_calculator, describe_regimen
+from app.prompts.schemas import TREATMENT, RISK_LEVELS, language_instruction
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,33 +16,9 @@ class TreatmentAgent:
     def __init__(self):
         self.client = smart_ai_client
         self.vertex_ai = vertex_ai_service
-        self.system_message = """You are an expert AI Treatment Recommendation and Safety Specialist.
-
-Your responsibilities:
-- Analyze comprehensive patient data (age, weight, medical history, current medications, allergies)
-- Recommend evidence-based treatment plans with precise dosage calculations
-- Identify safer alternative medications when applicable
-- Perform rigorous drug interaction analysis
-- Flag allergy conflicts and contraindications
-- Assess overdose risks and provide safety warnings
-- Cite known side effects and adverse reactions
-- Provide clear, actionable clinical recommendations
-
-CRITICAL SAFETY PROTOCOLS:
-- If HIGH RISK detected → Output 'ESCALATE TO DOCTOR' immediately
-- Always include contraindications and warnings
-- Mandatory disclaimer: 'Consult a physician before administration'
-
-Provide responses in structured markdown format with clear sections:
-1. **Treatment Plan**: Primary recommendations
-2. **Dosage Guidelines**: Precise calculations based on patient metrics
-3. **Alternative Options**: Safer or equally effective alternatives
-4. **Safety Analysis**: Drug interactions, allergies, contraindications
-5. **Side Effects**: Common and serious adverse reactions
-6. **Monitoring**: What to watch for during treatment
-7. **Recommendations**: Next steps and follow-up
-
-Use professional medical terminology while remaining clear and actionable."""
+        self.interactions = interaction_index
+        self.dosages = dosage_calculator
+        self.system_message = prompt_registry.get("treatment").system
 
     def recommend_treatment(self, patient_data: dict):
         """
@@ -45,91 +27,23 @@ Use professional medical terminology while remaining clear and actionable."""
         Args:
             patient_data: Dictionary containing patient information and language preference
         """
-        language = patient_data.get('language', 'en')
-        
-        # Language-specific instructions
-        language_instructions = {
-            "en": "Please provide a comprehensive treatment analysis including:",
-            "hi": "कृपया एक व्यापक उपचार विश्लेषण प्रदान करें जिसमें शामिल हों:",
-            "mr": "कृपया सर्वसमावेशक उपचार विश्लेषण प्रदान करा ज्यामध्ये समाविष्ट आहे:"
-        }
-        
-        section_headers = {
-            "en": {
-                "plan": "1. **Treatment Plan**",
-                "dosage": "   - Dosage calculations (based on age/weight)",
-                "duration": "   - Treatment duration and schedule",
-                "alternatives": "2. **Alternative Options**",
-                "safety": "3. **Safety Analysis**",
-                "side_effects": "4. **Side Effects Profile**",
-                "recommendations": "5. **Clinical Recommendations**",
-                "note": "**CRITICAL**: If you detect HIGH RISK (severe interactions, allergy conflicts, or contraindications), clearly state \"ESCALATE TO DOCTOR\" at the top of your response.\n\nProvide evidence-based, clinically sound recommendations."
-            },
-            "hi": {
-                "plan": "1. **उपचार योजना**",
-                "dosage": "   - खुराक की गणना (उम्र/वजन के आधार पर)",
-                "duration": "   - उपचार की अवधि और कार्यक्रम",
-                "alternatives": "2. **वैकल्पिक विकल्प**",
-                "safety": "3. **सुरक्षा विश्लेषण**",
-                "side_effects": "4. **दुष्प्रभाव प्रोफ़ाइल**",
-                "recommendations": "5. **नैदानिक सिफारिशें**",
-                "note": "**महत्वपूर्ण**: यदि आप उच्च जोखिम का पता लगाते हैं (गंभीर अंतःक्रियाएं, एलर्जी संघर्ष, या contraindications), तो अपनी प्रतिक्रिया के शीर्ष पर स्पष्ट रूप से \"डॉक्टर से परामर्श करें\" लिखें।\n\nसाक्ष्य-आधारित, नैदानिक रूप से सही सिफारिशें प्रदान करें।\n\n**कृपया पूरी रिपोर्ट हिंदी में लिखें।**"
-            },
-            "mr": {
-                "plan": "1. **उपचार योजना**",
-                "dosage": "   - डोस गणना (वय/वजन आधारित)",
-                "duration": "   - उपचार कालावधी आणि वेळापत्रक",
-                "alternatives": "2. **पर्यायी पर्याय**",
-                "safety": "3. **सुरक्षा विश्लेषण**",
-                "side_effects": "4. **दुष्परिणाम प्रोफाइल**",
-                "recommendations": "5. **क्लिनिकल शिफारसी**",
-                "note": "**महत्त्वाचे**: जर तुम्हाला उच्च धोका आढळला (गंभीर परस्परसंवाद, ऍलर्जी संघर्ष, किंवा contraindications), तर तुमच्या प्रतिसादाच्या शीर्षस्थानी स्पष्टपणे \"डॉक्टरांचा सल्ला घ्या\" लिहा.\n\nपुराव्यावर आधारित, क्लिनिकली योग्य शिफारसी द्या.\n\n**कृपया संपूर्ण अहवाल मराठीत लिहा.**"
-            }
-        }
-        
-        headers = section_headers.get(language, section_headers["en"])
-        instruction = language_instructions.get(language, language_instructions["en"])
-        
-        prompt = f"""
-        **Patient Profile:**
-        - Age: {patient_data.get('age')} years
-        - Weight: {patient_data.get('weight')} kg
-        - Primary Condition: {patient_data.get('condition')}
-        - Medical History: {patient_data.get('history', 'None reported')}
-        - Current Medications: {', '.join(patient_data.get('current_meds', [])) if patient_data.get('current_meds') else 'None'}
-        - Known Allergies: {', '.join(patient_data.get('allergies', [])) if patient_data.get('allergies') else 'None'}
-
-        {instruction}
-
-        {headers['plan']}
-           - Primary medication recommendations
-           {headers['dosage']}
-           {headers['duration']}
-
-        {headers['alternatives']}
-           - Safer alternatives if applicable
-           - Second-line treatments
-           - Non-pharmacological options
-
-        {headers['safety']}
-           - Drug-drug interactions (with current medications)
-           - Allergy cross-reactivity
-           - Contraindications
-           - Risk level assessment (Low/Medium/High)
-
-        {headers['side_effects']}
-           - Common side effects (>10% incidence)
-           - Serious adverse reactions
-           - What to monitor
-
-        {headers['recommendations']}
-           - Follow-up schedule
-           - Lab tests needed
-           - Lifestyle modifications
-           - When to seek immediate care
-
-        {headers['note']}
+        return self.recommend_treatment_with_source(patient_data)[0]
+
+    def recommend_treatment_with_source(self, patient_data: dict):
+        """
+        Markdown treatment plan and where it came from
+
+        Returns:
+            Tuple of (markdown, source: ai, formulary, escalation or unavailable)
         """
+        # Deterministic local pre-screen; high risk never needs the LLM
+        screen = self.interactions.screen(patient_data.get('current_meds') or [], patient_data.get('allergies') or [])
+        if screen["escalate"]:
+            metrics.inc("treatment_escalations_total", source="interaction_index")
+            return self.format_escalation(patient_data, screen), "escalation"
+
+        dosing = self.calculate_dosages(patient_data)
+        template, prompt = self.build_prompt(patient_data, screen, dosing)
         
         try:
             # Use Gemini AI (same as diagnostic agent)
@@ -137,10 +51,17 @@ Use professional medical terminology while remaining clear and actionable."""
                 prompt=prompt,
                 system_message=self.system_message,
                 temperature=0.3,  # Lower temperature for medical accuracy
-                max_tokens=3000
+                max_tokens=2200 if dosing["regimens"] else 3000,
+                agent="treatment",
+                prompt_version=template.key,
+                cache=True,
+                static_prefix=template.static_prefix,
+                context=template.key,
+                priority=_priority(patient_data)
             )
             
             # Format response with metadata
+            format_start = time.perf_counter()
             formatted_response = f"""
 ## 🏥 AI-Generated Treatment Plan
 
@@ -152,10 +73,15 @@ Use professional medical terminology while remaining clear and actionable."""
 **Confidence**: Clinical guidelines-based recommendations
 **Disclaimer**: This is an AI-assisted analysis to support medical decision-making. **Final treatment decisions must be made by a qualified physician.** Always consult with healthcare professionals before starting, stopping, or modifying any treatment.
 """
-            return formatted_response
+            metrics.record_stage("response_formatting", format_start, agent="treatment")
+            return formatted_response, "ai"
             
         except Exception as e:
+            if dosing["regimens"]:
+                metrics.inc("fallbacks_total", source="treatment", target="formulary")
+                return self.format_formulary_plan(patient_data, dosing, screen), "formulary"
             # Fallback response
+            metrics.inc("fallbacks_total", source="treatment", target="demo_response")
             return f"""
 ## ⚠️ Treatment Analysis Unavailable
 
@@ -203,8 +129,282 @@ Based on the patient profile for **{patient_data.get('condition', 'the condition
 3. Check network connectivity
 
 **Always consult qualified medical professionals for treatment decisions.**
+""", "unavailable"
+
+    def build_prompt(self, patient_data: dict, screen: dict, dosing: dict):
+        """
+        Request-specific prompt: patient profile, local safety screen and formulary doses
+
+        Returns:
+            Tuple of (PromptTemplate for the patient's language, prompt body)
+        """
+        build_start = time.perf_counter()
+        language = patient_data.get('language', 'en')
+        template = prompt_registry.get("treatment", language)
+        
+        # Canonical, sorted names so "metformin 500 mg bid" and "Metformin 500mg BID" share a cache entry
+        current_meds = self.interactions.drug_matcher.normalize_list(patient_data.get('current_meds'))
+        allergies = self.interactions.allergy_matcher.normalize_list(patient_data.get('allergies'))
+        
+        # Static instructions travel as a cacheable prefix; only the profile varies
+        prompt = template.render_body(
+            age=patient_data.get('age'),
+            weight=patient_data.get('weight'),
+            condition=patient_data.get('condition'),
+            history=patient_data.get('history') or 'None reported',
+            current_meds=', '.join(current_meds) or 'None',
+            allergies=', '.join(allergies) or 'None'
+        )
+        prompt += f"\n\n**Pre-screened Safety Findings:**\n{prompt_summary(screen)}"
+
+        # Formulary doses computed locally; the model explains them instead of recalculating
+        if dosing["regimens"]:
+            regimens = "\n".join(f"- {describe_regimen(r)}" for r in dosing["regimens"])
+            prompt += (f"\n\n**Precomputed Dosages (formulary v{dosing['formulary_version']}, "
+                       f"use these exactly, do not recalculate):**\n{regimens}")
+        if dosing.get("manual_dosing"):
+            manual = "\n".join(f"- {r['drug']}: {r['reason']}" for r in dosing["manual_dosing"])
+            prompt += (f"\n\n**Requires Manual Dosing (no formulary dose can be measured; "
+                       f"do not propose a dose, refer to the prescriber):**\n{manual}")
+        metrics.record_stage("prompt_build", build_start, agent="treatment")
+        return template, prompt
+
+    def recommend_treatment_structured(self, patient_data: dict) -> dict:
+        """
+        Treatment plan as a typed document (see app.prompts.schemas.TREATMENT)
+
+        Args:
+            patient_data: Dictionary containing patient information and language preference
+
+        Returns:
+            Dict with the plan, its source (ai, formulary, escalation or unavailable),
+            the local safety screen and the formulary regimens
+        """
+        screen = self.interactions.screen(patient_data.get('current_meds') or [], patient_data.get('allergies') or [])
+        if screen["escalate"]:
+            metrics.inc("treatment_escalations_total", source="interaction_index")
+            return self._structured_result(self.structured_escalation(patient_data, screen), "escalation", screen, None)
+
+        dosing = self.calculate_dosages(patient_data)
+        template, prompt = self.build_prompt(patient_data, screen, dosing)
+        try:
+            plan = self.client.structured_prompt(
+                prompt + language_instruction(patient_data.get('language')),
+                TREATMENT,
+                system_message=self.system_message,
+                temperature=0.3,
+                max_tokens=1800,
+                agent="treatment",
+                prompt_version=template.key,
+                cache=True,
+                context=template.key,
+                priority=_priority(patient_data)
+            )
+            return self._structured_result(plan, "ai", screen, dosing)
+        except Exception as e:
+            return self._structured_fallback(patient_data, dosing, screen, e)
+
+    def stream_treatment(self, patient_data: dict):
+        """
+        Stream a structured treatment plan
+
+        Yields:
+            Events: "screen" (local safety screen, immediately), "formulary"
+            (regimens, immediately), "field" per plan field as the model writes
+            it, then "complete" with the same document recommend_treatment_structured returns
+        """
+        screen = self.interactions.screen(patient_data.get('current_meds') or [], patient_data.get('allergies') or [])
+        yield {"event": "screen", "value": screen}
+        if screen["escalate"]:
+            metrics.inc("treatment_escalations_total", source="interaction_index")
+            plan = self.structured_escalation(patient_data, screen)
+            for field, value in plan.items():
+                yield {"event": "field", "path": field, "value": value}
+            yield {"event": "complete", **self._structured_result(plan, "escalation", screen, None)}
+            return
+
+        dosing = self.calculate_dosages(patient_data)
+        yield {"event": "formulary", "value": dosing}
+        template, prompt = self.build_prompt(patient_data, screen, dosing)
+        try:
+            for event in self.client.stream_structured(
+                prompt + language_instruction(patient_data.get('language')),
+                TREATMENT,
+                system_message=self.system_message,
+                temperature=0.3,
+                max_tokens=1800,
+                agent="treatment",
+                prompt_version=template.key,
+                cache=True,
+                context=template.key,
+                priority=_priority(patient_data)
+            ):
+                if event["event"] == "field":
+                    if event["path"] == "risk_level":
+                        event["value"] = _max_risk(event["value"], screen["risk"])
+                    yield event
+                elif event["valid"]:
+                    yield {"event": "complete", **self._structured_result(event["result"], "ai", screen, dosing)}
+                else:
+                    raise ValueError(f"Invalid structured response: {'; '.join(event['errors'][:3])}")
+        except Exception as e:
+            yield {"event": "complete", **self._structured_fallback(patient_data, dosing, screen, e)}
+
+    def _structured_result(self, plan: dict, source: str, screen: dict, dosing) -> dict:
+        """Attach local findings; the plan's risk level never drops below the local screen"""
+        plan["risk_level"] = _max_risk(plan.get("risk_level"), screen["risk"])
+        return {"plan": plan, "source": source, "safety_screen": screen, "formulary": dosing}
+
+    def _structured_fallback(self, patient_data: dict, dosing: dict, screen: dict, error: Exception) -> dict:
+        if dosing["regimens"]:
+            metrics.inc("fallbacks_total", source="treatment", target="formulary")
+            return self._structured_result(self.structured_formulary_plan(dosing, screen), "formulary", screen, dosing)
+        metrics.inc("fallbacks_total", source="treatment", target="demo_response")
+        plan = {
+            "risk_level": screen["risk"].capitalize(),
+            "escalate": False,
+            "summary": f"Treatment analysis unavailable ({error}); no formulary regimen for "
+                       f"{patient_data.get('condition', 'this condition')}. Physician review required.",
+            "dosages": [],
+            "interactions": [{k: f[k] for k in ("drugs", "severity", "effect")} for f in screen["interactions"]],
+            "monitoring": []
+        }
+        return self._structured_result(plan, "unavailable", screen, dosing)
+
+    def structured_formulary_plan(self, dosing: dict, screen: dict) -> dict:
+        """Deterministic structured plan from the formulary (no AI provider needed)"""
+        usable = [r for r in dosing["regimens"] if r.get("safety") != "avoid"]
+        avoided = [r for r in dosing["regimens"] if r.get("safety") == "avoid"]
+        return {
+            "risk_level": screen["risk"].capitalize(),
+            "escalate": False,
+            "summary": f"Standard formulary v{dosing['formulary_version']} regimens for {dosing['condition']}; "
+                       "AI service unavailable, doses are weight/age based only.",
+            "dosages": [{
+                "drug": r["drug"],
+                "dose": f"{r['dose_mg']:g} mg",
+                "frequency": r["frequency"],
+                "duration": f"{r['duration_days']} days" if r["duration_days"] else "ongoing",
+                "route": r["route"],
+                "rationale": "; ".join(filter(None, [r["line"], r["basis"], r.get("safety_reason"), r["notes"]]))
+            } for r in usable],
+            "interactions": [{k: f[k] for k in ("drugs", "severity", "effect")} for f in screen["interactions"]],
+            "allergy_warnings": [f"{f['allergy']} vs {f['drug']}: {f['note']}" for f in screen["allergy_conflicts"]],
+            "contraindications": [f"{r['drug']}: {r['safety_reason']}" for r in avoided]
+                                 + [f"{r['drug']}: manual dosing required, {r['reason']}" for r in dosing.get("manual_dosing", [])],
+            "monitoring": [r["notes"] for r in usable if r["notes"]],
+            "follow_up": "Physician review before administration"
+        }
+
+    def structured_escalation(self, patient_data: dict, screen: dict) -> dict:
+        """Structured form of format_escalation"""
+        return {
+            "risk_level": "High",
+            "escalate": True,
+            "summary": f"ESCALATE TO DOCTOR: high-risk medication safety findings for this "
+                       f"{patient_data.get('condition', 'patient')} case; no treatment plan generated.",
+            "dosages": [],
+            "interactions": [{k: f[k] for k in ("drugs", "severity", "effect")} for f in screen["interactions"]],
+            "allergy_warnings": [f"{f['allergy']} vs {f['drug']} ({f['severity']}): {f['note']}"
+                                 for f in screen["allergy_conflicts"]],
+            "monitoring": [],
+            "follow_up": "Physician must review the current regimen before any change"
+        }
+
+    def calculate_dosages(self, patient_data: dict) -> dict:
+        """
+        Formulary regimens for the patient's condition, age and weight, each
+        screened against current medications and allergies
+
+        Args:
+            patient_data: Dictionary with condition, age, weight, current_meds and allergies
+
+        Returns:
+            Dict with resolved condition, formulary version and regimens; regimens with
+            a major interaction or allergy conflict carry safety "avoid", others "caution"
+        """
+        dosing = self.dosages.calculate(patient_data.get('condition'), patient_data.get('age'),
+                                        patient_data.get('weight'))
+        meds = patient_data.get('current_meds') or []
+        allergies = patient_data.get('allergies') or []
+        for regimen in dosing["regimens"]:
+            screen = self.interactions.screen(meds, allergies, proposed=[regimen["drug"]])
+            findings = [f for f in screen["interactions"] if regimen["drug"] in f["drugs"]]
+            conflicts = [f for f in screen["allergy_conflicts"] if f["drug"] == regimen["drug"]]
+            if findings or conflicts:
+                severe = any(f["severity"] in ("major", "high") for f in findings + conflicts)
+                regimen["safety"] = "avoid" if severe else "caution"
+                regimen["safety_reason"] = "; ".join(
+                    [f"interacts with {' + '.join(f['drugs'])} ({f['severity']})" for f in findings]
+                    + [f"{f['allergy']} allergy ({f['severity']})" for f in conflicts])
+        return dosing
+
+    def format_formulary_plan(self, patient_data: dict, dosing: dict, screen: dict) -> str:
+        """Deterministic treatment plan from the formulary when no AI provider is available"""
+        usable = [r for r in dosing["regimens"] if r.get("safety") != "avoid"]
+        avoided = [r for r in dosing["regimens"] if r.get("safety") == "avoid"]
+        regimens = "\n".join(f"- {describe_regimen(r)}" + (f" - {r['notes']}" if r["notes"] else "")
+                              for r in usable) or "- No safe formulary option; physician review required"
+        avoid = "\n".join([f"- ~~{r['drug']}~~: {r['safety_reason']}" for r in avoided]
+                          + [f"- {r['drug']}: manual dosing required ({r['reason']})"
+                             for r in dosing.get("manual_dosing", [])]) or "- None"
+        return f"""
+## 🏥 Formulary Treatment Plan
+
+Standard regimens for **{dosing['condition']}** (age {patient_data.get('age')}, {patient_data.get('weight')} kg):
+
+### Dosing
+{regimens}
+
+### Not Recommended for This Patient
+{avoid}
+
+### Safety Analysis
+{prompt_summary(screen)}
+
+---
+
+**Analysis Method**: Local formulary v{dosing['formulary_version']} (deterministic weight/age dosing; AI service unavailable)
+**Disclaimer**: Doses follow the standard formulary and do not account for renal/hepatic function. **Final treatment decisions must be made by a qualified physician.**
+"""
+
+    def format_escalation(self, patient_data: dict, screen: dict) -> str:
+        """Deterministic escalation report for high-risk combinations found by the local screen"""
+        interactions = "\n".join(
+            f"- **{' + '.join(f['drugs'])}** ({f['severity']}): {f['effect']}" for f in screen["interactions"]
+        ) or "- None found"
+        conflicts = "\n".join(
+            f"- **{f['allergy']}** allergy vs **{f['drug']}** ({f['severity']}): {f['note']}"
+            for f in screen["allergy_conflicts"]
+        ) or "- None found"
+        return f"""
+## ⛔ ESCALATE TO DOCTOR
+
+High-risk medication safety findings were detected for this **{patient_data.get('condition', 'patient')}** case. No AI treatment plan was generated; a physician must review the current regimen first.
+
+### Drug Interactions
+{interactions}
+
+### Allergy Conflicts
+{conflicts}
+
+---
+
+**Analysis Method**: Local drug-interaction and allergy index (deterministic screen, {screen['elapsed_us']} µs)
+**Disclaimer**: Consult a physician before administration. **Final treatment decisions must be made by a qualified physician.**
 """
 
+def _priority(patient_data: dict):
+    """Urgent requests are scheduled ahead of interactive and background AI calls"""
+    return "emergency" if patient_data.get('urgent') else None
+
+
+def _max_risk(level, local_risk: str) -> str:
+    """Higher of a model risk level (Low/Medium/High) and the local screen risk (low/medium/high)"""
+    ranks = {name.lower(): i for i, name in enumerate(RISK_LEVELS)}
+    rank = max(ranks.get(str(level).lower(), 0), ranks[local_risk])
+    return RISK_LEVELS[rank]
+
 if __name__ == "__main__":
     agent = TreatmentAgent()
     data = {
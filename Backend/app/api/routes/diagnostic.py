@@ -1,5 +1,6 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Form
 from app.agents.diagnostic_agent import DiagnosticAgent
+from app.services.job_queue import job_queue, DegradedResult
 import shutil
 from pathlib import Path
 from typing import Optional
@@ -11,7 +12,7 @@ UPLOAD_DIR = Path("temp_uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 @router.post("/analyze-image")
-async def analyze_image(
+def analyze_image(
     file: UploadFile = File(...),
     language: Optional[str] = Form("en")
 ):
@@ -22,6 +23,8 @@ async def analyze_image(
         file: Medical image file
         language: Language code (en, hi, mr) for report generation
     """
+    # Shed before the upload is written when the providers are overloaded
+    agent.client.admit(vision=True)
     try:
         file_location = UPLOAD_DIR / file.filename
         with open(file_location, "wb") as buffer:
@@ -36,3 +39,64 @@ async def analyze_image(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+
+@router.post("/analyze-image/structured")
+def analyze_image_structured(
+    file: UploadFile = File(...),
+    language: Optional[str] = Form("en")
+):
+    """
+    Analyze medical image into a typed JSON report (risk level, urgency,
+    findings, recommendations) instead of markdown.
+    """
+    agent.client.admit(vision=True)
+    try:
+        file_location = UPLOAD_DIR / file.filename
+        with open(file_location, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+
+        result = agent.analyze_image_structured(str(file_location), language=language)
+        return {"filename": file.filename, "language": language, **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def run_analysis_job(payload: dict) -> dict:
+    analysis, source = agent.analyze_image_with_source(payload["attachment_path"], language=payload["language"])
+    result = {"filename": payload["filename"], "analysis": analysis, "language": payload["language"]}
+    if source == "unavailable":
+        raise DegradedResult(result, "Vision AI unavailable")
+    return result
+
+def run_structured_analysis_job(payload: dict) -> dict:
+    result = agent.analyze_image_structured(payload["attachment_path"], language=payload["language"])
+    result = {"filename": payload["filename"], "language": payload["language"], **result}
+    if result["source"] == "unavailable":
+        raise DegradedResult(result, f"Vision AI unavailable: {result['error']}")
+    return result
+
+job_queue.register("analyze-image", run_analysis_job)
+job_queue.register("analyze-image/structured", run_structured_analysis_job)
+
+@router.post("/analyze-image/jobs", status_code=202)
+def submit_analysis_job(
+    file: UploadFile = File(...),
+    language: Optional[str] = Form("en"),
+    structured: Optional[bool] = Form(False),
+    callback_url: Optional[str] = Form(None)
+):
+    """
+    Queue an image analysis and return a job id immediately.
+
+    Poll GET /api/v1/jobs/{job_id} or pass callback_url to be notified; the
+    result matches the synchronous (or structured) endpoint's response.
+    Re-submitting the same image and options returns the existing job.
+    """
+    kind = "analyze-image/structured" if structured else "analyze-image"
+    try:
+        job, deduplicated = job_queue.submit(kind, {"filename": file.filename, "language": language}, callback_url,
+                                             attachment=(file.file.read(), Path(file.filename or "").suffix))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**job, "deduplicated": deduplicated, "status_url": f"/api/v1/jobs/{job['job_id']}"}
@@ -1,13 +1,86 @@
-from fastapi import APIRouter, HTTPException
-from app.agents.hospital_agent import HospitalAgent
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import BaseModel
+from typing import Optional
+from app.services.hospital_snapshot_service import hospital_snapshot_service
+from app.services.inventory_service import inventory_service, STATUSES
+from app.services.or_scheduler import or_scheduler
 
 router = APIRouter()
-agent = HospitalAgent()
+agent = hospital_snapshot_service.agent
+
+class SurgeryCase(BaseModel):
+    surgery_type: str
+    duration_mins: int
+    earliest: Optional[str] = None  # "HH:MM"; auto-placement only
+    theatre: Optional[int] = None   # With start: manual booking
+    start: Optional[str] = None     # "HH:MM"
+
+def _minutes(clock: str) -> int:
+    hours, minutes = clock.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def _snapshot_response(request: Request) -> Response:
+    """Serve the current snapshot from memory, or 304 if the client already has it"""
+    snapshot = hospital_snapshot_service.current()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if snapshot.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 @router.post("/optimize")
-async def optimize_hospital():
+def optimize_hospital(request: Request):
+    try:
+        return _snapshot_response(request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/snapshot")
+def hospital_snapshot(request: Request):
+    """Latest dashboard snapshot; supports If-None-Match for cheap polling"""
     try:
-        result = agent.analyze_situation()
-        return result
+        return _snapshot_response(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/inventory")
+async def inventory_reorders(top: int = 20, status: str = None):
+    """Vectorized reorder analysis across all SKUs, highest priority first"""
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(STATUSES)}")
+    try:
+        inventory_service.advance()
+        return inventory_service.report(top=max(1, min(top, 500)), status=status)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/or-schedule")
+async def or_schedule():
+    """Today's theatre bookings with utilization, overruns and conflicts"""
+    return {"utilization": or_scheduler.utilization(), "cases": or_scheduler.schedule()}
+
+@router.post("/or-schedule/cases")
+async def add_surgery_case(case: SurgeryCase):
+    """Add a case: best-fit placement, or a fixed theatre/start (conflicts are reported, not rejected)"""
+    if case.duration_mins <= 0:
+        raise HTTPException(status_code=400, detail="duration_mins must be positive")
+    try:
+        if case.theatre is not None and case.start is not None:
+            if not 1 <= case.theatre <= len(or_scheduler.theatres):
+                raise HTTPException(status_code=400, detail="Unknown theatre")
+            booked = or_scheduler.book(case.surgery_type, case.duration_mins, case.theatre, _minutes(case.start))
+        else:
+            earliest = _minutes(case.earliest) if case.earliest else 0
+            booked = or_scheduler.add_case(case.surgery_type, case.duration_mins, earliest)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Times must be HH:MM")
+    return {
+        "case": booked.to_dict(),
+        "conflicts_with": or_scheduler.conflicts.get(booked.case_id, []),
+        "overrun_mins": or_scheduler.overruns.get(booked.case_id, 0)
+    }
+
+@router.delete("/or-schedule/cases/{case_id}")
+async def cancel_surgery_case(case_id: str):
+    if not or_scheduler.cancel_case(case_id):
+        raise HTTPException(status_code=404, detail="Case not found")
+    return {"cancelled": case_id}
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException
+from app.services.job_queue import job_queue
+
+router = APIRouter()
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """
+    Poll a queued analysis: status (queued, running, succeeded, failed,
+    cancelled), queue position while waiting and the result once done.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a job that has not started yet."""
+    if not job_queue.cancel(job_id):
+        job = job_queue.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found or expired")
+        raise HTTPException(status_code=409, detail=f"Job is already {job['status']}")
+    return job_queue.get(job_id)
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 from app.agents.mental_health_agent import MentalHealthAgent
 
 router = APIRouter()
@@ -7,11 +8,14 @@ agent = MentalHealthAgent()
 
 class ChatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = "default"  # Client-generated id; keeps conversations apart
 
 @router.post("/chat")
-async def chat(request: ChatRequest):
+def chat(request: ChatRequest):
+    # Shed before any work when the providers are overloaded
+    agent.client.admit()
     try:
-        response = agent.chat(request.message)
+        response = agent.chat(request.message, session_id=request.session_id or "default")
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,10 @@
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from app.agents.treatment_agent import TreatmentAgent
+from app.services.job_queue import job_queue, DegradedResult
 
 router = APIRouter()
 agent = TreatmentAgent()
@@ -14,18 +17,132 @@ class PatientData(BaseModel):
     current_meds: Optional[List[str]] = []
     allergies: Optional[List[str]] = []
     language: Optional[str] = "en"  # Language code: en, hi, mr
+    urgent: Optional[bool] = False  # Clinician-flagged: schedule the AI call at emergency priority
 
 @router.post("/recommend-treatment")
-async def recommend_treatment(data: PatientData):
+def recommend_treatment(data: PatientData):
     """
     Generate treatment recommendations with multilingual support.
     
     Args:
         data: Patient information including language preference
     """
+    # Shed before any work when the providers are overloaded
+    agent.client.admit("emergency" if data.urgent else None)
     try:
         recommendation = agent.recommend_treatment(data.dict())
         return {"recommendation": recommendation, "language": data.language}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post("/recommend-treatment/structured")
+def recommend_treatment_structured(data: PatientData):
+    """
+    Treatment plan as typed JSON (risk level, escalation flag, dosages,
+    interactions, monitoring, ...) plus the local safety screen and formulary doses.
+    """
+    agent.client.admit("emergency" if data.urgent else None)
+    try:
+        return {**agent.recommend_treatment_structured(data.dict()), "language": data.language}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/recommend-treatment/stream")
+def stream_treatment(data: PatientData):
+    """
+    Stream the structured plan as NDJSON: the local safety screen and formulary
+    doses first, then one "field" event per plan field as the model writes it
+    (risk_level first), then a "complete" event with the full document.
+    """
+    agent.client.admit("emergency" if data.urgent else None)
+    events = agent.stream_treatment(data.dict())
+    return StreamingResponse((json.dumps(event, ensure_ascii=False) + "\n" for event in events),
+                             media_type="application/x-ndjson")
+
+
+class TreatmentJobRequest(PatientData):
+    structured: Optional[bool] = False  # Typed JSON plan instead of markdown
+    callback_url: Optional[str] = None  # Receives the finished job as a POST
+
+# Fallback plans are returned to live callers but never stored as a job's success
+DEGRADED_SOURCES = ("formulary", "unavailable")
+
+def run_treatment_job(payload: dict) -> dict:
+    recommendation, source = agent.recommend_treatment_with_source(payload)
+    result = {"recommendation": recommendation, "language": payload.get("language")}
+    if source in DEGRADED_SOURCES:
+        raise DegradedResult(result, f"Treatment AI unavailable ({source} fallback)")
+    return result
+
+def run_structured_treatment_job(payload: dict) -> dict:
+    result = {**agent.recommend_treatment_structured(payload), "language": payload.get("language")}
+    if result["source"] in DEGRADED_SOURCES:
+        raise DegradedResult(result, f"Treatment AI unavailable ({result['source']} fallback)")
+    return result
+
+job_queue.register("recommend-treatment", run_treatment_job)
+job_queue.register("recommend-treatment/structured", run_structured_treatment_job)
+
+@router.post("/recommend-treatment/jobs", status_code=202)
+def submit_treatment_job(data: TreatmentJobRequest):
+    """
+    Queue a treatment recommendation and return a job id immediately.
+
+    Poll GET /api/v1/jobs/{job_id} or pass callback_url to be notified; the
+    result matches the synchronous (or structured) endpoint's response.
+    Identical requests share one job.
+    """
+    kind = "recommend-treatment/structured" if data.structured else "recommend-treatment"
+    try:
+        job, deduplicated = job_queue.submit(kind, data.dict(exclude={"structured", "callback_url"}), data.callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**job, "deduplicated": deduplicated, "status_url": f"/api/v1/jobs/{job['job_id']}"}
+
+
+class ScreenRequest(BaseModel):
+    current_meds: List[str] = []
+    allergies: List[str] = []
+    proposed: Optional[List[str]] = []
+
+@router.post("/screen")
+async def screen_medications(data: ScreenRequest):
+    """
+    Screen medications against each other and the patient's allergies
+    using the local interaction index (no AI call).
+    """
+    return agent.interactions.screen(data.current_meds, data.allergies, data.proposed)
+
+
+class DosageRequest(BaseModel):
+    condition: str
+    age: float
+    weight: float
+    current_meds: Optional[List[str]] = []
+    allergies: Optional[List[str]] = []
+
+class DosageBatchRequest(BaseModel):
+    patients: List[DosageRequest]
+
+@router.post("/dosage")
+async def calculate_dosage(data: DosageRequest):
+    """
+    Formulary regimens with weight/age-based doses for one patient,
+    screened against current medications and allergies (no AI call).
+    """
+    result = agent.calculate_dosages(data.dict())
+    if result["condition"] is None:
+        raise HTTPException(status_code=404, detail=f"Condition not in formulary: {data.condition}")
+    return result
+
+@router.post("/dosage/batch")
+async def calculate_dosage_batch(data: DosageBatchRequest):
+    """
+    Formulary doses for a whole patient list in one vectorized pass.
+    Unknown conditions come back with condition null and no regimens.
+    """
+    if len(data.patients) > 10000:
+        raise HTTPException(status_code=400, detail="At most 10000 patients per batch")
+    results = agent.dosages.calculate_batch([p.dict() for p in data.patients])
+    return {"formulary_version": agent.dosages.version, "results": results}
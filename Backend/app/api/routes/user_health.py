@@ -1,43 +1,70 @@
-from fastapi import APIRouter, HTTPException
+import os
+from datetime import date
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
 from app.agents.user_health_agent import UserHealthAgent
+from app.services.timeline_index import encode_cursor, decode_cursor
+from app.services.health_scoring import RISK_TIERS
+
+TIMELINE_TYPES = ("diagnostic", "treatment", "appointment", "mental_health")
 
 router = APIRouter()
 agent = UserHealthAgent()
 
+# Synthetic patients seeded before the first population query
+POPULATION_SIZE = int(os.getenv("USER_HEALTH_POPULATION", "200"))
+
 class UserHealthRequest(BaseModel):
     user_id: Optional[str] = "USER001"
     date_range: Optional[str] = "30d"  # 7d, 30d, 90d, 1y
 
 @router.post("/dashboard")
-async def get_user_health_dashboard(request: UserHealthRequest):
+def get_user_health_dashboard(request: UserHealthRequest):
     """
     Get comprehensive health dashboard data for a specific user.
     Returns personalized health metrics, diagnostics, treatments, and AI insights.
     """
+    # Shed before any work when the providers are overloaded
+    agent.client.admit()
     try:
         # Generate user health data
         health_data = agent.generate_user_health_data(user_id=request.user_id)
         
-        # Generate AI insights
-        ai_insights = agent.generate_ai_insights(health_data)
+        # Stored batch insights when fresh, otherwise a live AI call
+        ai_insights, source = agent.get_ai_insights(health_data)
         
         # Combine data with AI insights
         response = {
             **health_data,
-            "ai_insights": ai_insights
+            "ai_insights": ai_insights,
+            "ai_insights_source": source
         }
         
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/insights/{user_id}/structured")
+def get_structured_insights(user_id: str):
+    """
+    Personalized insights as typed JSON (risk level, assessment, strengths,
+    improvements, recommendations) instead of a markdown report.
+    """
+    agent.client.admit()
+    try:
+        health_data = agent.generate_user_health_data(
+            user_id=user_id, sections=("user_profile", "health_score", "vitals", "diagnostics", "treatments")
+        )
+        return {"user_id": user_id, **agent.generate_structured_insights(health_data)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/vitals/{user_id}")
 async def get_user_vitals(user_id: str):
     """Get current vital signs for a user."""
     try:
-        health_data = agent.generate_user_health_data(user_id=user_id)
+        health_data = agent.generate_user_health_data(user_id=user_id, sections=("vitals", "health_score"))
         return {
             "user_id": user_id,
             "vitals": health_data["vitals"],
@@ -47,13 +74,84 @@ async def get_user_vitals(user_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/timeline/{user_id}")
-async def get_user_timeline(user_id: str):
-    """Get medical timeline for a user."""
+async def get_user_timeline(
+    user_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    type: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """
+    Get medical timeline for a user, newest first.
+    Optional start/end (YYYY-MM-DD) bound the range (end defaults to today),
+    type filters to one event type, and limit/cursor page through results.
+    """
+    if type is not None and type not in TIMELINE_TYPES:
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(TIMELINE_TYPES)}")
+    try:
+        start_day = date.fromisoformat(start) if start else None
+        end_day = date.fromisoformat(end) if end else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD")
     try:
-        health_data = agent.generate_user_health_data(user_id=user_id)
+        cursor_key = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        if not any((start, end, type, limit, cursor)):
+            # Plain request: cached timeline section, same as the dashboard
+            health_data = agent.generate_user_health_data(user_id=user_id, sections=("timeline",))
+            return {
+                "user_id": user_id,
+                "timeline": health_data["timeline"]
+            }
+
+        items, next_key, total = agent.repository.timeline(
+            user_id, start=start_day, end=end_day, event_type=type, limit=limit, cursor=cursor_key
+        )
         return {
             "user_id": user_id,
-            "timeline": health_data["timeline"]
+            "timeline": items,
+            "total": total,
+            "next_cursor": encode_cursor(next_key)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/population/risk")
+async def get_population_risk(tier: Optional[str] = None, limit: int = Query(50, ge=1, le=1000)):
+    """
+    Risk stratification of all patients.
+    Scores every stored patient's vitals in one vectorized batch and lists
+    the highest-risk patients, optionally restricted to one tier.
+    """
+    if tier is not None and tier not in RISK_TIERS:
+        raise HTTPException(status_code=400, detail=f"tier must be one of {', '.join(RISK_TIERS.tolist())}")
+    try:
+        agent.repository.ensure_population(POPULATION_SIZE)
+        return agent.repository.population_risk(tier=tier, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/insights/batch")
+async def start_batch_insights():
+    """
+    Start (or resume) the batch insights job in the background.
+    Patients are packed several per AI request; progress is checkpointed
+    so an interrupted run picks up where it stopped.
+    """
+    try:
+        run_id = agent.batch_insights.start()
+        return agent.batch_insights.status(run_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/insights/batch/{run_id}")
+async def get_batch_insights_status(run_id: str):
+    """Progress of a batch insights run."""
+    status = agent.batch_insights.status(run_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run {run_id}")
+    return status
@@ -0,0 +1,67 @@
+import json
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+from app.services.workup_orchestrator import workup_orchestrator
+from app.util.smart_ai_client import smart_ai_client
+
+router = APIRouter()
+
+class WorkupRequest(BaseModel):
+    user_id: Optional[str] = "USER001"
+    age: int
+    weight: float
+    condition: Optional[str] = None
+    history: Optional[str] = None
+    current_meds: Optional[List[str]] = []
+    allergies: Optional[List[str]] = []
+    language: Optional[str] = "en"  # Language code: en, hi, mr
+    urgent: Optional[bool] = False  # Schedule the treatment AI call at emergency priority
+    message: Optional[str] = None  # Mental-health check-in text
+    image_base64: Optional[str] = None  # Medical image for the diagnosis step
+    image_filename: Optional[str] = None
+
+def _decode_image(data: WorkupRequest) -> Optional[bytes]:
+    """Validate the request before anything streams: 400 for a missing input or a bad image"""
+    if not data.condition and not data.image_base64:
+        raise HTTPException(status_code=400, detail="Provide a condition or an image to diagnose")
+    if not data.image_base64:
+        return None
+    try:
+        return workup_orchestrator.decode_image(data.image_base64)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("")
+def run_workup(data: WorkupRequest):
+    """
+    Full patient workup in one call, streamed as NDJSON.
+
+    Diagnosis (image analysis when an image is sent) feeds treatment, while the
+    mental-health check and dashboard insights run in parallel. Each node's
+    result is emitted as soon as it finishes, followed by a summary node and a
+    "complete" event with wall time, critical path and sequential sum.
+    Returns 503 with Retry-After when the AI providers are overloaded.
+    """
+    image = _decode_image(data)
+    smart_ai_client.admit("emergency" if data.urgent else None)
+    events = workup_orchestrator.run(data.dict(exclude={"image_base64"}), image)
+    return StreamingResponse((json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in events),
+                             media_type="application/x-ndjson")
+
+@router.post("/sync")
+def run_workup_sync(data: WorkupRequest):
+    """Same workup as a single JSON response (node results keyed by node name)."""
+    image = _decode_image(data)
+    smart_ai_client.admit("emergency" if data.urgent else None)
+    results, errors, timing = {}, {}, {}
+    for event in workup_orchestrator.run(data.dict(exclude={"image_base64"}), image):
+        if event["event"] == "node_completed":
+            results[event["node"]] = event["result"]
+        elif event["event"] == "node_failed":
+            errors[event["node"]] = event["error"]
+        elif event["event"] == "complete":
+            timing = {k: event[k] for k in ("wall_ms", "critical_path_ms", "sum_ms")}
+            workup_id = event["workup_id"]
+    return {"workup_id": workup_id, "results": results, "errors": errors, "timing": timing}
@@ -1,17 +1,49 @@
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import hospital, diagnostic, treatment, mental_health, user_health
+from fastapi.responses import PlainTextResponse, JSONResponse
+from app.api.routes import hospital, diagnostic, treatment, mental_health, user_health, workup, jobs
+from app.util.metrics import metrics
+from app.util.cache_manager import cache_manager
+from app.util.rate_limiter import rate_limiter_manager
+from app.util.logger import logging_manager
+from app.util.token_budget import token_accountant, current_endpoint
+from app.util.priority_scheduler import current_priority
+from app.util.admission import admission_controller, OverloadedError
+from app.util.http_pool import http_pool_manager
+from app.prompts.registry import prompt_registry
+from app.util.context_cache import context_cache
+from app.util.smart_ai_client import smart_ai_client
+from app.services.hospital_snapshot_service import hospital_snapshot_service
+from app.services.timeseries_store import timeseries_store
+from app.services.user_health_repository import user_health_repository
+from app.services.batch_insights import batch_insights_job
+from app.services.interaction_index import interaction_index
+from app.services.dosage_calculator import dosage_calculator
+from app.services.workup_orchestrator import workup_orchestrator
+from app.services.job_queue import job_queue
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background refreshers and job workers for the lifetime of the server"""
+    hospital_snapshot_service.start()
+    job_queue.start()
+    yield
+    job_queue.stop()
+    hospital_snapshot_service.stop()
+    http_pool_manager.close()
+
 app = FastAPI(
     title="GenAI Healthcare Copilot",
     description="Agentic AI backend for diagnostics, treatment & hospital optimization",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -23,6 +55,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def attribute_endpoint(request: Request, call_next):
+    """
+    Tag work done for this request with its route so token spend is reported per endpoint,
+    and with its scheduling class: interactive, or background when the client asks for it
+    via X-Request-Priority (clients can lower their priority, never raise it)
+    """
+    token = current_endpoint.set(request.url.path)
+    lowered = request.headers.get("x-request-priority", "").lower() == "background"
+    priority_token = current_priority.set("background" if lowered else "interactive")
+    try:
+        return await call_next(request)
+    finally:
+        current_priority.reset(priority_token)
+        current_endpoint.reset(token)
+
+@app.exception_handler(OverloadedError)
+async def overloaded(request: Request, exc: OverloadedError):
+    """Requests shed by admission control: 503 with a Retry-After hint"""
+    return JSONResponse(status_code=503, content={"detail": str(exc), "retry_after": exc.retry_after},
+                        headers={"Retry-After": str(exc.retry_after)})
+
 @app.get("/")
 def root():
     return {"status": "running", "message": "GenAI Hackathon Backend is live"}
@@ -31,10 +85,49 @@ def root():
 def health_check():
     return {"service": "backend", "health": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latency histograms and hot-path counters in Prometheus text format"""
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get("/stats")
+def service_stats():
+    """Cache, limiter, metrics, logging, token, prompt, context cache, snapshot, time-series, user repository, batch insights, drug index, formulary, workup, admission, job queue and HTTP pool summaries as JSON"""
+    return {
+        "cache": cache_manager.get_stats(),
+        "rate_limiters": rate_limiter_manager.get_all_stats(),
+        "metrics": metrics.snapshot(),
+        "logging": logging_manager.get_stats(),
+        "tokens": token_accountant.get_stats(),
+        "prompts": prompt_registry.get_stats(),
+        "context_cache": context_cache.get_stats(),
+        "mock_provider": smart_ai_client.mock_provider.get_stats() if smart_ai_client.mock_provider else None,
+        "hospital_snapshot": hospital_snapshot_service.get_stats(),
+        "timeseries": timeseries_store.get_stats(),
+        "user_health": user_health_repository.get_stats(),
+        "batch_insights": batch_insights_job.get_stats(),
+        "interaction_index": interaction_index.get_stats(),
+        "formulary": dosage_calculator.get_stats(),
+        "workup": workup_orchestrator.get_stats(),
+        "admission": admission_controller.get_stats(),
+        "jobs": job_queue.get_stats(),
+        "http_pools": http_pool_manager.get_stats()
+    }
+
+@app.get("/stats/tokens")
+def token_stats():
+    """Token spend per agent, provider and endpoint, plus configured budgets"""
+    return token_accountant.get_stats()
+
 # Register API Routers
 app.include_router(hospital.router, prefix="/api/v1/hospital", tags=["Hospital"])
 app.include_router(diagnostic.router, prefix="/api/v1/diagnostic", tags=["Diagnostic"])
 app.include_router(treatment.router, prefix="/api/v1/treatment", tags=["Treatment"])
 app.include_router(mental_health.router, prefix="/api/v1/mental-health", tags=["Mental Health"])
 app.include_router(user_health.router, prefix="/api/v1/user", tags=["User Health"])
+app.include_router(workup.router, prefix="/api/v1/workup", tags=["Workup"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["Jobs"])
 
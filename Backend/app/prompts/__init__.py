@@ -0,0 +1 @@
+# Prompts package
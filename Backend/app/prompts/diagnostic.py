@@ -0,0 +1,68 @@
+"""
+Diagnostic Agent prompt templates (vision analysis)
+"""
+
+from app.prompts.registry import PromptTemplate
+
+VERSION = "v1"
+
+SYSTEM = """You are a specialist Medical AI Diagnostic Assistant using advanced vision analysis.
+
+Your responsibilities:
+- Analyze the provided medical image (X-ray, MRI, retinal scan, etc.).
+- Identify potential abnormalities or diseases with high accuracy.
+- Provide a 'Doctor-Friendly Explanation': clear, professional, and concise.
+- Highlight specific regions of interest if possible (textual description).
+- Include a confidence score and any critical warning signs.
+- ALWAYS state: 'This is an AI-assisted analysis. Final diagnosis rests with a medical professional.'
+- Mention that Gemini Vision AI was used for analysis.
+
+Provide responses in markdown format for clarity."""
+
+# Whole prompt is static per language: the image is the only request input
+INSTRUCTIONS = {
+    "en": """Analyze this medical image for potential conditions or abnormalities.
+
+Provide:
+1. **Primary Findings**: What do you observe?
+2. **Potential Diagnosis**: What conditions might this indicate?
+3. **Confidence Level**: How certain are you? (High/Medium/Low)
+4. **Regions of Interest**: Describe specific areas of concern
+5. **Recommendations**: What should the clinician investigate further?
+
+Remember: This is AI-assisted analysis to support, not replace, medical professionals.
+""",
+    "hi": """इस चिकित्सा छवि का विश्लेषण संभावित स्थितियों या असामान्यताओं के लिए करें।
+
+कृपया प्रदान करें:
+1. **प्राथमिक निष्कर्ष**: आप क्या देखते हैं?
+2. **संभावित निदान**: यह किन स्थितियों का संकेत दे सकता है?
+3. **विश्वास स्तर**: आप कितने निश्चित हैं? (उच्च/मध्यम/निम्न)
+4. **रुचि के क्षेत्र**: चिंता के विशिष्ट क्षेत्रों का वर्णन करें
+5. **सिफारिशें**: चिकित्सक को आगे क्या जांच करनी चाहिए?
+
+याद रखें: यह चिकित्सा पेशेवरों को प्रतिस्थापित करने के लिए नहीं, बल्कि सहायता के लिए AI-सहायता प्राप्त विश्लेषण है।
+
+**महत्वपूर्ण**: कृपया पूरी रिपोर्ट हिंदी में लिखें।
+""",
+    "mr": """संभाव्य परिस्थिती किंवा विकृतींसाठी या वैद्यकीय प्रतिमेचे विश्लेषण करा.
+
+कृपया प्रदान करा:
+1. **प्राथमिक निष्कर्ष**: तुम्हाला काय दिसते?
+2. **संभाव्य निदान**: हे कोणत्या परिस्थितींचे संकेत देऊ शकते?
+3. **विश्वास पातळी**: तुम्ही किती निश्चित आहात? (उच्च/मध्यम/कमी)
+4. **स्वारस्याचे क्षेत्र**: चिंतेच्या विशिष्ट क्षेत्रांचे वर्णन करा
+5. **शिफारसी**: चिकित्सकांनी पुढे काय तपासले पाहिजे?
+
+लक्षात ठेवा: हे वैद्यकीय व्यावसायिकांना बदलण्यासाठी नाही, तर समर्थन करण्यासाठी AI-सहाय्यित विश्लेषण आहे।
+
+**महत्त्वाचे**: कृपया संपूर्ण अहवाल मराठीत लिहा.
+"""
+}
+
+
+def build_templates():
+    return [
+        PromptTemplate("diagnostic", language, VERSION, SYSTEM, static_prefix=instructions)
+        for language, instructions in INSTRUCTIONS.items()
+    ]
@@ -0,0 +1,130 @@
+"""
+Prompt Template Registry
+Versioned per-agent, per-language templates loaded once at startup
+"""
+
+import hashlib
+import string
+from typing import Dict, Optional, Tuple, List
+from app.util.token_budget import compact_prompt, estimate_tokens
+
+DEFAULT_LANGUAGE = "en"
+
+
+class PromptTemplate:
+    """
+    A single versioned prompt: system message, static instruction prefix
+    and a dynamic body with `{named}` placeholders
+    """
+
+    def __init__(self, agent: str, language: str, version: str, system: str,
+                 static_prefix: str, body: str = ""):
+        """
+        Initialize and pre-render a template
+
+        Args:
+            agent: Agent name (diagnostic, treatment, ...)
+            language: Language code (en, hi, mr)
+            version: Template version, bump on any wording change
+            system: System message sent with every call
+            static_prefix: Instructions that never depend on request data
+            body: Request-specific part, formatted with str.format fields
+        """
+        self.agent = agent
+        self.language = language
+        self.version = version
+        self.system = system.strip()
+
+        # Pre-render once: compacted static text is what every request reuses
+        self.static_prefix = compact_prompt(static_prefix)
+        self.body = compact_prompt(body) if body else ""
+        self.fields = sorted({name for _, name, _, _ in string.Formatter().parse(self.body) if name})
+
+        self.prefix_tokens = estimate_tokens(self.system) + estimate_tokens(self.static_prefix)
+        self.hash = hashlib.sha256(
+            "\x1f".join([agent, language, version, self.system, self.static_prefix, self.body]).encode()
+        ).hexdigest()[:12]
+
+    @property
+    def key(self) -> str:
+        """Stable identifier usable in cache keys, e.g. treatment/en/v2@1a2b3c4d5e6f"""
+        return f"{self.agent}/{self.language}/{self.version}@{self.hash}"
+
+    def render(self, **fields) -> str:
+        """
+        Render the full user prompt (static prefix first, so providers can reuse it)
+
+        Args:
+            **fields: Values for the body placeholders
+
+        Returns:
+            Prompt text
+        """
+        if not self.body:
+            return self.static_prefix
+        return f"{self.static_prefix}\n\n{self.body.format(**fields)}"
+
+    def render_body(self, **fields) -> str:
+        """Render only the request-specific part (for providers holding the prefix in a context cache)"""
+        return self.body.format(**fields) if self.body else ""
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "fields": self.fields,
+            "prefix_tokens": self.prefix_tokens
+        }
+
+
+class PromptRegistry:
+    """Holds the active template per (agent, language)"""
+
+    def __init__(self):
+        self.templates: Dict[Tuple[str, str], PromptTemplate] = {}
+
+    def register(self, template: PromptTemplate):
+        """Register a template, replacing any previous version for the same agent and language"""
+        self.templates[(template.agent, template.language)] = template
+
+    def get(self, agent: str, language: Optional[str] = None) -> PromptTemplate:
+        """
+        Get the active template, falling back to English
+
+        Args:
+            agent: Agent name
+            language: Language code
+
+        Returns:
+            PromptTemplate
+
+        Raises:
+            KeyError: If the agent has no templates registered
+        """
+        template = self.templates.get((agent, language or DEFAULT_LANGUAGE))
+        if template is None:
+            template = self.templates[(agent, DEFAULT_LANGUAGE)]
+        return template
+
+    def languages(self, agent: str) -> List[str]:
+        return sorted(language for (name, language) in self.templates if name == agent)
+
+    def get_stats(self) -> dict:
+        """Get registered template versions"""
+        return {
+            f"{agent}/{language}": template.to_dict()
+            for (agent, language), template in sorted(self.templates.items())
+        }
+
+
+def _load_registry() -> PromptRegistry:
+    from app.prompts import diagnostic, treatment
+
+    registry = PromptRegistry()
+    for module in (diagnostic, treatment):
+        for template in module.build_templates():
+            registry.register(template)
+    return registry
+
+
+# Global instance
+prompt_registry = _load_registry()
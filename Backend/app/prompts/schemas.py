@@ -0,0 +1,118 @@
+"""
+Structured Output Schemas
+JSON schemas (OpenAPI subset accepted by Vertex AI response_schema) for
+agents running in structured mode. Keys are listed in the order the model
+should emit them: fields consumers act on first (risk level, escalation)
+come first so they are available early in a stream
+"""
+
+RISK_LEVELS = ["Low", "Medium", "High"]
+
+# Response language for text values; keys and enum values stay English
+LANGUAGE_NAMES = {"hi": "Hindi", "mr": "Marathi"}
+
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+
+TREATMENT = {
+    "type": "object",
+    "properties": {
+        "risk_level": {"type": "string", "enum": RISK_LEVELS},
+        "escalate": {"type": "boolean"},
+        "summary": {"type": "string"},
+        "dosages": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "drug": {"type": "string"},
+                    "dose": {"type": "string"},
+                    "frequency": {"type": "string"},
+                    "duration": {"type": "string"},
+                    "route": {"type": "string"},
+                    "rationale": {"type": "string"}
+                },
+                "required": ["drug", "dose", "frequency"]
+            }
+        },
+        "interactions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "drugs": _STRINGS,
+                    "severity": {"type": "string", "enum": ["minor", "moderate", "major"]},
+                    "effect": {"type": "string"}
+                },
+                "required": ["drugs", "severity", "effect"]
+            }
+        },
+        "allergy_warnings": _STRINGS,
+        "contraindications": _STRINGS,
+        "alternatives": _STRINGS,
+        "side_effects": _STRINGS,
+        "monitoring": _STRINGS,
+        "follow_up": {"type": "string"}
+    },
+    "required": ["risk_level", "escalate", "summary", "dosages", "interactions", "monitoring"]
+}
+
+DIAGNOSTIC = {
+    "type": "object",
+    "properties": {
+        "risk_level": {"type": "string", "enum": RISK_LEVELS},
+        "urgency": {"type": "string", "enum": ["routine", "soon", "urgent", "emergency"]},
+        "impression": {"type": "string"},
+        "findings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "observation": {"type": "string"},
+                    "location": {"type": "string"},
+                    "severity": {"type": "string", "enum": ["normal", "mild", "moderate", "severe"]},
+                    "confidence": {"type": "number"}
+                },
+                "required": ["observation", "severity"]
+            }
+        },
+        "differential": _STRINGS,
+        "recommendations": _STRINGS,
+        "confidence": {"type": "number"}
+    },
+    "required": ["risk_level", "urgency", "impression", "findings", "recommendations"]
+}
+
+USER_HEALTH = {
+    "type": "object",
+    "properties": {
+        "risk_level": {"type": "string", "enum": RISK_LEVELS},
+        "assessment": {"type": "string"},
+        "strengths": _STRINGS,
+        "improvements": _STRINGS,
+        "recommendations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "detail": {"type": "string"}
+                },
+                "required": ["title", "detail"]
+            }
+        },
+        "encouragement": {"type": "string"}
+    },
+    "required": ["risk_level", "assessment", "recommendations"]
+}
+
+SCHEMAS = {
+    "treatment": TREATMENT,
+    "diagnostic": DIAGNOSTIC,
+    "user_health": USER_HEALTH
+}
+
+
+def language_instruction(language) -> str:
+    """Prompt suffix asking for text values in the request language (empty for English)"""
+    name = LANGUAGE_NAMES.get(language or "en")
+    return f"\n\nWrite all text values in {name}; keep keys and enum values in English." if name else ""
@@ -0,0 +1,125 @@
+"""
+Treatment Agent prompt templates
+"""
+
+from app.prompts.registry import PromptTemplate
+
+VERSION = "v1"
+
+SYSTEM = """You are an expert AI Treatment Recommendation and Safety Specialist.
+
+Your responsibilities:
+- Analyze comprehensive patient data (age, weight, medical history, current medications, allergies)
+- Recommend evidence-based treatment plans with precise dosage calculations
+- Identify safer alternative medications when applicable
+- Perform rigorous drug interaction analysis
+- Flag allergy conflicts and contraindications
+- Assess overdose risks and provide safety warnings
+- Cite known side effects and adverse reactions
+- Provide clear, actionable clinical recommendations
+
+CRITICAL SAFETY PROTOCOLS:
+- If HIGH RISK detected → Output 'ESCALATE TO DOCTOR' immediately
+- Always include contraindications and warnings
+- Mandatory disclaimer: 'Consult a physician before administration'
+
+Provide responses in structured markdown format with clear sections:
+1. **Treatment Plan**: Primary recommendations
+2. **Dosage Guidelines**: Precise calculations based on patient metrics
+3. **Alternative Options**: Safer or equally effective alternatives
+4. **Safety Analysis**: Drug interactions, allergies, contraindications
+5. **Side Effects**: Common and serious adverse reactions
+6. **Monitoring**: What to watch for during treatment
+7. **Recommendations**: Next steps and follow-up
+
+Use professional medical terminology while remaining clear and actionable."""
+
+# Opening line per language
+INSTRUCTIONS = {
+    "en": "Please provide a comprehensive treatment analysis including:",
+    "hi": "कृपया एक व्यापक उपचार विश्लेषण प्रदान करें जिसमें शामिल हों:",
+    "mr": "कृपया सर्वसमावेशक उपचार विश्लेषण प्रदान करा ज्यामध्ये समाविष्ट आहे:"
+}
+
+SECTION_HEADERS = {
+    "en": {
+        "plan": "1. **Treatment Plan**",
+        "dosage": "   - Dosage calculations (based on age/weight)",
+        "duration": "   - Treatment duration and schedule",
+        "alternatives": "2. **Alternative Options**",
+        "safety": "3. **Safety Analysis**",
+        "side_effects": "4. **Side Effects Profile**",
+        "recommendations": "5. **Clinical Recommendations**",
+        "note": "**CRITICAL**: If you detect HIGH RISK (severe interactions, allergy conflicts, or contraindications), clearly state \"ESCALATE TO DOCTOR\" at the top of your response.\n\nProvide evidence-based, clinically sound recommendations."
+    },
+    "hi": {
+        "plan": "1. **उपचार योजना**",
+        "dosage": "   - खुराक की गणना (उम्र/वजन के आधार पर)",
+        "duration": "   - उपचार की अवधि और कार्यक्रम",
+        "alternatives": "2. **वैकल्पिक विकल्प**",
+        "safety": "3. **सुरक्षा विश्लेषण**",
+        "side_effects": "4. **दुष्प्रभाव प्रोफ़ाइल**",
+        "recommendations": "5. **नैदानिक सिफारिशें**",
+        "note": "**महत्वपूर्ण**: यदि आप उच्च जोखिम का पता लगाते हैं (गंभीर अंतःक्रियाएं, एलर्जी संघर्ष, या contraindications), तो अपनी प्रतिक्रिया के शीर्ष पर स्पष्ट रूप से \"डॉक्टर से परामर्श करें\" लिखें।\n\nसाक्ष्य-आधारित, नैदानिक रूप से सही सिफारिशें प्रदान करें।\n\n**कृपया पूरी रिपोर्ट हिंदी में लिखें।**"
+    },
+    "mr": {
+        "plan": "1. **उपचार योजना**",
+        "dosage": "   - डोस गणना (वय/वजन आधारित)",
+        "duration": "   - उपचार कालावधी आणि वेळापत्रक",
+        "alternatives": "2. **पर्यायी पर्याय**",
+        "safety": "3. **सुरक्षा विश्लेषण**",
+        "side_effects": "4. **दुष्परिणाम प्रोफाइल**",
+        "recommendations": "5. **क्लिनिकल शिफारसी**",
+        "note": "**महत्त्वाचे**: जर तुम्हाला उच्च धोका आढळला (गंभीर परस्परसंवाद, ऍलर्जी संघर्ष, किंवा contraindications), तर तुमच्या प्रतिसादाच्या शीर्षस्थानी स्पष्टपणे \"डॉक्टरांचा सल्ला घ्या\" लिहा.\n\nपुराव्यावर आधारित, क्लिनिकली योग्य शिफारसी द्या.\n\n**कृपया संपूर्ण अहवाल मराठीत लिहा.**"
+    }
+}
+SKELETON = """{instruction}
+
+{plan}
+- Primary medication recommendations
+{dosage}
+{duration}
+
+{alternatives}
+- Safer alternatives if applicable
+- Second-line treatments
+- Non-pharmacological options
+
+{safety}
+- Drug-drug interactions (with current medications)
+- Allergy cross-reactivity
+- Contraindications
+- Risk level assessment (Low/Medium/High)
+
+{side_effects}
+- Common side effects (>10% incidence)
+- Serious adverse reactions
+- What to monitor
+
+{recommendations}
+- Follow-up schedule
+- Lab tests needed
+- Lifestyle modifications
+- When to seek immediate care
+
+{note}"""
+
+# Request-specific part, appended after the static instructions
+PATIENT_PROFILE = """**Patient Profile:**
+- Age: {age} years
+- Weight: {weight} kg
+- Primary Condition: {condition}
+- Medical History: {history}
+- Current Medications: {current_meds}
+- Known Allergies: {allergies}"""
+
+
+def build_templates():
+    return [
+        PromptTemplate(
+            "treatment", language, VERSION, SYSTEM,
+            static_prefix=SKELETON.format(instruction=INSTRUCTIONS[language], **headers),
+            body=PATIENT_PROFILE
+        )
+        for language, headers in SECTION_HEADERS.items()
+    ]
@@ -0,0 +1,385 @@
+"""
+Batch Insights Job - Cohort-packed personalized health reports
+Buckets patients by age band and risk tier, packs several
+compact summaries into one request per bucket chunk, parses the
+per-patient sections back out and checkpoints every pack in SQLite so an
+interrupted run resumes where it stopped
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+from app.services.user_health_repository import user_health_repository, UserHealthRepository
+from app.services.health_scoring import health_scoring_engine
+from app.util.smart_ai_client import smart_ai_client
+from app.util.priority_scheduler import request_priority
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS insight_runs (
+    run_id TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    total INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS insight_progress (
+    run_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_insight_progress_status ON insight_progress (run_id, status, bucket);
+CREATE TABLE IF NOT EXISTS insights (
+    user_id TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    insight TEXT NOT NULL,
+    generated_at REAL NOT NULL
+);
+"""
+
+SYSTEM_MESSAGE = """You are a compassionate AI Health Coach writing personalized health reports for many patients at once.
+Always prioritize patient safety and well-being. Use a warm, supportive tone and markdown."""
+
+PACK_INSTRUCTIONS = """You will receive a cohort description followed by compact summaries of several patients.
+Write one personalized report for EACH patient.
+
+Format rules:
+- Start every patient's report with the exact line: ### Patient <ID>
+- Then give, in under 150 words: **Overall Health Assessment**, **Key Strengths**,
+  **Areas for Improvement** (2-3 items), **Personalized Recommendations** (3-4 items) and **Encouragement**
+- Never merge or skip patients and write nothing outside the patient sections"""
+
+# "### Patient USER012" header that opens each parsed section
+SECTION_HEADER = re.compile(r"^#{2,4}\s*Patient\s+\[?([A-Za-z0-9_-]+)\]?\s*:?\s*$", re.MULTILINE)
+
+# Output tokens allowed per packed patient
+TOKENS_PER_PATIENT = 300
+
+
+def age_band(age: int) -> str:
+    return "18-39" if age < 40 else ("40-59" if age < 60 else "60+")
+
+
+def parse_sections(text: str, expected: List[str]) -> Dict[str, str]:
+    """
+    Split a packed response into per-patient reports
+
+    Args:
+        text: Completion text
+        expected: Patient ids sent in the pack (anything else is ignored)
+
+    Returns:
+        Dict of patient id -> report markdown for every non-empty section found
+    """
+    wanted = set(expected)
+    headers = list(SECTION_HEADER.finditer(text))
+    sections = {}
+    for header, following in zip(headers, headers[1:] + [None]):
+        user_id = header.group(1)
+        body = text[header.end():following.start() if following else len(text)].strip()
+        if user_id in wanted and body and user_id not in sections:
+            sections[user_id] = body
+    return sections
+
+
+class BatchInsightsJob:
+    """Resumable packed-prompt insights generation for every stored patient"""
+
+    def __init__(self, repository: UserHealthRepository, client, db_path: str, pack_size: int = 8,
+                 max_attempts: int = 3, max_age_hours: float = 36):
+        """
+        Initialize batch insights job
+
+        Args:
+            repository: Source of patient records and cohort scores
+            client: SmartAIClient used for packed requests
+            db_path: SQLite file holding checkpoints and stored insights
+            pack_size: Patients per request
+            max_attempts: Tries per patient before it is marked failed
+            max_age_hours: Age after which a stored insight is no longer served
+        """
+        self.repository = repository
+        self.client = client
+        self.db_path = db_path
+        self.pack_size = pack_size
+        self.max_attempts = max_attempts
+        self.max_age_seconds = max_age_hours * 3600
+
+        self._local = threading.local()
+        self._run_lock = threading.Lock()
+        self.current_run: Optional[str] = None
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not shareable by default)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    def plan(self, user_ids: Optional[List[str]] = None) -> str:
+        """
+        Score every patient, bucket them and checkpoint the work list
+
+        Args:
+            user_ids: Patients to include (default: every stored patient)
+
+        Returns:
+            New run id
+        """
+        start = time.perf_counter()
+        user_ids, profiles, result = self.repository.score_population(user_ids)
+
+        rows = []
+        for i, (user_id, profile) in enumerate(zip(user_ids, profiles)):
+            bucket = f"{age_band(profile['age'])}|{result['tier'][i]}"
+            rows.append((user_id, bucket, self._summary(user_id, profile, result, i)))
+
+        run_id = f"run-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT INTO insight_runs (run_id, started_at, total) VALUES (?, ?, ?)",
+                         (run_id, datetime.now().isoformat(timespec="seconds"), len(rows)))
+            conn.executemany(
+                "INSERT INTO insight_progress (run_id, user_id, bucket, summary, status) VALUES (?, ?, ?, ?, 'pending')",
+                [(run_id, *row) for row in rows]
+            )
+        log.info("batch_insights.planned", run_id=run_id, patients=len(rows),
+                 buckets=len({row[1] for row in rows}), elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
+        return run_id
+
+    @staticmethod
+    def _summary(user_id: str, profile: Dict[str, Any], result: Dict[str, Any], i: int) -> str:
+        """One-line patient summary from a cohort scoring result"""
+        scores, latest, trends = result["scores"], result["latest"], result["trends"]
+        anomalies = health_scoring_engine.flagged_metrics(result, i)
+        return (
+            f"[{user_id}] {profile['age']}{profile['gender'][0]}, BMI {result['bmi'][i]}, "
+            f"score {scores['overall'][i]} (vitals {int(scores['vitals'][i])}, mental {int(scores['mental'][i])}, "
+            f"lifestyle {int(scores['lifestyle'][i])}), HR {latest['heart_rate'][i]:.0f} {trends['heart_rate'][i]}, "
+            f"BP {latest['systolic'][i]:.0f}/{latest['diastolic'][i]:.0f} {trends['systolic'][i]}, "
+            f"glucose {latest['blood_glucose'][i]:.0f}, sleep {result['mean']['sleep_hours'][i]:.1f}h, "
+            f"activity {result['mean']['activity_minutes'][i]:.0f}min"
+            + (f", anomalies: {', '.join(anomalies)}" if anomalies else "")
+        )
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def run(self, run_id: Optional[str] = None, max_packs: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Process a run until every patient is done or out of attempts
+
+        Args:
+            run_id: Run to process (default: resume the latest unfinished run, else plan a new one)
+            max_packs: Stop after this many requests (the run stays resumable)
+
+        Returns:
+            Run status
+        """
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError(f"Batch insights run {self.current_run} is already in progress")
+        try:
+            run_id = run_id or self._unfinished_run() or self.plan()
+            self.current_run = run_id
+            log.info("batch_insights.run_started", run_id=run_id)
+
+            packs = 0
+            # Nightly work yields provider slots to interactive and emergency calls
+            with request_priority("background"):
+                while max_packs is None or packs < max_packs:
+                    # Pause while providers are over the background SLO instead of failing packs
+                    wait = self.client.admission.estimated_wait(self.client.active_limiters())
+                    if wait > self.client.admission.slo():
+                        metrics.inc("batch_insights_pauses_total")
+                        log.info("batch_insights.paused", run_id=run_id, estimated_wait=round(wait, 1))
+                        time.sleep(min(wait, 30))
+                        continue
+                    pack = self._next_pack(run_id)
+                    if not pack:
+                        self._conn().execute("UPDATE insight_runs SET finished_at = ? WHERE run_id = ?",
+                                             (datetime.now().isoformat(timespec="seconds"), run_id))
+                        self._conn().commit()
+                        break
+                    self._process_pack(run_id, *pack)
+                    packs += 1
+        finally:
+            self.current_run = None
+            self._run_lock.release()
+
+        status = self.status(run_id)
+        log.info("batch_insights.run_stopped", **status)
+        return status
+
+    def start(self) -> str:
+        """Run (or resume) in a background thread and return the run id"""
+        if self.current_run:
+            return self.current_run
+        run_id = self._unfinished_run() or self.plan()
+        threading.Thread(target=self._run_safely, args=(run_id,), daemon=True, name="batch-insights").start()
+        return run_id
+
+    def _run_safely(self, run_id: str):
+        try:
+            self.run(run_id)
+        except Exception as e:
+            log.error("batch_insights.run_failed", run_id=run_id, error=str(e))
+
+    def _unfinished_run(self) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT run_id FROM insight_runs WHERE finished_at IS NULL ORDER BY started_at DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def _next_pack(self, run_id: str) -> Optional[tuple]:
+        """Up to pack_size pending patients from the first bucket that still has work"""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT bucket FROM insight_progress WHERE run_id = ? AND status = 'pending' ORDER BY bucket LIMIT 1",
+            (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        patients = conn.execute(
+            "SELECT user_id, summary FROM insight_progress WHERE run_id = ? AND status = 'pending' AND bucket = ? "
+            "ORDER BY attempts, user_id LIMIT ?",
+            (run_id, row[0], self.pack_size)
+        ).fetchall()
+        return row[0], patients
+
+    def _process_pack(self, run_id: str, bucket: str, patients: List[tuple]):
+        """Send one packed request and checkpoint its outcome in a single transaction"""
+        start = time.perf_counter()
+        user_ids = [user_id for user_id, _ in patients]
+        age, tier = bucket.split("|")
+        prompt = (
+            f"Cohort: age {age}, {tier} risk\n\n"
+            "Patients:\n" + "\n".join(summary for _, summary in patients)
+        )
+
+        try:
+            response = self.client.simple_prompt(
+                prompt=prompt,
+                system_message=SYSTEM_MESSAGE,
+                static_prefix=PACK_INSTRUCTIONS,
+                temperature=0.7,
+                max_tokens=TOKENS_PER_PATIENT * len(patients),
+                agent="user_health_batch",
+                context="user_health_batch"
+            )
+            sections = parse_sections(response, user_ids)
+        except Exception as e:
+            log.warning("batch_insights.pack_failed", run_id=run_id, bucket=bucket, error=str(e))
+            sections = {}
+
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO insights (user_id, run_id, bucket, insight, generated_at) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, run_id, bucket, text, now) for user_id, text in sections.items()]
+            )
+            conn.executemany("UPDATE insight_progress SET status = 'done', attempts = attempts + 1 "
+                             "WHERE run_id = ? AND user_id = ?", [(run_id, user_id) for user_id in sections])
+            missing = [(self.max_attempts, run_id, user_id) for user_id in user_ids if user_id not in sections]
+            conn.executemany(
+                "UPDATE insight_progress SET attempts = attempts + 1, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END "
+                "WHERE run_id = ? AND user_id = ?", missing
+            )
+
+        outcome = "complete" if not missing else ("partial" if sections else "failed")
+        metrics.inc("batch_insights_packs_total", outcome=outcome)
+        metrics.inc("batch_insights_patients_total", value=len(sections), outcome="done")
+        metrics.record_stage("batch_insights_pack", start)
+        log.info("batch_insights.pack", run_id=run_id, bucket=bucket, patients=len(user_ids),
+                 parsed=len(sections), elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
+
+    # ------------------------------------------------------------------
+    # Serving
+    # ------------------------------------------------------------------
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Stored insight for a patient if it is fresh enough to serve"""
+        row = self._conn().execute(
+            "SELECT insight, run_id, generated_at FROM insights WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None or time.time() - row[2] > self.max_age_seconds:
+            return None
+        return {
+            "insight": row[0],
+            "run_id": row[1],
+            "generated_at": datetime.fromtimestamp(row[2]).strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def status(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Progress counts for a run"""
+        conn = self._conn()
+        run = conn.execute("SELECT started_at, finished_at, total FROM insight_runs WHERE run_id = ?",
+                           (run_id,)).fetchone()
+        if run is None:
+            return None
+        counts = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM insight_progress WHERE run_id = ? GROUP BY status", (run_id,)
+        ).fetchall())
+        return {
+            "run_id": run_id,
+            "started_at": run[0],
+            "finished_at": run[1],
+            "running": self.current_run == run_id,
+            "total": run[2],
+            "done": counts.get("done", 0),
+            "pending": counts.get("pending", 0),
+            "failed": counts.get("failed", 0)
+        }
+
+    def get_stats(self) -> dict:
+        """Get stored insight and run statistics"""
+        conn = self._conn()
+        cutoff = time.time() - self.max_age_seconds
+        return {
+            "stored_insights": conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0],
+            "fresh_insights": conn.execute("SELECT COUNT(*) FROM insights WHERE generated_at >= ?",
+                                           (cutoff,)).fetchone()[0],
+            "runs": conn.execute("SELECT COUNT(*) FROM insight_runs").fetchone()[0],
+            "current_run": self.current_run,
+            "pack_size": self.pack_size
+        }
+
+
+# Singleton instance (shares the user health database file)
+batch_insights_job = BatchInsightsJob(
+    user_health_repository,
+    smart_ai_client,
+    db_path=user_health_repository.db_path,
+    pack_size=int(os.getenv("BATCH_INSIGHTS_PACK_SIZE", "8")),
+    max_age_hours=float(os.getenv("BATCH_INSIGHTS_MAX_AGE_HOURS", "36"))
+)
+
+
+if __name__ == "__main__":
+    # Nightly entry point: python -m app.services.batch_insights [population size]
+    import sys
+
+    user_health_repository.ensure_population(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
+    print(batch_insights_job.run())
+    print(batch_insights_job.get_stats())
@@ -5,18 +5,21 @@ Includes data anonymization and secure handling
 import os
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
+from app.util.logger import get_logger
 import hashlib
 from datetime import datetime
 
 load_dotenv()
 
+log = get_logger(__name__)
+
 # BigQuery imports
 try:
     from google.cloud import bigquery
     BIGQUERY_AVAILABLE = True
 except ImportError:
     BIGQUERY_AVAILABLE = False
-    print("WARNING: BigQuery SDK not installed. Using fallback mode.")
+    log.warning("bigquery.sdk_missing", mode="fallback")
 
 
 class BigQueryService:
@@ -31,20 +34,20 @@ class BigQueryService:
         credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
         if credentials_path and os.path.exists(credentials_path):
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
-            print(f"✅ Using credentials from: {credentials_path}")
+            log.info("bigquery.credentials", source="service_account_file", path=credentials_path)
         else:
-            print("ℹ️ Using Application Default Credentials (ADC)")
+            log.info("bigquery.credentials", source="adc")
         
         if BIGQUERY_AVAILABLE and self.project_id != "your-gcp-project-id":
             try:
                 self.client = bigquery.Client(project=self.project_id)
                 self.initialized = True
-                print(f"✅ BigQuery initialized: {self.project_id}.{self.dataset_id}")
+                log.info("bigquery.initialized", project=self.project_id, dataset=self.dataset_id)
             except Exception as e:
-                print(f"⚠️ BigQuery initialization failed: {e}")
+                log.warning("bigquery.init_failed", error=str(e))
                 self.initialized = False
         else:
-            print("⚠️ BigQuery not configured. Using in-memory storage.")
+            log.warning("bigquery.unavailable", reason="not configured", fallback="in-memory")
     
     def anonymize_patient_id(self, patient_id: str) -> str:
         """
@@ -0,0 +1,203 @@
+"""
+Dosage Calculator - Formulary-driven weight/age dosing
+Loads a versioned formulary table (mg/kg or fixed doses per age band with
+single and daily caps) into NumPy arrays and evaluates every matching
+regimen for one patient or a whole patient list in one vectorized pass
+"""
+
+import csv
+import os
+import re
+import time
+from typing import Optional, Dict, Any, List
+import numpy as np
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+DATA_DIR = os.getenv("DRUG_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
+
+LINE_LABELS = {1: "first-line", 2: "second-line"}
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+_NUMERIC = ("line", "age_min", "age_max", "mg_per_kg", "fixed_mg", "max_single_mg", "doses_per_day",
+            "max_daily_mg", "max_daily_mg_per_kg", "duration_days", "round_mg")
+
+
+def condition_key(text: str) -> str:
+    """Lowercase words of a condition name; digits are kept ("type 1" and "type 2" differ)"""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+class DosageCalculator:
+    """Vectorized regimen evaluation over a formulary version"""
+
+    def __init__(self, data_dir: str = DATA_DIR, version: Optional[str] = None):
+        """
+        Initialize dosage calculator
+
+        Args:
+            data_dir: Directory holding formulary.csv and conditions.csv
+            version: Formulary version to use (default: the latest in the file)
+        """
+        with open(os.path.join(data_dir, "formulary.csv"), newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        versions = sorted({row["version"] for row in rows}, key=lambda v: [int(p) for p in v.split(".")])
+        self.version = version or versions[-1]
+        rows = [row for row in rows if row["version"] == self.version]
+        if not rows:
+            raise ValueError(f"Formulary version {self.version} not found (available: {', '.join(versions)})")
+        # First-line regimens first, so per-patient results need no sorting
+        rows.sort(key=lambda row: int(row["line"]))
+
+        self.conditions: List[str] = sorted({row["condition"] for row in rows})
+        condition_index = {name: i for i, name in enumerate(self.conditions)}
+        self.drug = [row["drug"] for row in rows]
+        self.frequency = [row["frequency"] for row in rows]
+        self.route = [row["route"] for row in rows]
+        self.notes = [row["notes"] for row in rows]
+        self.condition = np.array([condition_index[row["condition"]] for row in rows])
+        for field in _NUMERIC:
+            setattr(self, field, np.array([float(row[field] or 0) for row in rows]))
+        self.line_label = [LINE_LABELS.get(int(line), f"line {int(line)}") for line in self.line]
+        self.duration = [int(days) or None for days in self.duration_days]
+        self.basis = [f"{per_kg:g} mg/kg" if per_kg > 0 else "fixed dose" for per_kg in self.mg_per_kg]
+
+        # Exact names and listed aliases only: a near miss ("hypotension") is a different condition
+        self.condition_aliases = {condition_key(name): name for name in self.conditions}
+        with open(os.path.join(data_dir, "conditions.csv"), newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                for alias in row["aliases"].split(";"):
+                    if alias.strip() and row["condition"] in condition_index:
+                        self.condition_aliases[condition_key(alias)] = row["condition"]
+        log.info("dosage_calculator.loaded", version=self.version, regimens=len(rows), conditions=len(self.conditions))
+
+    def resolve_condition(self, text: Optional[str]) -> Optional[str]:
+        """Formulary condition for a canonical name or listed alias (None otherwise, so no regimen is proposed)"""
+        if not text:
+            return None
+        return self.condition_aliases.get(condition_key(text))
+
+    def calculate_batch(self, patients: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Regimens for many patients at once
+
+        Args:
+            patients: Dicts with condition, age (years) and weight (kg); a patient
+                without an age gets no regimens
+
+        Returns:
+            One result per patient: resolved condition, regimens (first-line first) and
+            manual_dosing (regimens whose cap is below the smallest measurable dose)
+        """
+        start = time.perf_counter()
+        names = [self.resolve_condition(p.get("condition")) for p in patients]
+        cond = np.array([self.conditions.index(n) if n else -1 for n in names])
+        # A missing age matches no age band (0 would select neonatal/pediatric rows)
+        age = np.array([np.nan if p.get("age") is None else float(p["age"]) for p in patients])
+        weight = np.array([float(p.get("weight") or 0) for p in patients])
+
+        # (patients x regimens) eligibility and dose matrices
+        eligible = ((cond[:, None] == self.condition)
+                    & (age[:, None] >= self.age_min) & (age[:, None] < self.age_max)
+                    & ((self.mg_per_kg == 0) | (weight[:, None] > 0)))
+        per_kg = self.mg_per_kg > 0
+        raw = np.where(per_kg, weight[:, None] * self.mg_per_kg, self.fixed_mg)
+
+        daily_cap = np.where(self.max_daily_mg > 0, self.max_daily_mg, np.inf)
+        daily_cap = np.where(self.max_daily_mg_per_kg > 0,
+                             np.minimum(daily_cap, weight[:, None] * self.max_daily_mg_per_kg), daily_cap)
+        single_cap = np.where(self.max_single_mg > 0, self.max_single_mg, np.inf)
+        limit = np.minimum(single_cap, daily_cap / self.doses_per_day)
+
+        # Round to the nearest measurable amount (at least one step), never above the cap;
+        # when the cap is below one step no dose can be measured and it is left to the prescriber
+        step = self.round_mg
+        nearest = np.round(raw / step) * step
+        floored = np.floor(limit / step) * step
+        measurable = floored >= step
+        dose = np.maximum(np.minimum(nearest, floored), step)
+        daily = np.round(dose * self.doses_per_day, 2)
+        capped = raw > limit + 1e-9
+
+        results = [{"condition": name, "formulary_version": self.version, "regimens": [], "manual_dosing": []}
+                   for name in names]
+        p_idx, r_idx = np.nonzero(eligible & measurable)
+        for p, r, d, total, c in zip(p_idx.tolist(), r_idx.tolist(), dose[p_idx, r_idx].tolist(),
+                                     daily[p_idx, r_idx].tolist(), capped[p_idx, r_idx].tolist()):
+            results[p]["regimens"].append(self._regimen(r, d, total, c))
+        p_idx, r_idx = np.nonzero(eligible & ~measurable)
+        for p, r, cap in zip(p_idx.tolist(), r_idx.tolist(), limit[p_idx, r_idx].tolist()):
+            results[p]["manual_dosing"].append({
+                "drug": self.drug[r],
+                "line": self.line_label[r],
+                "reason": f"maximum {cap:.3g} mg per dose is below the smallest measurable {step[r]:g} mg"
+            })
+            metrics.inc("dosage_manual_total", drug=self.drug[r])
+
+        metrics.record_stage("dosage_calculation", start, batch="patient" if len(patients) == 1 else "list")
+        return results
+
+    def calculate(self, condition: str, age: float, weight: float) -> Dict[str, Any]:
+        """Regimens for one patient (see calculate_batch)"""
+        return self.calculate_batch([{"condition": condition, "age": age, "weight": weight}])[0]
+
+    def _regimen(self, r: int, dose: float, daily: float, capped: bool) -> Dict[str, Any]:
+        return {
+            "drug": self.drug[r],
+            "line": self.line_label[r],
+            "dose_mg": dose,
+            "frequency": self.frequency[r],
+            "daily_mg": daily,
+            "duration_days": self.duration[r],
+            "route": self.route[r],
+            "basis": self.basis[r],
+            "capped": capped,
+            "notes": self.notes[r]
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            "version": self.version,
+            "regimens": len(self.drug),
+            "conditions": self.conditions
+        }
+
+
+def describe_regimen(regimen: Dict[str, Any]) -> str:
+    """One-line text form: "Amoxicillin 1000 mg TID oral x5 days (first-line; fixed dose)" """
+    duration = f" x{regimen['duration_days']} days" if regimen["duration_days"] else " (ongoing)"
+    extras = [regimen["line"], regimen["basis"]]
+    if regimen["capped"]:
+        extras.append("capped at maximum")
+    if regimen.get("safety"):
+        extras.append(f"{regimen['safety'].upper()}: {regimen['safety_reason']}")
+    return (f"{regimen['drug']} {regimen['dose_mg']:g} mg {regimen['frequency']} {regimen['route']}{duration} "
+            f"({'; '.join(extras)})")
+
+
+# Singleton instance
+dosage_calculator = DosageCalculator(version=os.getenv("FORMULARY_VERSION") or None)
+
+
+if __name__ == "__main__":
+    for condition, age, weight in [("Pneumonia", 6, 20), ("community acquired pneumonia", 45, 75),
+                                   ("TB", 40, 52), ("Hypertension", 70, 68), ("fever", 4, 16),
+                                   ("fever", 0.5, 0.5), ("Hypotension", 70, 68), ("Type 1 Diabetes", 30, 70)]:
+        result = dosage_calculator.calculate(condition, age, weight)
+        print(f"{condition} / {age}y / {weight}kg -> {result['condition']}")
+        for regimen in result["regimens"]:
+            print("  -", describe_regimen(regimen))
+        for regimen in result["manual_dosing"]:
+            print(f"  - {regimen['drug']}: manual dosing ({regimen['reason']})")
+
+    rng = np.random.default_rng(0)
+    cohort = [{"condition": c, "age": float(a), "weight": float(w)}
+              for c, a, w in zip(rng.choice(dosage_calculator.conditions, 10000),
+                                 rng.integers(1, 90, 10000), rng.integers(10, 110, 10000))]
+    start = time.perf_counter()
+    results = dosage_calculator.calculate_batch(cohort)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{len(results)} patients, {sum(len(r['regimens']) for r in results)} regimens in {elapsed:.1f} ms")
@@ -0,0 +1,350 @@
+"""
+Drug Normalizer - Free-text medication/allergy name matching
+Strips dose, frequency and dosage-form noise, then resolves the name
+against a vocabulary by exact lookup, a SymSpell-style deletion
+dictionary (a typo of one edit with a single closest drug) and a trigram
+index (reordered or re-punctuated multi-word names). A term is never
+corrected into a drug whose name it does not actually contain, so a
+real drug missing from the vocabulary stays unmatched
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, List, Set, Tuple
+
+# Dose: number + unit ("500mg", "2.5 ml", "2000 IU")
+_DOSE = re.compile(r"(\d+(?:\.\d+)?)\s*(mcg|µg|mg|g|ml|iu|units?|%)\b")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_NON_NAME = re.compile(r"[^a-z0-9\- ]+")
+_PARENS = re.compile(r"\(([^)]*)\)")
+DOSE_UNITS = {"µg": "mcg", "iu": "IU", "unit": "units"}
+
+# Frequency phrases (longest first when matching) -> canonical abbreviation
+FREQUENCIES = {
+    "three times daily": "TID", "three times a day": "TID", "twice daily": "BID", "twice a day": "BID",
+    "once daily": "OD", "once a day": "OD", "four times daily": "QID", "as needed": "PRN",
+    "at night": "HS", "at bedtime": "HS", "every day": "OD",
+    "od": "OD", "qd": "OD", "daily": "OD", "bid": "BID", "bd": "BID", "tid": "TID", "tds": "TID",
+    "qid": "QID", "prn": "PRN", "hs": "HS", "weekly": "WEEKLY", "stat": "STAT",
+}
+_FREQUENCY = re.compile(r"\b(" + "|".join(sorted((re.escape(k) for k in FREQUENCIES), key=len, reverse=True)) + r")\b")
+
+# Form, route and filler words that never distinguish a drug
+NOISE_WORDS = {
+    "tab", "tabs", "tablet", "tablets", "cap", "caps", "capsule", "capsules", "syrup", "suspension",
+    "injection", "inj", "drops", "cream", "ointment", "oral", "po", "iv", "im", "sc", "er", "sr", "xr",
+    "mg", "mcg", "ml", "iu", "units", "unit", "dose", "take", "taking", "allergy", "allergic", "to",
+    "intolerance", "reaction", "x", "per", "day", "days", "and", "with", "plus",
+}
+
+
+class Match:
+    """Resolved vocabulary entry for one free-text term"""
+
+    __slots__ = ("text", "canonical", "alias", "method", "distance", "dose", "frequency")
+
+    def __init__(self, text: str, canonical: Optional[str], alias: Optional[str], method: str,
+                 distance: int = 0, dose: Optional[str] = None, frequency: Optional[str] = None):
+        self.text = text
+        self.canonical = canonical
+        self.alias = alias
+        self.method = method
+        self.distance = distance
+        self.dose = dose
+        self.frequency = frequency
+
+    @property
+    def corrected(self) -> bool:
+        """True if the canonical name is not simply what was typed (typo, brand or partial match)"""
+        return self.canonical is not None and clean_term(self.text)[0] != clean_term(self.canonical)[0]
+
+    @property
+    def normalized(self) -> str:
+        """
+        Canonical name plus normalized dose/frequency ("Metformin 500mg BID"),
+        the same for every spelling of an entry; unmatched entries are returned as typed
+        """
+        if self.canonical is None:
+            return self.text.strip()
+        return " ".join(part for part in (self.canonical, self.dose, self.frequency) if part)
+
+    @property
+    def display(self) -> str:
+        """Normalized form followed by the original entry when the name was corrected"""
+        return f'{self.normalized} (entered as "{self.text.strip()}")' if self.corrected else self.normalized
+
+    def to_dict(self) -> dict:
+        return {"text": self.text, "canonical": self.canonical, "method": self.method,
+                "distance": self.distance, "dose": self.dose, "frequency": self.frequency,
+                "corrected": self.corrected}
+
+
+def clean_term(text: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Split a free-text entry into (name, dose, frequency)
+
+    Args:
+        text: e.g. "Tab. Metformin 500 mg twice daily"
+
+    Returns:
+        Tuple of (lowercase name words, "500mg" or None, "BID" or None)
+    """
+    lowered = text.lower()
+    dose_match = _DOSE.search(lowered)
+    dose = f"{dose_match.group(1)}{DOSE_UNITS.get(dose_match.group(2), dose_match.group(2))}" if dose_match else None
+    freq_match = _FREQUENCY.search(lowered)
+    frequency = FREQUENCIES[freq_match.group(1)] if freq_match else None
+
+    name = _FREQUENCY.sub(" ", _DOSE.sub(" ", lowered))
+    name = _NUMBER.sub(" ", _NON_NAME.sub(" ", name))
+    words = [w for w in name.split() if w not in NOISE_WORDS]
+    return " ".join(words), dose, frequency
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """Every string reachable from word by up to max_distance single-character deletions"""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - results
+        results |= frontier
+    return results
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if a == b:
+        return 0
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cb = b[j - 1]
+            value = prev[j - 1] if ca == cb else prev[j - 1] + 1
+            if prev[j] + 1 < value:
+                value = prev[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb and prev2[j - 2] + 1 < value:
+                value = prev2[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, current
+    return prev[-1]
+
+
+def _words(text: str) -> List[str]:
+    return text.replace("-", " ").split()
+
+
+def _single_word_edit(term: str, alias: str) -> bool:
+    """
+    True if term and alias differ only inside one long word (or only in separators)
+
+    Keeps a one-letter edit from turning "vitamin e" into "vitamin d" or
+    "pen g" into "pen v": short words identify the drug and must match exactly.
+    """
+    term_words, alias_words = _words(term), _words(alias)
+    if len(term_words) != len(alias_words):
+        return False
+    differing = [(a, b) for a, b in zip(term_words, alias_words) if a != b]
+    return not differing or (len(differing) == 1 and min(len(differing[0][0]), len(differing[0][1])) > 4)
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DrugNormalizer:
+    """Vocabulary matcher: exact, deletion-dictionary and trigram lookups with a memo"""
+
+    def __init__(self, vocabulary: Dict[str, str], max_distance: int = 1,
+                 trigram_threshold: float = 0.55, memo_size: int = 4096):
+        """
+        Initialize normalizer
+
+        Args:
+            vocabulary: Lowercase alias -> canonical name (include each canonical name itself)
+            max_distance: Largest edit distance accepted for names over 4 characters
+                (more than 1 turns real drugs into their neighbours: duloxetine -> fluoxetine)
+            trigram_threshold: Minimum trigram Jaccard similarity for a partial match
+            memo_size: Resolved terms kept in the LRU memo
+        """
+        self.vocabulary = {alias.lower(): canonical for alias, canonical in vocabulary.items()}
+        self.max_distance = max_distance
+        self.trigram_threshold = trigram_threshold
+
+        self.delete_index: Dict[str, Set[str]] = {}
+        self.trigram_index: Dict[str, Set[str]] = {}
+        self.alias_trigrams: Dict[str, Set[str]] = {}
+        for alias in self.vocabulary:
+            for deletion in _deletes(alias, self._budget(alias)):
+                self.delete_index.setdefault(deletion, set()).add(alias)
+            grams = _trigrams(alias)
+            self.alias_trigrams[alias] = grams
+            for gram in grams:
+                self.trigram_index.setdefault(gram, set()).add(alias)
+
+        self.memo: "OrderedDict[str, Match]" = OrderedDict()
+        self.memo_size = memo_size
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.memo_hits = 0
+        self.lookup_seconds = 0.0
+
+    def _budget(self, term: str) -> int:
+        """Edits tolerated for a term of this length (short names must match exactly)"""
+        return 0 if len(term) <= 4 else self.max_distance
+
+    def match(self, text: str) -> Match:
+        """
+        Resolve one free-text medication or allergy entry
+
+        Args:
+            text: Raw entry, e.g. "metformn 500mg BID"
+
+        Returns:
+            Match (canonical None and method "unmatched" when nothing is close enough)
+        """
+        with self.lock:
+            self.lookups += 1
+            cached = self.memo.get(text)
+            if cached is not None:
+                self.memo.move_to_end(text)
+                self.memo_hits += 1
+                return cached
+
+        start = time.perf_counter()
+        name, dose, frequency = clean_term(text)
+        result = None
+        # Parenthesised names ("Antibiotics (Amoxicillin)") are tried first
+        candidates = [clean_term(inner)[0] for inner in _PARENS.findall(text)] + [name]
+        for candidate in candidates:
+            result = self._resolve(candidate)
+            if result:
+                break
+        alias, method, distance = result if result else (None, "unmatched", 0)
+        match = Match(text, self.vocabulary.get(alias) if alias else None, alias or name or None,
+                      method, distance, dose, frequency)
+
+        with self.lock:
+            self.lookup_seconds += time.perf_counter() - start
+            self.memo[text] = match
+            while len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        return match
+
+    def _resolve(self, name: str) -> Optional[Tuple[str, str, int]]:
+        """(alias, method, distance) for a cleaned name: whole phrase, then word windows, then trigrams"""
+        if not name:
+            return None
+        if name in self.vocabulary:
+            return name, "exact", 0
+
+        words = name.split()
+        # Longest word windows first, so "vitamin d3 supplement" finds "vitamin d3"
+        for size in range(len(words), 0, -1):
+            for i in range(len(words) - size + 1):
+                phrase = " ".join(words[i:i + size])
+                if phrase in self.vocabulary:
+                    return phrase, "exact", 0
+                fuzzy = self._symspell(phrase)
+                if fuzzy:
+                    return fuzzy[0], "fuzzy", fuzzy[1]
+
+        return self._trigram(name)
+
+    def _symspell(self, term: str) -> Optional[Tuple[str, int]]:
+        budget = self._budget(term)
+        if budget == 0:
+            return None
+        candidates: Set[str] = set()
+        for deletion in _deletes(term, budget):
+            candidates.update(self.delete_index.get(deletion, ()))
+
+        matches: Dict[int, List[str]] = {}
+        for alias in candidates:
+            distance = edit_distance(term, alias, budget)
+            if distance <= budget and _single_word_edit(term, alias):
+                matches.setdefault(distance, []).append(alias)
+        if not matches:
+            return None
+        distance = min(matches)
+        # Two different drugs equally close: a guess could swap one for the other
+        if len({self.vocabulary[alias] for alias in matches[distance]}) > 1:
+            return None
+        return min(matches[distance]), distance
+
+    def _trigram(self, name: str) -> Optional[Tuple[str, str, int]]:
+        grams = _trigrams(name)
+        counts: Dict[str, int] = {}
+        for gram in grams:
+            for alias in self.trigram_index.get(gram, ()):
+                counts[alias] = counts.get(alias, 0) + 1
+        words = set(_words(name))
+        scored: Dict[str, Tuple[float, str]] = {}
+        for alias, shared in counts.items():
+            # Every word of the drug's name must be in the entry: similar-looking
+            # names ("citalopram" / "escitalopram") are different drugs
+            if not set(_words(alias)) <= words:
+                continue
+            score = shared / len(grams | self.alias_trigrams[alias])
+            canonical = self.vocabulary[alias]
+            if score >= self.trigram_threshold and score > scored.get(canonical, (0.0, ""))[0]:
+                scored[canonical] = (score, alias)
+        if not scored:
+            return None
+        ranked = sorted(scored.values(), reverse=True)
+        if len(ranked) > 1 and ranked[0][0] == ranked[1][0]:
+            return None
+        return ranked[0][1], "trigram", 0
+
+    def normalize_list(self, items: Optional[List[str]]) -> List[str]:
+        """
+        Sorted, de-duplicated normalized forms for a list of entries ("None"/blank dropped);
+        canonical names only, so every spelling of a list gives the same prompt and cache key
+        """
+        seen = set()
+        for item in items or []:
+            if not item or not clean_term(item)[0] or clean_term(item)[0] == "none":
+                continue
+            seen.add(self.match(item).normalized)
+        return sorted(seen)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "vocabulary": len(self.vocabulary),
+                "delete_keys": len(self.delete_index),
+                "lookups": self.lookups,
+                "memo_hits": self.memo_hits,
+                "avg_lookup_us": round(self.lookup_seconds / max(self.lookups - self.memo_hits, 1) * 1e6, 1)
+            }
+
+
+if __name__ == "__main__":
+    from app.services.interaction_index import interaction_index
+
+    normalizer = interaction_index.drug_matcher
+    terms = ["Metformin 500mg BID", "metformn 500 mg twice daily", "Tab. Amoxycilin 250mg TID", "Augmentin 625",
+             "Antibiotics (Amoxicillin)", "atorvastatn", "Vitamin D3 2000 IU", "Lisinipril 10mg OD", "unknownium",
+             "Duloxetine", "Citalopram", "Esomeprazole", "Vitamin C", "Vitamin B12"]
+    for term in terms:
+        match = normalizer.match(term)
+        print(f"{term!r:35} -> {match.display!r:30} {match.method} d={match.distance}")
+
+    start = time.perf_counter()
+    for i in range(2000):
+        normalizer.match(f"metfromin {i}mg")
+    print(f"{(time.perf_counter() - start) / 2000 * 1e6:.1f} us per uncached lookup")
@@ -0,0 +1,178 @@
+"""
+Hospital Snapshot Service
+Rebuilds hospital dashboard data and its AI report on a background schedule
+and serves polls from an immutable in-memory snapshot
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from app.agents.hospital_agent import HospitalAgent
+from app.util.priority_scheduler import request_priority
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+
+class HospitalSnapshot:
+    """
+    One published dashboard state
+
+    The JSON body and ETag are computed once at publish time; readers only
+    ever get the pre-serialized bytes, so a snapshot is never mutated after
+    it has been swapped in.
+    """
+
+    __slots__ = ("body", "etag", "generated_at", "analysis_status", "version")
+
+    def __init__(self, raw_data: dict, analysis: Optional[str], analysis_status: str, version: int):
+        self.generated_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.analysis_status = analysis_status
+        self.version = version
+        self.body = json.dumps({
+            "raw_data": raw_data,
+            "analysis": analysis if analysis is not None else "AI analysis is being generated. It will appear on the next refresh.",
+            "analysis_status": analysis_status,
+            "generated_at": self.generated_at
+        }, ensure_ascii=False, default=str).encode("utf-8")
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:20]}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """
+        Check an If-None-Match header against this snapshot
+
+        Args:
+            if_none_match: Raw header value (may list several, weak or '*')
+
+        Returns:
+            True if the client already holds this snapshot
+        """
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+
+class HospitalSnapshotService:
+    """
+    Background refresher for HospitalAgent data and analysis
+    """
+
+    def __init__(self, agent: HospitalAgent, interval_seconds: int = 60):
+        """
+        Initialize snapshot service
+
+        Args:
+            agent: HospitalAgent providing simulate_hospital_data/generate_analysis
+            interval_seconds: Seconds between refreshes
+        """
+        self.agent = agent
+        self.interval_seconds = interval_seconds
+
+        self._snapshot: Optional[HospitalSnapshot] = None
+        self._version = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.refreshes = 0
+        self.failures = 0
+        self.last_refresh_seconds = 0.0
+
+    def start(self):
+        """
+        Publish the first snapshot (raw data, analysis pending) and start the
+        refresher thread (idempotent)
+
+        Call from application startup so no request ever builds the data itself.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._snapshot is None:
+                self._publish(self.agent.simulate_hospital_data(), None, "pending")
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="hospital-snapshot", daemon=True)
+            self._thread.start()
+        log.info("hospital_snapshot.started", interval_seconds=self.interval_seconds)
+
+    def stop(self, timeout: float = 5.0):
+        """Signal the refresher to exit and wait briefly for it"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        log.info("hospital_snapshot.stopped")
+
+    def current(self) -> HospitalSnapshot:
+        """
+        Get the latest published snapshot
+
+        The first snapshot is published by start(); if the service was not
+        started (no application lifespan) it is started here. Never waits on the LLM.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        self.start()
+        return self._snapshot
+
+    def refresh(self):
+        """Build fresh data, publish it immediately, then publish again with the AI report"""
+        start = time.perf_counter()
+        data = self.agent.simulate_hospital_data()
+
+        if self._snapshot is None:
+            self._publish(data, None, "pending")
+
+        analysis = self.agent.generate_analysis(data)
+        self._publish(data, analysis, "ready")
+
+        self.refreshes += 1
+        self.last_refresh_seconds = time.perf_counter() - start
+        metrics.record_stage("snapshot_refresh", start, agent="hospital")
+
+    def _publish(self, data: dict, analysis: Optional[str], status: str):
+        self._version += 1
+        # Single reference assignment: readers see either the old or the new snapshot
+        self._snapshot = HospitalSnapshot(data, analysis, status, self._version)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # Scheduled refreshes yield provider slots to user requests
+                with request_priority("background"):
+                    self.refresh()
+            except Exception as e:
+                self.failures += 1
+                log.error("hospital_snapshot.refresh_failed", error=str(e))
+            self._stop.wait(self.interval_seconds)
+
+    def get_stats(self) -> dict:
+        """Get refresher statistics"""
+        snapshot = self._snapshot
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval_seconds": self.interval_seconds,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_refresh_seconds": round(self.last_refresh_seconds, 3),
+            "version": snapshot.version if snapshot else 0,
+            "generated_at": snapshot.generated_at if snapshot else None,
+            "analysis_status": snapshot.analysis_status if snapshot else None
+        }
+
+
+# Singleton instance
+hospital_snapshot_service = HospitalSnapshotService(
+    HospitalAgent(),
+    interval_seconds=int(os.getenv("HOSPITAL_SNAPSHOT_INTERVAL_SECONDS", "60"))
+)
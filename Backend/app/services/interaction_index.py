@@ -0,0 +1,275 @@
+"""
+Interaction Index - Local drug-interaction and allergy pre-screening
+Loads drugs (with classes and synonyms), interaction rules and allergy
+cross-reactivity from CSV and compiles them into integer bitsets, so a
+patient's full medication and allergy list is screened in microseconds
+without an LLM call. Free-text entries are resolved through DrugNormalizer
+"""
+
+import csv
+import os
+import time
+from typing import Optional, Dict, Any, List, Tuple
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+from app.services.drug_normalizer import DrugNormalizer, clean_term
+
+log = get_logger(__name__)
+
+DATA_DIR = os.getenv("DRUG_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
+
+# Interaction severities and allergy severities share one 1-3 scale
+SEVERITY_RANK = {"minor": 1, "low": 1, "moderate": 2, "major": 3, "high": 3}
+RISK_LEVELS = {0: "low", 1: "low", 2: "medium", 3: "high"}
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase drug/allergy name without dose, frequency or punctuation"""
+    return clean_term(text)[0]
+
+
+def _bits(mask: int):
+    """Indices of the set bits of mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class InteractionIndex:
+    """Bitset-compiled interaction and allergy knowledge base"""
+
+    def __init__(self):
+        self.drugs: List[str] = []
+        self.names: Dict[str, int] = {}            # normalized drug name/synonym -> drug bit
+        self.class_masks: Dict[str, int] = {}      # class -> member drug bits
+        self.partners: List[int] = []              # drug bit -> interacting drug bits
+        self.pairs: Dict[Tuple[int, int], Tuple[int, str]] = {}
+        self.allergy_names: Dict[str, str] = {}    # normalized allergy/synonym -> allergy
+        self.allergy_rules: Dict[str, List[Tuple[int, int, str]]] = {}  # allergy -> [(drug bits, rank, note)]
+        self.drug_matcher: Optional[DrugNormalizer] = None
+        self.allergy_matcher: Optional[DrugNormalizer] = None
+        self.loaded_at = 0.0
+
+    @classmethod
+    def from_csv(cls, data_dir: str = DATA_DIR) -> "InteractionIndex":
+        """
+        Build an index from drugs.csv, drug_interactions.csv and allergy_classes.csv
+
+        Args:
+            data_dir: Directory holding the three CSV files
+
+        Returns:
+            Loaded InteractionIndex
+        """
+        index = cls()
+        with open(os.path.join(data_dir, "drugs.csv"), newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                index.add_drug(row["drug"], _split(row["classes"]), _split(row["synonyms"]))
+        with open(os.path.join(data_dir, "drug_interactions.csv"), newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                index.add_interaction(row["left"], row["right"], row["severity"], row["effect"])
+        with open(os.path.join(data_dir, "allergy_classes.csv"), newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                index.add_allergy_rule(row["allergy"], _split(row["synonyms"]), _split(row["reacts_with"]),
+                                       row["severity"], row["note"])
+        index.compile_matchers()
+        index.loaded_at = time.time()
+        log.info("interaction_index.loaded", drugs=len(index.drugs), classes=len(index.class_masks),
+                 pairs=len(index.pairs), allergies=len(index.allergy_rules))
+        return index
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def add_drug(self, name: str, classes: List[str], synonyms: List[str]) -> int:
+        bit = self.names.get(normalize_name(name))
+        if bit is None:
+            bit = len(self.drugs)
+            self.drugs.append(name)
+            self.partners.append(0)
+        for alias in [name, *synonyms]:
+            self.names[normalize_name(alias)] = bit
+        for drug_class in classes:
+            self.class_masks[drug_class] = self.class_masks.get(drug_class, 0) | (1 << bit)
+        return bit
+
+    def mask_for(self, term: str) -> int:
+        """Drug bits for a class name or a drug name/synonym (0 if unknown)"""
+        if term in self.class_masks:
+            return self.class_masks[term]
+        bit = self.names.get(normalize_name(term))
+        return 0 if bit is None else 1 << bit
+
+    def add_interaction(self, left: str, right: str, severity: str, effect: str):
+        """Record an interaction between two drugs or classes (class rules expand to every member pair)"""
+        left_mask, right_mask = self.mask_for(left), self.mask_for(right)
+        if not left_mask or not right_mask:
+            log.warning("interaction_index.unknown_term", left=left, right=right)
+            return
+        rank = SEVERITY_RANK[severity.strip().lower()]
+        for i in _bits(left_mask):
+            self.partners[i] |= right_mask & ~(1 << i)
+            for j in _bits(right_mask):
+                if i == j:
+                    continue
+                self.partners[j] |= 1 << i
+                key = (min(i, j), max(i, j))
+                # The most severe rule covering a pair wins
+                if key not in self.pairs or self.pairs[key][0] < rank:
+                    self.pairs[key] = (rank, effect)
+
+    def compile_matchers(self):
+        """Build the fuzzy name matchers once the vocabulary is complete"""
+        self.drug_matcher = DrugNormalizer({alias: self.drugs[bit] for alias, bit in self.names.items()})
+        self.allergy_matcher = DrugNormalizer(dict(self.allergy_names))
+
+    def add_allergy_rule(self, allergy: str, synonyms: List[str], reacts_with: List[str], severity: str, note: str):
+        for alias in [allergy, *synonyms]:
+            self.allergy_names[normalize_name(alias)] = allergy
+        mask = 0
+        for term in reacts_with:
+            mask |= self.mask_for(term)
+        self.allergy_rules.setdefault(allergy, []).append((mask, SEVERITY_RANK[severity.strip().lower()], note))
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def resolve_drug(self, text: str) -> Optional[int]:
+        """Drug bit for a free-text medication entry (exact, typo-tolerant or partial match)"""
+        match = self.drug_matcher.match(text)
+        return self.names[match.alias] if match.canonical else None
+
+    def allergy_rules_for(self, text: str) -> Optional[List[Tuple[int, int, str]]]:
+        """Cross-reactivity rules for a free-text allergy (None if unknown)"""
+        match = self.allergy_matcher.match(text)
+        if match.canonical:
+            return self.allergy_rules[match.canonical]
+        bit = self.resolve_drug(text)
+        if bit is None:
+            return None
+        # An allergy to one drug implies its class allergy when the index has one
+        for rules in self.allergy_rules.values():
+            if rules[0][0] >> bit & 1:
+                return rules
+        return [(1 << bit, SEVERITY_RANK["high"], "Documented allergy to this drug")]
+
+    def screen(self, medications: List[str], allergies: List[str],
+               proposed: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Screen a medication list against itself and the patient's allergies
+
+        Args:
+            medications: Current medications (free text, doses allowed)
+            allergies: Known allergies (free text)
+            proposed: Drugs under consideration, screened like current medications
+
+        Returns:
+            Dict with interactions, allergy conflicts, unrecognized entries,
+            risk (low/medium/high), escalate flag and elapsed microseconds
+        """
+        start = time.perf_counter()
+        entries = [m for m in (medications or []) + (proposed or []) if m and normalize_name(m) not in ("", "none")]
+
+        med_mask = 0
+        recognized: Dict[str, str] = {}
+        unrecognized: List[str] = []
+        for entry in entries:
+            bit = self.resolve_drug(entry)
+            if bit is None:
+                unrecognized.append(entry)
+            else:
+                med_mask |= 1 << bit
+                recognized[entry] = self.drugs[bit]
+
+        interactions = []
+        for i in _bits(med_mask):
+            # Only partners above i, so each pair is reported once
+            for j in _bits(self.partners[i] & med_mask & ~((1 << (i + 1)) - 1)):
+                rank, effect = self.pairs[(i, j)]
+                interactions.append({"drugs": [self.drugs[i], self.drugs[j]],
+                                     "severity": _severity_name(rank, "interaction"), "effect": effect, "rank": rank})
+
+        conflicts = []
+        for entry in allergies or []:
+            if normalize_name(entry) in ("", "none"):
+                continue
+            rules = self.allergy_rules_for(entry)
+            if rules is None:
+                unrecognized.append(entry)
+                continue
+            for mask, rank, note in rules:
+                for bit in _bits(mask & med_mask):
+                    conflicts.append({"allergy": entry, "drug": self.drugs[bit],
+                                      "severity": _severity_name(rank, "allergy"), "note": note, "rank": rank})
+
+        top = max([f["rank"] for f in interactions + conflicts], default=0)
+        interactions.sort(key=lambda f: -f["rank"])
+        conflicts.sort(key=lambda f: -f["rank"])
+        for finding in interactions + conflicts:
+            del finding["rank"]
+
+        risk = RISK_LEVELS[top]
+        metrics.inc("safety_screens_total", risk=risk)
+        return {
+            "risk": risk,
+            "escalate": top >= 3,
+            "interactions": interactions,
+            "allergy_conflicts": conflicts,
+            "recognized": recognized,
+            "unrecognized": unrecognized,
+            "elapsed_us": round((time.perf_counter() - start) * 1e6, 1)
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            "drugs": len(self.drugs),
+            "names": len(self.names),
+            "classes": len(self.class_masks),
+            "interaction_pairs": len(self.pairs),
+            "allergies": len(self.allergy_rules),
+            "drug_matcher": self.drug_matcher.get_stats() if self.drug_matcher else None,
+            "allergy_matcher": self.allergy_matcher.get_stats() if self.allergy_matcher else None
+        }
+
+
+def _split(field: Optional[str]) -> List[str]:
+    return [part.strip() for part in (field or "").split(";") if part.strip()]
+
+
+def _severity_name(rank: int, kind: str) -> str:
+    if kind == "interaction":
+        return {1: "minor", 2: "moderate", 3: "major"}[rank]
+    return {1: "low", 2: "moderate", 3: "high"}[rank]
+
+
+def prompt_summary(screen: Dict[str, Any]) -> str:
+    """Compact text of a screen for the treatment prompt"""
+    lines = [f"Local screen risk: {screen['risk'].upper()}"]
+    lines += [f"- Interaction ({f['severity']}): {' + '.join(f['drugs'])} - {f['effect']}" for f in screen["interactions"]]
+    lines += [f"- Allergy ({f['severity']}): {f['allergy']} vs {f['drug']} - {f['note']}" for f in screen["allergy_conflicts"]]
+    if not screen["interactions"] and not screen["allergy_conflicts"]:
+        lines.append("- No known interactions or allergy conflicts among current medications")
+    if screen["unrecognized"]:
+        lines.append(f"- Not in local index (check manually): {', '.join(screen['unrecognized'])}")
+    return "\n".join(lines)
+
+
+# Singleton instance
+interaction_index = InteractionIndex.from_csv()
+
+
+if __name__ == "__main__":
+    cases = [
+        (["Metformin 500mg BID", "Lisinopril 10mg"], ["Penicillin", "Sulfa drugs"], None),
+        (["Warfarin 5mg", "Aspirin 75mg"], [], None),
+        (["Sertraline 50mg"], ["Penicillin"], ["Amoxicillin 500mg TID", "Tramadol"]),
+    ]
+    for meds, allergies, proposed in cases:
+        result = interaction_index.screen(meds, allergies, proposed)
+        print(f"{meds} + {proposed or []} / allergies {allergies}: {result['risk']} "
+              f"(escalate={result['escalate']}, {result['elapsed_us']} us)")
+        print(prompt_summary(result))
+        print()
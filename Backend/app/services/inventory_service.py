@@ -0,0 +1,260 @@
+"""
+Inventory Service - Vectorized pharmacy reorder engine
+Holds stock, consumption rates and lead times for every SKU in NumPy
+arrays and computes days-to-stockout, reorder points and priorities in
+one pass
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, List
+import numpy as np
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+# Days of demand covered by one order beyond the lead time
+REVIEW_PERIOD_DAYS = 7.0
+
+STATUSES = np.array(["ok", "reorder", "critical", "stockout"])
+
+# Headline items shown on the dashboard (name, stock, daily use, lead days, criticality)
+TRACKED_ITEMS = [
+    ("Paracetamol", 300, 40.0, 2.0, 1.0),
+    ("Antibiotics (Amoxicillin)", 60, 9.0, 3.0, 2.0),
+    ("Insulin", 25, 4.0, 4.0, 3.0),
+    ("Bandages", 120, 15.0, 2.0, 1.0),
+    ("Anesthetics", 10, 2.0, 5.0, 3.0),
+]
+
+
+class InventoryService:
+    """Columnar SKU table with vectorized reorder analysis"""
+
+    def __init__(self, service_level_z: float = 1.65):
+        """
+        Initialize inventory service
+
+        Args:
+            service_level_z: Safety-stock z-score (1.65 ~ 95% cycle service level)
+        """
+        self.z = service_level_z
+        self.lock = threading.Lock()
+
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.stock = np.empty(0)
+        self.daily_use = np.empty(0)
+        self.daily_use_std = np.empty(0)
+        self.lead_days = np.empty(0)
+        self.criticality = np.empty(0)
+        self.on_order = np.empty(0)
+        self.order_eta = np.empty(0)
+        self.updated_at = time.time()
+
+    def load(self, names: List[str], stock, daily_use, lead_days, criticality=None, daily_use_std=None):
+        """
+        Replace the SKU table
+
+        Args:
+            names: SKU names
+            stock: Units on hand
+            daily_use: Mean units consumed per day
+            lead_days: Supplier lead time in days
+            criticality: Clinical weight (1 routine .. 3 life-critical)
+            daily_use_std: Std of daily use (default 30% of the mean)
+        """
+        n = len(names)
+        with self.lock:
+            self.names = list(names)
+            self.index = {name: i for i, name in enumerate(self.names)}
+            self.stock = np.asarray(stock, dtype=np.float64).copy()
+            self.daily_use = np.asarray(daily_use, dtype=np.float64)
+            self.daily_use_std = (np.asarray(daily_use_std, dtype=np.float64) if daily_use_std is not None
+                                  else self.daily_use * 0.3)
+            self.lead_days = np.asarray(lead_days, dtype=np.float64)
+            self.criticality = np.asarray(criticality, dtype=np.float64) if criticality is not None else np.ones(n)
+            self.on_order = np.zeros(n)
+            self.order_eta = np.full(n, np.inf)
+            self.updated_at = time.time()
+
+    def seed_synthetic(self, n_skus: int = 2000, seed: Optional[int] = None):
+        """Load the tracked items plus n_skus generated SKUs"""
+        rng = np.random.default_rng(seed)
+        names = [item[0] for item in TRACKED_ITEMS] + [f"SKU-{i:05d}" for i in range(n_skus)]
+        daily_use = np.concatenate(([i[2] for i in TRACKED_ITEMS], rng.gamma(2.0, 5.0, n_skus)))
+        lead_days = np.concatenate(([i[3] for i in TRACKED_ITEMS], rng.integers(1, 15, n_skus)))
+        # Most SKUs hold 1-6 weeks of cover; a tail is running low
+        cover_days = np.concatenate(([i[1] / i[2] for i in TRACKED_ITEMS], rng.gamma(4.0, 8.0, n_skus)))
+        criticality = np.concatenate(([i[4] for i in TRACKED_ITEMS], rng.choice([1.0, 2.0, 3.0], n_skus, p=[0.6, 0.3, 0.1])))
+        self.load(names, np.round(daily_use * cover_days), daily_use, lead_days, criticality)
+
+    def advance(self, now: Optional[float] = None):
+        """
+        Deplete stock for elapsed time, receive due orders and place new ones
+
+        Args:
+            now: Current epoch seconds (default: time.time())
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            elapsed_days = max(0.0, (now - self.updated_at) / 86400)
+            if elapsed_days == 0:
+                return
+            self.stock = np.maximum(self.stock - self.daily_use * elapsed_days, 0.0)
+            self.order_eta -= elapsed_days
+
+            arrived = self.order_eta <= 0
+            self.stock[arrived] += self.on_order[arrived]
+            self.on_order[arrived] = 0.0
+            self.order_eta[arrived] = np.inf
+
+            rop, quantity = self._reorder_point(), self._order_quantity()
+            place = (self.stock <= rop) & (self.on_order == 0)
+            self.on_order[place] = quantity[place]
+            self.order_eta[place] = self.lead_days[place]
+            self.updated_at = now
+
+    def _reorder_point(self) -> np.ndarray:
+        safety = self.z * self.daily_use_std * np.sqrt(self.lead_days)
+        return self.daily_use * self.lead_days + safety
+
+    def _order_quantity(self) -> np.ndarray:
+        safety = self.z * self.daily_use_std * np.sqrt(self.lead_days)
+        target = self.daily_use * (self.lead_days + REVIEW_PERIOD_DAYS) + safety
+        return np.maximum(np.ceil(target - self.stock - self.on_order), 0.0)
+
+    def analyze(self) -> Dict[str, np.ndarray]:
+        """
+        Reorder analysis for every SKU
+
+        Returns:
+            Dict of arrays: days_to_stockout, reorder_point, reorder_qty,
+            status (ok/reorder/critical/stockout), priority and order (SKU
+            indices sorted by descending priority)
+        """
+        start = time.perf_counter()
+        with self.lock:
+            stock, use, lead = self.stock.copy(), self.daily_use, self.lead_days
+            reorder_point = self._reorder_point()
+            reorder_qty = self._order_quantity()
+            on_order = self.on_order.copy()
+
+        days_to_stockout = np.divide(stock, use, out=np.full_like(stock, np.inf), where=use > 0)
+
+        # 0 ok, 1 below reorder point, 2 runs out before a new order could land, 3 empty
+        status = np.zeros(len(stock), dtype=np.int8)
+        status[stock <= reorder_point] = 1
+        status[days_to_stockout < lead] = 2
+        status[stock <= 0] = 3
+
+        # Urgency = lead time relative to remaining cover, weighted by criticality;
+        # items with an order already in flight drop in priority
+        urgency = lead / np.maximum(days_to_stockout, 0.1)
+        priority = urgency * self.criticality * np.where(on_order > 0, 0.25, 1.0) * (status > 0)
+        order = np.argsort(-priority, kind="stable")
+
+        metrics.record_stage("inventory_analysis", start)
+        return {
+            "stock": stock,
+            "days_to_stockout": days_to_stockout,
+            "reorder_point": reorder_point,
+            "reorder_qty": reorder_qty,
+            "on_order": on_order,
+            "status": status,
+            "priority": priority,
+            "order": order
+        }
+
+    def report(self, top: int = 20, status: Optional[str] = None) -> Dict[str, Any]:
+        """
+        JSON-ready reorder report
+
+        Args:
+            top: Number of highest-priority SKUs to list
+            status: Only list SKUs with this status
+
+        Returns:
+            Dict with status counts, reorder list and analysis time
+        """
+        start = time.perf_counter()
+        result = self.analyze()
+        codes = result["status"]
+
+        order = result["order"]
+        if status is not None:
+            order = order[STATUSES[codes[order]] == status]
+        else:
+            order = order[codes[order] > 0]
+
+        return {
+            "total_skus": len(self.names),
+            "counts": {str(name): int((codes == i).sum()) for i, name in enumerate(STATUSES)},
+            "reorders": [self._row(i, result) for i in order[:top].tolist()],
+            "analysis_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def tracked_items(self) -> List[Dict[str, Any]]:
+        """Dashboard rows for the headline items (threshold = reorder point)"""
+        result = self.analyze()
+        rows = []
+        for name, *_ in TRACKED_ITEMS:
+            i = self.index.get(name)
+            if i is None:
+                continue
+            rows.append({
+                "item": name,
+                "stock": int(result["stock"][i]),
+                "threshold": int(np.ceil(result["reorder_point"][i])),
+                "days_to_stockout": round(float(result["days_to_stockout"][i]), 1),
+                "status": str(STATUSES[result["status"][i]])
+            })
+        return rows
+
+    def prompt_summary(self, top: int = 5) -> str:
+        """Compact text for the hospital prompt"""
+        report = self.report(top=top)
+        counts = report["counts"]
+        lines = [f"{report['total_skus']} SKUs: {counts['stockout']} out of stock, "
+                 f"{counts['critical']} critical, {counts['reorder']} below reorder point"]
+        lines += [
+            f"- {row['item']}: {row['stock']} units, {row['days_to_stockout']} days left, "
+            f"lead {row['lead_days']}d, "
+            + (f"{row['on_order']} on order" if row['on_order'] else f"order {row['reorder_qty']}")
+            + f" ({row['status']})"
+            for row in report["reorders"]
+        ]
+        return "\n".join(lines)
+
+    def _row(self, i: int, result: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        days = float(result["days_to_stockout"][i])
+        return {
+            "item": self.names[i],
+            "stock": int(result["stock"][i]),
+            "days_to_stockout": round(days, 1) if np.isfinite(days) else None,
+            "reorder_point": int(np.ceil(result["reorder_point"][i])),
+            "reorder_qty": int(result["reorder_qty"][i]),
+            "on_order": int(result["on_order"][i]),
+            "lead_days": int(self.lead_days[i]),
+            "status": str(STATUSES[result["status"][i]]),
+            "priority": round(float(result["priority"][i]), 2)
+        }
+
+
+# Singleton instance
+inventory_service = InventoryService()
+inventory_service.seed_synthetic(n_skus=int(os.getenv("INVENTORY_SYNTHETIC_SKUS", "2000")), seed=42)
+
+
+if __name__ == "__main__":
+    engine = InventoryService()
+    engine.seed_synthetic(n_skus=50000, seed=1)
+    t0 = time.perf_counter()
+    report = engine.report(top=5)
+    print(f"Analyzed {report['total_skus']} SKUs in {(time.perf_counter() - t0) * 1000:.2f} ms: {report['counts']}")
+    for row in report["reorders"]:
+        print(row)
+    print()
+    print(engine.prompt_summary())
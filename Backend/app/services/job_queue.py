@@ -0,0 +1,482 @@
+"""
+Job Queue - Asynchronous AI analyses with polling and webhooks
+Long-running requests (image analysis, treatment plans) are stored in a
+local SQLite queue and drained by a worker pool. Identical submissions are
+deduplicated by request hash, failed jobs are retried with exponential
+backoff, finished jobs notify an optional callback URL (signed with
+HMAC-SHA256, private network targets refused) and results are kept for a
+configurable TTL
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, Any, Callable, Iterable, Tuple
+from urllib.parse import urlsplit
+from app.util.smart_ai_client import smart_ai_client
+from app.util.priority_scheduler import request_priority
+from app.util.token_budget import current_endpoint
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    callback_url TEXT,
+    callback_status TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    next_attempt_at REAL NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_hash ON jobs (kind, request_hash);
+"""
+
+TERMINAL = ("succeeded", "failed", "cancelled")
+
+
+class DegradedResult(Exception):
+    """
+    Raised by a handler whose result is a fallback (AI provider unavailable)
+
+    The job is retried like any failure; if every attempt degrades it finishes
+    as failed with the fallback attached as its result. Failed jobs are never
+    reused for identical submissions, so a fallback is not served from the queue.
+    """
+
+    def __init__(self, result: Any, reason: str):
+        super().__init__(reason)
+        self.result = result
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Refuse redirects, so an accepted callback host cannot bounce the POST to an internal one"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_CALLBACK_OPENER = urllib.request.build_opener(_NoRedirect)
+
+
+class JobQueue:
+    """SQLite-backed queue with a worker thread pool"""
+
+    def __init__(self, client, db_path: str, attachment_dir: str, workers: int = 4, max_attempts: int = 3,
+                 retry_base_seconds: float = 5.0, result_ttl_hours: float = 24, poll_seconds: float = 1.0,
+                 webhook_secret: Optional[str] = None, callback_allowed_hosts: Iterable[str] = ()):
+        """
+        Initialize job queue
+
+        Args:
+            client: SmartAIClient, consulted for provider load before a job starts
+            db_path: SQLite file holding jobs and results
+            attachment_dir: Directory for uploaded files referenced by queued jobs
+            workers: Worker threads draining the queue
+            max_attempts: Tries per job before it is marked failed
+            retry_base_seconds: First retry delay (doubles on every attempt)
+            result_ttl_hours: How long finished jobs and their results are kept
+            poll_seconds: Idle worker poll interval (submissions wake a worker immediately)
+            webhook_secret: Key for the X-Signature-256 HMAC on callbacks (unsigned when empty)
+            callback_allowed_hosts: Hosts that may receive callbacks; when empty, any host
+                that resolves only to public addresses is accepted
+        """
+        self.client = client
+        self.db_path = db_path
+        self.attachment_dir = attachment_dir
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.result_ttl_seconds = result_ttl_hours * 3600
+        self.poll_seconds = poll_seconds
+        self.webhook_secret = webhook_secret.encode() if webhook_secret else None
+        self.callback_allowed_hosts = {host.strip().lower() for host in callback_allowed_hosts if host.strip()}
+        if not self.webhook_secret:
+            log.warning("jobs.webhook_unsigned", reason="JOB_WEBHOOK_SECRET not set")
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(attachment_dir, exist_ok=True)
+
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._local = threading.local()
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self._last_purge = 0.0
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not shareable by default)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any]):
+        """Route jobs of a kind to handler(payload) -> JSON-serializable result"""
+        self.handlers[kind] = handler
+
+    # ------------------------------------------------------------------
+    # Submission and polling
+    # ------------------------------------------------------------------
+
+    def submit(self, kind: str, payload: Dict[str, Any], callback_url: Optional[str] = None,
+               attachment: Optional[Tuple[bytes, str]] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue a job, or return the live job for an identical request
+
+        Args:
+            kind: Registered job kind
+            payload: Handler input (JSON-serializable)
+            callback_url: http(s) URL that receives the finished job as a POST
+            attachment: (file bytes, suffix) stored for the handler as payload["attachment_path"]
+
+        Returns:
+            (job status, True if an existing job was returned)
+
+        Raises:
+            ValueError: For an unknown kind or a callback URL that is not allowed
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        if callback_url:
+            self.check_callback_url(callback_url)
+
+        digest = hashlib.sha256(kind.encode())
+        digest.update(json.dumps(payload, sort_keys=True, default=str).encode())
+        if attachment:
+            digest.update(attachment[0])
+        request_hash = digest.hexdigest()
+
+        now = time.time()
+        conn = self._conn()
+        existing = conn.execute(
+            "SELECT job_id FROM jobs WHERE kind = ? AND request_hash = ? AND status IN ('queued', 'running', 'succeeded') "
+            "AND (expires_at IS NULL OR expires_at > ?) ORDER BY created_at DESC LIMIT 1",
+            (kind, request_hash, now)
+        ).fetchone()
+        if existing:
+            metrics.inc("jobs_submitted_total", kind=kind, deduplicated="true")
+            return self.get(existing["job_id"]), True
+
+        job_id = uuid.uuid4().hex[:16]
+        if attachment:
+            path = os.path.join(self.attachment_dir, f"{job_id}{attachment[1]}")
+            with open(path, "wb") as f:
+                f.write(attachment[0])
+            payload = {**payload, "attachment_path": path}
+        conn.execute(
+            "INSERT INTO jobs (job_id, kind, request_hash, payload, status, callback_url, created_at, next_attempt_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, request_hash, json.dumps(payload, default=str), callback_url, now, now)
+        )
+        metrics.inc("jobs_submitted_total", kind=kind, deduplicated="false")
+        log.info("jobs.submitted", job_id=job_id, kind=kind, callback=bool(callback_url))
+        with self._wake:
+            self._wake.notify()
+        return self.get(job_id), False
+
+    def check_callback_url(self, url: str):
+        """
+        Refuse callback targets inside our network
+
+        With an allow-list the host must be on it; otherwise every address the host
+        resolves to must be public (not private, loopback, link-local or reserved).
+
+        Raises:
+            ValueError: If the URL is not http(s) or its host is not allowed
+        """
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if parts.scheme not in ("http", "https") or not host:
+            raise ValueError("callback_url must be an http(s) URL")
+        if self.callback_allowed_hosts:
+            if host not in self.callback_allowed_hosts:
+                raise ValueError(f"callback_url host {host!r} is not allowed")
+            return
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or None, proto=socket.IPPROTO_TCP)}
+        except (socket.gaierror, UnicodeError, ValueError):
+            raise ValueError(f"callback_url host {host!r} does not resolve")
+        for address in addresses:
+            ip = ipaddress.ip_address(address.split("%")[0])
+            if getattr(ip, "ipv4_mapped", None):
+                ip = ip.ipv4_mapped
+            if not ip.is_global or ip.is_multicast:
+                raise ValueError(f"callback_url host {host!r} resolves to a non-public address")
+
+    def sign(self, body: bytes, timestamp: str) -> Optional[str]:
+        """X-Signature-256 value: "sha256=" + HMAC of "<timestamp>.<body>" (None without a secret)"""
+        if not self.webhook_secret:
+            return None
+        return "sha256=" + hmac.new(self.webhook_secret, timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status, with the result once it has succeeded or degraded (None if unknown or expired)"""
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None or (row["expires_at"] and row["expires_at"] <= time.time()):
+            return None
+        job = {
+            "job_id": row["job_id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "created_at": _timestamp(row["created_at"]),
+            "started_at": _timestamp(row["started_at"]),
+            "finished_at": _timestamp(row["finished_at"]),
+            "expires_at": _timestamp(row["expires_at"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "callback": row["callback_status"] if row["callback_url"] else None
+        }
+        if row["status"] == "queued":
+            job["queue_position"] = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (row["created_at"],)
+            ).fetchone()[0] + 1
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ?, expires_at = ? WHERE job_id = ? AND status = 'queued'",
+            (now, now + self.result_ttl_seconds, job_id)
+        )
+        if cursor.rowcount:
+            self._remove_attachment(job_id)
+        return cursor.rowcount > 0
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Requeue jobs interrupted by a restart and start the worker pool"""
+        if self._threads:
+            return
+        requeued = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', next_attempt_at = ? WHERE status = 'running'", (time.time(),)
+        ).rowcount
+        if requeued:
+            log.warning("jobs.requeued_after_restart", jobs=requeued)
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._work, daemon=True, name=f"job-worker-{i}")
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        log.info("jobs.workers_started", workers=self.workers)
+
+    def stop(self):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                # Leave jobs queued while providers are over the background SLO,
+                # rather than running them into degraded fallback answers
+                wait = self.client.admission.estimated_wait(self.client.active_limiters(), "background")
+                if wait > self.client.admission.slo("background"):
+                    self._stop.wait(min(wait, 10))
+                    continue
+                job = self._claim()
+                if job is None:
+                    self._purge_expired()
+                    with self._wake:
+                        self._wake.wait(self.poll_seconds)
+                    continue
+                self._execute(job)
+            except Exception as e:
+                log.error("jobs.worker_error", error=str(e))
+                self._stop.wait(self.poll_seconds)
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Atomically move the oldest due job to running"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND next_attempt_at <= ? ORDER BY created_at LIMIT 1", (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 "
+                             "WHERE job_id = ?", (now, row["job_id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is not None:
+            metrics.observe("stage_duration_seconds", now - row["created_at"], stage="job_queue_wait")
+        return row
+
+    def _execute(self, row: sqlite3.Row):
+        job_id, kind, attempt = row["job_id"], row["kind"], row["attempts"] + 1
+        start = time.perf_counter()
+        token = current_endpoint.set(f"job:{kind}")
+        try:
+            # Jobs are asynchronous by design: yield provider slots to live requests
+            with request_priority("background"):
+                result = self.handlers[kind](json.loads(row["payload"]))
+            self._finish(job_id, "succeeded", result=json.dumps(result, ensure_ascii=False, default=str))
+            metrics.inc("jobs_completed_total", kind=kind, outcome="succeeded")
+            log.info("jobs.succeeded", job_id=job_id, kind=kind, attempt=attempt,
+                     elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
+        except Exception as e:
+            if attempt < self.max_attempts:
+                delay = self.retry_base_seconds * 2 ** (attempt - 1)
+                self._conn().execute("UPDATE jobs SET status = 'queued', error = ?, next_attempt_at = ? WHERE job_id = ?",
+                                     (str(e), time.time() + delay, job_id))
+                metrics.inc("jobs_retries_total", kind=kind)
+                log.warning("jobs.retry_scheduled", job_id=job_id, kind=kind, attempt=attempt,
+                            delay_seconds=delay, error=str(e))
+                return
+            fallback = json.dumps(e.result, ensure_ascii=False, default=str) if isinstance(e, DegradedResult) else None
+            self._finish(job_id, "failed", result=fallback, error=str(e))
+            metrics.inc("jobs_completed_total", kind=kind, outcome="failed")
+            log.error("jobs.failed", job_id=job_id, kind=kind, attempts=attempt, error=str(e))
+        finally:
+            current_endpoint.reset(token)
+            metrics.record_stage("job_run", start, kind=kind)
+
+        if row["callback_url"]:
+            self._notify(job_id, row["callback_url"])
+
+    def _finish(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None):
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, expires_at = ? WHERE job_id = ?",
+            (status, result, error, now, now + self.result_ttl_seconds, job_id)
+        )
+        self._remove_attachment(job_id)
+
+    def _notify(self, job_id: str, url: str, attempts: int = 3):
+        """POST the finished job to its callback URL, retrying transient failures"""
+        body = json.dumps(self.get(job_id), ensure_ascii=False, default=str).encode()
+        status = "failed"
+        for attempt in range(attempts):
+            # Checked again on every try: DNS may have changed since submission
+            try:
+                self.check_callback_url(url)
+            except ValueError as e:
+                status = "rejected"
+                log.warning("jobs.callback_rejected", job_id=job_id, error=str(e))
+                break
+            timestamp = str(int(time.time()))
+            headers = {"Content-Type": "application/json", "X-Job-Id": job_id, "X-Webhook-Timestamp": timestamp}
+            signature = self.sign(body, timestamp)
+            if signature:
+                headers["X-Signature-256"] = signature
+            request = urllib.request.Request(url, data=body, method="POST", headers=headers)
+            try:
+                with _CALLBACK_OPENER.open(request, timeout=5) as response:
+                    if 200 <= response.status < 300:
+                        status = "delivered"
+                        break
+            except (urllib.error.URLError, OSError) as e:
+                log.warning("jobs.callback_failed", job_id=job_id, attempt=attempt + 1, error=str(e))
+            self._stop.wait(2 ** attempt)
+        self._conn().execute("UPDATE jobs SET callback_status = ? WHERE job_id = ?", (status, job_id))
+        metrics.inc("jobs_callbacks_total", outcome=status)
+
+    def _remove_attachment(self, job_id: str):
+        row = self._conn().execute("SELECT payload FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        path = json.loads(row["payload"]).get("attachment_path") if row else None
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def _purge_expired(self, interval: float = 60.0):
+        """Drop finished jobs past their TTL (at most once per interval)"""
+        now = time.time()
+        if now - self._last_purge < interval:
+            return
+        self._last_purge = now
+        purged = self._conn().execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)).rowcount
+        if purged:
+            log.info("jobs.purged", jobs=purged)
+
+    def get_stats(self) -> dict:
+        counts = dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": len(self._threads),
+            "kinds": sorted(self.handlers),
+            "jobs": {status: counts.get(status, 0) for status in ("queued", "running") + TERMINAL},
+            "result_ttl_hours": self.result_ttl_seconds / 3600,
+            "max_attempts": self.max_attempts
+        }
+
+
+# Singleton instance
+job_queue = JobQueue(
+    smart_ai_client,
+    db_path=os.getenv("JOB_QUEUE_DB_PATH", os.path.join("data", "jobs.db")),
+    attachment_dir=os.getenv("JOB_ATTACHMENT_DIR", os.path.join("temp_uploads", "jobs")),
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+    result_ttl_hours=float(os.getenv("JOB_RESULT_TTL_HOURS", "24")),
+    webhook_secret=os.getenv("JOB_WEBHOOK_SECRET"),
+    callback_allowed_hosts=os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",")
+)
+
+metrics.register_gauge(
+    "jobs_queued",
+    lambda: job_queue.get_stats()["jobs"]["queued"],
+    "Jobs waiting for a worker"
+)
+
+
+if __name__ == "__main__":
+    # AI_PROVIDER=mock python -m app.services.job_queue
+    def slow_echo(payload):
+        time.sleep(0.2)
+        if payload.get("fail"):
+            raise RuntimeError("simulated failure")
+        return {"echo": payload["text"]}
+
+    job_queue.register("echo", slow_echo)
+    job_queue.retry_base_seconds = 0.1
+    job_queue.start()
+    submitted = [job_queue.submit("echo", {"text": f"job {i % 5}"}) for i in range(10)]
+    failing, _ = job_queue.submit("echo", {"text": "bad", "fail": True})
+    print(f"Submitted 11, deduplicated {sum(dup for _, dup in submitted)}")
+    time.sleep(2)
+    for job, _ in submitted[:5] + [(failing, False)]:
+        status = job_queue.get(job["job_id"])
+        print(status["job_id"], status["status"], status["attempts"], status["result"] or status["error"])
+    print(job_queue.get_stats())
+    job_queue.stop()
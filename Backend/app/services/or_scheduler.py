@@ -0,0 +1,361 @@
+"""
+OR Scheduler - Operating theatre scheduling engine
+Packs surgeries into theatres with best-fit placement over a per-theatre
+sorted interval index (bisect), and tracks conflicts, overruns and
+utilization incrementally as cases are added or cancelled
+"""
+
+import bisect
+import itertools
+import os
+import threading
+import time
+from datetime import date
+from typing import Optional, Dict, List, Any, Tuple
+import numpy as np
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+# Surgery type -> (mean duration, std) in minutes
+SURGERY_TYPES = {
+    "General": (90, 20),
+    "Orthopedic": (120, 30),
+    "Cardiac": (240, 45),
+    "Emergency": (60, 20),
+}
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class Case:
+    """One booked surgery"""
+
+    __slots__ = ("case_id", "surgery_type", "duration", "earliest", "theatre", "start")
+
+    def __init__(self, case_id: str, surgery_type: str, duration: int, earliest: int = 0):
+        self.case_id = case_id
+        self.surgery_type = surgery_type
+        self.duration = duration
+        self.earliest = earliest
+        self.theatre: Optional[int] = None
+        self.start: Optional[int] = None
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + self.duration
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "case_id": self.case_id,
+            "type": self.surgery_type,
+            "theatre": self.theatre,
+            "start": _clock(self.start) if self.start is not None else None,
+            "end": _clock(self.end) if self.start is not None else None,
+            "duration_mins": self.duration
+        }
+
+
+class Theatre:
+    """
+    Sorted, non-overlapping interval index for one theatre
+
+    Intervals are held as parallel sorted lists of starts and (end incl.
+    turnover, case_id), so gap search and neighbour checks are bisects.
+    """
+
+    def __init__(self, theatre_id: int, opens: int, closes: int):
+        self.theatre_id = theatre_id
+        self.opens = opens
+        self.closes = closes
+        self.starts: List[int] = []
+        self.slots: List[Tuple[int, str]] = []
+        self.booked_minutes = 0
+
+    def gaps(self, earliest: int = 0):
+        """Yield free (start, end) windows at or after earliest; the last one is open-ended"""
+        cursor = max(self.opens, earliest)
+        i = bisect.bisect_right(self.starts, cursor)
+        # An interval starting before cursor may still cover it
+        if i > 0 and self.slots[i - 1][0] > cursor:
+            cursor = self.slots[i - 1][0]
+        for start, (end, _) in zip(self.starts[i:], self.slots[i:]):
+            if start > cursor:
+                yield cursor, start
+            cursor = max(cursor, end)
+        yield cursor, None
+
+    def overlaps(self, start: int, end: int) -> List[str]:
+        """Case ids whose intervals intersect [start, end)"""
+        i = bisect.bisect_left(self.starts, end)
+        hits = []
+        j = i - 1
+        while j >= 0 and self.slots[j][0] > start:
+            hits.append(self.slots[j][1])
+            j -= 1
+        return hits
+
+    def insert(self, start: int, end: int, case_id: str, minutes: int):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.slots.insert(i, (end, case_id))
+        self.booked_minutes += minutes
+
+    def remove(self, start: int, case_id: str, minutes: int):
+        i = bisect.bisect_left(self.starts, start)
+        while self.slots[i][1] != case_id:
+            i += 1
+        del self.starts[i]
+        del self.slots[i]
+        self.booked_minutes -= minutes
+
+    @property
+    def last_end(self) -> int:
+        return max((end for end, _ in self.slots), default=self.opens)
+
+
+class ORScheduler:
+    """
+    Best-fit theatre packing with incremental conflict/overrun tracking
+    """
+
+    def __init__(self, theatres: int = 6, opens: int = 8 * 60, closes: int = 20 * 60, turnover: int = 30):
+        """
+        Initialize OR scheduler
+
+        Args:
+            theatres: Number of operating theatres
+            opens: Opening time in minutes after midnight
+            closes: Scheduled closing time in minutes after midnight
+            turnover: Cleaning/setup minutes required after each case
+        """
+        self.opens = opens
+        self.closes = closes
+        self.turnover = turnover
+        self.theatres = [Theatre(i + 1, opens, closes) for i in range(theatres)]
+        self.cases: Dict[str, Case] = {}
+        self.overruns: Dict[str, int] = {}   # case_id -> minutes past closing
+        self.conflicts: Dict[str, List[str]] = {}  # case_id -> overlapping case ids
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.day: Optional[date] = None
+
+    def add_case(self, surgery_type: str, duration: int, earliest: int = 0,
+                 case_id: Optional[str] = None) -> Case:
+        """
+        Place a case in the theatre gap that leaves the least slack
+
+        Falls back to the theatre that frees up first, which creates an
+        overrun past closing time.
+
+        Args:
+            surgery_type: Surgery category
+            duration: Procedure minutes
+            earliest: Earliest start in minutes after midnight (e.g. emergency arrival)
+            case_id: Optional id (generated if omitted)
+
+        Returns:
+            The booked Case
+        """
+        start_clock = time.perf_counter()
+        case = Case(case_id or f"OR-{next(self._ids):04d}", surgery_type, int(duration), int(earliest))
+        need = case.duration + self.turnover
+
+        with self.lock:
+            best = None  # (slack, start, theatre)
+            fallback = None  # (start, theatre)
+            for theatre in self.theatres:
+                for gap_start, gap_end in theatre.gaps(case.earliest):
+                    if gap_end is None:
+                        if fallback is None or gap_start < fallback[0]:
+                            fallback = (gap_start, theatre)
+                        limit = self.closes
+                    else:
+                        limit = gap_end
+                    slack = limit - gap_start - need
+                    if slack >= 0 and (best is None or (slack, gap_start) < best[:2]):
+                        best = (slack, gap_start, theatre)
+                    if gap_start + need > self.closes:
+                        break
+
+            start, theatre = (best[1], best[2]) if best else fallback
+            self._book(case, theatre, start)
+
+        metrics.record_stage("or_scheduling", start_clock)
+        return case
+
+    def book(self, surgery_type: str, duration: int, theatre_id: int, start: int,
+             case_id: Optional[str] = None) -> Case:
+        """
+        Book a case at a fixed theatre and time (manual override), recording any conflicts
+
+        Args:
+            surgery_type: Surgery category
+            duration: Procedure minutes
+            theatre_id: 1-based theatre number
+            start: Start in minutes after midnight
+            case_id: Optional id
+
+        Returns:
+            The booked Case
+        """
+        case = Case(case_id or f"OR-{next(self._ids):04d}", surgery_type, int(duration), int(start))
+        with self.lock:
+            self._book(case, self.theatres[theatre_id - 1], int(start))
+        return case
+
+    def _book(self, case: Case, theatre: Theatre, start: int):
+        end = start + case.duration + self.turnover
+        clashes = theatre.overlaps(start, end)
+        if clashes:
+            self.conflicts[case.case_id] = clashes
+            for other in clashes:
+                self.conflicts.setdefault(other, []).append(case.case_id)
+            log.warning("or.conflict", case_id=case.case_id, theatre=theatre.theatre_id, overlaps=clashes)
+
+        theatre.insert(start, end, case.case_id, case.duration)
+        case.theatre, case.start = theatre.theatre_id, start
+        self.cases[case.case_id] = case
+        if case.end > self.closes:
+            self.overruns[case.case_id] = case.end - self.closes
+
+    def cancel_case(self, case_id: str) -> bool:
+        """
+        Remove a case and clear the conflicts/overruns it caused
+
+        Returns:
+            False if the case id is unknown
+        """
+        with self.lock:
+            case = self.cases.pop(case_id, None)
+            if case is None:
+                return False
+            self.theatres[case.theatre - 1].remove(case.start, case_id, case.duration)
+            self.overruns.pop(case_id, None)
+            for other in self.conflicts.pop(case_id, []):
+                remaining = [c for c in self.conflicts.get(other, []) if c != case_id]
+                if remaining:
+                    self.conflicts[other] = remaining
+                else:
+                    self.conflicts.pop(other, None)
+            return True
+
+    def schedule_day(self, cases: List[Tuple[str, int, int]], day: Optional[date] = None):
+        """
+        Replace the schedule with a batch, longest cases first (best-fit decreasing)
+
+        Args:
+            cases: (surgery_type, duration, earliest) tuples
+            day: Date the schedule is for
+        """
+        with self.lock:
+            for theatre in self.theatres:
+                theatre.starts.clear()
+                theatre.slots.clear()
+                theatre.booked_minutes = 0
+            self.cases.clear()
+            self.overruns.clear()
+            self.conflicts.clear()
+            self.day = day
+        for surgery_type, duration, earliest in sorted(cases, key=lambda c: (-c[1], c[2])):
+            self.add_case(surgery_type, duration, earliest)
+
+    def generate_cases(self, counts: Dict[str, int], seed: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """
+        Demo case list: durations drawn per type, emergencies arriving through the day
+
+        Args:
+            counts: Surgery type -> number of cases
+            seed: Random seed
+
+        Returns:
+            (surgery_type, duration, earliest) tuples
+        """
+        rng = np.random.default_rng(seed)
+        cases = []
+        for surgery_type, count in counts.items():
+            mean, std = SURGERY_TYPES.get(surgery_type, (90, 20))
+            durations = np.clip(rng.normal(mean, std, count), 30, None).round(-1).astype(int)
+            if surgery_type == "Emergency":
+                earliest = rng.integers(self.opens, self.closes - 60, count) // 15 * 15
+            else:
+                earliest = np.full(count, self.opens)
+            cases += [(surgery_type, int(d), int(e)) for d, e in zip(durations, earliest)]
+        return cases
+
+    def utilization(self) -> Dict[str, Any]:
+        """Per-theatre and overall utilization, overruns and conflicts"""
+        with self.lock:
+            available = self.closes - self.opens
+            per_theatre = [
+                {
+                    "theatre": t.theatre_id,
+                    "cases": len(t.slots),
+                    "booked_minutes": t.booked_minutes,
+                    "utilization": round(100 * min(t.booked_minutes, available) / available, 1),
+                    "finishes": _clock(t.last_end)
+                }
+                for t in self.theatres
+            ]
+            booked = sum(t.booked_minutes for t in self.theatres)
+            return {
+                "day": self.day.isoformat() if self.day else None,
+                "theatres": len(self.theatres),
+                "cases": len(self.cases),
+                "overall_utilization": round(100 * booked / (available * len(self.theatres)), 1),
+                "overruns": [{"case_id": c, "minutes_over": m} for c, m in sorted(self.overruns.items())],
+                "conflicts": len(self.conflicts),
+                "per_theatre": per_theatre
+            }
+
+    def schedule(self) -> List[Dict[str, Any]]:
+        """All booked cases ordered by theatre and start time"""
+        with self.lock:
+            return [case.to_dict() for case in sorted(self.cases.values(), key=lambda c: (c.theatre, c.start))]
+
+    def type_summary(self) -> List[Dict[str, Any]]:
+        """Cases per surgery type with average duration, in the dashboard's surgery_schedule shape"""
+        with self.lock:
+            by_type: Dict[str, List[int]] = {name: [] for name in SURGERY_TYPES}
+            for case in self.cases.values():
+                by_type.setdefault(case.surgery_type, []).append(case.duration)
+        return [
+            {"type": name, "count": len(durations),
+             "avg_duration_mins": int(round(sum(durations) / len(durations))) if durations else SURGERY_TYPES.get(name, (0, 0))[0]}
+            for name, durations in by_type.items()
+        ]
+
+    def prompt_summary(self) -> str:
+        """Compact text for the hospital prompt"""
+        u = self.utilization()
+        busiest = max(u["per_theatre"], key=lambda t: t["booked_minutes"], default=None)
+        lines = [f"{u['cases']} cases across {u['theatres']} theatres, {u['overall_utilization']}% utilized"]
+        if busiest:
+            lines.append(f"Busiest: theatre {busiest['theatre']} ({busiest['utilization']}%, finishes {busiest['finishes']})")
+        worst = sorted(u["overruns"], key=lambda o: -o["minutes_over"])[:5]
+        lines.append(f"Overruns past {_clock(self.closes)}: {len(u['overruns'])}" + (
+            " (worst: " + ", ".join(f"{o['case_id']} +{o['minutes_over']}m" for o in worst) + ")" if worst else ""))
+        lines.append(f"Conflicting bookings: {u['conflicts']}")
+        return "\n".join(lines)
+
+
+# Singleton instance
+or_scheduler = ORScheduler(theatres=int(os.getenv("OR_THEATRES", "6")))
+
+
+if __name__ == "__main__":
+    scheduler = ORScheduler(theatres=24)
+    cases = scheduler.generate_cases({"General": 50, "Orthopedic": 30, "Cardiac": 10, "Emergency": 25}, seed=3)
+    t0 = time.perf_counter()
+    scheduler.schedule_day(cases)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    print(f"Packed {len(cases)} cases into {len(scheduler.theatres)} theatres in {elapsed_ms:.2f} ms")
+    print(scheduler.prompt_summary())
+
+    t0 = time.perf_counter()
+    extra = scheduler.add_case("Emergency", 90, earliest=14 * 60)
+    scheduler.cancel_case(extra.case_id)
+    print(f"Incremental add + cancel: {(time.perf_counter() - t0) * 1000:.3f} ms")
@@ -0,0 +1,151 @@
+"""
+Timeline Index - Incrementally sorted per-user medical event index
+Keeps events ordered on insert (bisect over integer YYYYMMDD dates) with
+per-type sub-indexes, so range, type and cursor-paged queries never
+re-sort a user's history
+"""
+
+import base64
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+# Sort key: (YYYYMMDD date, event id) - unique per user and totally ordered
+Key = Tuple[int, str]
+
+
+class UserTimeline:
+    """Sorted event keys (oldest first) plus a sub-index per event type"""
+
+    __slots__ = ("keys", "items", "by_type", "ids")
+
+    def __init__(self):
+        self.keys: List[Key] = []
+        self.items: Dict[Key, Dict[str, Any]] = {}
+        self.by_type: Dict[str, List[Key]] = {}
+        self.ids: Dict[str, Key] = {}
+
+    def insert(self, day: int, event_id: str, event_type: str, item: Dict[str, Any]):
+        """Add or replace an event in O(log n) search + list insert"""
+        key = (day, event_id)
+        self.remove(event_id)
+        bisect.insort(self.keys, key)
+        bisect.insort(self.by_type.setdefault(event_type, []), key)
+        self.items[key] = item
+        self.ids[event_id] = key
+
+    def remove(self, event_id: str) -> bool:
+        """Drop an event by id (ids are unique per user)"""
+        key = self.ids.pop(event_id, None)
+        if key is None:
+            return False
+        item = self.items.pop(key)
+        self.keys.pop(bisect.bisect_left(self.keys, key))
+        typed = self.by_type[item["type"]]
+        typed.pop(bisect.bisect_left(typed, key))
+        return True
+
+    def query(self, start: Optional[int] = None, end: Optional[int] = None,
+              event_type: Optional[str] = None, limit: Optional[int] = None,
+              cursor: Optional[Key] = None) -> Tuple[List[Dict[str, Any]], Optional[Key], int]:
+        """
+        Newest-first page of events within [start, end]
+
+        Args:
+            start: Earliest YYYYMMDD (inclusive)
+            end: Latest YYYYMMDD (inclusive)
+            event_type: Restrict to one type
+            limit: Page size (None for everything)
+            cursor: Key of the last event on the previous page
+
+        Returns:
+            Tuple of (items, next cursor key or None, total matches in range)
+        """
+        keys = self.by_type.get(event_type, []) if event_type else self.keys
+
+        lo = bisect.bisect_left(keys, (start, "")) if start is not None else 0
+        hi = bisect.bisect_right(keys, (end, "\uffff")) if end is not None else len(keys)
+        total = max(0, hi - lo)
+
+        # Resume strictly before (older than) the cursor
+        page_hi = min(hi, bisect.bisect_left(keys, cursor)) if cursor is not None else hi
+        page_lo = max(lo, page_hi - limit) if limit is not None else lo
+
+        page = [self.items[k] for k in reversed(keys[page_lo:page_hi])]
+        next_key = keys[page_lo] if page_lo > lo and page else None
+        return page, next_key, total
+
+
+class TimelineIndex:
+    """
+    LRU of per-user timelines, loaded on first use and updated incrementally
+    """
+
+    def __init__(self, loader: Callable[[str], List[tuple]], max_users: int = 5000):
+        """
+        Initialize timeline index
+
+        Args:
+            loader: user_id -> [(date, event_id, type, item)] used to build a user's index once
+            max_users: Users kept in memory
+        """
+        self.loader = loader
+        self.max_users = max_users
+        self.timelines: "OrderedDict[str, UserTimeline]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, user_id: str) -> UserTimeline:
+        with self.lock:
+            timeline = self.timelines.get(user_id)
+            if timeline is not None:
+                self.timelines.move_to_end(user_id)
+                return timeline
+
+        timeline = UserTimeline()
+        for day, event_id, event_type, item in self.loader(user_id):
+            timeline.insert(day, event_id, event_type, item)
+
+        with self.lock:
+            self.loads += 1
+            self.timelines[user_id] = timeline
+            while len(self.timelines) > self.max_users:
+                self.timelines.popitem(last=False)
+        return timeline
+
+    def add(self, user_id: str, day: int, event_id: str, event_type: str, item: Dict[str, Any]):
+        """Apply a newly written event to a loaded index (unloaded users pick it up on load)"""
+        with self.lock:
+            timeline = self.timelines.get(user_id)
+            if timeline is not None:
+                timeline.insert(day, event_id, event_type, item)
+
+    def query(self, user_id: str, **kwargs):
+        timeline = self.get(user_id)
+        with self.lock:
+            return timeline.query(**kwargs)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "users_loaded": len(self.timelines),
+                "events_indexed": sum(len(t.keys) for t in self.timelines.values()),
+                "loads": self.loads
+            }
+
+
+def encode_cursor(key: Optional[Key]) -> Optional[str]:
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(f"{key[0]}:{key[1]}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Key:
+    """
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    day, event_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+    return int(day), event_id
@@ -0,0 +1,285 @@
+"""
+Time-Series Store - In-process columnar storage for hospital metrics
+One fixed-capacity NumPy ring buffer per (metric, department) with integer
+timestamps, range queries, downsampling and aggregates
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Tuple, List
+import numpy as np
+from app.services.forecasting_service import forecasting_service, hour_index, HOURS_PER_WEEK
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+SECONDS_PER_HOUR = 3600
+# Bucket widths in seconds; week buckets start on Monday (the epoch was a Thursday)
+BUCKETS = {"hour": 3600, "day": 86400, "week": 604800}
+_BUCKET_OFFSETS = {"hour": 0, "day": 0, "week": 3 * 86400}
+
+AGGREGATES = ("sum", "mean", "min", "max", "count", "last")
+
+
+def to_timestamp(moment: datetime) -> int:
+    """Wall-clock seconds since the epoch for a naive local datetime"""
+    return hour_index(moment) * SECONDS_PER_HOUR + moment.minute * 60 + moment.second
+
+
+def from_timestamp(timestamp: int) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(seconds=int(timestamp))
+
+
+class RingSeries:
+    """
+    Fixed-capacity series of (int64 timestamp, float64 value)
+
+    Appends must be in non-decreasing timestamp order; once full, the
+    oldest points are overwritten.
+    """
+
+    __slots__ = ("capacity", "timestamps", "values", "head", "size")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.head = 0  # next write position
+        self.size = 0
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.timestamps[(self.head - 1) % self.capacity]) if self.size else None
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray):
+        """Append points in bulk (timestamps must be sorted and after the last point)"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if len(timestamps) == 0:
+            return
+        last = self.last_timestamp
+        if last is not None and timestamps[0] < last:
+            raise ValueError("Timestamps must be appended in order")
+
+        if len(timestamps) > self.capacity:
+            timestamps, values = timestamps[-self.capacity:], values[-self.capacity:]
+
+        n = len(timestamps)
+        positions = (self.head + np.arange(n)) % self.capacity
+        self.timestamps[positions] = timestamps
+        self.values[positions] = values
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.capacity, self.size + n)
+
+    def ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps and values oldest-first (views when the buffer has not wrapped)"""
+        if self.size < self.capacity:
+            return self.timestamps[:self.size], self.values[:self.size]
+        return (np.concatenate((self.timestamps[self.head:], self.timestamps[:self.head])),
+                np.concatenate((self.values[self.head:], self.values[:self.head])))
+
+    def range(self, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Points with start <= timestamp < end via binary search"""
+        timestamps, values = self.ordered()
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="left"))
+        return timestamps[lo:hi], values[lo:hi]
+
+
+class TimeSeriesStore:
+    """
+    Registry of ring-buffered metric series keyed by (metric, department)
+    """
+
+    def __init__(self, capacity: int = 8 * HOURS_PER_WEEK):
+        """
+        Initialize time-series store
+
+        Args:
+            capacity: Points retained per series (default 8 weeks of hourly data)
+        """
+        self.capacity = capacity
+        self.series: Dict[Tuple[str, str], RingSeries] = {}
+        self.lock = threading.Lock()
+
+    def _series(self, metric: str, department: Optional[str], create: bool = False) -> Optional[RingSeries]:
+        key = (metric, department or "all")
+        series = self.series.get(key)
+        if series is None and create:
+            with self.lock:
+                series = self.series.setdefault(key, RingSeries(self.capacity))
+        return series
+
+    def record(self, metric: str, timestamp: int, value: float, department: Optional[str] = None):
+        """
+        Append one point
+
+        Args:
+            metric: Metric name, e.g. opd_visits
+            timestamp: Integer seconds since the epoch
+            value: Observed value
+            department: Optional department dimension
+        """
+        self.record_many(metric, np.array([timestamp]), np.array([value]), department)
+
+    def record_many(self, metric: str, timestamps: np.ndarray, values: np.ndarray,
+                    department: Optional[str] = None):
+        """Append a sorted batch of points to one series"""
+        series = self._series(metric, department, create=True)
+        with self.lock:
+            series.extend(timestamps, values)
+
+    def range(self, metric: str, start: Optional[int] = None, end: Optional[int] = None,
+              department: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Raw points in [start, end)
+
+        Returns:
+            Tuple of (int64 timestamps, float64 values); empty if the series is unknown
+        """
+        series = self._series(metric, department)
+        if series is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        with self.lock:
+            timestamps, values = series.range(start, end)
+            return timestamps.copy(), values.copy()
+
+    def downsample(self, metric: str, bucket: str = "day", agg: str = "sum",
+                   start: Optional[int] = None, end: Optional[int] = None,
+                   department: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Aggregate points into hour/day/week buckets
+
+        Args:
+            metric: Metric name
+            bucket: One of hour, day, week
+            agg: One of sum, mean, min, max, count, last
+            start: Inclusive start timestamp
+            end: Exclusive end timestamp
+            department: Optional department dimension
+
+        Returns:
+            Tuple of (bucket start timestamps, aggregated values)
+        """
+        if bucket not in BUCKETS or agg not in AGGREGATES:
+            raise ValueError(f"Unsupported bucket/aggregate: {bucket}/{agg}")
+
+        timestamps, values = self.range(metric, start, end, department)
+        if len(timestamps) == 0:
+            return timestamps, values
+
+        width, offset = BUCKETS[bucket], _BUCKET_OFFSETS[bucket]
+        bucket_ids = (timestamps + offset) // width
+        # Timestamps are sorted, so bucket ids are too: run starts mark each bucket
+        starts = np.flatnonzero(np.concatenate(([True], bucket_ids[1:] != bucket_ids[:-1])))
+        bucket_starts = bucket_ids[starts] * width - offset
+
+        if agg == "sum":
+            result = np.add.reduceat(values, starts)
+        elif agg == "mean":
+            result = np.add.reduceat(values, starts) / np.diff(np.append(starts, len(values)))
+        elif agg == "min":
+            result = np.minimum.reduceat(values, starts)
+        elif agg == "max":
+            result = np.maximum.reduceat(values, starts)
+        elif agg == "count":
+            result = np.diff(np.append(starts, len(values))).astype(np.float64)
+        else:
+            result = values[np.append(starts[1:], len(values)) - 1]
+        return bucket_starts, result
+
+    def aggregate(self, metric: str, agg: str = "sum", start: Optional[int] = None,
+                  end: Optional[int] = None, department: Optional[str] = None) -> float:
+        """Single aggregate over [start, end)"""
+        _, values = self.range(metric, start, end, department)
+        if len(values) == 0:
+            return 0.0
+        if agg == "count":
+            return float(len(values))
+        if agg == "last":
+            return float(values[-1])
+        return float(getattr(np, agg)(values))
+
+    def hourly_series(self, metric: str, start_hour: int, end_hour: int,
+                      department: Optional[str] = None) -> np.ndarray:
+        """
+        Dense hourly array for [start_hour, end_hour) hour indices, zero-filled
+
+        Used as forecaster input.
+        """
+        timestamps, values = self.range(metric, start_hour * SECONDS_PER_HOUR,
+                                        end_hour * SECONDS_PER_HOUR, department)
+        dense = np.zeros(end_hour - start_hour, dtype=np.float64)
+        np.add.at(dense, timestamps // SECONDS_PER_HOUR - start_hour, values)
+        return dense
+
+    def last_timestamp(self, metric: str, department: Optional[str] = None) -> Optional[int]:
+        series = self._series(metric, department)
+        return series.last_timestamp if series else None
+
+    def departments(self, metric: str) -> List[str]:
+        return sorted(dept for name, dept in self.series if name == metric and dept != "all")
+
+    def seed_synthetic(self, now: Optional[datetime] = None, hours: int = 4 * HOURS_PER_WEEK):
+        """
+        Fill the store with synthetic hourly history up to the current hour
+
+        Only the hours after each series' last point are generated, so this
+        is also used to roll the demo data forward.
+
+        Args:
+            now: Current time (default: now)
+            hours: History to generate for empty series
+        """
+        end = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+        end_hour = hour_index(end)
+
+        for metric, department, profile in SYNTHETIC_STREAMS:
+            last = self.last_timestamp(metric, department)
+            missing = hours if last is None else end_hour - (last // SECONDS_PER_HOUR + 1)
+            if missing <= 0:
+                continue
+            start_hour, values = forecasting_service.synthetic_history(end=end, hours=min(missing, self.capacity),
+                                                                       **profile)
+            timestamps = (start_hour + np.arange(len(values), dtype=np.int64)) * SECONDS_PER_HOUR
+            self.record_many(metric, timestamps, values, department)
+
+    def get_stats(self) -> dict:
+        """Get series count and points retained"""
+        with self.lock:
+            return {
+                "series": len(self.series),
+                "points": int(sum(s.size for s in self.series.values())),
+                "capacity_per_series": self.capacity,
+                "bytes": int(sum(s.timestamps.nbytes + s.values.nbytes for s in self.series.values()))
+            }
+
+
+# (metric, department, synthetic_history kwargs) for the demo hospital
+SYNTHETIC_STREAMS = [
+    ("opd_visits", None, {"base": 18, "peak_boost": 30}),
+    ("er_arrivals", None, {"base": 3, "peak_hours": (19, 20, 21, 22), "peak_boost": 3}),
+    ("department_patients", "Cardiology", {"base": 14, "peak_boost": 14}),
+    ("department_patients", "Orthopedics", {"base": 12, "peak_boost": 12}),
+    ("department_patients", "Pediatrics", {"base": 18, "peak_boost": 15}),
+    ("department_patients", "Emergency", {"base": 16, "peak_hours": (19, 20, 21, 22), "peak_boost": 10}),
+    ("department_patients", "General", {"base": 20, "peak_boost": 18}),
+]
+
+
+# Singleton instance
+timeseries_store = TimeSeriesStore(capacity=int(os.getenv("TIMESERIES_CAPACITY_HOURS", str(8 * HOURS_PER_WEEK))))
+
+
+if __name__ == "__main__":
+    import time
+
+    timeseries_store.seed_synthetic()
+    t0 = time.perf_counter()
+    days, totals = timeseries_store.downsample("opd_visits", bucket="day", agg="sum")
+    weeks, weekly = timeseries_store.downsample("opd_visits", bucket="week", agg="mean")
+    print(f"Downsampled {timeseries_store.get_stats()['points']} points in {(time.perf_counter() - t0) * 1000:.2f} ms")
+    for ts, total in list(zip(days, totals))[-7:]:
+        print(from_timestamp(ts).strftime("%a %d %b"), int(total))
+    print("Weekly mean per hour:", np.round(weekly, 1))
@@ -0,0 +1,734 @@
+"""
+User Health Repository - SQLite-backed per-user health records
+Builds dashboard sections lazily from indexed vitals/events tables and
+caches each (user, section) independently so endpoints only pay for the
+sections they return
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from typing import Optional, Dict, Any, List, Iterable, Callable, Tuple
+import numpy as np
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+from app.services.timeline_index import TimelineIndex
+from app.services.health_scoring import health_scoring_engine, SCORING_METRICS, RISK_TIERS
+
+log = get_logger(__name__)
+
+SECTIONS = (
+    "user_profile", "vitals", "health_score", "diagnostics", "treatments",
+    "appointments", "mental_health", "timeline", "health_trends", "alerts",
+)
+
+# Event kinds that appear on the medical timeline
+TIMELINE_KINDS = ("diagnostic", "treatment", "appointment", "therapy")
+
+# Days of synthetic vitals generated for a new user
+HISTORY_DAYS = 90
+
+# Days of vitals loaded for scoring: anomaly baseline plus the latest day
+SCORING_DAYS = health_scoring_engine.baseline_window + 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vitals (
+    user_id TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vitals_user_date ON vitals (user_id, date);
+CREATE TABLE IF NOT EXISTS events (
+    user_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (user_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS idx_events_user_date ON events (user_id, date);
+"""
+
+
+def date_to_int(day: date) -> int:
+    """2024-03-09 -> 20240309"""
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def int_to_date(value: int) -> date:
+    return date(value // 10000, value // 100 % 100, value % 100)
+
+
+def format_date(value: int) -> str:
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
+
+
+class UserHealthRepository:
+    """
+    Per-user health data store with section-level lazy loading
+    """
+
+    def __init__(self, db_path: str, cache_ttl_seconds: int = 300, cache_max_entries: int = 2000):
+        """
+        Initialize repository
+
+        Args:
+            db_path: SQLite database file
+            cache_ttl_seconds: Lifetime of a cached (user, section)
+            cache_max_entries: LRU bound on cached sections
+        """
+        self.db_path = db_path
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_max_entries = cache_max_entries
+
+        self._local = threading.local()
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._seed_lock = threading.Lock()
+        self._known_users: set = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.timelines = TimelineIndex(self._timeline_rows)
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+        self._builders: Dict[str, Callable[[str], Any]] = {
+            "user_profile": self._build_profile,
+            "vitals": self._build_vitals,
+            "health_score": self._build_health_score,
+            "diagnostics": self._build_diagnostics,
+            "treatments": self._build_treatments,
+            "appointments": self._build_appointments,
+            "mental_health": self._build_mental_health,
+            "timeline": self._build_timeline,
+            "health_trends": self._build_health_trends,
+            "alerts": self._build_alerts,
+        }
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not shareable by default)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get_sections(self, user_id: str, sections: Iterable[str] = SECTIONS) -> Dict[str, Any]:
+        """
+        Fetch only the requested dashboard sections for a user
+
+        Args:
+            user_id: User identifier
+            sections: Section names (see SECTIONS)
+
+        Returns:
+            Dict mapping section name to its data
+
+        Raises:
+            KeyError: For an unknown section name
+        """
+        self.ensure_user(user_id)
+        return {section: self.section(user_id, section) for section in sections}
+
+    def section(self, user_id: str, name: str) -> Any:
+        """One section, from cache or built from the database"""
+        builder = self._builders[name]
+        key = (user_id, name)
+        now = time.time()
+
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] > now:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                metrics.inc("cache_hits_total", cache="user_health")
+                return entry[0]
+
+        self.misses += 1
+        metrics.inc("cache_misses_total", cache="user_health")
+        with metrics.timer("user_section_build", section=name):
+            value = builder(user_id)
+
+        with self._cache_lock:
+            self._cache[key] = (value, now + self.cache_ttl_seconds)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id: str, sections: Optional[Iterable[str]] = None):
+        """Drop cached sections for a user (all sections by default)"""
+        with self._cache_lock:
+            for name in (sections or SECTIONS):
+                self._cache.pop((user_id, name), None)
+
+    def add_event(self, user_id: str, event_id: str, day: date, kind: str, payload: Dict[str, Any]):
+        """
+        Insert or replace a medical event
+
+        Args:
+            user_id: User identifier
+            event_id: Event id, unique per user
+            day: Event date
+            kind: diagnostic, treatment, appointment or therapy
+            payload: Event fields
+        """
+        self.ensure_user(user_id)
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO events (user_id, event_id, date, kind, payload) VALUES (?, ?, ?, ?, ?)",
+                         (user_id, event_id, date_to_int(day), kind, json.dumps(payload)))
+        if kind in TIMELINE_KINDS:
+            item = timeline_item({"kind": kind, "date": date_to_int(day), **payload})
+            self.timelines.add(user_id, date_to_int(day), event_id, item["type"], item)
+        self.invalidate(user_id, ("diagnostics", "treatments", "appointments", "mental_health", "timeline", "alerts"))
+
+    def timeline(self, user_id: str, start: Optional[date] = None, end: Optional[date] = None,
+                 event_type: Optional[str] = None, limit: Optional[int] = None,
+                 cursor: Optional[tuple] = None) -> tuple:
+        """
+        Newest-first timeline page from the incremental index
+
+        Args:
+            user_id: User identifier
+            start: Earliest date (inclusive)
+            end: Latest date (inclusive, default today so upcoming appointments are excluded)
+            event_type: diagnostic, treatment, appointment or mental_health
+            limit: Page size
+            cursor: Key returned with the previous page
+
+        Returns:
+            Tuple of (items, next cursor key or None, total matches)
+        """
+        self.ensure_user(user_id)
+        return self.timelines.query(
+            user_id,
+            start=date_to_int(start) if start else None,
+            end=date_to_int(end or date.today()),
+            event_type=event_type,
+            limit=limit,
+            cursor=cursor
+        )
+
+    def record_vitals(self, user_id: str, day: date, readings: Dict[str, float]):
+        """Append one day's readings (metric -> value)"""
+        self.ensure_user(user_id)
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT INTO vitals (user_id, date, metric, value) VALUES (?, ?, ?, ?)",
+                             [(user_id, date_to_int(day), metric, float(value)) for metric, value in readings.items()])
+        self.invalidate(user_id, ("vitals", "health_score", "mental_health", "health_trends"))
+
+    def population_risk(self, tier: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        Risk-stratify every stored patient in one scoring batch
+
+        Args:
+            tier: Only list patients in this tier (low/moderate/high)
+            limit: Number of highest-risk patients to list
+
+        Returns:
+            Dict with user count, tier counts, highest-risk patients and compute time
+        """
+        start = time.perf_counter()
+        user_ids, _, result = self.score_population()
+
+        order = np.argsort(-result["risk"], kind="stable")
+        if tier is not None:
+            order = order[result["tier"][order] == tier]
+
+        patients = []
+        for i in order[:limit].tolist():
+            patients.append({
+                "user_id": user_ids[i],
+                "risk_score": float(result["risk"][i]),
+                "tier": str(result["tier"][i]),
+                "overall_score": float(result["scores"]["overall"][i]),
+                "bmi": float(result["bmi"][i]),
+                "anomalies": health_scoring_engine.flagged_metrics(result, i),
+                "systolic_slope": round(float(result["slopes"]["systolic"][i]), 2)
+            })
+
+        return {
+            "total_users": len(user_ids),
+            "counts": {str(name): int((result["tier"] == name).sum()) for name in RISK_TIERS},
+            "patients": patients,
+            "compute_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def score_population(self, user_ids: Optional[List[str]] = None) -> Tuple[List[str], List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Score many users in one batch
+
+        Args:
+            user_ids: Users to score (default: every stored user)
+
+        Returns:
+            Tuple of (user ids, profiles, health_scoring_engine.evaluate result) in matching order
+        """
+        user_ids, profiles, series = self._cohort(user_ids)
+        heights = np.array([profile["height_cm"] for profile in profiles], dtype=np.float64)
+        return user_ids, profiles, health_scoring_engine.evaluate(series, heights)
+
+    def ensure_population(self, count: int):
+        """Seed synthetic patients USER001..USER<count> that do not exist yet"""
+        for i in range(1, count + 1):
+            self.ensure_user(f"USER{i:03d}")
+
+    def list_users(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT user_id FROM users ORDER BY user_id")]
+
+    def get_stats(self) -> dict:
+        """Get cache and table statistics"""
+        conn = self._conn()
+        return {
+            "db_path": self.db_path,
+            "users": conn.execute("SELECT COUNT(*) FROM users").fetchone()[0],
+            "cached_sections": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / (self.hits + self.misses) * 100, 2) if self.hits + self.misses else 0,
+            "timeline_index": self.timelines.get_stats()
+        }
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _vitals(self, user_id: str, metrics_: Iterable[str], since: Optional[int] = None) -> Dict[str, tuple]:
+        """metric -> (int dates array, values array) using the (user_id, date) index"""
+        metric_list = list(metrics_)
+        placeholders = ",".join("?" * len(metric_list))
+        query = f"SELECT metric, date, value FROM vitals WHERE user_id = ? AND date >= ? AND metric IN ({placeholders}) ORDER BY date"
+        rows = self._conn().execute(query, (user_id, since or 0, *metric_list)).fetchall()
+
+        grouped: Dict[str, tuple] = {m: ([], []) for m in metric_list}
+        for metric, day, value in rows:
+            grouped[metric][0].append(day)
+            grouped[metric][1].append(value)
+        return {m: (np.array(d, dtype=np.int64), np.array(v, dtype=np.float64)) for m, (d, v) in grouped.items()}
+
+    def _cohort(self, user_ids: Optional[List[str]] = None,
+                days: int = SCORING_DAYS) -> Tuple[List[str], List[Dict[str, Any]], Dict[str, np.ndarray]]:
+        """
+        Scoring vitals for many users as (users x days) matrices in one query
+
+        Args:
+            user_ids: Users to load (default: every stored user)
+            days: Days ending today
+
+        Returns:
+            Tuple of (user ids, profiles, metric -> matrix with NaN for missing days)
+        """
+        axis = np.array([date_to_int(date.today() - timedelta(days=i)) for i in range(days - 1, -1, -1)])
+        metric_list = list(SCORING_METRICS)
+        user_filter, params = "", []
+        if user_ids is not None:
+            user_filter = f"user_id IN ({','.join('?' * len(user_ids))})"
+            params = list(user_ids)
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT user_id, metric, date, value FROM vitals WHERE {user_filter + ' AND ' if user_filter else ''}"
+            f"date >= ? AND date <= ? AND metric IN ({','.join('?' * len(metric_list))})",
+            (*params, int(axis[0]), int(axis[-1]), *metric_list)
+        ).fetchall()
+        profiles = conn.execute(
+            f"SELECT user_id, profile FROM users {'WHERE ' + user_filter if user_filter else ''} ORDER BY user_id",
+            params
+        ).fetchall()
+
+        users = [user_id for user_id, _ in profiles]
+        matrices = np.full((len(metric_list), len(users), days), np.nan)
+        if rows:
+            user_col, metric_col, date_col, value_col = zip(*rows)
+            u = np.searchsorted(users, user_col)
+            m = np.array([metric_list.index(metric) for metric in metric_col])
+            d = np.searchsorted(axis, date_col)
+            # Later rows for the same day win, like the newest reading
+            matrices[m, u, d] = value_col
+        return users, [json.loads(profile) for _, profile in profiles], dict(zip(metric_list, matrices))
+
+    def _score(self, user_id: str) -> Dict[str, Any]:
+        """Scoring result for one user (row 0 of a one-user batch)"""
+        return self.score_population([user_id])[2]
+
+    def _events(self, user_id: str, kinds: Iterable[str], descending: bool = True) -> List[Dict[str, Any]]:
+        kind_list = list(kinds)
+        placeholders = ",".join("?" * len(kind_list))
+        order = "DESC" if descending else "ASC"
+        rows = self._conn().execute(
+            f"SELECT event_id, date, kind, payload FROM events WHERE user_id = ? AND kind IN ({placeholders}) "
+            f"ORDER BY date {order}, event_id {order}",
+            (user_id, *kind_list)
+        ).fetchall()
+        return [{"id": event_id, "date": day, "kind": kind, **json.loads(payload)} for event_id, day, kind, payload in rows]
+
+    @staticmethod
+    def _since(days: int) -> int:
+        return date_to_int(date.today() - timedelta(days=days))
+
+    # ------------------------------------------------------------------
+    # Section builders
+    # ------------------------------------------------------------------
+
+    def _build_profile(self, user_id: str) -> Dict[str, Any]:
+        row = self._conn().execute("SELECT profile FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0])
+
+    def _build_vitals(self, user_id: str) -> Dict[str, Any]:
+        series = self._vitals(user_id, ("heart_rate", "systolic", "diastolic", "temperature",
+                                        "oxygen_saturation", "blood_glucose"), since=self._since(6))
+        hr_days, hr = series["heart_rate"]
+        bp_days, systolic = series["systolic"]
+        _, diastolic = series["diastolic"]
+
+        score = self._score(user_id)
+        bmi = float(score["bmi"][0])
+        return {
+            "heart_rate": {
+                "current": int(hr[-1]),
+                "unit": "bpm",
+                "status": "normal" if 60 <= hr[-1] <= 100 else "attention",
+                "trend": score["trends"]["heart_rate"][0],
+                "history": [{"date": format_date(d), "value": int(v)} for d, v in zip(hr_days.tolist(), hr.tolist())]
+            },
+            "blood_pressure": {
+                "systolic": int(systolic[-1]),
+                "diastolic": int(diastolic[-1]),
+                "unit": "mmHg",
+                "status": "normal" if systolic[-1] < 130 and diastolic[-1] < 85 else "attention",
+                "trend": score["trends"]["systolic"][0],
+                "history": [{"date": format_date(d), "systolic": int(s), "diastolic": int(di)}
+                            for d, s, di in zip(bp_days.tolist(), systolic.tolist(), diastolic.tolist())]
+            },
+            "temperature": {
+                "current": round(float(series["temperature"][1][-1]), 1),
+                "unit": "°F",
+                "status": "normal" if series["temperature"][1][-1] < 99.5 else "attention"
+            },
+            "oxygen_saturation": {
+                "current": int(series["oxygen_saturation"][1][-1]),
+                "unit": "%",
+                "status": "normal" if series["oxygen_saturation"][1][-1] >= 95 else "attention"
+            },
+            "bmi": {
+                "value": bmi,
+                "category": str(score["bmi_category"][0]),
+                "status": "normal" if 18.5 <= bmi < 25 else "attention"
+            },
+            "blood_glucose": {
+                "current": int(series["blood_glucose"][1][-1]),
+                "unit": "mg/dL",
+                "status": "normal" if series["blood_glucose"][1][-1] < 100 else "attention",
+                "fasting": True
+            }
+        }
+
+    def _build_health_score(self, user_id: str) -> Dict[str, Any]:
+        score = self._score(user_id)
+        scores = score["scores"]
+        return {
+            "overall": float(scores["overall"][0]),
+            "vitals": int(scores["vitals"][0]),
+            "mental": int(scores["mental"][0]),
+            "lifestyle": int(scores["lifestyle"][0]),
+            "risk": {
+                "score": float(score["risk"][0]),
+                "tier": str(score["tier"][0]),
+                "anomalies": health_scoring_engine.flagged_metrics(score, 0)
+            },
+            "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _build_diagnostics(self, user_id: str) -> List[Dict[str, Any]]:
+        return [
+            {**{k: v for k, v in event.items() if k not in ("kind", "date")}, "date": format_date(event["date"])}
+            for event in self._events(user_id, ("diagnostic",))
+        ]
+
+    def _build_treatments(self, user_id: str) -> List[Dict[str, Any]]:
+        now = datetime.now()
+        treatments = []
+        for event in self._events(user_id, ("treatment",)):
+            started = int_to_date(event["date"])
+            days_completed = min(event["duration_days"], (now.date() - started).days)
+            treatments.append({
+                "id": event["id"],
+                "medication": event["medication"],
+                "dosage": event["dosage"],
+                "frequency": event["frequency"],
+                "start_date": format_date(event["date"]),
+                "duration_days": event["duration_days"],
+                "days_completed": days_completed,
+                "adherence": event["adherence"],
+                "next_dose": (now + timedelta(hours=8)).strftime("%Y-%m-%d %H:%M"),
+                "purpose": event["purpose"],
+                "status": "active" if days_completed < event["duration_days"] else "completed"
+            })
+        return treatments
+
+    def _build_appointments(self, user_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        today = date_to_int(date.today())
+        upcoming, past = [], []
+        for event in self._events(user_id, ("appointment",), descending=False):
+            item = {**{k: v for k, v in event.items() if k not in ("kind", "date")}, "date": format_date(event["date"])}
+            (upcoming if event["date"] >= today else past).append(item)
+        past.reverse()
+        return {"upcoming": upcoming, "past": past}
+
+    def _build_mental_health(self, user_id: str) -> Dict[str, Any]:
+        series = self._vitals(user_id, ("mood_score", "mindfulness_minutes"), since=self._since(6))
+        mood_days, mood = series["mood_score"]
+        sessions = self._events(user_id, ("therapy",))
+        return {
+            "wellness_score": self.section(user_id, "health_score")["mental"],
+            "mood_logs": [
+                {"date": format_date(d), "mood": self._mood_label(v), "score": int(v)}
+                for d, v in zip(mood_days.tolist(), mood.tolist())
+            ],
+            "therapy_sessions": [
+                {"date": format_date(s["date"]), "therapist": s["therapist"], "type": s["type"],
+                 "duration_mins": s["duration_mins"], "notes": s["notes"]}
+                for s in sessions
+            ],
+            "mindfulness_minutes": int(series["mindfulness_minutes"][1].sum()),
+            "last_session": format_date(sessions[0]["date"]) if sessions else None
+        }
+
+    @staticmethod
+    def _mood_label(score: float) -> str:
+        return "Great" if score >= 9 else ("Good" if score >= 8 else ("Okay" if score >= 7 else "Low"))
+
+    def _build_timeline(self, user_id: str) -> List[Dict[str, Any]]:
+        items, _, _ = self.timeline(user_id)
+        # Appointments booked for later today are not history yet
+        return [item for item in items if item["status"] != "scheduled"]
+
+    def _timeline_rows(self, user_id: str) -> List[tuple]:
+        """Index loader: every timeline event for a user, read once via the (user_id, date) index"""
+        return [
+            (event["date"], event["id"], item["type"], item)
+            for event in self._events(user_id, TIMELINE_KINDS, descending=False)
+            for item in (timeline_item(event),)
+        ]
+
+    def _build_health_trends(self, user_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        series = self._vitals(user_id, ("weight", "systolic", "activity_minutes", "sleep_hours"), since=self._since(29))
+        trends = {}
+        for name, metric in (("weight", "weight"), ("blood_pressure_systolic", "systolic"),
+                             ("activity_minutes", "activity_minutes"), ("sleep_hours", "sleep_hours")):
+            days, values = series[metric]
+            # Every third day, ending on the latest reading
+            days, values = days[::-1][::3][::-1], values[::-1][::3][::-1]
+            trends[name] = [
+                {"date": format_date(d), "value": round(v, 1) if metric in ("weight", "sleep_hours") else int(v)}
+                for d, v in zip(days.tolist(), values.tolist())
+            ]
+        return trends
+
+    def _build_alerts(self, user_id: str) -> List[Dict[str, Any]]:
+        diagnostics = self.section(user_id, "diagnostics")
+        appointments = self.section(user_id, "appointments")
+        treatments = self.section(user_id, "treatments")
+
+        alerts = []
+        if any(d["type"] == "Blood Test - Complete Panel" and d["status"] == "attention" for d in diagnostics):
+            alerts.append({
+                "type": "attention",
+                "title": "Vitamin D Levels Low",
+                "message": "Your recent blood test showed low Vitamin D. Continue taking supplements as prescribed.",
+                "action": "View Results",
+                "priority": "medium"
+            })
+        if appointments["upcoming"]:
+            next_apt = appointments["upcoming"][0]
+            alerts.append({
+                "type": "info",
+                "title": "Upcoming Appointment",
+                "message": f"You have an appointment with {next_apt['doctor']} on {next_apt['date']} at {next_apt['time']}",
+                "action": "View Details",
+                "priority": "high"
+            })
+        if any(t["adherence"] < 80 for t in treatments):
+            alerts.append({
+                "type": "warning",
+                "title": "Medication Adherence",
+                "message": "Remember to take your medications on time for best results.",
+                "action": "Set Reminder",
+                "priority": "medium"
+            })
+        return alerts
+
+    # ------------------------------------------------------------------
+    # Synthetic seeding
+    # ------------------------------------------------------------------
+
+    def ensure_user(self, user_id: str):
+        """Create a synthetic record set the first time a user is seen"""
+        if user_id in self._known_users:
+            return
+        with self._seed_lock:
+            if user_id in self._known_users:
+                return
+            exists = self._conn().execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if not exists:
+                self._seed_user(user_id)
+            self._known_users.add(user_id)
+
+    def _seed_user(self, user_id: str):
+        start = time.perf_counter()
+        seed = int(hashlib.sha256(user_id.encode()).hexdigest()[:8], 16)
+        rng = np.random.default_rng(seed)
+        today = date.today()
+
+        profile = synthetic_profile(user_id, rng)
+        # Population patients get their own baselines so risk spans low to high; the demo user keeps the defaults
+        baseline = {} if user_id == "USER001" else synthetic_baseline(rng)
+        days = [date_to_int(today - timedelta(days=i)) for i in range(HISTORY_DAYS - 1, -1, -1)]
+        n = len(days)
+        daily = {
+            "heart_rate": rng.integers(65, 86, n),
+            "systolic": rng.integers(110, 131, n),
+            "diastolic": rng.integers(70, 86, n),
+            "temperature": np.round(rng.uniform(97.5, 98.8, n), 1),
+            "oxygen_saturation": rng.integers(96, 101, n),
+            "blood_glucose": rng.integers(80, 111, n),
+            "weight": np.round(profile["weight_kg"] + rng.uniform(-1, 1, n), 1),
+            "activity_minutes": rng.integers(20, 61, n),
+            "sleep_hours": np.round(rng.uniform(6.5, 8.5, n), 1),
+            "mood_score": rng.integers(6, 11, n),
+            "mindfulness_minutes": rng.integers(0, 45, n),
+        }
+        for metric, offset in baseline.items():
+            daily[metric] = daily[metric] + offset
+        if baseline and rng.random() < 0.05:
+            daily["systolic"][-1] += 35  # Acute reading on the latest day
+        vitals_rows = [(user_id, day, metric, float(value))
+                       for metric, values in daily.items() for day, value in zip(days, values.tolist())]
+
+        event_rows = [
+            (user_id, event_id, date_to_int(today + timedelta(days=offset)), kind, json.dumps(payload))
+            for event_id, offset, kind, payload in synthetic_events()
+        ]
+
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT INTO users (user_id, profile, created_at) VALUES (?, ?, ?)",
+                         (user_id, json.dumps(profile), datetime.now().isoformat(timespec="seconds")))
+            conn.executemany("INSERT INTO vitals (user_id, date, metric, value) VALUES (?, ?, ?, ?)", vitals_rows)
+            conn.executemany("INSERT INTO events (user_id, event_id, date, kind, payload) VALUES (?, ?, ?, ?, ?)", event_rows)
+        log.info("user_health.seeded", user_id=user_id, vitals=len(vitals_rows), events=len(event_rows),
+                 elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
+
+
+def timeline_item(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Timeline entry for a stored diagnostic/treatment/appointment/therapy event"""
+    kind = event["kind"]
+    day = format_date(event["date"])
+    if kind == "diagnostic":
+        return {"date": day, "type": "diagnostic", "title": event["type"],
+                "description": event["ai_summary"][:100] + "...", "status": event["status"], "icon": "🔬"}
+    if kind == "treatment":
+        return {"date": day, "type": "treatment", "title": f"Started {event['medication']}",
+                "description": f"{event['dosage']} - {event['frequency']}", "status": "active", "icon": "💊"}
+    if kind == "appointment":
+        return {"date": day, "type": "appointment", "title": f"{event['type']} - {event['doctor']}",
+                "description": event.get("notes", ""),
+                "status": "completed" if event["date"] < date_to_int(date.today()) else "scheduled", "icon": "📅"}
+    return {"date": day, "type": "mental_health", "title": event["type"],
+            "description": event["notes"], "status": "completed", "icon": "🧠"}
+
+
+_NAMES = ["Alex Johnson", "Priya Sharma", "Rahul Deshmukh", "Maria Garcia", "Chen Wei", "Aisha Khan",
+          "Liam Brown", "Sneha Patil", "Omar Hassan", "Emma Wilson"]
+
+
+def synthetic_profile(user_id: str, rng: np.random.Generator) -> Dict[str, Any]:
+    if user_id == "USER001":
+        return {"user_id": user_id, "name": "Alex Johnson", "age": 35, "gender": "Male",
+                "blood_group": "A+", "height_cm": 175, "weight_kg": 75}
+    return {
+        "user_id": user_id,
+        "name": _NAMES[int(rng.integers(len(_NAMES)))],
+        "age": int(rng.integers(18, 80)),
+        "gender": str(rng.choice(["Male", "Female"])),
+        "blood_group": str(rng.choice(["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"])),
+        "height_cm": int(rng.integers(150, 190)),
+        "weight_kg": int(rng.integers(50, 95))
+    }
+
+
+def synthetic_baseline(rng: np.random.Generator) -> Dict[str, Any]:
+    """Per-patient offsets added to the default vitals ranges"""
+    return {
+        "heart_rate": int(rng.integers(-5, 16)),
+        "systolic": int(rng.choice([0, 0, 5, 10, 20, 30])),
+        "blood_glucose": int(rng.choice([0, 0, 10, 25, 45])),
+        "sleep_hours": round(float(rng.uniform(-1.5, 0.3)), 1),
+        "activity_minutes": int(rng.integers(-20, 1)),
+    }
+
+
+def synthetic_events() -> List[tuple]:
+    """(event_id, day offset from today, kind, payload) for the demo record"""
+    return [
+        ("DX003", -5, "diagnostic", {
+            "type": "Chest X-Ray",
+            "ai_summary": "No abnormalities detected. Lungs are clear with no signs of infection or inflammation.",
+            "status": "normal", "doctor": "Dr. Sarah Mitchell", "department": "Radiology", "image_available": True}),
+        ("DX002", -15, "diagnostic", {
+            "type": "Blood Test - Complete Panel",
+            "ai_summary": "All values within normal range. Cholesterol levels are healthy. Vitamin D slightly low - consider supplementation.",
+            "status": "attention", "doctor": "Dr. James Wilson", "department": "Laboratory",
+            "results": {"Hemoglobin": "14.5 g/dL", "WBC": "7,200/μL", "Cholesterol": "180 mg/dL", "Vitamin D": "22 ng/mL"}}),
+        ("DX001", -45, "diagnostic", {
+            "type": "ECG",
+            "ai_summary": "Normal sinus rhythm. No arrhythmias detected. Heart function is normal.",
+            "status": "normal", "doctor": "Dr. Emily Chen", "department": "Cardiology"}),
+        ("TX002", -10, "treatment", {
+            "medication": "Vitamin D3", "dosage": "2000 IU", "frequency": "Once daily",
+            "duration_days": 90, "adherence": 90, "purpose": "Vitamin D deficiency"}),
+        ("TX001", -60, "treatment", {
+            "medication": "Multivitamin", "dosage": "1 tablet", "frequency": "Once daily",
+            "duration_days": 365, "adherence": 95, "purpose": "General wellness"}),
+        ("APT002", 7, "appointment", {
+            "time": "10:30 AM", "doctor": "Dr. Sarah Mitchell", "department": "Radiology", "type": "Follow-up",
+            "reason": "Review X-ray results", "location": "Building A, Room 203"}),
+        ("APT003", 30, "appointment", {
+            "time": "2:00 PM", "doctor": "Dr. James Wilson", "department": "General Medicine", "type": "Routine Checkup",
+            "reason": "Quarterly health review", "location": "Building B, Room 105"}),
+        ("APT001", -15, "appointment", {
+            "time": "11:00 AM", "doctor": "Dr. James Wilson", "department": "Laboratory", "type": "Blood Test",
+            "notes": "Routine blood work completed. Results reviewed."}),
+        ("TH001", -10, "therapy", {
+            "therapist": "Dr. Lisa Anderson", "type": "Cognitive Behavioral Therapy", "duration_mins": 50,
+            "notes": "Discussed stress management techniques"}),
+    ]
+
+
+# Singleton instance
+user_health_repository = UserHealthRepository(
+    db_path=os.getenv("USER_HEALTH_DB_PATH", os.path.join("data", "user_health.db")),
+    cache_ttl_seconds=int(os.getenv("USER_HEALTH_CACHE_TTL_SECONDS", "300"))
+)
@@ -3,11 +3,17 @@ Vertex AI Service - Handles all Vertex AI interactions
 Includes Vision API for medical imaging and Forecasting for hospital operations
 """
 import os
+from datetime import datetime
 from typing import Optional, Dict, Any
+import numpy as np
 from dotenv import load_dotenv
+from app.util.logger import get_logger
+from app.services.forecasting_service import forecasting_service, hour_index
 
 load_dotenv()
 
+log = get_logger(__name__)
+
 # Vertex AI imports
 try:
     from google.cloud import aiplatform
@@ -17,7 +23,7 @@ try:
     VERTEX_AI_AVAILABLE = True
 except ImportError:
     VERTEX_AI_AVAILABLE = False
-    print("WARNING: Vertex AI SDK not installed. Using fallback mode.")
+    log.warning("vertex.sdk_missing", mode="fallback")
 
 
 class VertexAIService:
@@ -32,21 +38,21 @@ class VertexAIService:
         credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
         if credentials_path and os.path.exists(credentials_path):
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
-            print(f"✅ Using credentials from: {credentials_path}")
+            log.info("vertex.credentials", source="service_account_file", path=credentials_path)
         else:
-            print("ℹ️ Using Application Default Credentials (ADC)")
+            log.info("vertex.credentials", source="adc")
         
         if VERTEX_AI_AVAILABLE and self.project_id != "your-gcp-project-id":
             try:
                 vertexai.init(project=self.project_id, location=self.location)
                 self.vision_model = ImageTextModel.from_pretrained("imagetext@001")
                 self.initialized = True
-                print(f"✅ Vertex AI initialized: {self.project_id}")
+                log.info("vertex.initialized", project=self.project_id)
             except Exception as e:
-                print(f"⚠️ Vertex AI initialization failed: {e}")
+                log.warning("vertex.init_failed", error=str(e))
                 self.initialized = False
         else:
-            print("⚠️ Vertex AI not configured. Using Gemini fallback.")
+            log.warning("vertex.unavailable", reason="not configured", fallback="gemini")
     
     def analyze_medical_image(self, image_path: str, prompt: str) -> Dict[str, Any]:
         """
@@ -87,27 +93,35 @@ class VertexAIService:
                 "message": "Vertex AI Vision failed. Use Gemini fallback."
             }
     
-    def forecast_patient_load(self, historical_data: list) -> Dict[str, Any]:
-        """
-        Forecast patient load using Vertex AI Forecasting
-        Falls back to simulated data if not available
+    def forecast_patient_load(self, historical_data: list, start_index: Optional[int] = None,
+                              horizon: int = 24, open_hours: tuple = (8, 20)) -> Dict[str, Any]:
         """
-        if not self.initialized:
-            return {
-                "success": False,
-                "forecast": None,
-                "fallback": True,
-                "message": "Vertex AI not configured. Using simulated forecasting."
-            }
+        Forecast hourly patient load
+        Vertex AI Forecasting is not wired up yet, so this always serves the
+        local Holt-Winters engine
         
+        Args:
+            historical_data: Hourly counts, oldest first, as numbers or dicts
+                with a 'visitors', 'arrivals', 'patients' or 'value' key
+            start_index: Hour index of the first point (default: series ends at the current hour)
+            horizon: Hours to forecast
+            open_hours: Hours of day considered for rush detection
+        """
         try:
-            # In production, this would use Vertex AI Forecasting API
-            # For MVP, we acknowledge the architecture but use simulation
+            values = historical_data if isinstance(historical_data, np.ndarray) else np.asarray([
+                point if isinstance(point, (int, float)) else
+                next(point[key] for key in ("visitors", "arrivals", "patients", "value") if key in point)
+                for point in historical_data
+            ], dtype=np.float64)
+            values = values.astype(np.float64, copy=False)
+            if start_index is None:
+                start_index = hour_index(datetime.now()) - len(values)
+            
             return {
-                "success": False,
-                "forecast": None,
-                "fallback": True,
-                "message": "Vertex AI Forecasting integration pending. Using simulation."
+                "success": True,
+                "forecast": forecasting_service.forecast_summary(values, start_index, horizon, open_hours),
+                "fallback": not self.initialized,
+                "source": "Local Holt-Winters"
             }
         except Exception as e:
             return {
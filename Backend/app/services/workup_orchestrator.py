@@ -0,0 +1,373 @@
+"""
+Workup Orchestrator - Concurrent agent DAG for a full patient workup
+Runs diagnosis -> treatment alongside the mental-health check and the
+dashboard insights on a shared worker pool, streaming each node's result
+as soon as it finishes, so end-to-end latency follows the critical path
+instead of the sum of all agent calls
+"""
+
+import base64
+import binascii
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+from app.prompts.schemas import RISK_LEVELS
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.agents.treatment_agent import TreatmentAgent
+from app.agents.user_health_agent import UserHealthAgent
+from app.agents.mental_health_agent import MentalHealthAgent
+
+log = get_logger(__name__)
+
+UPLOAD_DIR = Path("temp_uploads")
+
+# Leading bytes of the image formats the vision providers accept
+IMAGE_SIGNATURES = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff", b"GIF87a", b"GIF89a", b"BM", b"II*\x00", b"MM\x00*")
+
+# Mental-health risk levels mapped onto the shared Low/Medium/High scale
+MENTAL_RISK = {"LOW": "Low", "MODERATE": "Medium", "HIGH": "High", "CRITICAL": "High"}
+
+
+class TaskNode:
+    """One unit of work in the graph: fn(inputs, dependency results) -> result"""
+
+    __slots__ = ("name", "fn", "deps")
+
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any], Dict[str, Any]], Any], deps: tuple = ()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+class TaskGraph:
+    """Dependency-ordered execution of TaskNodes on a thread pool"""
+
+    def __init__(self, nodes: List[TaskNode]):
+        self.nodes = {node.name: node for node in nodes}
+        for node in nodes:
+            missing = [dep for dep in node.deps if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"Node {node.name} depends on unknown nodes: {missing}")
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        state: Dict[str, int] = {}
+
+        def visit(name: str):
+            if state.get(name) == 1:
+                raise ValueError(f"Cycle through node {name}")
+            if state.get(name) == 2:
+                return
+            state[name] = 1
+            for dep in self.nodes[name].deps:
+                visit(dep)
+            state[name] = 2
+
+        for name in self.nodes:
+            visit(name)
+
+    def run(self, executor: ThreadPoolExecutor, inputs: Dict[str, Any],
+            on_settled: Optional[Callable[[], None]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Execute every node as soon as its dependencies are done
+
+        A failed node reports its error; dependents still run and receive
+        None for it, so each agent decides how to degrade.
+
+        Args:
+            executor: Shared worker pool
+            inputs: Request data passed to every node
+            on_settled: Called once no node of this run is executing any more,
+                including after the consumer stops early (client disconnect)
+
+        Yields:
+            "node_started" and "node_completed"/"node_failed" events in
+            completion order, then "complete" with critical path and timing totals
+        """
+        start = time.perf_counter()
+        results: Dict[str, Any] = {}
+        durations: Dict[str, float] = {}
+        pending = dict(self.nodes)
+        running = {}
+
+        try:
+            while pending or running:
+                for name, node in list(pending.items()):
+                    if all(dep in results for dep in node.deps):
+                        del pending[name]
+                        deps = {dep: results[dep] for dep in node.deps}
+                        # Copy the request context so per-endpoint token accounting follows the task
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, _timed, node.fn, inputs, deps)] = name
+                        yield {"event": "node_started", "node": name, "deps": list(node.deps),
+                               "at_ms": _ms(time.perf_counter() - start)}
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result, error, elapsed = future.result()
+                    results[name] = result
+                    durations[name] = elapsed
+                    metrics.observe("workup_node_seconds", elapsed, node=name, outcome="error" if error else "success")
+                    event = {"event": "node_failed" if error else "node_completed", "node": name,
+                             "elapsed_ms": _ms(elapsed), "at_ms": _ms(time.perf_counter() - start)}
+                    if error:
+                        event["error"] = error
+                        log.warning("workup.node_failed", node=name, error=error)
+                    else:
+                        event["result"] = result
+                    yield event
+        finally:
+            if on_settled:
+                _when_done(list(running), on_settled)
+
+        # Longest dependency chain by node duration
+        chain: Dict[str, float] = {}
+        for name in self._topological_order():
+            chain[name] = durations[name] + max((chain[dep] for dep in self.nodes[name].deps), default=0.0)
+        yield {"event": "complete", "wall_ms": _ms(time.perf_counter() - start),
+               "critical_path_ms": _ms(max(chain.values(), default=0.0)), "sum_ms": _ms(sum(durations.values())),
+               "results": results}
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        seen = set()
+
+        def visit(name: str):
+            if name in seen:
+                return
+            seen.add(name)
+            for dep in self.nodes[name].deps:
+                visit(dep)
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name)
+        return order
+
+
+def _timed(fn, inputs, deps):
+    """(result, error message, seconds) for one node call"""
+    start = time.perf_counter()
+    try:
+        return fn(inputs, deps), None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
+
+
+def _when_done(futures: list, callback: Callable[[], None]):
+    """Run callback once every future has finished (immediately if none is running)"""
+    if not futures:
+        callback()
+        return
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def settled(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    for future in futures:
+        future.add_done_callback(settled)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+class WorkupOrchestrator:
+    """Builds and runs the patient workup graph"""
+
+    def __init__(self, max_workers: int = 16):
+        """
+        Initialize orchestrator
+
+        Args:
+            max_workers: Worker threads shared by all concurrent workups; provider
+                calls inside them are still bounded by the shared rate limiters
+        """
+        self.diagnostic = DiagnosticAgent()
+        self.treatment = TreatmentAgent()
+        self.user_health = UserHealthAgent()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="workup")
+        self.graph = TaskGraph([
+            TaskNode("diagnosis", self.run_diagnosis),
+            TaskNode("treatment", self.run_treatment, deps=("diagnosis",)),
+            TaskNode("mental_health", self.run_mental_health),
+            TaskNode("dashboard", self.run_dashboard),
+            TaskNode("summary", self.run_summary, deps=("diagnosis", "treatment", "mental_health", "dashboard")),
+        ])
+        self.workups = 0
+
+    def run(self, request: Dict[str, Any], image: Optional[bytes] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Run a workup, streaming node events (see TaskGraph.run)
+
+        Args:
+            request: Patient fields (user_id, age, weight, condition, history,
+                current_meds, allergies, language, image_filename) and optional
+                check-in message
+            image: Medical image already checked by decode_image
+
+        Yields:
+            Workup events, each tagged with the workup id
+        """
+        workup_id = uuid.uuid4().hex[:12]
+        inputs = {key: value for key, value in request.items() if key != "image_base64"}
+        inputs["image_path"] = self._save_image(workup_id, image, inputs.get("image_filename"))
+        self.workups += 1
+        metrics.inc("workups_total")
+        log.info("workup.started", workup_id=workup_id, user_id=inputs.get("user_id"),
+                 image=bool(inputs["image_path"]))
+        # The image is removed only once no node can still be reading it
+        cleanup = (lambda: Path(inputs["image_path"]).unlink(missing_ok=True)) if inputs["image_path"] else None
+        events = self.graph.run(self.executor, inputs, on_settled=cleanup)
+        try:
+            for event in events:
+                if event["event"] == "complete":
+                    metrics.observe("workup_seconds", event["wall_ms"] / 1000)
+                    log.info("workup.completed", workup_id=workup_id, wall_ms=event["wall_ms"],
+                             critical_path_ms=event["critical_path_ms"], sum_ms=event["sum_ms"])
+                    event.pop("results")
+                yield {"workup_id": workup_id, **event}
+        finally:
+            events.close()
+
+    @staticmethod
+    def decode_image(image_base64: str) -> bytes:
+        """
+        Decode a base64 (or data URL) image and check it is a supported format
+
+        Raises:
+            ValueError: If the data is not valid base64 or not a PNG, JPEG, GIF, WebP, BMP or TIFF image
+        """
+        try:
+            image = base64.b64decode(image_base64.split(",", 1)[-1].strip(), validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"image_base64 is not valid base64: {e}") from e
+        webp = image[:4] == b"RIFF" and image[8:12] == b"WEBP"
+        if not webp and not image.startswith(IMAGE_SIGNATURES):
+            raise ValueError("image_base64 is not a PNG, JPEG, GIF, WebP, BMP or TIFF image")
+        return image
+
+    @staticmethod
+    def _save_image(workup_id: str, image: Optional[bytes], filename: Optional[str]) -> Optional[str]:
+        if not image:
+            return None
+        UPLOAD_DIR.mkdir(exist_ok=True)
+        suffix = Path(filename or "image.png").suffix or ".png"
+        path = UPLOAD_DIR / f"workup-{workup_id}{suffix}"
+        path.write_bytes(image)
+        return str(path)
+
+    # ------------------------------------------------------------------
+    # Nodes
+    # ------------------------------------------------------------------
+
+    def run_diagnosis(self, inputs: Dict[str, Any], deps: Dict[str, Any]) -> Dict[str, Any]:
+        """Structured image analysis, or the stated condition when no image was sent"""
+        if not inputs.get("image_path"):
+            return {"source": "provided", "condition": inputs.get("condition"), "report": None}
+        result = self.diagnostic.analyze_image_structured(inputs["image_path"], inputs.get("language", "en"))
+        return {"condition": inputs.get("condition") or (result["report"] or {}).get("impression"), **result}
+
+    def run_treatment(self, inputs: Dict[str, Any], deps: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Structured treatment plan for the diagnosed (or stated) condition"""
+        diagnosis = deps["diagnosis"] or {}
+        condition = diagnosis.get("condition") or inputs.get("condition")
+        if not condition:
+            return None
+        history = inputs.get("history") or ""
+        report = diagnosis.get("report")
+        if report:
+            findings = "; ".join(f["observation"] for f in report.get("findings", [])[:3])
+            history = f"{history}; imaging: {report['impression']} ({findings})".strip("; ")
+        return self.treatment.recommend_treatment_structured({
+            "age": inputs.get("age"),
+            "weight": inputs.get("weight"),
+            "condition": condition,
+            "history": history or None,
+            "current_meds": inputs.get("current_meds") or [],
+            "allergies": inputs.get("allergies") or [],
+            "language": inputs.get("language", "en"),
+            "urgent": inputs.get("urgent", False)
+        })
+
+    def run_mental_health(self, inputs: Dict[str, Any], deps: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Risk assessment and supportive reply for the patient's check-in message"""
+        message = inputs.get("message")
+        if not message:
+            return None
+        # A fresh agent per workup, so conversation history never crosses patients
+        agent = MentalHealthAgent()
+        risk = agent.assess_risk_level(message)
+        return {"risk": risk, "risk_level": MENTAL_RISK[risk["level"]], "response": agent.chat(message)}
+
+    def run_dashboard(self, inputs: Dict[str, Any], deps: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Health scores and structured insights from the user's record"""
+        if not inputs.get("user_id"):
+            return None
+        health_data = self.user_health.generate_user_health_data(
+            user_id=inputs["user_id"],
+            sections=("user_profile", "health_score", "vitals", "diagnostics", "treatments")
+        )
+        insights = self.user_health.generate_structured_insights(health_data)
+        return {"health_score": health_data["health_score"], **insights}
+
+    def run_summary(self, inputs: Dict[str, Any], deps: Dict[str, Any]) -> Dict[str, Any]:
+        """Overall risk (highest across nodes) and escalation flags; no AI call"""
+        levels = {}
+        diagnosis = (deps["diagnosis"] or {}).get("report")
+        if diagnosis:
+            levels["diagnosis"] = diagnosis["risk_level"]
+        if deps["treatment"]:
+            levels["treatment"] = deps["treatment"]["plan"]["risk_level"]
+        if deps["mental_health"]:
+            levels["mental_health"] = deps["mental_health"]["risk_level"]
+        if deps["dashboard"]:
+            levels["dashboard"] = deps["dashboard"]["insights"]["risk_level"]
+
+        rank = max((RISK_LEVELS.index(level) for level in levels.values()), default=0)
+        escalations = []
+        if deps["treatment"] and deps["treatment"]["plan"]["escalate"]:
+            escalations.append("treatment: medication safety findings need physician review")
+        if diagnosis and diagnosis["urgency"] in ("urgent", "emergency"):
+            escalations.append(f"diagnosis: imaging urgency {diagnosis['urgency']}")
+        if deps["mental_health"] and deps["mental_health"]["risk"]["level"] in ("HIGH", "CRITICAL"):
+            escalations.append(f"mental_health: {deps['mental_health']['risk']['action']}")
+        return {"risk_level": RISK_LEVELS[rank], "risk_by_node": levels, "escalate": bool(escalations),
+                "escalations": escalations}
+
+    def get_stats(self) -> dict:
+        return {
+            "workups": self.workups,
+            "nodes": list(self.graph.nodes),
+            "max_workers": self.executor._max_workers
+        }
+
+
+# Singleton instance
+workup_orchestrator = WorkupOrchestrator(max_workers=int(os.getenv("WORKUP_MAX_WORKERS", "16")))
+
+
+if __name__ == "__main__":
+    request = {"user_id": "USER001", "age": 45, "weight": 75, "condition": "Hypertension",
+               "current_meds": ["Metformin 500mg BID"], "allergies": ["Sulfa drugs"],
+               "message": "I've been feeling anxious and overwhelmed about my diagnosis"}
+    for event in workup_orchestrator.run(request):
+        if event["event"] == "complete":
+            print(f"wall {event['wall_ms']} ms, critical path {event['critical_path_ms']} ms, "
+                  f"sequential sum {event['sum_ms']} ms")
+        else:
+            print(f"{event['at_ms']:8.1f} ms  {event['event']:15} {event['node']}")
+    workup_orchestrator.executor.shutdown()
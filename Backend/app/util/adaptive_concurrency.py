@@ -0,0 +1,152 @@
+"""
+Adaptive Concurrency Limit
+Gradient-style limit for provider slots: recent call latency (a fast
+moving average) is compared with the baseline (its windowed minimum), and
+the limit grows while calls stay within tolerance of the
+baseline and shrinks once they slow down (queueing at the provider).
+Latency is normalised by completion size and tracked per size class, so a
+change in the mix of short and long completions does not read as queueing.
+Rate-limit errors and timeouts cut the limit multiplicatively (AIMD-style),
+always within configured bounds
+"""
+
+import math
+from typing import Dict, Optional
+
+
+class _LatencyClass:
+    """Recent latency (fast moving average) and baseline (windowed minimum) of one completion size class"""
+
+    def __init__(self):
+        self.short: Optional[float] = None
+        self.base: Optional[float] = None
+        self.window_min = math.inf
+        self.samples = 0
+
+    def update(self, sample: float, window: int):
+        self.short = sample if self.short is None else self.short + 0.3 * (sample - self.short)
+        self.window_min = min(self.window_min, self.short)
+        self.samples += 1
+        if self.base is None or self.samples % window == 0:
+            self.base = self.window_min if self.base is None else min(self.window_min, self.base * 1.1)
+            self.window_min = math.inf
+
+    @property
+    def baseline(self) -> float:
+        return min(self.base, self.window_min)
+
+
+class GradientLimit:
+    """Concurrency limit driven by latency samples and drop signals"""
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int, tolerance: float = 1.5,
+                 smoothing: float = 0.2, backoff_ratio: float = 0.7, window: int = 500,
+                 overhead_tokens: int = 100):
+        """
+        Initialize limit
+
+        Args:
+            initial: Starting limit
+            min_limit: Lowest limit the algorithm may set
+            max_limit: Highest limit the algorithm may set
+            tolerance: Recent/baseline latency ratio tolerated before the limit shrinks
+            smoothing: Weight of each new estimate in the limit
+            backoff_ratio: Multiplier applied on a 429 or timeout
+            window: Samples per baseline window (per size class); at the end of each
+                window the baseline moves to that window's minimum, rising by at most
+                10% so latency inflated by our own queueing cannot ratchet it up
+            overhead_tokens: Fixed per-call latency (time to first token) expressed in
+                completion tokens; samples are latency / (tokens + overhead_tokens)
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff_ratio = backoff_ratio
+        self.window = window
+        self.overhead_tokens = overhead_tokens
+
+        # Keyed by tokens.bit_length(): 0, 1, 2-3, 4-7, ... completion tokens
+        self.classes: Dict[int, _LatencyClass] = {}
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def value(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def on_sample(self, latency: float, in_flight: int, tokens: Optional[int] = None) -> int:
+        """
+        Update from a successful call
+
+        Args:
+            latency: Call duration (seconds)
+            in_flight: Calls holding a slot when it finished
+            tokens: Completion tokens produced (unknown counts share the smallest class)
+
+        Returns:
+            New limit
+        """
+        tokens = max(0, int(tokens or 0))
+        latency_class = self.classes.setdefault(tokens.bit_length(), _LatencyClass())
+        latency_class.update(latency / (tokens + self.overhead_tokens), self.window)
+
+        gradient = max(0.5, min(1.0, self.tolerance * latency_class.baseline / latency_class.short))
+        estimate = self.limit * gradient + math.sqrt(self.limit)
+        # Only grow when the current limit is actually being used
+        if in_flight < self.limit / 2:
+            estimate = min(estimate, self.limit)
+        return self._set((1 - self.smoothing) * self.limit + self.smoothing * estimate)
+
+    def on_drop(self) -> int:
+        """Update from a rate-limit error or timeout; returns the new limit"""
+        return self._set(self.limit * self.backoff_ratio)
+
+    def _set(self, limit: float) -> int:
+        before = self.value
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        if self.value > before:
+            self.increases += 1
+        elif self.value < before:
+            self.decreases += 1
+        return self.value
+
+    def get_stats(self) -> dict:
+        return {
+            "limit": self.value,
+            "min": self.min_limit,
+            "max": self.max_limit,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            # Per completion size class, in ms per (token + overhead)
+            "latency_classes": {
+                f"{(1 << size) >> 1}-{(1 << size) - 1} tokens" if size else "0 tokens": {
+                    "samples": c.samples,
+                    "recent_ms_per_token": round(c.short * 1000, 3),
+                    "baseline_ms_per_token": round(c.baseline * 1000, 3)
+                }
+                for size, c in sorted(self.classes.items())
+            }
+        }
+
+
+if __name__ == "__main__":
+    import random
+
+    # Simulated provider: a mix of short (0.8s) and long (8.3s) completions that
+    # queue beyond 12 in flight, then a slowdown to 6, then a burst of 429s
+    random.seed(0)
+    limit = GradientLimit(initial=5, min_limit=2, max_limit=40)
+    for step in range(3000):
+        capacity = 12 if step < 1500 else 6
+        if 2500 <= step < 2505:
+            limit.on_drop()
+        else:
+            in_flight = limit.value
+            tokens = random.choice([50, 800])
+            latency = (0.3 + 0.01 * tokens) * max(1.0, in_flight / capacity) * random.uniform(0.7, 1.3)
+            limit.on_sample(latency, in_flight, tokens)
+        if step % 250 == 0 or step == 2505:
+            print(f"step {step:4} (capacity {capacity:2}): limit {limit.value:2}")
+    print(limit.get_stats())
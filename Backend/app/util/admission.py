@@ -0,0 +1,156 @@
+"""
+Admission Control for AI-backed requests
+Estimates how long a new request would wait for a provider (backoff, slot
+queue, token bucket) and decides before any expensive work starts:
+
+- admit: the wait fits the latency SLO for the request's priority class
+- degrade: AI calls over the SLO fail fast so agents return their
+  deterministic fallback content instead of blocking a thread
+- shed: HTTP requests far over the SLO are rejected with 503 + Retry-After
+"""
+
+import math
+import os
+from typing import Dict, List, Optional
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+from app.util.priority_scheduler import PRIORITIES, current_priority
+
+log = get_logger(__name__)
+
+
+class OverloadedError(RuntimeError):
+    """Raised when a request cannot be served within its SLO"""
+
+    def __init__(self, message: str, retry_after: int, estimated_wait: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.estimated_wait = estimated_wait
+
+
+class AdmissionController:
+    """SLO checks against the provider limiters' estimated wait"""
+
+    def __init__(self, slo_seconds: Optional[Dict[str, float]] = None, shed_factor: float = 3.0,
+                 enabled: bool = True):
+        """
+        Initialize admission controller
+
+        Args:
+            slo_seconds: Longest acceptable provider wait per priority class; AI
+                calls expected to wait longer degrade to fallbacks
+            shed_factor: HTTP requests are rejected when the wait exceeds the SLO
+                by this factor (emergency requests are never rejected)
+            enabled: False admits everything (calls still time out at the SLO)
+        """
+        self.slo_seconds = slo_seconds or {"emergency": 30.0, "interactive": 8.0, "background": 60.0}
+        self.shed_factor = shed_factor
+        self.enabled = enabled
+        self.decisions = {decision: {priority: 0 for priority in PRIORITIES}
+                          for decision in ("admitted", "degraded", "shed")}
+        self.last_wait = {priority: 0.0 for priority in PRIORITIES}
+
+    def slo(self, priority: Optional[str] = None) -> float:
+        return self.slo_seconds[priority or current_priority.get()]
+
+    def estimated_wait(self, limiters: List, priority: Optional[str] = None) -> float:
+        """
+        Expected provider wait for a new request: the shortest among the
+        providers that would be tried (0 when none is configured, so the
+        request reaches the agent's own unavailable handling)
+        """
+        priority = priority or current_priority.get()
+        wait = min((limiter.estimated_wait(priority) for limiter in limiters), default=0.0)
+        self.last_wait[priority] = wait
+        return wait
+
+    def admit(self, limiters: List, priority: Optional[str] = None):
+        """
+        Gate an incoming HTTP request before it starts work
+
+        Raises:
+            OverloadedError: If the wait exceeds the SLO by shed_factor (returned as 503)
+        """
+        priority = priority or current_priority.get()
+        wait = self.estimated_wait(limiters, priority)
+        if self.enabled and priority != "emergency" and wait > self.slo(priority) * self.shed_factor:
+            self._reject("shed", priority, wait)
+        self._record("admitted", priority)
+
+    def check_call(self, limiters: List, priority: Optional[str] = None):
+        """
+        Gate a single AI call before it queues for a provider
+
+        Raises:
+            OverloadedError: If the wait exceeds the SLO; agents catch it and fall back
+        """
+        priority = priority or current_priority.get()
+        wait = self.estimated_wait(limiters, priority)
+        if self.enabled and wait > self.slo(priority):
+            self._reject("degraded", priority, wait)
+
+    def _reject(self, decision: str, priority: str, wait: float):
+        self._record(decision, priority)
+        log.warning(f"admission.{decision}", sampled=True, priority=priority,
+                    estimated_wait=round(wait, 2), slo_seconds=self.slo(priority))
+        raise OverloadedError(f"AI providers overloaded (estimated wait {wait:.1f}s, "
+                              f"SLO {self.slo(priority):g}s for {priority} requests)",
+                              retry_after=max(1, min(120, math.ceil(wait))), estimated_wait=wait)
+
+    def _record(self, decision: str, priority: str):
+        self.decisions[decision][priority] += 1
+        metrics.inc("admission_decisions_total", decision=decision, priority=priority)
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "slo_seconds": dict(self.slo_seconds),
+            "shed_factor": self.shed_factor,
+            "decisions": {decision: dict(counts) for decision, counts in self.decisions.items()},
+            "last_estimated_wait": {priority: round(wait, 3) for priority, wait in self.last_wait.items()}
+        }
+
+
+# Singleton instance
+admission_controller = AdmissionController(
+    slo_seconds={
+        "emergency": float(os.getenv("ADMISSION_SLO_EMERGENCY_SECONDS", "30")),
+        "interactive": float(os.getenv("ADMISSION_SLO_SECONDS", "8")),
+        "background": float(os.getenv("ADMISSION_SLO_BACKGROUND_SECONDS", "60"))
+    },
+    shed_factor=float(os.getenv("ADMISSION_SHED_FACTOR", "3")),
+    enabled=os.getenv("ADMISSION_CONTROL", "on").lower() not in ("off", "0", "false")
+)
+
+
+if __name__ == "__main__":
+    import threading
+    import time
+    from app.util.rate_limiter import RateLimiter
+
+    # 2 slots held for 1s each: watch the decision change as the queue grows
+    limiter = RateLimiter(calls_per_minute=600, max_concurrent=2, name="demo")
+    limiter.scheduler.avg_hold_seconds = 1.0
+    controller = AdmissionController(slo_seconds={"emergency": 30.0, "interactive": 2.0, "background": 5.0})
+
+    def hold():
+        if limiter.acquire(timeout=30, priority="interactive"):
+            time.sleep(1.0)
+            limiter.release()
+
+    threads = []
+    for queued in range(12):
+        for priority in ("interactive", "emergency"):
+            try:
+                controller.check_call([limiter], priority)
+                decision = "admit"
+            except OverloadedError as e:
+                decision = f"degrade (retry after {e.retry_after}s)"
+            print(f"{queued:2} running/queued, {priority:11}: wait ~{controller.last_wait[priority]:.1f}s -> {decision}")
+        thread = threading.Thread(target=hold)
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+    print(controller.get_stats()["decisions"])
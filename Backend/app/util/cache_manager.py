@@ -10,6 +10,10 @@ from typing import Optional, Any, Dict
 from collections import OrderedDict
 from datetime import datetime, timedelta
 import threading
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
 
 class CacheManager:
     """
@@ -75,6 +79,11 @@ class CacheManager:
         Returns:
             Cached result or None
         """
+        with metrics.timer("cache_lookup"):
+            return self._get(prompt, system_message, **kwargs)
+    
+    def _get(self, prompt: str, system_message: Optional[str] = None, **kwargs) -> Optional[str]:
+        """Lookup without timing (see get)"""
         key = self._generate_key(prompt, system_message, **kwargs)
         
         with self.lock:
@@ -86,6 +95,7 @@ class CacheManager:
                     # Expired, remove from cache
                     del self.cache[key]
                     self.misses += 1
+                    metrics.inc("cache_misses_total")
                     return None
                 
                 # Move to end (most recently used)
@@ -93,11 +103,13 @@ class CacheManager:
                 
                 # Cache hit
                 self.hits += 1
-                print(f"💾 Cache HIT (key: {key[:8]}...)")
+                metrics.inc("cache_hits_total")
+                log.debug("cache.hit", sampled=True, key=key[:8])
                 return entry["result"]
             
             # Cache miss
             self.misses += 1
+            metrics.inc("cache_misses_total")
             return None
     
     def set(self, result: str, prompt: str, system_message: Optional[str] = None, **kwargs):
@@ -126,13 +138,13 @@ class CacheManager:
                 "timestamp": time.time()
             }
             
-            print(f"💾 Cache SET (key: {key[:8]}..., size: {len(self.cache)}/{self.max_size})")
+            log.debug("cache.set", sampled=True, key=key[:8], size=len(self.cache), max_size=self.max_size)
     
     def clear(self):
         """Clear all cache entries"""
         with self.lock:
             self.cache.clear()
-            print("🗑️ Cache cleared")
+            log.info("cache.cleared")
     
     def cleanup_expired(self):
         """Remove expired entries from cache"""
@@ -147,7 +159,7 @@ class CacheManager:
                 del self.cache[key]
             
             if expired_keys:
-                print(f"🗑️ Cleaned up {len(expired_keys)} expired cache entries")
+                log.info("cache.expired_cleanup", removed=len(expired_keys))
     
     def get_stats(self) -> dict:
         """Get cache statistics"""
@@ -168,3 +180,5 @@ class CacheManager:
 
 # Global instance
 cache_manager = CacheManager(max_size=100, ttl_seconds=3600)
+
+metrics.register_gauge("cache_entries", lambda: len(cache_manager.cache), "Entries held in the response cache")
@@ -0,0 +1,175 @@
+"""
+Provider Context Cache Manager
+Registers long static system/instruction prefixes once per agent and
+references them by provider-side handle, refreshing before TTL expiry
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Optional, Dict, Callable, Any
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+from app.util.token_budget import estimate_tokens
+
+log = get_logger(__name__)
+
+
+class CachedContext:
+    """A registered static prefix and its per-provider handles"""
+
+    def __init__(self, name: str, system_message: str, static_prefix: str = ""):
+        self.name = name
+        self.system_message = system_message or ""
+        self.static_prefix = static_prefix or ""
+        self.text = f"{self.system_message}\n\n{self.static_prefix}".strip()
+        self.digest = self.fingerprint(system_message, static_prefix)
+        self.tokens = estimate_tokens(self.text)
+
+        # provider -> (handle or None if unsupported, expires_at)
+        self.handles: Dict[str, tuple] = {}
+        # Held while a provider handle is created, so concurrent first requests create one
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(system_message: Optional[str], static_prefix: Optional[str]) -> str:
+        return hashlib.sha256(f"{system_message or ''}\x1f{static_prefix or ''}".encode()).hexdigest()[:16]
+
+
+class ContextCacheManager:
+    """
+    Tracks cached-context handles per (context name, provider)
+    """
+
+    def __init__(self, ttl_seconds: int = 3600, refresh_margin_seconds: int = 120):
+        """
+        Initialize context cache manager
+
+        Args:
+            ttl_seconds: Lifetime requested for provider-side contexts
+            refresh_margin_seconds: Recreate a context this long before it expires
+        """
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.contexts: Dict[str, CachedContext] = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.creations = 0
+        self.failures = 0
+
+    def register(self, name: str, system_message: Optional[str], static_prefix: Optional[str] = None) -> CachedContext:
+        """
+        Register (or re-register on change) a static context
+
+        Args:
+            name: Context name, e.g. an agent name or prompt template key
+            system_message: System prompt
+            static_prefix: Static instruction text sent before request data
+
+        Returns:
+            The registered CachedContext
+        """
+        context = self.contexts.get(name)
+        if context is not None and context.digest == CachedContext.fingerprint(system_message, static_prefix):
+            return context
+
+        with self.lock:
+            context = CachedContext(name, system_message, static_prefix)
+            self.contexts[name] = context
+        log.info("context_cache.registered", context=name, tokens=context.tokens, digest=context.digest)
+        return context
+
+    def resolve(self, name: str, provider: str, create: Callable[[str, int], Any],
+                min_tokens: int = 0) -> Optional[Any]:
+        """
+        Get a live provider handle for a context, creating or refreshing it
+
+        Args:
+            name: Registered context name
+            provider: Provider key (google, grok, mock)
+            create: Callable(text, ttl_seconds) returning a provider handle
+            min_tokens: Provider's minimum cacheable size; smaller contexts are
+                never sent for creation
+
+        Returns:
+            Provider handle, or None if the provider cannot cache this context
+        """
+        context = self.contexts[name]
+        if context.tokens < min_tokens:
+            return None
+
+        handle = self._live_handle(context, provider)
+        if handle is not False:
+            return handle
+        with context.lock:
+            # Another request may have created it while we waited
+            handle = self._live_handle(context, provider)
+            if handle is not False:
+                return handle
+            return self._create(context, provider, create)
+
+    def _live_handle(self, context: CachedContext, provider: str) -> Any:
+        """Unexpired handle (None if creation failed recently), or False if one must be created"""
+        entry = context.handles.get(provider)
+        if entry is None or entry[1] - time.time() <= self.refresh_margin_seconds:
+            return False
+        if entry[0] is not None:
+            self.hits += 1
+            metrics.inc("context_cache_hits_total", provider=provider)
+        return entry[0]
+
+    def _create(self, context: CachedContext, provider: str, create: Callable[[str, int], Any]) -> Optional[Any]:
+        name = context.name
+        now = time.time()
+        try:
+            handle = create(context.text, self.ttl_seconds)
+            context.handles[provider] = (handle, now + self.ttl_seconds)
+            self.creations += 1
+            metrics.inc("context_cache_refreshes_total", provider=provider)
+            log.info("context_cache.created", context=name, provider=provider, tokens=context.tokens)
+            return handle
+        except Exception as e:
+            # Remember the failure for one TTL so every request doesn't retry creation
+            context.handles[provider] = (None, now + self.ttl_seconds)
+            self.failures += 1
+            log.warning("context_cache.unsupported", context=name, provider=provider, error=str(e))
+            return None
+
+    def invalidate(self, name: str, provider: str):
+        """Drop a handle the provider no longer recognizes"""
+        context = self.contexts.get(name)
+        if context:
+            context.handles.pop(provider, None)
+
+    def get_stats(self) -> dict:
+        """Get context cache statistics"""
+        now = time.time()
+        return {
+            "contexts": {
+                name: {
+                    "tokens": context.tokens,
+                    "digest": context.digest,
+                    "providers": {
+                        provider: {
+                            "cached": handle is not None,
+                            "expires_in_seconds": int(expires_at - now)
+                        }
+                        for provider, (handle, expires_at) in context.handles.items()
+                    }
+                }
+                for name, context in list(self.contexts.items())
+            },
+            "hits": self.hits,
+            "creations": self.creations,
+            "failures": self.failures,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+# Global instance
+context_cache = ContextCacheManager(ttl_seconds=int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600")))
+
+metrics.describe("context_cache_hits_total", "counter", "Requests served with an existing provider context handle")
+metrics.describe("context_cache_refreshes_total", "counter", "Provider context creations and TTL refreshes")
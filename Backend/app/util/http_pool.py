@@ -0,0 +1,229 @@
+"""
+HTTP Connection Pools for provider SDKs
+One shared httpx client per provider, with the pool sized to the provider's
+concurrency limit so every limiter slot can keep a warm keep-alive
+connection, HTTP/2 when the h2 package is installed, connect/read timeouts
+per call class and pool saturation metrics (in-flight requests, pool wait,
+new TCP connections and TLS handshakes)
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+import httpx
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Read timeout per call class; "stream" bounds the gap between chunks, not the whole response
+READ_TIMEOUTS = {
+    "emergency": float(os.getenv("HTTP_READ_TIMEOUT_EMERGENCY", "20")),
+    "interactive": float(os.getenv("HTTP_READ_TIMEOUT_INTERACTIVE", "30")),
+    "background": float(os.getenv("HTTP_READ_TIMEOUT_BACKGROUND", "120")),
+    "stream": float(os.getenv("HTTP_READ_TIMEOUT_STREAM", "20"))
+}
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+# httpcore trace events that mark the end of the wait for a pooled connection
+_ACQUIRED_EVENTS = ("connection.connect_tcp.started", "http11.send_request_headers.started",
+                    "http2.send_request_headers.started")
+
+
+class _PoolStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.connects = 0
+        self.tls_handshakes = 0
+
+
+class InstrumentedTransport(httpx.HTTPTransport):
+    """HTTPTransport that reports pool usage for one provider"""
+
+    def __init__(self, provider: str, **kwargs):
+        super().__init__(**kwargs)
+        self.provider = provider
+        self.stats = _PoolStats()
+        self.lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        acquired = []
+
+        def trace(event: str, info: dict):
+            if event in _ACQUIRED_EVENTS and not acquired:
+                acquired.append(True)
+                metrics.observe("stage_duration_seconds", time.perf_counter() - start,
+                                stage="http_pool_wait", provider=self.provider)
+            if event == "connection.connect_tcp.complete":
+                self._count("connects", "http_pool_connects_total")
+            elif event == "connection.start_tls.complete":
+                self._count("tls_handshakes", "http_pool_tls_handshakes_total")
+
+        request.extensions = {**request.extensions, "trace": trace}
+        with self.lock:
+            self.stats.requests += 1
+            self.stats.in_flight += 1
+            self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.stats.in_flight)
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            self._done()
+            raise
+        # The connection stays busy until the body is consumed (streams included)
+        response.stream = _TrackedStream(response.stream, self._done)
+        return response
+
+    def _count(self, field: str, metric: str):
+        with self.lock:
+            setattr(self.stats, field, getattr(self.stats, field) + 1)
+        metrics.inc(metric, provider=self.provider)
+
+    def _done(self):
+        with self.lock:
+            self.stats.in_flight -= 1
+
+    def connections(self) -> Dict[str, int]:
+        """Open pooled connections by state"""
+        states = {"active": 0, "idle": 0}
+        for connection in list(self._pool.connections):
+            states["idle" if connection.is_idle() else "active"] += 1
+        return states
+
+
+class _TrackedStream(httpx.SyncByteStream):
+    def __init__(self, stream, on_close):
+        self.stream = stream
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.on_close()
+        self.stream.close()
+
+
+class HTTPPoolManager:
+    """Shared pooled httpx clients, one per provider"""
+
+    def __init__(self, keepalive_seconds: float = 60.0, http2: bool = True):
+        """
+        Initialize pool manager
+
+        Args:
+            keepalive_seconds: How long idle connections stay open for reuse
+            http2: Use HTTP/2 when the h2 package is installed
+        """
+        self.keepalive_seconds = keepalive_seconds
+        self.http2 = http2 and HTTP2_AVAILABLE
+        if http2 and not HTTP2_AVAILABLE:
+            log.info("http_pool.http2_unavailable", hint="pip install 'httpx[http2]'")
+        self.clients: Dict[str, httpx.Client] = {}
+        self.transports: Dict[str, InstrumentedTransport] = {}
+        self.pool_sizes: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def client(self, provider: str, pool_size: int) -> httpx.Client:
+        """
+        Shared client for a provider, created on first use
+
+        Args:
+            provider: Provider name (metrics label)
+            pool_size: Maximum connections; match the provider's concurrency limit
+        """
+        with self.lock:
+            if provider not in self.clients:
+                transport = InstrumentedTransport(
+                    provider,
+                    http2=self.http2,
+                    limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                        keepalive_expiry=self.keepalive_seconds)
+                )
+                self.transports[provider] = transport
+                self.pool_sizes[provider] = pool_size
+                self.clients[provider] = httpx.Client(transport=transport, timeout=self.timeout("interactive"))
+                log.info("http_pool.created", provider=provider, pool_size=pool_size, http2=self.http2)
+            return self.clients[provider]
+
+    @staticmethod
+    def timeout(call_class: Optional[str]) -> httpx.Timeout:
+        """
+        Timeouts for a call class: emergency, interactive, background or stream
+
+        The pool timeout matches connect so a saturated pool fails like an
+        unreachable host instead of queueing behind slow calls.
+        """
+        read = READ_TIMEOUTS.get(call_class or "interactive", READ_TIMEOUTS["interactive"])
+        return httpx.Timeout(read, connect=CONNECT_TIMEOUT, pool=CONNECT_TIMEOUT)
+
+    def close(self):
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+            self.transports.clear()
+
+    def get_stats(self) -> dict:
+        stats = {}
+        for provider, transport in list(self.transports.items()):
+            with transport.lock:
+                usage = vars(transport.stats).copy()
+            stats[provider] = {
+                "pool_size": self.pool_sizes[provider],
+                "http2": self.http2,
+                "connections": transport.connections(),
+                "saturation": round(usage["in_flight"] / self.pool_sizes[provider], 3),
+                **usage
+            }
+        return stats
+
+
+# Singleton instance
+http_pool_manager = HTTPPoolManager(
+    keepalive_seconds=float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60")),
+    http2=os.getenv("HTTP2", "on").lower() not in ("off", "0", "false")
+)
+
+metrics.register_gauge(
+    "http_pool_in_flight",
+    lambda: {(("provider", name),): stats["in_flight"] for name, stats in http_pool_manager.get_stats().items()},
+    "Provider requests in flight (above the pool size, requests are waiting for a connection)"
+)
+
+metrics.register_gauge(
+    "http_pool_connections",
+    lambda: {(("provider", name), ("state", state)): count
+             for name, stats in http_pool_manager.get_stats().items()
+             for state, count in stats["connections"].items()},
+    "Open pooled provider connections by state"
+)
+
+
+if __name__ == "__main__":
+    # Ten sequential requests reuse one keep-alive connection; eight parallel ones fill the pool
+    from concurrent.futures import ThreadPoolExecutor
+
+    client = http_pool_manager.client("demo", pool_size=4)
+    url = os.getenv("HTTP_POOL_DEMO_URL", "https://api.groq.com/")
+    try:
+        for _ in range(10):
+            client.get(url, timeout=http_pool_manager.timeout("interactive"))
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: client.get(url).status_code, range(8)))
+    except httpx.HTTPError as e:
+        print("Request failed (no network?):", e)
+    print(http_pool_manager.get_stats())
+    http_pool_manager.close()
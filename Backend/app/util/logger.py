@@ -0,0 +1,275 @@
+"""
+Structured JSON Logging with a non-blocking queue handler
+Hot-path events are rate-limited and sampled; patient content is redacted
+"""
+
+import atexit
+import copy
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+# Field names whose values may carry patient-authored text
+REDACTED_FIELDS = {"message", "user_message", "content", "prompt", "response", "history", "notes"}
+
+# Attributes present on every LogRecord; anything else came in via `extra`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def redact(value: Any) -> Dict[str, Any]:
+    """
+    Replace free text with a non-reversible fingerprint
+
+    Args:
+        value: Original field value
+
+    Returns:
+        Dict with length and short hash so events can still be correlated
+    """
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return {
+        "redacted": True,
+        "length": len(text),
+        "sha256": hashlib.sha256(text.encode()).hexdigest()[:12]
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON documents"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", None) or record.getMessage(),
+            "thread": record.threadName
+        }
+
+        for key, value in record.__dict__.items():
+            if key in _RESERVED_ATTRS or key in ("event", "sampled"):
+                continue
+            entry[key] = value
+
+        # Records that came through the queue already carry `exc`/`stack` text
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class HotPathSampler(logging.Filter):
+    """
+    Rate-limits and samples records flagged as hot-path (`sampled=True`)
+
+    Each event name gets a token bucket of `burst` records refilled at
+    `rate_per_sec`; records beyond the bucket are kept with probability
+    `sample_rate`. Warnings and above always pass.
+    """
+
+    def __init__(self, rate_per_sec: float = 5.0, burst: int = 20, sample_rate: float = 0.01):
+        super().__init__()
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.sample_rate = sample_rate
+        self.buckets: Dict[str, list] = {}
+        self.suppressed: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+
+        event = getattr(record, "event", record.msg)
+        now = time.monotonic()
+
+        with self.lock:
+            bucket = self.buckets.get(event)
+            if bucket is None:
+                bucket = [float(self.burst), now]
+                self.buckets[event] = bucket
+
+            # Refill bucket: [tokens, last_refill]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate_per_sec)
+            bucket[1] = now
+
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                keep = True
+            else:
+                keep = random.random() < self.sample_rate
+
+            if not keep:
+                self.suppressed[event] = self.suppressed.get(event, 0) + 1
+                return False
+
+            # Report how many records were dropped since the last one emitted
+            dropped = self.suppressed.pop(event, 0)
+
+        if dropped:
+            record.suppressed_since_last = dropped
+        return True
+
+
+_traceback_formatter = logging.Formatter()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Render the traceback into an `exc` field before queueing
+
+        The base class clears exc_info (tracebacks do not survive the queue)
+        and folds the text into the message, which the JSON formatter does
+        not emit, so without this logged exceptions lose their traceback.
+        """
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        if record.stack_info:
+            record.stack = record.stack_info
+            record.stack_info = None
+        return super().prepare(record)
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructuredLogger:
+    """
+    Thin adapter over logging.Logger taking an event name plus fields
+
+    Example:
+        log.info("cache.hit", sampled=True, key=key[:8])
+    """
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def _log(self, level: int, event: str, sampled: bool = False, exc_info=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+
+        # Redact before the record is queued so raw text never leaves the caller
+        extra = {"event": event, "sampled": sampled}
+        for key, value in fields.items():
+            if key in REDACTED_FIELDS:
+                value = redact(value)
+            # LogRecord refuses `extra` keys that shadow its own attributes
+            extra[f"{key}_" if key in _RESERVED_ATTRS else key] = value
+
+        self.logger.log(level, event, exc_info=exc_info, extra=extra)
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, **fields)
+
+    def critical(self, event: str, **fields):
+        self._log(logging.CRITICAL, event, **fields)
+
+
+class LoggingManager:
+    """Owns the queue, background listener and shared filters"""
+
+    def __init__(self):
+        self.configured = False
+        self.lock = threading.Lock()
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.sampler: Optional[HotPathSampler] = None
+
+    def configure(self):
+        """Install the queue handler on the `app` logger (idempotent)"""
+        with self.lock:
+            if self.configured:
+                return
+
+            log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+
+            stream = logging.StreamHandler(sys.stdout)
+            stream.setFormatter(JsonFormatter())
+
+            self.sampler = HotPathSampler(
+                rate_per_sec=float(os.getenv("LOG_HOT_RATE_PER_SEC", "5")),
+                burst=int(os.getenv("LOG_HOT_BURST", "20")),
+                sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+            )
+
+            self.handler = DroppingQueueHandler(log_queue)
+            # Sample on the producer side so suppressed records never hit the queue
+            self.handler.addFilter(self.sampler)
+
+            root = logging.getLogger("app")
+            root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+            root.addHandler(self.handler)
+            root.propagate = False
+
+            self.listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.shutdown)
+
+            self.configured = True
+
+    def shutdown(self):
+        """Flush queued records and stop the listener thread"""
+        with self.lock:
+            if self.listener:
+                self.listener.stop()
+                self.listener = None
+
+    def get_stats(self) -> dict:
+        """Get logging pipeline statistics"""
+        return {
+            "queue_depth": self.handler.queue.qsize() if self.handler else 0,
+            "dropped": self.handler.dropped if self.handler else 0,
+            "suppressed_pending": dict(self.sampler.suppressed) if self.sampler else {}
+        }
+
+
+# Global instance
+logging_manager = LoggingManager()
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """
+    Get a structured logger under the `app` hierarchy
+
+    Args:
+        name: Module name, usually __name__
+
+    Returns:
+        StructuredLogger writing JSON through the shared queue
+    """
+    logging_manager.configure()
+    if not name.startswith("app"):
+        name = f"app.{name}"
+    return StructuredLogger(logging.getLogger(name))
@@ -0,0 +1,255 @@
+"""
+Low-overhead Metrics Registry with Prometheus text exposition
+Records per-stage latency histograms and event counters for the AI hot path
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple, List, Optional
+
+# Latency buckets (seconds) covering in-process work up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    """Build a hashable, order-independent key from a labels dict"""
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    """Render labels in Prometheus `{a="b",c="d"}` form"""
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    rendered = ",".join(
+        f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in pairs
+    )
+    return "{" + rendered + "}"
+
+
+class _Shard:
+    """
+    Per-thread aggregation buffer.
+    Only the owning thread writes to a shard, so updates take no lock;
+    the scraper merges all shards when /metrics is requested.
+    """
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        # (name, labels) -> [bucket_counts..., +Inf count, sum]
+        self.histograms: Dict[Tuple[str, LabelKey], List[float]] = {}
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms aggregated per thread and merged on scrape
+    """
+
+    def __init__(self, namespace: str = "healthcare", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize metrics registry
+
+        Args:
+            namespace: Prefix applied to every exported metric name
+            buckets: Histogram bucket upper bounds in seconds
+        """
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._help: Dict[str, Tuple[str, str]] = {}
+
+        # Gauges are sampled lazily at scrape time from callbacks
+        self._gauge_callbacks = []
+
+        # Lock only guards shard registration and scrape, never the hot path
+        self.lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            self._local.shard = shard
+            with self.lock:
+                self._shards.append(shard)
+        return shard
+
+    def describe(self, name: str, metric_type: str, help_text: str):
+        """Register HELP/TYPE metadata for a metric"""
+        self._help[name] = (metric_type, help_text)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """
+        Increment a counter
+
+        Args:
+            name: Metric name (without namespace)
+            value: Amount to add
+            **labels: Metric labels
+        """
+        counters = self._shard().counters
+        key = (name, _label_key(labels))
+        counters[key] = counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record a histogram observation
+
+        Args:
+            name: Metric name (without namespace)
+            value: Observed value in seconds
+            **labels: Metric labels
+        """
+        histograms = self._shard().histograms
+        key = (name, _label_key(labels))
+        series = histograms.get(key)
+        if series is None:
+            series = [0.0] * (len(self.buckets) + 2)
+            histograms[key] = series
+
+        # Non-cumulative bucket counts; cumulated at scrape time
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        """
+        Time a block of code as a pipeline stage
+
+        Args:
+            stage: Stage name (prompt_build, limiter_wait, provider_call, ...)
+            **labels: Additional labels such as agent or provider
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def record_stage(self, stage: str, started: float, **labels):
+        """
+        Record a stage duration measured from a perf_counter() start time
+
+        Args:
+            stage: Stage name
+            started: Value of time.perf_counter() when the stage began
+            **labels: Additional labels such as agent or provider
+        """
+        self.observe("stage_duration_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+    def register_gauge(self, name: str, callback, help_text: str = ""):
+        """
+        Register a gauge sampled at scrape time
+
+        Args:
+            name: Metric name (without namespace)
+            callback: Callable returning {labels_dict_tuple: value} or a number
+            help_text: HELP text for the exposition output
+        """
+        self.describe(name, "gauge", help_text)
+        self._gauge_callbacks.append((name, callback))
+
+    def _merge(self):
+        counters: Dict[Tuple[str, LabelKey], float] = {}
+        histograms: Dict[Tuple[str, LabelKey], List[float]] = {}
+        with self.lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0.0) + value
+            for key, series in list(shard.histograms.items()):
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = list(series)
+                else:
+                    for i, v in enumerate(series):
+                        merged[i] += v
+        return counters, histograms
+
+    def snapshot(self) -> dict:
+        """Get merged counters and histogram summaries as plain dicts"""
+        counters, histograms = self._merge()
+        return {
+            "counters": {
+                f"{name}{_format_labels(key)}": value
+                for (name, key), value in sorted(counters.items())
+            },
+            "histograms": {
+                f"{name}{_format_labels(key)}": {
+                    "count": int(sum(series[:-1])),
+                    "sum": round(series[-1], 6)
+                }
+                for (name, key), series in sorted(histograms.items())
+            }
+        }
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        counters, histograms = self._merge()
+        lines: List[str] = []
+        emitted_meta = set()
+
+        def meta(name: str, default_type: str):
+            if name in emitted_meta:
+                return
+            emitted_meta.add(name)
+            metric_type, help_text = self._help.get(name, (default_type, ""))
+            full = f"{self.namespace}_{name}"
+            if help_text:
+                lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {metric_type}")
+
+        for (name, key), value in sorted(counters.items()):
+            meta(name, "counter")
+            lines.append(f"{self.namespace}_{name}{_format_labels(key)} {value:g}")
+
+        for (name, key), series in sorted(histograms.items()):
+            meta(name, "histogram")
+            full = f"{self.namespace}_{name}"
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{full}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative:g}")
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{full}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative:g}")
+            lines.append(f"{full}_sum{_format_labels(key)} {series[-1]:.6f}")
+            lines.append(f"{full}_count{_format_labels(key)} {cumulative:g}")
+
+        for name, callback in self._gauge_callbacks:
+            try:
+                values = callback()
+            except Exception:
+                continue
+            meta(name, "gauge")
+            if isinstance(values, dict):
+                for labels, value in values.items():
+                    lines.append(f"{self.namespace}_{name}{_format_labels(_label_key(dict(labels)))} {value:g}")
+            else:
+                lines.append(f"{self.namespace}_{name} {values:g}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+metrics.describe("stage_duration_seconds", "histogram",
+                 "Latency of AI pipeline stages (prompt_build, limiter_wait, provider_call, cache_lookup, response_formatting)")
+metrics.describe("cache_hits_total", "counter", "Response cache hits")
+metrics.describe("cache_misses_total", "counter", "Response cache misses")
+metrics.describe("limiter_waits_total", "counter", "Rate limiter acquisitions that had to wait")
+metrics.describe("limiter_rejections_total", "counter", "Rate limiter acquisitions that timed out")
+metrics.describe("fallbacks_total", "counter", "Provider fallbacks and deterministic fallback responses")
+metrics.describe("circuit_trips_total", "counter", "Rate limiter backoff (circuit) activations")
+metrics.describe("provider_calls_total", "counter", "Provider calls by outcome")
@@ -0,0 +1,221 @@
+"""
+Local Mock LLM Provider
+Deterministic offline stand-in that models token cost and latency,
+including provider-side context caching, for benchmarks and demos
+"""
+
+import hashlib
+import os
+import threading
+import time
+import json
+import uuid
+from typing import Optional, Dict, Any, Iterator
+from app.util.token_budget import estimate_tokens
+from app.util.structured_output import example_for
+
+
+class MockResponse:
+    """Completion result with provider-style usage numbers"""
+
+    def __init__(self, text: str, prompt_tokens: int, cached_tokens: int,
+                 completion_tokens: int, latency_seconds: float):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens
+        self.completion_tokens = completion_tokens
+        self.latency_seconds = latency_seconds
+
+
+class MockStream:
+    """Paced chunk iterator for one streamed completion; usage is in .response"""
+
+    def __init__(self, response: MockResponse, chunks: list, first_chunk_delay: float, chunk_delay: float):
+        self.response = response
+        self.chunks = chunks
+        self.first_chunk_delay = first_chunk_delay
+        self.chunk_delay = chunk_delay
+
+    def __iter__(self) -> Iterator[str]:
+        if self.first_chunk_delay > 0:
+            time.sleep(self.first_chunk_delay)
+        for chunk in self.chunks:
+            if self.chunk_delay > 0:
+                time.sleep(self.chunk_delay)
+            yield chunk
+
+
+class MockProvider:
+    """
+    Simulates an LLM endpoint with context caching
+
+    Latency model (per call):
+        base + uncached_input * prefill_per_token
+             + cached_input * cached_prefill_per_token
+             + output * decode_per_token
+    """
+
+    def __init__(self, time_scale: Optional[float] = None):
+        """
+        Initialize mock provider
+
+        Args:
+            time_scale: Multiplier applied to simulated latency before sleeping
+                (0 computes latency without sleeping; default MOCK_TIME_SCALE or 1.0)
+        """
+        self.time_scale = float(os.getenv("MOCK_TIME_SCALE", "1.0")) if time_scale is None else time_scale
+
+        self.base_latency = 0.15
+        self.prefill_per_token = 0.0004
+        self.cached_prefill_per_token = 0.00004
+        self.decode_per_token = 0.004
+        self.output_tokens = 180
+
+        # handle -> {"text", "tokens", "expires_at"}
+        self.contexts: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+        # Billing counters
+        self.calls = 0
+        self.billed_input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens_total = 0
+        self.simulated_seconds = 0.0
+
+    def create_cached_context(self, text: str, ttl_seconds: int) -> str:
+        """
+        Store a context prefix server-side
+
+        Args:
+            text: System/instruction prefix
+            ttl_seconds: Lifetime of the cached context
+
+        Returns:
+            Opaque handle referencing the cached context
+        """
+        handle = f"mockctx-{uuid.uuid4().hex[:12]}"
+        with self.lock:
+            self.contexts[handle] = {
+                "text": text,
+                "tokens": estimate_tokens(text),
+                "expires_at": time.time() + ttl_seconds
+            }
+        return handle
+
+    def delete_cached_context(self, handle: str):
+        with self.lock:
+            self.contexts.pop(handle, None)
+
+    def generate(self, prompt: str, system_message: Optional[str] = None,
+                 context_handle: Optional[str] = None, max_tokens: int = 2048,
+                 response_schema: Optional[Dict[str, Any]] = None, simulate_latency: bool = True) -> MockResponse:
+        """
+        Produce a deterministic completion
+
+        Args:
+            prompt: Request-specific prompt
+            system_message: Inline system text (billed in full)
+            context_handle: Cached context handle (billed at the cached rate)
+            max_tokens: Completion token limit
+            response_schema: JSON schema; the completion is then a JSON document matching it
+            simulate_latency: False returns at once (the latency is still reported)
+
+        Returns:
+            MockResponse
+
+        Raises:
+            KeyError: If the context handle is unknown or expired
+        """
+        cached_tokens = 0
+        context_text = ""
+        if context_handle:
+            with self.lock:
+                context = self.contexts.get(context_handle)
+                if context is None or context["expires_at"] < time.time():
+                    self.contexts.pop(context_handle, None)
+                    raise KeyError(f"Cached context {context_handle} not found or expired")
+            cached_tokens = context["tokens"]
+            context_text = context["text"]
+
+        uncached_tokens = estimate_tokens(prompt) + estimate_tokens(system_message)
+        completion_tokens = min(self.output_tokens, max_tokens)
+
+        latency = (self.base_latency
+                   + uncached_tokens * self.prefill_per_token
+                   + cached_tokens * self.cached_prefill_per_token
+                   + completion_tokens * self.decode_per_token)
+        if simulate_latency and self.time_scale > 0:
+            time.sleep(latency * self.time_scale)
+
+        digest = hashlib.sha256(f"{system_message}{context_text}{prompt}".encode()).hexdigest()[:10]
+        if response_schema:
+            text = json.dumps(example_for(response_schema, digest), ensure_ascii=False)
+        else:
+            text = (
+                "## Mock Provider Response\n\n"
+                f"Deterministic offline response `{digest}` "
+                f"({uncached_tokens} uncached + {cached_tokens} cached input tokens).\n\n"
+                "Configure Vertex AI or Groq for real analysis."
+            )
+
+        with self.lock:
+            self.calls += 1
+            self.billed_input_tokens += uncached_tokens
+            self.cached_input_tokens += cached_tokens
+            self.output_tokens_total += completion_tokens
+            self.simulated_seconds += latency
+
+        return MockResponse(text, uncached_tokens + cached_tokens, cached_tokens, completion_tokens, latency)
+
+    def stream(self, prompt: str, system_message: Optional[str] = None,
+               context_handle: Optional[str] = None, max_tokens: int = 2048,
+               response_schema: Optional[Dict[str, Any]] = None, chunk_chars: int = 24) -> MockStream:
+        """
+        Stream a deterministic completion in chunks, paced like token decoding
+
+        Prefill latency is paid before the first chunk, decode latency spread
+        across the chunks. Arguments as for generate(); the usage of this call
+        is available as .response on the returned stream.
+        """
+        response = self.generate(prompt, system_message, context_handle, max_tokens, response_schema,
+                                 simulate_latency=False)
+        chunks = [response.text[i:i + chunk_chars] for i in range(0, len(response.text), chunk_chars)]
+        decode = response.completion_tokens * self.decode_per_token
+        scale = max(self.time_scale, 0.0)
+        return MockStream(response, chunks, (response.latency_seconds - decode) * scale,
+                          decode / len(chunks) * scale)
+
+    def get_stats(self) -> dict:
+        """Get simulated billing and latency totals"""
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "billed_input_tokens": self.billed_input_tokens,
+                "cached_input_tokens": self.cached_input_tokens,
+                "output_tokens": self.output_tokens_total,
+                "simulated_seconds": round(self.simulated_seconds, 3),
+                "active_contexts": len(self.contexts)
+            }
+
+
+if __name__ == "__main__":
+    # Offline benchmark: inline system prompt vs. cached context handle
+    from app.prompts.registry import prompt_registry
+
+    template = prompt_registry.get("treatment")
+    body = template.render_body(age=45, weight=75, condition="Hypertension", history="Type 2 Diabetes",
+                                current_meds="Metformin 500mg BID", allergies="Penicillin, Sulfa drugs")
+
+    inline = MockProvider(time_scale=0)
+    for _ in range(100):
+        inline.generate(f"{template.static_prefix}\n\n{body}", system_message=template.system)
+
+    cached = MockProvider(time_scale=0)
+    handle = cached.create_cached_context(f"{template.system}\n\n{template.static_prefix}", ttl_seconds=3600)
+    for _ in range(100):
+        cached.generate(body, context_handle=handle)
+
+    a, b = inline.get_stats(), cached.get_stats()
+    print(f"Inline system prompt : {a['billed_input_tokens']} billed input tokens, {a['simulated_seconds']}s")
+    print(f"Cached context handle: {b['billed_input_tokens']} billed input tokens "
+          f"(+{b['cached_input_tokens']} cached), {b['simulated_seconds']}s")
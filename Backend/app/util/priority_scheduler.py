@@ -0,0 +1,236 @@
+"""
+Priority Scheduler for provider concurrency slots
+Replaces a plain semaphore: emergency requests are served first,
+interactive and background requests share the remaining slots by weighted
+fair queuing, and queued background work is preempted when an emergency
+request has to wait
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+PRIORITIES = ("emergency", "interactive", "background")
+
+# WFQ weights for the classes below emergency (emergency is strict priority)
+DEFAULT_WEIGHTS = {"interactive": 4.0, "background": 1.0}
+
+# Set per request (HTTP middleware, batch jobs, risk-aware agents); read by the rate limiters
+current_priority: ContextVar[str] = ContextVar("current_priority", default="interactive")
+
+
+@contextmanager
+def request_priority(priority: str):
+    """Run the enclosed AI calls in a priority class"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r} (expected one of {PRIORITIES})")
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class _Ticket:
+    __slots__ = ("priority", "tag", "enqueued", "granted", "preempted")
+
+    def __init__(self, priority: str, tag: float):
+        self.priority = priority
+        self.tag = tag
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.preempted = False
+
+
+class PriorityScheduler:
+    """Counting semaphore that grants slots by priority class"""
+
+    def __init__(self, slots: int, name: str = "default", weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize scheduler
+
+        Args:
+            slots: Concurrent holders allowed
+            name: Provider name used as the metrics label
+            weights: WFQ weight per non-emergency class (default DEFAULT_WEIGHTS)
+        """
+        self.slots = slots
+        self.name = name
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+        self.in_use = 0
+        self.cond = threading.Condition()
+        self.queues: Dict[str, deque] = {priority: deque() for priority in PRIORITIES}
+
+        # WFQ state: virtual clock and the last finish tag handed to each class
+        self.virtual_time = 0.0
+        self.last_tag = {priority: 0.0 for priority in PRIORITIES}
+
+        # Smoothed slot hold time, used for wait estimates
+        self.avg_hold_seconds = 1.0
+        self.granted = {priority: 0 for priority in PRIORITIES}
+        self.timeouts = {priority: 0 for priority in PRIORITIES}
+        self.preempted = 0
+
+    def acquire(self, priority: str = "interactive", timeout: float = 30.0) -> bool:
+        """
+        Wait for a slot
+
+        Args:
+            priority: emergency, interactive or background
+            timeout: Maximum time to wait (seconds)
+
+        Returns:
+            True once a slot is held; False on timeout or when preempted
+        """
+        start = time.monotonic()
+        with self.cond:
+            if self.in_use < self.slots and not any(self.queues.values()):
+                self.in_use += 1
+                self.granted[priority] += 1
+                self._observe_wait(priority, 0.0)
+                return True
+
+            ticket = _Ticket(priority, self._finish_tag(priority))
+            self.queues[priority].append(ticket)
+            if priority == "emergency":
+                self._preempt_background()
+
+            deadline = start + timeout
+            while not ticket.granted and not ticket.preempted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.queues[priority].remove(ticket)
+                    self.timeouts[priority] += 1
+                    metrics.inc("scheduler_timeouts_total", provider=self.name, priority=priority)
+                    return False
+                self.cond.wait(remaining)
+
+        self._observe_wait(priority, time.monotonic() - start)
+        return ticket.granted
+
+    def release(self, held_seconds: Optional[float] = None):
+        """Free a slot and hand it to the next queued request"""
+        with self.cond:
+            self.in_use -= 1
+            if held_seconds is not None:
+                self.avg_hold_seconds += 0.2 * (held_seconds - self.avg_hold_seconds)
+            self._dispatch()
+
+    def resize(self, slots: int):
+        """Change the slot count; extra slots go to queued requests at once, removed ones as holders release"""
+        with self.cond:
+            self.slots = slots
+            self._dispatch()
+
+    def _finish_tag(self, priority: str) -> float:
+        if priority == "emergency":
+            return 0.0
+        tag = max(self.virtual_time, self.last_tag[priority]) + 1.0 / self.weights[priority]
+        self.last_tag[priority] = tag
+        return tag
+
+    def _next(self) -> Optional[_Ticket]:
+        if self.queues["emergency"]:
+            return self.queues["emergency"].popleft()
+        heads = [queue[0] for priority, queue in self.queues.items() if queue and priority != "emergency"]
+        if not heads:
+            return None
+        ticket = min(heads, key=lambda t: t.tag)
+        self.queues[ticket.priority].popleft()
+        self.virtual_time = max(self.virtual_time, ticket.tag)
+        return ticket
+
+    def _dispatch(self):
+        """Grant free slots to queued tickets (caller holds the condition)"""
+        while self.in_use < self.slots:
+            ticket = self._next()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self.in_use += 1
+            self.granted[ticket.priority] += 1
+        self.cond.notify_all()
+
+    def _preempt_background(self):
+        """Drop queued background work so its callers fail fast and retry later"""
+        queue = self.queues["background"]
+        if not queue:
+            return
+        for ticket in queue:
+            ticket.preempted = True
+        metrics.inc("scheduler_preemptions_total", value=len(queue), provider=self.name)
+        log.info("scheduler.background_preempted", provider=self.name, count=len(queue))
+        self.preempted += len(queue)
+        queue.clear()
+        self.cond.notify_all()
+
+    def _observe_wait(self, priority: str, waited: float):
+        metrics.observe("scheduler_wait_seconds", waited, provider=self.name, priority=priority)
+
+    def queue_depths(self) -> Dict[str, int]:
+        with self.cond:
+            return {priority: len(queue) for priority, queue in self.queues.items()}
+
+    def estimated_wait(self, priority: str = "interactive") -> float:
+        """
+        Seconds a new request of this class would likely wait for a slot
+
+        Counts the queued work served before it (all emergency work, plus
+        the weighted share of the other class) and drains it at slots per
+        average hold time.
+        """
+        with self.cond:
+            if self.in_use < self.slots and not any(self.queues.values()):
+                return 0.0
+            ahead = len(self.queues["emergency"])
+            if priority != "emergency":
+                own = len(self.queues[priority])
+                other = "background" if priority == "interactive" else "interactive"
+                share = self.weights[other] / self.weights[priority]
+                ahead += own + min(len(self.queues[other]), share * (own + 1))
+            # Queued work plus the wait for a currently held slot to free up
+            return (ahead / self.slots + 0.5) * self.avg_hold_seconds
+
+    def get_stats(self) -> dict:
+        with self.cond:
+            return {
+                "slots": self.slots,
+                "in_use": self.in_use,
+                "queued": {priority: len(queue) for priority, queue in self.queues.items()},
+                "granted": dict(self.granted),
+                "timeouts": dict(self.timeouts),
+                "preempted": self.preempted,
+                "avg_hold_seconds": round(self.avg_hold_seconds, 3)
+            }
+
+
+if __name__ == "__main__":
+    # 2 slots, 1s hold: 6 background jobs queue first, then interactive and emergency requests arrive
+    scheduler = PriorityScheduler(slots=2, name="demo")
+    order = []
+
+    def worker(priority: str, label: str, delay: float):
+        time.sleep(delay)
+        if scheduler.acquire(priority, timeout=10):
+            order.append(label)
+            time.sleep(0.2)
+            scheduler.release(0.2)
+        else:
+            order.append(f"{label} (preempted)")
+
+    threads = [threading.Thread(target=worker, args=("background", f"bg{i}", 0)) for i in range(6)]
+    threads += [threading.Thread(target=worker, args=("interactive", f"int{i}", 0.05)) for i in range(3)]
+    threads.append(threading.Thread(target=worker, args=("emergency", "ER", 0.1)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print("Service order:", ", ".join(order))
+    print(scheduler.get_stats())
@@ -1,29 +1,46 @@
 """
-Global Rate Limiter with Token Bucket Algorithm and Semaphore Queue
-Prevents API flooding and manages concurrent requests
+Global Rate Limiter with Token Bucket Algorithm and Priority Slot Queue
+Prevents API flooding and manages concurrent requests; concurrency slots
+are granted by priority class (see app.util.priority_scheduler) and their
+number adapts to provider latency and 429s (see app.util.adaptive_concurrency)
 """
 
+import os
 import time
 import threading
 from collections import deque
 from typing import Optional
 from datetime import datetime, timedelta
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+from app.util.priority_scheduler import PriorityScheduler, current_priority
+from app.util.adaptive_concurrency import GradientLimit
+
+log = get_logger(__name__)
 
 class RateLimiter:
     """
     Token bucket rate limiter with semaphore for concurrent call control
     """
     
-    def __init__(self, calls_per_minute: int = 60, max_concurrent: int = 5):
+    def __init__(self, calls_per_minute: int = 60, max_concurrent: int = 5, name: str = "default",
+                 background_reserve: float = 0.2, min_concurrent: Optional[int] = None,
+                 max_concurrent_limit: Optional[int] = None):
         """
         Initialize rate limiter
         
         Args:
             calls_per_minute: Maximum API calls per minute
-            max_concurrent: Maximum concurrent API calls
+            max_concurrent: Initial maximum concurrent API calls
+            name: Provider name used as the metrics label
+            background_reserve: Fraction of the token bucket background calls may not spend,
+                kept for emergency and interactive calls
+            min_concurrent: Lowest concurrency the adaptive limit may set
+            max_concurrent_limit: Highest concurrency the adaptive limit may set
+                (both default to max_concurrent, i.e. a fixed limit)
         """
+        self.name = name
         self.calls_per_minute = calls_per_minute
-        self.max_concurrent = max_concurrent
         
         # Token bucket for rate limiting
         self.tokens = calls_per_minute
@@ -31,8 +48,14 @@ class RateLimiter:
         self.last_refill = time.time()
         self.refill_rate = calls_per_minute / 60.0  # tokens per second
         
-        # Semaphore for concurrent call limiting
-        self.semaphore = threading.Semaphore(max_concurrent)
+        self.background_reserve = background_reserve * calls_per_minute
+        
+        # Priority-aware slots for concurrent call limiting, sized by the adaptive limit
+        self.concurrency = GradientLimit(max_concurrent, min_concurrent or max_concurrent,
+                                         max_concurrent_limit or max_concurrent)
+        self.max_concurrent = self.concurrency.value
+        self.scheduler = PriorityScheduler(self.max_concurrent, name=name)
+        self.hold_starts = deque()
         
         # Call history for monitoring
         self.call_history = deque(maxlen=100)
@@ -54,40 +77,59 @@ class RateLimiter:
         self.tokens = min(self.max_tokens, self.tokens + new_tokens)
         self.last_refill = now
     
-    def acquire(self, timeout: float = 30.0) -> bool:
+    def acquire(self, timeout: float = 30.0, priority: Optional[str] = None) -> bool:
         """
         Acquire permission to make an API call
         
         Args:
             timeout: Maximum time to wait for permission (seconds)
+            priority: emergency, interactive or background (default: the request's current_priority)
             
         Returns:
-            True if permission granted, False if timeout
+            True if permission granted, False if timeout or preempted
         """
+        priority = priority or current_priority.get()
         start_time = time.time()
+        granted = self._acquire(start_time, timeout, priority)
         
+        waited = time.time() - start_time
+        metrics.observe("stage_duration_seconds", waited, stage="limiter_wait", provider=self.name)
+        if waited > 0.01:
+            metrics.inc("limiter_waits_total", provider=self.name)
+        if not granted:
+            metrics.inc("limiter_rejections_total", provider=self.name)
+        else:
+            with self.lock:
+                self.hold_starts.append(time.monotonic())
+        return granted
+    
+    def _acquire(self, start_time: float, timeout: float, priority: str) -> bool:
+        """Wait for backoff, a concurrency slot and a token (see acquire)"""
         # Check if in backoff period
         if self.backoff_until:
             wait_time = (self.backoff_until - datetime.now()).total_seconds()
             if wait_time > 0:
-                print(f"⏳ Rate limiter in backoff mode, waiting {wait_time:.1f}s...")
+                log.info("limiter.backoff_wait", sampled=True, provider=self.name, wait_seconds=round(wait_time, 1))
                 if wait_time > timeout:
                     return False
                 time.sleep(wait_time)
                 self.backoff_until = None
         
-        # Try to acquire semaphore (concurrent call limit)
-        if not self.semaphore.acquire(timeout=timeout):
-            print("⚠️ Too many concurrent requests, please wait...")
+        # Wait for a concurrency slot in this priority class
+        remaining = max(0.0, timeout - (time.time() - start_time))
+        if not self.scheduler.acquire(priority, timeout=remaining):
+            log.warning("limiter.concurrency_timeout", sampled=True, provider=self.name, priority=priority)
             return False
         
+        # Background calls leave the reserve for emergency and interactive ones
+        needed = 1.0 + (self.background_reserve if priority == "background" else 0.0)
         try:
             # Wait for token availability
             while True:
                 with self.lock:
                     self._refill_tokens()
                     
-                    if self.tokens >= 1.0:
+                    if self.tokens >= needed:
                         # Token available, consume it
                         self.tokens -= 1.0
                         self.call_history.append(time.time())
@@ -95,25 +137,69 @@ class RateLimiter:
                 
                 # Check timeout
                 if time.time() - start_time > timeout:
-                    print("⚠️ Rate limit timeout, request denied")
+                    log.warning("limiter.token_timeout", sampled=True, provider=self.name, priority=priority)
+                    self.scheduler.release()
                     return False
                 
                 # Wait a bit before retrying
                 time.sleep(0.1)
         
         except Exception as e:
-            # Release semaphore on error
-            self.semaphore.release()
+            # Release the slot on error
+            self.scheduler.release()
             raise e
     
     def release(self):
-        """Release the semaphore after API call completes"""
-        self.semaphore.release()
+        """Release the concurrency slot after API call completes"""
+        with self.lock:
+            # Oldest outstanding hold; an approximation when calls overlap, fine for the average
+            held = time.monotonic() - self.hold_starts.popleft() if self.hold_starts else None
+        self.scheduler.release(held)
     
-    def report_success(self):
-        """Report successful API call"""
+    def estimated_wait(self, priority: Optional[str] = None) -> float:
+        """
+        Seconds a new call of this class would likely wait in acquire:
+        remaining backoff, then the longer of the slot queue and the token
+        bucket (tokens for the calls queued ahead plus its own)
+        """
+        priority = priority or current_priority.get()
+        backoff = (self.backoff_until - datetime.now()).total_seconds() if self.backoff_until else 0.0
+        queued = sum(self.scheduler.queue_depths().values())
+        needed = 1.0 + (self.background_reserve if priority == "background" else 0.0)
+        with self.lock:
+            self._refill_tokens()
+            token_wait = max(0.0, queued + needed - self.tokens) / self.refill_rate
+        return max(0.0, backoff) + max(self.scheduler.estimated_wait(priority), token_wait)
+
+    def report_success(self, latency: Optional[float] = None, tokens: Optional[int] = None):
+        """
+        Report successful API call
+
+        Args:
+            latency: Call duration in seconds; feeds the adaptive concurrency limit
+            tokens: Completion tokens produced, so long and short completions are
+                compared against their own baselines
+        """
         with self.lock:
             self.consecutive_failures = 0
+            if latency is not None:
+                self._apply_limit(self.concurrency.on_sample(latency, self.scheduler.in_use, tokens), "latency")
+
+    def report_timeout(self):
+        """Report a timed-out API call (shrinks the concurrency limit)"""
+        with self.lock:
+            self._apply_limit(self.concurrency.on_drop(), "timeout")
+
+    def _apply_limit(self, limit: int, reason: str):
+        """Resize the slot pool to a new concurrency limit (caller holds the lock)"""
+        if limit == self.max_concurrent:
+            return
+        direction = "up" if limit > self.max_concurrent else "down"
+        self.max_concurrent = limit
+        self.scheduler.resize(limit)
+        metrics.inc("limiter_limit_changes_total", provider=self.name, direction=direction)
+        log.info("limiter.concurrency_changed", sampled=direction == "up", provider=self.name,
+                 limit=limit, reason=reason)
     
     def report_rate_limit_error(self):
         """Report rate limit error and activate backoff"""
@@ -123,8 +209,11 @@ class RateLimiter:
             # Exponential backoff: 2^failures seconds (max 60s)
             backoff_seconds = min(2 ** self.consecutive_failures, 60)
             self.backoff_until = datetime.now() + timedelta(seconds=backoff_seconds)
+            metrics.inc("circuit_trips_total", provider=self.name)
+            self._apply_limit(self.concurrency.on_drop(), "rate_limited")
             
-            print(f"🚨 Rate limit detected! Backing off for {backoff_seconds}s (failure #{self.consecutive_failures})")
+            log.warning("limiter.backoff_started", provider=self.name,
+                        backoff_seconds=backoff_seconds, consecutive_failures=self.consecutive_failures)
     
     def get_stats(self) -> dict:
         """Get rate limiter statistics"""
@@ -137,8 +226,10 @@ class RateLimiter:
                 "calls_last_minute": recent_calls,
                 "calls_per_minute_limit": self.calls_per_minute,
                 "max_concurrent": self.max_concurrent,
+                "concurrency": self.concurrency.get_stats(),
                 "consecutive_failures": self.consecutive_failures,
-                "in_backoff": self.backoff_until is not None
+                "in_backoff": self.backoff_until is not None,
+                "scheduler": self.scheduler.get_stats()
             }
 
 
@@ -146,11 +237,30 @@ class RateLimiterManager:
     """Manages separate rate limiters for different APIs"""
     
     def __init__(self):
-        # Google Gemini: 60 calls/min, max 5 concurrent
-        self.google_limiter = RateLimiter(calls_per_minute=60, max_concurrent=5)
+        reserve = float(os.getenv("RATE_LIMIT_BACKGROUND_RESERVE", "0.2"))
+        adaptive = os.getenv("ADAPTIVE_CONCURRENCY", "on").lower() not in ("off", "0", "false")
+        
+        def limiter(name: str, calls_per_minute: int, concurrent: int, low: int, high: int) -> RateLimiter:
+            """Limiter with RATE_LIMIT_<NAME>_RPM / _CONCURRENCY[_MIN|_MAX] overrides"""
+            prefix = f"RATE_LIMIT_{name.upper()}"
+            concurrent = int(os.getenv(f"{prefix}_CONCURRENCY", concurrent))
+            return RateLimiter(
+                calls_per_minute=int(os.getenv(f"{prefix}_RPM", calls_per_minute)),
+                max_concurrent=concurrent,
+                name=name,
+                background_reserve=reserve,
+                min_concurrent=int(os.getenv(f"{prefix}_CONCURRENCY_MIN", low)) if adaptive else None,
+                max_concurrent_limit=int(os.getenv(f"{prefix}_CONCURRENCY_MAX", high)) if adaptive else None
+            )
         
-        # Grok: 100 calls/min, max 10 concurrent
-        self.grok_limiter = RateLimiter(calls_per_minute=100, max_concurrent=10)
+        # Google Gemini: 60 calls/min, 5 concurrent to start (adapts within 2-20)
+        self.google_limiter = limiter("google", 60, 5, 2, 20)
+        
+        # Grok: 100 calls/min, 10 concurrent to start (adapts within 2-40)
+        self.grok_limiter = limiter("grok", 100, 10, 2, 40)
+        
+        # Offline mock provider (AI_PROVIDER=mock): generous limits for benchmarking
+        self.mock_limiter = limiter("mock", 6000, 20, 4, 64)
     
     def get_limiter(self, api_name: str) -> RateLimiter:
         """Get rate limiter for specific API"""
@@ -158,6 +268,8 @@ class RateLimiterManager:
             return self.google_limiter
         elif api_name.lower() in ['grok', 'xai']:
             return self.grok_limiter
+        elif api_name.lower() == 'mock':
+            return self.mock_limiter
         else:
             raise ValueError(f"Unknown API: {api_name}")
     
@@ -165,9 +277,34 @@ class RateLimiterManager:
         """Get statistics for all rate limiters"""
         return {
             "google": self.google_limiter.get_stats(),
-            "grok": self.grok_limiter.get_stats()
+            "grok": self.grok_limiter.get_stats(),
+            "mock": self.mock_limiter.get_stats()
         }
 
 
 # Global instance
 rate_limiter_manager = RateLimiterManager()
+
+metrics.register_gauge(
+    "limiter_tokens_available",
+    lambda: {(("provider", name),): stats["tokens_available"]
+             for name, stats in rate_limiter_manager.get_all_stats().items()},
+    "Tokens currently available in each provider bucket"
+)
+
+metrics.register_gauge(
+    "limiter_concurrency_limit",
+    lambda: {(("provider", name),): stats["max_concurrent"]
+             for name, stats in rate_limiter_manager.get_all_stats().items()},
+    "Current (adaptive) concurrency limit of each provider"
+)
+
+metrics.register_gauge(
+    "scheduler_queue_depth",
+    lambda: {(("priority", priority), ("provider", name)): depth
+             for name, limiter in (("google", rate_limiter_manager.google_limiter),
+                                   ("grok", rate_limiter_manager.grok_limiter),
+                                   ("mock", rate_limiter_manager.mock_limiter))
+             for priority, depth in limiter.scheduler.queue_depths().items()},
+    "Requests waiting for a provider slot, per priority class"
+)
@@ -1,20 +1,39 @@
 import os
-from typing import Optional, List, Dict
+import time
+from datetime import timedelta
+from typing import Optional, List, Dict, Any, Iterator
 from dotenv import load_dotenv
 from groq import Groq
 from app.util.rate_limiter import rate_limiter_manager
 from app.util.cache_manager import cache_manager
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+from app.util.token_budget import token_accountant, estimate_tokens
+from app.util.context_cache import context_cache
+from app.util.mock_provider import MockProvider
+from app.util.admission import admission_controller
+from app.util.http_pool import http_pool_manager
+from app.util.priority_scheduler import current_priority
+from app.util.structured_output import (
+    IncrementalJSONParser, StructuredOutputError, parse_document, schema_instructions, schema_key, validate
+)
 
 load_dotenv()
 
+log = get_logger(__name__)
+
 # Vertex AI imports (OAuth/Service Account authentication)
 try:
     import vertexai
     from vertexai.preview.generative_models import GenerativeModel, Image
+    from vertexai.preview import caching as vertex_caching
     VERTEX_AI_AVAILABLE = True
 except ImportError:
     VERTEX_AI_AVAILABLE = False
-    print("⚠️ Vertex AI SDK not available. Install with: pip install google-cloud-aiplatform")
+    log.warning("vertex.sdk_missing", hint="pip install google-cloud-aiplatform")
+
+# Smallest context Vertex AI accepts for CachedContent; shorter prefixes go inline as system_instruction
+VERTEX_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("VERTEX_CONTEXT_CACHE_MIN_TOKENS", "4096"))
 
 class SmartAIClient:
 
@@ -23,19 +42,22 @@ class SmartAIClient:
         credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
         if credentials_path and os.path.exists(credentials_path):
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
-            print(f"✅ Using Vertex AI credentials from: {credentials_path}")
+            log.info("vertex.credentials", source="service_account_file", path=credentials_path)
         else:
-            print("ℹ️ Using Application Default Credentials (ADC) for Vertex AI")
+            log.info("vertex.credentials", source="adc")
 
         # Initialize Vertex AI with OAuth/Service Account
         project_id = os.getenv("PROJECT_ID") or os.getenv("GCP_PROJECT_ID")
         self.vertex_ai_initialized = False
         self.vertex_gemini_model = None
+        self.vertex_model_name = None
+        # Context name -> GenerativeModel carrying the system instruction (no cache support)
+        self.vertex_context_models: Dict[str, "GenerativeModel"] = {}
         
         if not VERTEX_AI_AVAILABLE:
-            print("⚠️ Vertex AI SDK not installed. Install with: pip install google-cloud-aiplatform")
+            log.warning("vertex.unavailable", reason="sdk_not_installed")
         elif not project_id or project_id == "your-gcp-project-id":
-            print("⚠️ GCP_PROJECT_ID not configured. Vertex AI will not be available.")
+            log.warning("vertex.unavailable", reason="GCP_PROJECT_ID not configured")
         else:
             try:
                 vertexai.init(
@@ -50,18 +72,19 @@ class SmartAIClient:
                 for model_name in model_names:
                     try:
                         self.vertex_gemini_model = GenerativeModel(model_name)
-                        print(f"✅ Vertex AI Gemini model initialized: {model_name} (using OAuth/Service Account)")
+                        self.vertex_model_name = model_name
+                        log.info("vertex.model_initialized", model=model_name)
                         break
                     except Exception as e:
-                        print(f"⚠️ Failed to initialize {model_name}: {str(e)}")
+                        log.warning("vertex.model_init_failed", model=model_name, error=str(e))
                         continue
                 
                 if not self.vertex_gemini_model:
-                    print("⚠️ No Vertex AI Gemini model available. Will use Groq fallback.")
+                    log.warning("vertex.unavailable", reason="no Gemini model could be initialized", fallback="groq")
                     
             except Exception as e:
-                print(f"⚠️ Vertex AI initialization failed: {e}")
-                print("⚠️ Will use Groq as fallback. Ensure GCP_PROJECT_ID and GOOGLE_APPLICATION_CREDENTIALS are set correctly.")
+                log.warning("vertex.init_failed", error=str(e), fallback="groq",
+                            hint="Ensure GCP_PROJECT_ID and GOOGLE_APPLICATION_CREDENTIALS are set correctly")
 
         self.groq_api_key = os.getenv("GROQ_API_KEY")
         self.groq_model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
@@ -70,54 +93,515 @@ class SmartAIClient:
         self.groq_limiter = rate_limiter_manager.get_limiter("grok")
 
         self.cache = cache_manager
-        self.groq_client = Groq(api_key=self.groq_api_key) if self.groq_api_key else None
+        self.context_cache = context_cache
+        # Shared keep-alive pool with a connection for every slot the adaptive limit can open
+        self.groq_client = Groq(
+            api_key=self.groq_api_key,
+            http_client=http_pool_manager.client("grok", self.groq_limiter.concurrency.max_limit)
+        ) if self.groq_api_key else None
+
+        # AI_PROVIDER=mock routes completions to the offline mock provider
+        self.mock_provider = MockProvider() if os.getenv("AI_PROVIDER", "auto").lower() == "mock" else None
+        self.mock_limiter = rate_limiter_manager.get_limiter("mock")
+        if self.mock_provider:
+            log.warning("provider.mock_enabled")
+
+        self.admission = admission_controller
+
+    def active_limiters(self, vision: bool = False) -> list:
+        """Limiters of the providers a completion (or with vision, an image analysis) would try, in order"""
+        if vision:
+            return [self.google_limiter] if self.vertex_gemini_model else []
+        if self.mock_provider:
+            return [self.mock_limiter]
+        return [limiter for limiter, configured in ((self.google_limiter, self.vertex_gemini_model),
+                                                    (self.groq_limiter, self.groq_client)) if configured]
+
+    def admit(self, priority: Optional[str] = None, vision: bool = False):
+        """
+        Admission check for an incoming request, before it starts any work
+
+        Args:
+            priority: Request priority class (default: the request's current_priority)
+            vision: Check the vision provider's queue instead of the text providers'
+
+        Raises:
+            OverloadedError: If providers are too backed up to serve it (503 + Retry-After)
+        """
+        self.admission.admit(self.active_limiters(vision), priority)
 
     def simple_prompt(self, prompt: str, system_message: Optional[str] = None,
-                      temperature: float = 0.7, max_tokens: int = 2048) -> str:
+                      temperature: float = 0.7, max_tokens: int = 2048,
+                      agent: Optional[str] = None, prompt_version: Optional[str] = None,
+                      cache: bool = False, static_prefix: Optional[str] = None,
+                      context: Optional[str] = None, response_schema: Optional[Dict[str, Any]] = None,
+                      priority: Optional[str] = None) -> str:
+        """
+        Run a text completion on Vertex AI Gemini, falling back to Groq
 
-        full_prompt = f"{system_message}\n\n{prompt}" if system_message else prompt
+        Args:
+            prompt: Request-specific prompt
+            system_message: Optional system message
+            temperature: Sampling temperature
+            max_tokens: Requested completion tokens (clamped to the agent budget)
+            agent: Calling agent name, used for token budgets and accounting
+            prompt_version: Registry template key; stands in for the static
+                system/instruction text in the response cache key
+            cache: Serve identical requests from the response cache
+            static_prefix: Static instructions sent ahead of the prompt
+            context: Name under which system_message + static_prefix are
+                registered for provider context caching (usually the agent
+                name or template key); None sends them inline every call
+            response_schema: Ask the provider for JSON matching this schema
+                (JSON mode); responses that fail validation are never cached
+            priority: Scheduling class for provider slots (emergency, interactive,
+                background); default is the request's current_priority
+
+        Returns:
+            Completion text
+
+        Raises:
+            StructuredOutputError: If response_schema is set and the response does not match it
+            OverloadedError: If no provider can start the call within the priority's SLO
+        """
+        static_text = f"{system_message or ''}\n\n{static_prefix or ''}" if static_prefix else system_message
+        prompt, max_tokens = token_accountant.apply_budget(agent, prompt, static_text, max_tokens)
+
+        if not cache:
+            result = self._generate(prompt, system_message, static_prefix, context, temperature, max_tokens,
+                                    agent, response_schema, priority)
+            if response_schema:
+                parse_document(result, response_schema)
+            return result
+
+        # The template version hash already identifies the static text
+        cache_system = None if prompt_version else static_text
+        cached = self.cache.get(prompt, cache_system, temperature=temperature,
+                                max_tokens=max_tokens, prompt_version=prompt_version)
+        if cached is not None:
+            return cached
+
+        result = self._generate(prompt, system_message, static_prefix, context, temperature, max_tokens,
+                                agent, response_schema, priority)
+        if response_schema:
+            parse_document(result, response_schema)
+        self.cache.set(result, prompt, cache_system, temperature=temperature,
+                       max_tokens=max_tokens, prompt_version=prompt_version)
+        return result
+
+    def structured_prompt(self, prompt: str, schema: Dict[str, Any], system_message: Optional[str] = None,
+                          temperature: float = 0.3, max_tokens: int = 2048, agent: Optional[str] = None,
+                          prompt_version: Optional[str] = None, cache: bool = False,
+                          static_prefix: Optional[str] = None, context: Optional[str] = None,
+                          repair_attempts: int = 1, priority: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run a completion constrained to a JSON schema and return the parsed document
+
+        The schema shape is appended to the static prefix and passed to the
+        provider's JSON mode (Vertex response_schema, Groq json_object). An
+        invalid reply is retried with the validation errors appended.
+
+        Args:
+            prompt: Request-specific prompt
+            schema: JSON schema (see app.prompts.schemas)
+            repair_attempts: Extra calls allowed after an invalid reply
+            Others: As for simple_prompt
+
+        Returns:
+            Parsed document matching the schema
+
+        Raises:
+            StructuredOutputError: If no valid document was produced
+        """
+        static_prefix, prompt_version, context = self._structured_request(schema, static_prefix, prompt_version, context)
+        request = prompt
+        for attempt in range(repair_attempts + 1):
+            try:
+                text = self.simple_prompt(request, system_message, temperature, max_tokens, agent, prompt_version,
+                                          cache=cache and attempt == 0, static_prefix=static_prefix,
+                                          context=context, response_schema=schema, priority=priority)
+                metrics.inc("structured_outputs_total", agent=agent or "unknown",
+                            outcome="valid" if attempt == 0 else "repaired")
+                return parse_document(text, schema)
+            except StructuredOutputError as e:
+                log.warning("structured.invalid_response", agent=agent, attempt=attempt, error=str(e))
+                error = e
+                request = (f"{prompt}\n\nYour previous reply was rejected ({e}). "
+                           "Reply again with only the JSON object.")
+        metrics.inc("structured_outputs_total", agent=agent or "unknown", outcome="invalid")
+        raise error
+
+    def stream_structured(self, prompt: str, schema: Dict[str, Any], system_message: Optional[str] = None,
+                          temperature: float = 0.3, max_tokens: int = 2048, agent: Optional[str] = None,
+                          prompt_version: Optional[str] = None, cache: bool = False,
+                          static_prefix: Optional[str] = None, context: Optional[str] = None,
+                          max_depth: int = 2, priority: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a schema-constrained completion as parsed field events
+
+        Args:
+            max_depth: Deepest path reported as a field event (2 reports top-level
+                fields and each array item, e.g. "risk_level" and "dosages.0")
+            Others: As for structured_prompt
+
+        Yields:
+            {"event": "field", "path", "value"} for each value as soon as it is
+            complete, then {"event": "complete", "result", "valid", "errors", "cached"}
+        """
+        static_prefix, prompt_version, context = self._structured_request(schema, static_prefix, prompt_version, context)
+        static_text = f"{system_message or ''}\n\n{static_prefix}"
+        prompt, max_tokens = token_accountant.apply_budget(agent, prompt, static_text, max_tokens)
+
+        cache_system = None if prompt_version else static_text
+        cached = self.cache.get(prompt, cache_system, temperature=temperature, max_tokens=max_tokens,
+                                prompt_version=prompt_version) if cache else None
+        chunks = [cached] if cached is not None else self._stream(
+            prompt, system_message, static_prefix, context, temperature, max_tokens, agent, schema, priority)
+
+        parser = IncrementalJSONParser()
+        raw = []
+        errors = []
+        try:
+            for chunk in chunks:
+                raw.append(chunk)
+                for path, value in parser.feed(chunk):
+                    if path and path.count(".") < max_depth:
+                        yield {"event": "field", "path": path, "value": value}
+        except StructuredOutputError as e:
+            log.warning("structured.invalid_stream", agent=agent, error=str(e))
+            errors = [str(e)]
+        finally:
+            # Stop a malformed provider stream now (releases its slot)
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+        if not errors:
+            errors = validate(parser.value, schema) if parser.done else ["incomplete JSON document"]
+        if cache and cached is None and not errors:
+            self.cache.set("".join(raw), prompt, cache_system, temperature=temperature,
+                           max_tokens=max_tokens, prompt_version=prompt_version)
+        metrics.inc("structured_outputs_total", agent=agent or "unknown", outcome="streamed" if not errors else "invalid")
+        yield {"event": "complete", "result": parser.value if parser.done else parser.partial,
+               "valid": not errors, "errors": errors, "cached": cached is not None}
+
+    @staticmethod
+    def _structured_request(schema: Dict[str, Any], static_prefix: Optional[str], prompt_version: Optional[str],
+                            context: Optional[str]):
+        """Static prefix, cache version and context name for a structured-mode request"""
+        suffix = f"#json:{schema_key(schema)}"
+        instructions = schema_instructions(schema)
+        static_prefix = f"{static_prefix}\n\n{instructions}" if static_prefix else instructions
+        return (static_prefix,
+                f"{prompt_version}{suffix}" if prompt_version else None,
+                f"{context}{suffix}" if context else None)
+
+    @staticmethod
+    def _vertex_config(temperature: float, max_tokens: int, response_schema: Optional[Dict[str, Any]]) -> dict:
+        config = {"temperature": temperature, "max_output_tokens": max_tokens}
+        if response_schema:
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = response_schema
+        return config
+
+    @staticmethod
+    def _groq_options(response_schema: Optional[Dict[str, Any]]) -> dict:
+        """Extra Groq request options: JSON mode when a schema is requested"""
+        return {"response_format": {"type": "json_object"}} if response_schema else {}
+
+    def _create_vertex_context(self, text: str, ttl_seconds: int):
+        """Create a Vertex AI CachedContent and return a model bound to it"""
+        cached_content = vertex_caching.CachedContent.create(
+            model_name=self.vertex_model_name,
+            system_instruction=text,
+            ttl=timedelta(seconds=ttl_seconds)
+        )
+        return GenerativeModel.from_cached_content(cached_content=cached_content)
+
+    def _vertex_model_for(self, context_name: Optional[str]):
+        """
+        Pick the Vertex model for a request
+
+        Returns a model bound to a provider-side cached context when the
+        context is large enough to cache, otherwise a per-context model
+        carrying the text as system_instruction, so it is never
+        concatenated into the user prompt.
+        """
+        if not context_name:
+            return self.vertex_gemini_model
+
+        model = self.context_cache.resolve(context_name, "google", self._create_vertex_context,
+                                           min_tokens=VERTEX_CONTEXT_CACHE_MIN_TOKENS)
+        if model is not None:
+            return model
+
+        model = self.vertex_context_models.get(context_name)
+        if model is None:
+            text = self.context_cache.contexts[context_name].text
+            model = GenerativeModel(self.vertex_model_name, system_instruction=[text])
+            self.vertex_context_models[context_name] = model
+        return model
+
+    def _generate(self, prompt: str, system_message: Optional[str], static_prefix: Optional[str],
+                  context: Optional[str], temperature: float, max_tokens: int,
+                  agent: Optional[str], response_schema: Optional[Dict[str, Any]] = None,
+                  priority: Optional[str] = None) -> str:
+        """Call the providers in order (see simple_prompt)"""
+        # Fail fast (agents fall back) rather than queue past the SLO
+        self.admission.check_call(self.active_limiters(), priority)
+        if context:
+            self.context_cache.register(context, system_message, static_prefix)
+
+        # Inline form used by providers without a cached context
+        user_prompt = f"{static_prefix}\n\n{prompt}" if static_prefix else prompt
+        full_prompt = f"{system_message}\n\n{user_prompt}" if system_message else user_prompt
+
+        if self.mock_provider:
+            return self._generate_mock(prompt, system_message, user_prompt, context, max_tokens, agent,
+                                       response_schema, priority)
 
         # Try Vertex AI Gemini first (primary - using OAuth/Service Account)
-        if self.vertex_gemini_model and self.google_limiter.acquire(timeout=30):
+        if self.vertex_gemini_model and self.google_limiter.acquire(timeout=self.admission.slo(priority), priority=priority):
             try:
-                response = self.vertex_gemini_model.generate_content(
-                    full_prompt,
-                    generation_config={
-                        "temperature": temperature,
-                        "max_output_tokens": max_tokens
-                    }
+                model = self._vertex_model_for(context)
+                call_start = time.perf_counter()
+                with metrics.timer("provider_call", provider="google"):
+                    response = model.generate_content(
+                        prompt if context else full_prompt,
+                        generation_config=self._vertex_config(temperature, max_tokens, response_schema)
+                    )
+                latency = time.perf_counter() - call_start
+                metrics.inc("provider_calls_total", provider="google", outcome="success")
+                usage = getattr(response, "usage_metadata", None)
+                completion_tokens = getattr(usage, "candidates_token_count", 0) or estimate_tokens(response.text)
+                self.google_limiter.report_success(latency, completion_tokens)
+                token_accountant.record(
+                    agent, "google",
+                    getattr(usage, "prompt_token_count", 0) or estimate_tokens(full_prompt),
+                    completion_tokens,
+                    cached_tokens=getattr(usage, "cached_content_token_count", 0) or 0
                 )
-                self.google_limiter.report_success()
-                self.google_limiter.release()
                 return response.text
             except Exception as e:
+                self._report_failure(self.google_limiter, e)
+                if context:
+                    self.context_cache.invalidate(context, "google")
+                metrics.inc("provider_calls_total", provider="google", outcome="error")
+                metrics.inc("fallbacks_total", source="google", target="groq")
+                log.warning("provider.fallback", source="google", target="groq", error=str(e))
+            finally:
                 self.google_limiter.release()
-                print(f"⚠️ Vertex AI Gemini failed: {str(e)}, falling back to Groq...")
 
         # Fallback to Groq (only fallback)
-        if self.groq_client and self.groq_limiter.acquire(timeout=30):
+        if self.groq_client and self.groq_limiter.acquire(timeout=self.admission.slo(priority), priority=priority):
             try:
-                # Build messages for Groq API (supports system/user roles)
+                # Build messages for Groq API (supports system/user roles). Groq has no
+                # explicit context cache; keeping the static text first lets its
+                # automatic prefix caching apply on supported models.
                 messages = []
                 if system_message:
                     messages.append({"role": "system", "content": system_message})
-                messages.append({"role": "user", "content": prompt})
+                messages.append({"role": "user", "content": user_prompt})
                 
-                resp = self.groq_client.chat.completions.create(
+                call_start = time.perf_counter()
+                with metrics.timer("provider_call", provider="grok"):
+                    resp = self.groq_client.chat.completions.create(
+                        model=self.groq_model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=http_pool_manager.timeout(priority or current_priority.get()),
+                        **self._groq_options(response_schema)
+                    )
+                latency = time.perf_counter() - call_start
+                metrics.inc("provider_calls_total", provider="grok", outcome="success")
+                content = resp.choices[0].message.content
+                usage = getattr(resp, "usage", None)
+                completion_tokens = getattr(usage, "completion_tokens", 0) or estimate_tokens(content)
+                self.groq_limiter.report_success(latency, completion_tokens)
+                token_accountant.record(
+                    agent, "grok",
+                    getattr(usage, "prompt_tokens", 0) or estimate_tokens(full_prompt),
+                    completion_tokens
+                )
+                return content
+            except Exception as e:
+                self._report_failure(self.groq_limiter, e)
+                metrics.inc("provider_calls_total", provider="grok", outcome="error")
+                raise Exception(f"Both Vertex AI and Groq failed. Groq error: {str(e)}")
+            finally:
+                self.groq_limiter.release()
+
+        raise Exception("No AI provider available")
+
+    @staticmethod
+    def _report_failure(limiter, error: Exception):
+        """Feed provider 429s (backoff + limit cut) and timeouts (limit cut) to the limiter"""
+        text = str(error).lower()
+        if getattr(error, "status_code", None) == 429 or any(
+                marker in text for marker in ("429", "rate limit", "resource exhausted", "quota")):
+            limiter.report_rate_limit_error()
+        elif "timed out" in text or "timeout" in text or "deadline exceeded" in text:
+            limiter.report_timeout()
+
+    def _generate_mock(self, prompt: str, system_message: Optional[str], user_prompt: str,
+                       context: Optional[str], max_tokens: int, agent: Optional[str],
+                       response_schema: Optional[Dict[str, Any]] = None, priority: Optional[str] = None) -> str:
+        """Serve a completion from the offline mock provider, using its context cache"""
+        if not self.mock_limiter.acquire(timeout=self.admission.slo(priority), priority=priority):
+            raise Exception("No AI provider available")
+        try:
+            handle = None
+            if context:
+                handle = self.context_cache.resolve(context, "mock", self.mock_provider.create_cached_context)
+            call_start = time.perf_counter()
+            with metrics.timer("provider_call", provider="mock"):
+                try:
+                    if handle:
+                        response = self.mock_provider.generate(prompt, context_handle=handle, max_tokens=max_tokens,
+                                                               response_schema=response_schema)
+                    else:
+                        response = self.mock_provider.generate(user_prompt, system_message=system_message,
+                                                               max_tokens=max_tokens, response_schema=response_schema)
+                except KeyError:
+                    # Context expired provider-side before our refresh margin; resend inline
+                    self.context_cache.invalidate(context, "mock")
+                    response = self.mock_provider.generate(user_prompt, system_message=system_message,
+                                                           max_tokens=max_tokens, response_schema=response_schema)
+            self.mock_limiter.report_success(time.perf_counter() - call_start, response.completion_tokens)
+            metrics.inc("provider_calls_total", provider="mock", outcome="success")
+            token_accountant.record(agent, "mock", response.prompt_tokens, response.completion_tokens,
+                                    cached_tokens=response.cached_tokens)
+            return response.text
+        finally:
+            self.mock_limiter.release()
+
+    def _stream(self, prompt: str, system_message: Optional[str], static_prefix: Optional[str],
+                context: Optional[str], temperature: float, max_tokens: int, agent: Optional[str],
+                response_schema: Optional[Dict[str, Any]] = None, priority: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream completion text chunks, trying providers in the same order as _generate
+
+        A provider that fails before its first chunk falls through to the next
+        one; a failure mid-stream is raised to the consumer.
+        """
+        self.admission.check_call(self.active_limiters(), priority)
+        if context:
+            self.context_cache.register(context, system_message, static_prefix)
+        user_prompt = f"{static_prefix}\n\n{prompt}" if static_prefix else prompt
+        full_prompt = f"{system_message}\n\n{user_prompt}" if system_message else user_prompt
+        start = time.perf_counter()
+
+        if self.mock_provider:
+            if not self.mock_limiter.acquire(timeout=self.admission.slo(priority), priority=priority):
+                raise Exception("No AI provider available")
+            call_start = time.perf_counter()
+            try:
+                handle = None
+                if context:
+                    handle = self.context_cache.resolve(context, "mock", self.mock_provider.create_cached_context)
+                stream = self.mock_provider.stream(prompt if handle else user_prompt,
+                                                   system_message=None if handle else system_message,
+                                                   context_handle=handle, max_tokens=max_tokens,
+                                                   response_schema=response_schema)
+                for i, chunk in enumerate(stream):
+                    if i == 0:
+                        metrics.record_stage("provider_first_chunk", start, provider="mock")
+                    yield chunk
+                response = stream.response
+                self.mock_limiter.report_success(time.perf_counter() - call_start, response.completion_tokens)
+                metrics.record_stage("provider_call", start, provider="mock", kind="stream")
+                metrics.inc("provider_calls_total", provider="mock", outcome="success")
+                token_accountant.record(agent, "mock", response.prompt_tokens, response.completion_tokens,
+                                        cached_tokens=response.cached_tokens)
+                return
+            finally:
+                self.mock_limiter.release()
+
+        if self.vertex_gemini_model and self.google_limiter.acquire(timeout=self.admission.slo(priority), priority=priority):
+            parts: List[str] = []
+            call_start = time.perf_counter()
+            try:
+                response = self._vertex_model_for(context).generate_content(
+                    prompt if context else full_prompt,
+                    generation_config=self._vertex_config(temperature, max_tokens, response_schema),
+                    stream=True
+                )
+                usage = None
+                for chunk in response:
+                    text = chunk.text
+                    if not parts:
+                        metrics.record_stage("provider_first_chunk", start, provider="google")
+                    parts.append(text)
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    yield text
+                completion_tokens = getattr(usage, "candidates_token_count", 0) or estimate_tokens("".join(parts))
+                self.google_limiter.report_success(time.perf_counter() - call_start, completion_tokens)
+                metrics.record_stage("provider_call", start, provider="google", kind="stream")
+                metrics.inc("provider_calls_total", provider="google", outcome="success")
+                token_accountant.record(
+                    agent, "google",
+                    getattr(usage, "prompt_token_count", 0) or estimate_tokens(full_prompt),
+                    completion_tokens,
+                    cached_tokens=getattr(usage, "cached_content_token_count", 0) or 0
+                )
+                return
+            except Exception as e:
+                self._report_failure(self.google_limiter, e)
+                if context:
+                    self.context_cache.invalidate(context, "google")
+                metrics.inc("provider_calls_total", provider="google", outcome="error")
+                if parts:
+                    raise
+                metrics.inc("fallbacks_total", source="google", target="groq")
+                log.warning("provider.fallback", source="google", target="groq", error=str(e), kind="stream")
+            finally:
+                self.google_limiter.release()
+
+        if self.groq_client and self.groq_limiter.acquire(timeout=self.admission.slo(priority), priority=priority):
+            parts = []
+            call_start = time.perf_counter()
+            try:
+                messages = []
+                if system_message:
+                    messages.append({"role": "system", "content": system_message})
+                messages.append({"role": "user", "content": user_prompt})
+                stream = self.groq_client.chat.completions.create(
                     model=self.groq_model,
                     messages=messages,
                     temperature=temperature,
-                    max_tokens=max_tokens
+                    max_tokens=max_tokens,
+                    stream=True,
+                    timeout=http_pool_manager.timeout("stream"),
+                    **self._groq_options(response_schema)
                 )
-                self.groq_limiter.release()
-                return resp.choices[0].message.content
+                for chunk in stream:
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if not text:
+                        continue
+                    if not parts:
+                        metrics.record_stage("provider_first_chunk", start, provider="grok")
+                    parts.append(text)
+                    yield text
+                completion_tokens = estimate_tokens("".join(parts))
+                self.groq_limiter.report_success(time.perf_counter() - call_start, completion_tokens)
+                metrics.record_stage("provider_call", start, provider="grok", kind="stream")
+                metrics.inc("provider_calls_total", provider="grok", outcome="success")
+                token_accountant.record(agent, "grok", estimate_tokens(full_prompt), completion_tokens)
+                return
             except Exception as e:
-                self.groq_limiter.release()
+                self._report_failure(self.groq_limiter, e)
+                metrics.inc("provider_calls_total", provider="grok", outcome="error")
+                if parts:
+                    raise
                 raise Exception(f"Both Vertex AI and Groq failed. Groq error: {str(e)}")
+            finally:
+                self.groq_limiter.release()
 
         raise Exception("No AI provider available")
 
-    def vision_analysis(self, image_path: str, prompt: str, system_message: Optional[str] = None) -> str:
+    def vision_analysis(self, image_path: str, prompt: str, system_message: Optional[str] = None,
+                        context: Optional[str] = None, response_schema: Optional[Dict[str, Any]] = None,
+                        priority: Optional[str] = None) -> str:
         """
         Analyze image using Vertex AI Gemini Vision (OAuth/Service Account)
         Falls back to Groq if Vertex AI fails (note: Groq doesn't support vision)
@@ -126,28 +610,63 @@ class SmartAIClient:
             image_path: Path to the image file
             prompt: The prompt/question for the image
             system_message: Optional system message/instructions
+            context: Context name for caching system_message + prompt provider-side
+                (the prompt must then be static, e.g. a pre-rendered template)
+            response_schema: Ask for JSON matching this schema (the prompt should
+                then include schema_instructions)
+            priority: Scheduling class for the Vertex slot (default: the request's current_priority)
             
         Returns:
             Analysis response as string
+
+        Raises:
+            OverloadedError: If the Vertex queue is longer than the priority's SLO
         """
         # Combine system message with prompt if provided
         full_prompt = f"{system_message}\n\n{prompt}" if system_message else prompt
 
         # Try Vertex AI Gemini Vision (primary - using OAuth/Service Account)
         if self.vertex_gemini_model:
+            # Vision calls share the Gemini slots and quota with text calls
+            self.admission.check_call(self.active_limiters(vision=True), priority)
+            if not self.google_limiter.acquire(timeout=self.admission.slo(priority), priority=priority):
+                raise Exception("Vertex AI Vision unavailable: no provider slot within the latency SLO")
             try:
                 with open(image_path, "rb") as f:
                     image_bytes = f.read()
                 image = Image.from_bytes(image_bytes)
                 
-                response = self.vertex_gemini_model.generate_content([
-                    full_prompt,
-                    image
-                ])
+                if context:
+                    self.context_cache.register(context, system_message, prompt)
+                    contents = [image]
+                else:
+                    contents = [full_prompt, image]
+                
+                call_start = time.perf_counter()
+                with metrics.timer("provider_call", provider="google", kind="vision"):
+                    response = self._vertex_model_for(context).generate_content(
+                        contents,
+                        generation_config=self._vertex_config(0.4, 2048, response_schema) if response_schema else None
+                    )
+                latency = time.perf_counter() - call_start
+                metrics.inc("provider_calls_total", provider="google", outcome="success")
+                usage = getattr(response, "usage_metadata", None)
+                completion_tokens = getattr(usage, "candidates_token_count", 0) or estimate_tokens(response.text)
+                self.google_limiter.report_success(latency, completion_tokens)
+                token_accountant.record(
+                    "diagnostic", "google",
+                    getattr(usage, "prompt_token_count", 0) or estimate_tokens(full_prompt),
+                    completion_tokens,
+                    cached_tokens=getattr(usage, "cached_content_token_count", 0) or 0
+                )
                 return response.text
             except Exception as e:
+                self._report_failure(self.google_limiter, e)
+                metrics.inc("provider_calls_total", provider="google", outcome="error")
+                if context:
+                    self.context_cache.invalidate(context, "google")
                 error_msg = str(e)
-                print(f"⚠️ Vertex AI Vision failed: {error_msg}")
+                log.error("provider.vision_failed", provider="google", error=error_msg)
                 
                 # Note: Groq doesn't support vision, so we can't fallback for image analysis
                 raise Exception(
@@ -159,6 +678,8 @@ class SmartAIClient:
                     "4. The project has access to Gemini models\n"
                     "Note: Vision analysis requires Vertex AI (Groq doesn't support image analysis)"
                 )
+            finally:
+                self.google_limiter.release()
 
         # Vertex AI not available
         raise Exception(
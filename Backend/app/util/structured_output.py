@@ -0,0 +1,309 @@
+"""
+Structured Output Utilities
+Schema-constrained JSON for agent responses: prompt instructions derived
+from a JSON schema, validation, deterministic example documents (for the
+mock provider) and an incremental parser that reports each field as soon
+as it is complete in a streamed response
+"""
+
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Runs of ordinary string characters, consumed in one step while parsing
+_STRING_RUN = re.compile(r'[^"\\]+')
+_SCALAR_CHARS = set("-+.0123456789eEtrufalsn")
+_WHITESPACE = set(" \t\r\n")
+_TYPES = {"object": dict, "array": list, "string": str, "boolean": bool}
+# Models occasionally emit raw newlines inside strings; accept them
+_DECODER = json.JSONDecoder(strict=False)
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a model response is not valid JSON for the requested schema"""
+
+    def __init__(self, message: str, raw: str = "", errors: Optional[List[str]] = None):
+        super().__init__(message)
+        self.raw = raw
+        self.errors = errors or []
+
+
+def schema_key(schema: Dict[str, Any]) -> str:
+    """Short stable hash of a schema, used in response cache keys"""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def describe_schema(schema: Dict[str, Any]) -> str:
+    """Compact shape of a schema: {"risk_level": "Low|Medium|High", "dosages": [{"drug": string}]}"""
+    kind = schema.get("type")
+    if "enum" in schema:
+        return json.dumps("|".join(str(v) for v in schema["enum"]), ensure_ascii=False)
+    if kind == "object":
+        required = set(schema.get("required", []))
+        fields = [f'"{name}"{"" if name in required else "?"}: {describe_schema(sub)}'
+                  for name, sub in schema.get("properties", {}).items()]
+        return "{" + ", ".join(fields) + "}"
+    if kind == "array":
+        return f"[{describe_schema(schema.get('items', {}))}]"
+    return kind or "any"
+
+
+def schema_instructions(schema: Dict[str, Any]) -> str:
+    """Instruction block appended to the static prompt prefix in structured mode"""
+    return (
+        "RESPONSE FORMAT: Reply with exactly one JSON object and nothing else (no markdown, no code fences, "
+        "no commentary); this overrides any formatting guidance above. Emit the keys in the order shown; "
+        "keys marked ? are optional.\n"
+        f"Shape: {describe_schema(schema)}"
+    )
+
+
+def validate(value: Any, schema: Dict[str, Any], path: str = "") -> List[str]:
+    """
+    Check a parsed document against a schema (type, enum, required, properties, items)
+
+    Args:
+        value: Parsed JSON value
+        schema: JSON schema subset
+        path: Dotted location of value, used in messages
+
+    Returns:
+        List of error messages (empty when valid)
+    """
+    where = path or "<root>"
+    kind = schema.get("type")
+    if kind in ("number", "integer"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or (kind == "integer" and value != int(value)):
+            return [f"{where}: expected {kind}"]
+    elif kind in _TYPES and not isinstance(value, _TYPES[kind]):
+        return [f"{where}: expected {kind}"]
+    if "enum" in schema and value not in schema["enum"]:
+        return [f"{where}: {value!r} not one of {schema['enum']}"]
+
+    errors = []
+    if kind == "object":
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{where}: missing {name}")
+        for name, sub in schema.get("properties", {}).items():
+            if name in value:
+                errors += validate(value[name], sub, f"{path}.{name}" if path else name)
+    elif kind == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            errors += validate(item, schema["items"], f"{path}.{i}" if path else str(i))
+    return errors
+
+
+def example_for(schema: Dict[str, Any], seed: str, path: str = "") -> Any:
+    """Deterministic document matching a schema; enum choices and text vary with seed"""
+    digest = hashlib.sha256(f"{seed}:{path}".encode()).digest()
+    kind = schema.get("type")
+    if "enum" in schema:
+        return schema["enum"][digest[0] % len(schema["enum"])]
+    if kind == "object":
+        return {name: example_for(sub, seed, f"{path}.{name}")
+                for name, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_for(schema.get("items", {}), seed, f"{path}.{i}") for i in range(1 + digest[0] % 2)]
+    if kind == "boolean":
+        return bool(digest[0] % 2)
+    if kind == "integer":
+        return digest[0] % 10
+    if kind == "number":
+        return round(digest[0] / 255, 2)
+    label = next((part for part in reversed(path.split(".")) if part and not part.isdigit()), "value")
+    return f"Mock {label} {digest.hex()[:6]}"
+
+
+def parse_document(text: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parse a complete model response into a validated document
+
+    Raises:
+        StructuredOutputError: If no JSON object can be parsed or it fails validation
+    """
+    parser = IncrementalJSONParser()
+    try:
+        parser.feed(text)
+    except StructuredOutputError as e:
+        raise StructuredOutputError(str(e), raw=text) from e
+    if not parser.done:
+        raise StructuredOutputError("Response is not a complete JSON document", raw=text)
+    errors = validate(parser.value, schema)
+    if errors:
+        raise StructuredOutputError(f"Response does not match schema: {'; '.join(errors[:5])}", raw=text, errors=errors)
+    return parser.value
+
+
+class IncrementalJSONParser:
+    """
+    Push parser for a JSON document arriving in chunks
+
+    feed() returns (path, value) for every value completed by the chunk, in
+    document order: scalars as soon as their closing quote/delimiter arrives
+    and containers once closed. Paths are dotted ("dosages.0.drug"); the root
+    document completes with path "". Text before the first { or [ (such as a
+    code fence) and after the root closes is ignored.
+
+    Malformed input inside the document (a bare word such as True, a missing
+    comma or colon, mismatched brackets) raises StructuredOutputError.
+    """
+
+    def __init__(self):
+        self.stack: List[list] = []   # [container, pending key, path]
+        self.value: Any = None
+        self.done = False
+        self.in_string = False
+        self.escape = False
+        self.string_parts: List[str] = []
+        self.scalar: List[str] = []
+        self.expect_key = False
+        self.need_colon = False       # Key read, ":" must follow
+        self.need_separator = False   # Value read, "," or a closing bracket must follow
+
+    @property
+    def partial(self) -> Any:
+        """The document parsed so far (root container, still growing)"""
+        return self.stack[0][0] if self.stack else self.value
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        events: List[Tuple[str, Any]] = []
+        i, n = 0, len(chunk)
+        while i < n and not self.done:
+            if self.in_string:
+                if self.escape:
+                    self.string_parts.append(chunk[i])
+                    self.escape = False
+                    i += 1
+                    continue
+                run = _STRING_RUN.match(chunk, i)
+                if run:
+                    self.string_parts.append(run.group())
+                    i = run.end()
+                    continue
+                ch = chunk[i]
+                i += 1
+                if ch == "\\":
+                    self.string_parts.append(ch)
+                    self.escape = True
+                    continue
+                self.in_string = False
+                text = self._decode('"' + "".join(self.string_parts) + '"', _DECODER.decode)
+                self.string_parts = []
+                if self.expect_key:
+                    self.stack[-1][1] = text
+                    self.expect_key = False
+                    self.need_colon = True
+                else:
+                    self._complete(text, events)
+                continue
+
+            ch = chunk[i]
+            if ch in _SCALAR_CHARS and self.stack:
+                if not self.scalar:
+                    self._expect_value(ch)
+                self.scalar.append(ch)
+                i += 1
+                continue
+            if self.scalar:
+                self._complete(self._decode("".join(self.scalar), json.loads), events)
+                self.scalar = []
+                if self.done:
+                    break
+            i += 1
+            if not self.stack and ch not in "{[":
+                continue
+            if ch in _WHITESPACE:
+                continue
+            if ch == '"':
+                if not self.expect_key:
+                    self._expect_value(ch)
+                self.in_string = True
+            elif ch in "{[":
+                if self.stack:
+                    self._expect_value(ch)
+                container = {} if ch == "{" else []
+                self.stack.append([container, None, self._child_path()])
+                self.expect_key = ch == "{"
+                self.need_separator = False
+            elif ch in "}]":
+                container, key, path = self.stack[-1]
+                if isinstance(container, dict) != (ch == "}") or self.need_colon or key is not None:
+                    raise StructuredOutputError(f"Unexpected {ch!r} in JSON document")
+                self.stack.pop()
+                self.expect_key = False
+                self._complete(container, events, path)
+            elif ch == ",":
+                if not self.need_separator:
+                    raise StructuredOutputError("Unexpected ',' in JSON document")
+                self.need_separator = False
+                self.expect_key = isinstance(self.stack[-1][0], dict)
+            elif ch == ":":
+                if not self.need_colon:
+                    raise StructuredOutputError("Unexpected ':' in JSON document")
+                self.need_colon = False
+            else:
+                raise StructuredOutputError(f"Unexpected character {ch!r} in JSON document")
+        return events
+
+    def _expect_value(self, ch: str):
+        """Reject a value where a key, ":" or "," is required"""
+        if self.expect_key or self.need_colon or self.need_separator:
+            expected = "a key" if self.expect_key else "':'" if self.need_colon else "',' or a closing bracket"
+            raise StructuredOutputError(f"Unexpected {ch!r} in JSON document (expected {expected})")
+
+    @staticmethod
+    def _decode(text: str, decode) -> Any:
+        try:
+            return decode(text)
+        except ValueError as e:
+            raise StructuredOutputError(f"Invalid JSON value {text[:40]!r}: {e}") from e
+
+    def _child_path(self) -> str:
+        if not self.stack:
+            return ""
+        container, key, path = self.stack[-1]
+        name = key if isinstance(container, dict) else str(len(container))
+        return f"{path}.{name}" if path else name
+
+    def _complete(self, value: Any, events: List[Tuple[str, Any]], path: Optional[str] = None):
+        """Attach a finished value to its parent and report it"""
+        if path is None:
+            path = self._child_path()
+        if not self.stack:
+            self.value = value
+            self.done = True
+        else:
+            self.need_separator = True
+            parent = self.stack[-1]
+            if isinstance(parent[0], dict):
+                parent[0][parent[1]] = value
+                parent[1] = None
+            else:
+                parent[0].append(value)
+        events.append((path, value))
+
+
+if __name__ == "__main__":
+    import time
+    from app.prompts.schemas import SCHEMAS
+
+    schema = SCHEMAS["treatment"]
+    print(schema_instructions(schema), "\n")
+    document = json.dumps(example_for(schema, "demo"), indent=2)
+    parser = IncrementalJSONParser()
+    for start in range(0, len(document), 16):
+        for path, value in parser.feed(document[start:start + 16]):
+            if "." not in path and path:
+                print(f"{path:20} -> {json.dumps(value)[:60]}")
+    print("valid:", not validate(parser.value, schema))
+
+    big = "```json\n" + json.dumps([example_for(schema, str(i)) for i in range(200)]) + "\n```"
+    start = time.perf_counter()
+    parser = IncrementalJSONParser()
+    for offset in range(0, len(big), 64):
+        parser.feed(big[offset:offset + 64])
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Parsed {len(big) / 1024:.0f} KB in 64-byte chunks: {elapsed:.1f} ms (matches json.loads: "
+          f"{parser.value == json.loads(big[8:-4])})")
@@ -0,0 +1,309 @@
+"""
+Token Accounting and Prompt Compaction
+Estimates tokens locally, enforces per-agent budgets and reports spend
+"""
+
+import math
+import os
+import re
+import threading
+from contextvars import ContextVar
+from typing import Optional, Dict, List, Tuple
+from app.util.metrics import metrics
+from app.util.logger import get_logger
+
+log = get_logger(__name__)
+
+# Set per request by the API middleware so spend can be attributed to endpoints
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="internal")
+
+# Words, numbers, newlines, indentation runs and single other characters (e.g. Devanagari)
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|\n|[ \t]{2,}|[^\sA-Za-z\d]")
+_MULTISPACE = re.compile(r"[ \t]+")
+_BLANK_RUN = re.compile(r"\n{3,}")
+# A markdown-ish section header such as "**Recent Diagnostics:**" or "1. **Treatment Plan**"
+_HEADER = re.compile(r"^\s*(\d+\.\s*)?\*\*[^*]+\*\*:?\s*$")
+_EMPTY_ITEM = re.compile(r"^\s*[-*]\s*(None)?\s*$")
+# Lines budget elision never drops (only clips): the user's current message
+PINNED_LINE_PREFIXES = ("Current User Message:",)
+_OMITTED = "[... omitted to fit token budget ...]"
+# Smallest remainder worth filling with a clipped line
+_MIN_CLIP_TOKENS = 16
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimate BPE token count without a provider tokenizer
+
+    English words cost roughly one token per 4 characters, digits one per
+    3, and non-Latin scripts (hi/mr prompts) close to one per character.
+    Newlines and indentation runs cost a token each, as in BPE vocabularies.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        first = piece[0]
+        if first.isalpha() and first.isascii():
+            tokens += max(1, math.ceil(len(piece) / 4))
+        elif first.isdigit():
+            tokens += max(1, math.ceil(len(piece) / 3))
+        else:
+            tokens += 1
+    return tokens
+
+
+def compact_prompt(text: str) -> str:
+    """
+    Remove token waste from templated prompts
+
+    Strips indentation and trailing whitespace, collapses repeated blank
+    lines and spaces, and drops section headers with no content under them.
+
+    Args:
+        text: Prompt text
+
+    Returns:
+        Compacted prompt
+    """
+    lines = [_MULTISPACE.sub(" ", line).strip() for line in text.strip().splitlines()]
+
+    compacted: List[str] = []
+    for i, line in enumerate(lines):
+        if _EMPTY_ITEM.match(line):
+            continue
+        if _HEADER.match(line):
+            # Drop the header if the next non-blank line is another header or the end
+            following = next((l for l in lines[i + 1:] if l and not _EMPTY_ITEM.match(l)), None)
+            if following is None or _HEADER.match(following):
+                continue
+        compacted.append(line)
+
+    return _BLANK_RUN.sub("\n\n", "\n".join(compacted)).strip()
+
+
+def truncate_history(messages: List[str], max_tokens: int) -> List[str]:
+    """
+    Keep the most recent messages that fit in a token budget
+
+    Args:
+        messages: Messages in chronological order
+        max_tokens: Budget for the whole history
+
+    Returns:
+        Suffix of messages whose combined estimate fits the budget
+    """
+    kept: List[str] = []
+    used = 0
+    for message in reversed(messages):
+        cost = estimate_tokens(message)
+        if used + cost > max_tokens:
+            break
+        kept.append(message)
+        used += cost
+    return list(reversed(kept))
+
+
+def clip_text(text: str, max_tokens: int) -> str:
+    """
+    Clip free text to roughly max_tokens, preferring a sentence boundary
+
+    Args:
+        text: Text to clip
+        max_tokens: Token allowance
+
+    Returns:
+        Original text if it fits, otherwise a clipped version ending in '...'
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    approx = text[:max_tokens * 4]
+    cut = approx.rfind(". ")
+    return (approx[:cut + 1] if cut > len(approx) // 2 else approx.rstrip()) + "..."
+
+
+class TokenBudget:
+    """Per-request input/output token limits for one agent"""
+
+    def __init__(self, max_input_tokens: int, max_output_tokens: int):
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+
+    def to_dict(self) -> dict:
+        return {"max_input_tokens": self.max_input_tokens, "max_output_tokens": self.max_output_tokens}
+
+
+# Defaults sized from current prompts; override with TOKEN_BUDGET_<AGENT>_INPUT/_OUTPUT
+DEFAULT_BUDGETS = {
+    "treatment": (1800, 3000),
+    "user_health": (1000, 1000),
+    "user_health_batch": (3000, 3000),
+    "hospital": (2500, 1500),
+    "mental_health": (1500, 800),
+    "diagnostic": (1500, 2048),
+    "default": (4000, 2048),
+}
+
+
+class TokenAccountant:
+    """
+    Records token spend and applies per-agent budgets
+    """
+
+    def __init__(self):
+        self.budgets: Dict[str, TokenBudget] = {}
+        for agent, (max_in, max_out) in DEFAULT_BUDGETS.items():
+            prefix = f"TOKEN_BUDGET_{agent.upper()}"
+            self.budgets[agent] = TokenBudget(
+                max_input_tokens=int(os.getenv(f"{prefix}_INPUT", max_in)),
+                max_output_tokens=int(os.getenv(f"{prefix}_OUTPUT", max_out))
+            )
+
+        # (dimension, key) -> [requests, input_tokens, output_tokens, cached_input_tokens]
+        self.usage: Dict[Tuple[str, str], List[int]] = {}
+        self.tokens_saved = 0
+        self.truncations = 0
+        self.lock = threading.Lock()
+
+    def get_budget(self, agent: Optional[str]) -> TokenBudget:
+        return self.budgets.get(agent or "default", self.budgets["default"])
+
+    def apply_budget(self, agent: Optional[str], prompt: str, system_message: Optional[str],
+                     max_tokens: int) -> Tuple[str, int]:
+        """
+        Compact a prompt and clamp it and max_tokens to the agent budget
+
+        Args:
+            agent: Agent name (treatment, user_health, ...)
+            prompt: User prompt
+            system_message: System prompt, counted against the input budget
+            max_tokens: Requested completion tokens
+
+        Returns:
+            Tuple of (prompt to send, max_tokens to request)
+        """
+        budget = self.get_budget(agent)
+
+        before = estimate_tokens(prompt)
+        prompt = compact_prompt(prompt)
+        after = estimate_tokens(prompt)
+
+        allowance = budget.max_input_tokens - estimate_tokens(system_message)
+        if after > allowance > 0:
+            prompt = self._elide_middle(prompt, allowance)
+            log.warning("tokens.prompt_truncated", agent=agent, estimated=after, allowance=allowance)
+            with self.lock:
+                self.truncations += 1
+            after = estimate_tokens(prompt)
+
+        with self.lock:
+            self.tokens_saved += max(0, before - after)
+
+        return prompt, min(max_tokens, budget.max_output_tokens)
+
+    def _elide_middle(self, prompt: str, allowance: int) -> str:
+        """
+        Keep the head (patient data) and tail (instructions) of an oversized prompt
+
+        Pinned lines (PINNED_LINE_PREFIXES) are always kept, clipped to half the
+        allowance at most; a line too long for the remaining budget is clipped
+        rather than dropped. Each omitted run becomes one marker line.
+        """
+        lines = prompt.splitlines()
+        kept: Dict[int, str] = {}
+        used = 2 * (estimate_tokens(_OMITTED) + 1)
+        for i, line in enumerate(lines):
+            if line.startswith(PINNED_LINE_PREFIXES):
+                kept[i] = clip_text(line, max(1, allowance // 2))
+                used += estimate_tokens(kept[i]) + 1
+
+        lo, hi = 0, len(lines) - 1
+        take_tail = True
+        while lo <= hi:
+            i = hi if take_tail else lo
+            if take_tail:
+                hi -= 1
+            else:
+                lo += 1
+            take_tail = not take_tail
+            if i in kept:
+                continue
+            line, remaining = lines[i], allowance - used
+            if estimate_tokens(line) + 1 > remaining:
+                if remaining < _MIN_CLIP_TOKENS:
+                    break
+                line = clip_text(line, remaining - 1)
+                if estimate_tokens(line) + 1 > remaining:
+                    break
+            kept[i] = line
+            used += estimate_tokens(line) + 1
+
+        output: List[str] = []
+        for i, line in enumerate(lines):
+            if i in kept:
+                output.append(kept[i])
+            elif not output or output[-1] != _OMITTED:
+                output.append(_OMITTED)
+        return "\n".join(output)
+
+    def record(self, agent: Optional[str], provider: str, input_tokens: int, output_tokens: int,
+               cached_tokens: int = 0):
+        """
+        Record token usage for one completion
+
+        Args:
+            agent: Agent name
+            provider: Provider that served the call
+            input_tokens: Prompt tokens (provider-reported or estimated)
+            output_tokens: Completion tokens (provider-reported or estimated)
+            cached_tokens: Portion of input_tokens served from a provider context cache
+        """
+        agent = agent or "default"
+        endpoint = current_endpoint.get()
+
+        with self.lock:
+            for key in (("agent", agent), ("provider", provider), ("endpoint", endpoint)):
+                entry = self.usage.setdefault(key, [0, 0, 0, 0])
+                entry[0] += 1
+                entry[1] += input_tokens
+                entry[2] += output_tokens
+                entry[3] += cached_tokens
+
+        metrics.inc("tokens_total", input_tokens, direction="input", agent=agent, provider=provider)
+        metrics.inc("tokens_total", output_tokens, direction="output", agent=agent, provider=provider)
+        if cached_tokens:
+            metrics.inc("tokens_total", cached_tokens, direction="cached_input", agent=agent, provider=provider)
+
+    def get_stats(self) -> dict:
+        """Get token spend grouped by agent, provider and endpoint"""
+        with self.lock:
+            report: Dict[str, Dict[str, dict]] = {"agent": {}, "provider": {}, "endpoint": {}}
+            for (dimension, key), (requests, tokens_in, tokens_out, tokens_cached) in self.usage.items():
+                report[dimension][key] = {
+                    "requests": requests,
+                    "input_tokens": tokens_in,
+                    "cached_input_tokens": tokens_cached,
+                    "output_tokens": tokens_out,
+                    "avg_input_tokens": round(tokens_in / requests, 1) if requests else 0
+                }
+            return {
+                "by_agent": report["agent"],
+                "by_provider": report["provider"],
+                "by_endpoint": report["endpoint"],
+                "tokens_saved_by_compaction": self.tokens_saved,
+                "budget_truncations": self.truncations,
+                "budgets": {agent: budget.to_dict() for agent, budget in self.budgets.items()}
+            }
+
+
+# Global instance
+token_accountant = TokenAccountant()
+
+metrics.describe("tokens_total", "counter", "Prompt and completion tokens by agent and provider")
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Offline, fast and isolated: mock provider with no simulated latency, scratch databases
+_SCRATCH = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("AI_PROVIDER", "mock")
+os.environ.setdefault("MOCK_TIME_SCALE", "0")
+os.environ.setdefault("USER_HEALTH_DB_PATH", os.path.join(_SCRATCH, "user_health.db"))
+os.environ.setdefault("JOB_QUEUE_DB_PATH", os.path.join(_SCRATCH, "jobs.db"))
+os.environ.setdefault("JOB_ATTACHMENT_DIR", os.path.join(_SCRATCH, "jobs"))
@@ -0,0 +1,41 @@
+import random
+
+from app.util.adaptive_concurrency import GradientLimit
+
+
+def _run(limit: GradientLimit, steps: int, capacity: int, with_tokens: bool = True, seed: int = 0) -> GradientLimit:
+    """Feed a provider whose calls take 0.3s + 10ms per token, queueing beyond capacity in flight"""
+    rng = random.Random(seed)
+    for _ in range(steps):
+        in_flight = limit.value
+        tokens = rng.choice([40, 60, 900, 1200])
+        latency = (0.3 + 0.01 * tokens) * max(1.0, in_flight / capacity) * rng.uniform(0.9, 1.1)
+        limit.on_sample(latency, in_flight, tokens if with_tokens else None)
+    return limit
+
+
+def test_mixed_completion_lengths_keep_limit_stable():
+    limit = _run(GradientLimit(initial=10, min_limit=2, max_limit=10), 2000, capacity=100)
+    assert limit.value == 10
+    assert limit.decreases == 0
+
+
+def test_raw_latency_mix_would_shrink_limit():
+    # The failure mode token normalisation prevents: long calls read as queueing
+    limit = _run(GradientLimit(initial=10, min_limit=2, max_limit=10), 2000, capacity=100, with_tokens=False)
+    assert limit.value < 10
+
+
+def test_queueing_still_stops_growth():
+    # Grows past the provider's capacity only until queueing outweighs the tolerance
+    limit = _run(GradientLimit(initial=2, min_limit=2, max_limit=40), 2000, capacity=8)
+    assert 8 <= limit.value <= 20
+    assert limit.decreases > 0
+
+
+def test_unknown_token_counts_share_a_class():
+    limit = GradientLimit(initial=5, min_limit=2, max_limit=10)
+    limit.on_sample(1.0, 5)
+    limit.on_sample(1.0, 5, 0)
+    assert list(limit.classes) == [0]
+    assert limit.classes[0].samples == 2
@@ -0,0 +1,76 @@
+import pytest
+
+from app.util.admission import AdmissionController, OverloadedError
+from app.util.priority_scheduler import request_priority
+from app.util.smart_ai_client import smart_ai_client
+
+
+class Limiter:
+    """Stands in for a provider RateLimiter with a fixed wait estimate"""
+
+    def __init__(self, wait: float):
+        self.wait = wait
+
+    def estimated_wait(self, priority: str) -> float:
+        return self.wait
+
+
+def controller(**kwargs) -> AdmissionController:
+    return AdmissionController(slo_seconds={"emergency": 30.0, "interactive": 8.0, "background": 60.0},
+                               shed_factor=3.0, **kwargs)
+
+
+def test_requests_shed_only_far_over_the_slo():
+    c = controller()
+    c.admit([Limiter(20.0)], "interactive")  # over the SLO, under SLO x shed_factor
+
+    with pytest.raises(OverloadedError) as shed:
+        c.admit([Limiter(30.0)], "interactive")
+    assert shed.value.retry_after == 30 and shed.value.estimated_wait == 30.0
+    assert c.decisions["shed"]["interactive"] == 1 and c.decisions["admitted"]["interactive"] == 1
+
+
+def test_emergency_requests_are_never_shed():
+    c = controller()
+    c.admit([Limiter(500.0)], "emergency")
+    assert c.decisions["admitted"]["emergency"] == 1
+
+
+def test_calls_degrade_at_the_slo():
+    c = controller()
+    c.check_call([Limiter(8.0)], "interactive")
+    with pytest.raises(OverloadedError) as degraded:
+        c.check_call([Limiter(9.0)], "interactive")
+    assert degraded.value.retry_after == 9
+    c.check_call([Limiter(9.0)], "background")
+    with pytest.raises(OverloadedError):
+        c.check_call([Limiter(31.0)], "emergency")
+
+
+def test_wait_is_the_fastest_provider_and_priority_comes_from_context():
+    c = controller()
+    assert c.estimated_wait([Limiter(40.0), Limiter(2.0)]) == 2.0
+    assert c.estimated_wait([]) == 0.0
+    with request_priority("background"):
+        c.admit([Limiter(100.0)])  # 100s is fine for background work
+    assert c.decisions["admitted"]["background"] == 1
+
+
+def test_retry_after_is_clamped():
+    with pytest.raises(OverloadedError) as shed:
+        controller().admit([Limiter(10_000.0)], "interactive")
+    assert shed.value.retry_after == 120
+
+
+def test_disabled_controller_admits_everything():
+    c = controller(enabled=False)
+    c.admit([Limiter(1000.0)], "interactive")
+    c.check_call([Limiter(1000.0)], "interactive")
+
+
+def test_overloaded_client_fails_calls_before_queueing(monkeypatch):
+    monkeypatch.setattr(smart_ai_client, "active_limiters", lambda vision=False: [Limiter(1000.0)])
+    with pytest.raises(OverloadedError):
+        smart_ai_client.simple_prompt("hello")
+    with pytest.raises(OverloadedError):
+        smart_ai_client.admit()
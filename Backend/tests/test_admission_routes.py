@@ -0,0 +1,50 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.routes import treatment, user_health, mental_health
+from app.util.admission import OverloadedError
+from app.util.smart_ai_client import smart_ai_client
+
+PATIENT = {"age": 40, "weight": 70, "condition": "hypertension"}
+
+ROUTES = [
+    ("post", "/api/v1/treatment/recommend-treatment", PATIENT),
+    ("post", "/api/v1/treatment/recommend-treatment/structured", PATIENT),
+    ("post", "/api/v1/treatment/recommend-treatment/stream", PATIENT),
+    ("post", "/api/v1/user/dashboard", {"user_id": "USER001"}),
+    ("get", "/api/v1/user/insights/USER001/structured", None),
+    ("post", "/api/v1/mental-health/chat", {"message": "hello"}),
+]
+
+
+@pytest.fixture
+def overloaded(monkeypatch):
+    """Shed every admission and fail loudly if a route reaches its agent anyway"""
+    priorities = []
+
+    def shed(priority=None, vision=False):
+        priorities.append(priority)
+        raise OverloadedError("AI providers overloaded", retry_after=7, estimated_wait=40.0)
+
+    def reached(*args, **kwargs):
+        raise AssertionError("route started work after being shed")
+
+    monkeypatch.setattr(smart_ai_client, "admit", shed)
+    for agent, name in [(treatment.agent, "recommend_treatment"), (treatment.agent, "recommend_treatment_structured"),
+                        (treatment.agent, "stream_treatment"), (user_health.agent, "generate_user_health_data"),
+                        (mental_health.agent, "chat")]:
+        monkeypatch.setattr(agent, name, reached)
+    return priorities
+
+
+@pytest.mark.parametrize("method,path,body", ROUTES)
+def test_ai_routes_shed_before_work(overloaded, method, path, body):
+    response = getattr(TestClient(app), method)(path, **({"json": body} if body else {}))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_urgent_treatment_admitted_at_emergency_priority(overloaded):
+    TestClient(app).post("/api/v1/treatment/recommend-treatment", json={**PATIENT, "urgent": True})
+    assert overloaded == ["emergency"]
@@ -0,0 +1,91 @@
+import re
+import time
+
+import pytest
+
+from app.services.batch_insights import BatchInsightsJob, parse_sections
+from app.services.user_health_repository import UserHealthRepository
+
+
+class FakeAdmission:
+    def estimated_wait(self, limiters):
+        return 0.0
+
+    def slo(self, priority=None):
+        return 60.0
+
+
+class FakeClient:
+    """Answers each pack with a section per patient, except ids listed in `skip`"""
+
+    def __init__(self, skip=()):
+        self.admission = FakeAdmission()
+        self.skip = set(skip)
+        self.prompts = []
+
+    def active_limiters(self, vision=False):
+        return []
+
+    def simple_prompt(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        ids = re.findall(r"^\[(\w+)\]", prompt, re.MULTILINE)
+        return "\n\n".join(f"### Patient {user_id}\nReport for {user_id}." for user_id in ids if user_id not in self.skip)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = UserHealthRepository(str(tmp_path / "health.db"))
+    repo.ensure_population(12)
+    return repo
+
+
+def job(repo, client, **kwargs) -> BatchInsightsJob:
+    return BatchInsightsJob(repo, client, db_path=repo.db_path, pack_size=4, **kwargs)
+
+
+def test_parse_sections_keeps_expected_patients_only():
+    text = ("Intro line\n### Patient USER001\nFirst.\n## Patient [USER002]:\nSecond.\n"
+            "### Patient USER999\nNot asked for.\n### Patient USER003\n\n### Patient USER001\nDuplicate.")
+    assert parse_sections(text, ["USER001", "USER002", "USER003"]) == {"USER001": "First.", "USER002": "Second."}
+
+
+def test_run_packs_by_cohort_and_stores_insights(repo):
+    client = FakeClient()
+    batch = job(repo, client)
+    status = batch.run()
+
+    assert status["done"] == status["total"] == 12 and status["finished_at"]
+    assert batch.get("USER005")["insight"] == "Report for USER005."
+    for prompt in client.prompts:
+        assert prompt.count("\n[") <= 4  # pack size
+        cohort = prompt.splitlines()[0]
+        assert cohort.startswith("Cohort: age ") and cohort.endswith(" risk")
+    assert len(client.prompts) >= 3
+
+
+def test_missing_sections_retry_then_fail(repo):
+    client = FakeClient(skip={"USER003"})
+    status = job(repo, client, max_attempts=2).run()
+
+    assert (status["done"], status["failed"], status["pending"]) == (11, 1, 0)
+    assert sum("[USER003]" in prompt for prompt in client.prompts) == 2
+
+
+def test_interrupted_run_resumes_without_repeating_work(repo):
+    first = FakeClient()
+    batch = job(repo, first)
+    partial = batch.run(max_packs=1)
+    assert partial["finished_at"] is None and 0 < partial["done"] < 12
+
+    second = FakeClient()
+    resumed = job(repo, second).run()
+    assert resumed["run_id"] == partial["run_id"] and resumed["done"] == 12
+    done_first = set(re.findall(r"^\[(\w+)\]", first.prompts[0], re.MULTILINE))
+    assert not any(f"[{user_id}]" in prompt for prompt in second.prompts for user_id in done_first)
+
+
+def test_stale_insights_are_not_served(repo):
+    batch = job(repo, FakeClient(), max_age_hours=1)
+    batch.run()
+    batch._conn().execute("UPDATE insights SET generated_at = ? WHERE user_id = 'USER001'", (time.time() - 7200,))
+    assert batch.get("USER001") is None and batch.get("USER002") is not None
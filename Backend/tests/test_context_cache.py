@@ -0,0 +1,50 @@
+import threading
+import time
+
+from app.util.context_cache import ContextCacheManager
+
+
+def test_concurrent_first_requests_create_one_provider_context():
+    cache = ContextCacheManager()
+    cache.register("treatment", "system " * 100)
+    created = []
+
+    def create(text, ttl_seconds):
+        time.sleep(0.05)
+        created.append(text)
+        return f"handle-{len(created)}"
+
+    handles = []
+    threads = [threading.Thread(target=lambda: handles.append(cache.resolve("treatment", "google", create)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert handles == ["handle-1"] * 8
+
+
+def test_contexts_below_the_provider_minimum_are_not_created():
+    cache = ContextCacheManager()
+    cache.register("mental_health", "short system prompt")
+
+    def create(text, ttl_seconds):
+        raise AssertionError("should not be called")
+
+    assert cache.resolve("mental_health", "google", create, min_tokens=4096) is None
+    assert cache.failures == 0 and "google" not in cache.contexts["mental_health"].handles
+
+
+def test_creation_failure_is_remembered():
+    cache = ContextCacheManager()
+    cache.register("diagnostic", "system")
+    calls = []
+
+    def create(text, ttl_seconds):
+        calls.append(text)
+        raise RuntimeError("unsupported")
+
+    assert cache.resolve("diagnostic", "google", create) is None
+    assert cache.resolve("diagnostic", "google", create) is None
+    assert len(calls) == 1 and cache.failures == 1
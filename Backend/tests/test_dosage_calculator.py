@@ -0,0 +1,62 @@
+import pytest
+
+from app.services.dosage_calculator import DosageCalculator
+
+
+@pytest.fixture(scope="module")
+def calculator():
+    return DosageCalculator()
+
+
+def _doses(result):
+    return {r["drug"]: r for r in result["regimens"]}
+
+
+def test_pediatric_dose_is_weight_based_and_rounded(calculator):
+    amoxicillin = _doses(calculator.calculate("Pneumonia", 6, 20))["Amoxicillin"]
+    # 45 mg/kg x 20 kg, BID, rounded to the 50 mg step
+    assert (amoxicillin["dose_mg"], amoxicillin["daily_mg"], amoxicillin["basis"]) == (900, 1800, "45 mg/kg")
+    assert not amoxicillin["capped"]
+
+
+def test_adult_dose_is_fixed(calculator):
+    amoxicillin = _doses(calculator.calculate("community acquired pneumonia", 45, 75))["Amoxicillin"]
+    assert (amoxicillin["dose_mg"], amoxicillin["frequency"], amoxicillin["basis"]) == (1000, "TID", "fixed dose")
+
+
+def test_age_band_boundary_is_inclusive_at_the_lower_edge(calculator):
+    assert _doses(calculator.calculate("Pneumonia", 17.9, 60))["Amoxicillin"]["basis"] == "45 mg/kg"
+    assert _doses(calculator.calculate("Pneumonia", 18, 60))["Amoxicillin"]["basis"] == "fixed dose"
+
+
+def test_weight_based_dose_never_exceeds_the_cap(calculator):
+    amoxicillin = _doses(calculator.calculate("Pneumonia", 16, 70))["Amoxicillin"]
+    # 45 mg/kg would be 3150 mg; single cap 2000 mg
+    assert amoxicillin["dose_mg"] == 2000 and amoxicillin["capped"]
+
+
+def test_cap_below_the_measurable_step_needs_manual_dosing(calculator):
+    result = calculator.calculate("Fever", 0.5, 0.5)
+    assert result["regimens"] == []
+    assert {r["drug"] for r in result["manual_dosing"]} == {"Paracetamol", "Ibuprofen"}
+
+
+def test_missing_age_gets_no_regimen(calculator):
+    result = calculator.calculate("Tuberculosis", None, 20)
+    assert result["condition"] == "Tuberculosis"
+    assert result["regimens"] == [] and result["manual_dosing"] == []
+
+
+def test_weight_based_regimen_needs_a_weight(calculator):
+    assert calculator.calculate("Pneumonia", 6, None)["regimens"] == []
+
+
+@pytest.mark.parametrize("condition", ["Hypotension", "Type 1 Diabetes", "Headache", None])
+def test_unknown_conditions_get_no_regimen(calculator, condition):
+    result = calculator.calculate(condition, 40, 70)
+    assert result["condition"] is None and result["regimens"] == []
+
+
+def test_batch_matches_single_patient(calculator):
+    patients = [{"condition": "TB", "age": 40, "weight": 52}, {"condition": "fever", "age": 4, "weight": 16}]
+    assert calculator.calculate_batch(patients) == [calculator.calculate(**p) for p in patients]
@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.drug_normalizer import DrugNormalizer, clean_term
+from app.services.interaction_index import InteractionIndex
+
+
+@pytest.fixture(scope="module")
+def drugs():
+    return InteractionIndex.from_csv().drug_matcher
+
+
+def test_clean_term_splits_dose_and_frequency():
+    assert clean_term("Tab. Metformin 500 mg twice daily") == ("metformin", "500mg", "BID")
+
+
+@pytest.mark.parametrize("text, canonical", [("metformn 500mg", "Metformin"), ("Amoxycilin 250mg TID", "Amoxicillin"),
+                                             ("atorvastatn", "Atorvastatin")])
+def test_one_letter_typos_are_corrected(drugs, text, canonical):
+    match = drugs.match(text)
+    assert (match.canonical, match.method, match.distance) == (canonical, "fuzzy", 1)
+    assert match.corrected
+
+
+@pytest.mark.parametrize("text", ["Duloxetine", "Citalopram", "Esomeprazole", "Vitamin C", "Vitamin B12", "metfrmn"])
+def test_never_corrects_into_a_different_drug(drugs, text):
+    match = drugs.match(text)
+    assert match.canonical is None and match.display == text
+
+
+def test_prednisolone_is_not_prednisone(drugs):
+    assert drugs.match("Prednisolone 5mg OD").canonical == "Prednisolone"
+    assert drugs.match("Prednisone").canonical == "Prednisone"
+
+
+def test_trigram_matches_reordered_names():
+    normalizer = DrugNormalizer({"isosorbide mononitrate": "Isosorbide Mononitrate"})
+    match = normalizer.match("mononitrate isosorbide 30mg")
+    assert (match.canonical, match.method) == ("Isosorbide Mononitrate", "trigram")
+
+
+def test_trigram_requires_every_word_of_the_drug_name():
+    normalizer = DrugNormalizer({"escitalopram": "Escitalopram", "isosorbide mononitrate": "Isosorbide Mononitrate"})
+    assert normalizer.match("citalopram").canonical is None
+    assert normalizer.match("isosorbide dinitrate").canonical is None
+
+
+def test_normalize_list_is_the_same_for_every_spelling(drugs):
+    typed = drugs.normalize_list(["metformn 500 mg twice daily", "Amoxycilin", "none", ""])
+    clean = drugs.normalize_list(["Amoxicillin", "Metformin 500mg BID"])
+    assert typed == clean == ["Amoxicillin", "Metformin 500mg BID"]
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import numpy as np
+
+from app.services.forecasting_service import ForecastingService, hour_index, hour_of_week, hour_to_datetime
+
+# A Wednesday, so the series does not start on a season boundary
+END = datetime(2026, 3, 18, 0)
+
+
+def test_hour_of_week_starts_monday():
+    assert hour_of_week([hour_index(datetime(2026, 3, 16, 0))])[0] == 0  # Monday
+    assert hour_of_week([hour_index(datetime(2026, 3, 22, 23))])[0] == 167  # Sunday
+    assert hour_to_datetime(hour_index(END)) == END
+
+
+def test_weekly_forecast_tracks_seasonal_peaks():
+    service = ForecastingService()
+    start, history = service.synthetic_history(end=END, seed=3)
+    result = service.forecast(history, start, horizon=24)
+
+    assert result["method"] == "holt_winters_weekly"
+    assert result["hours"][0] == hour_index(END)
+    by_hour = dict(zip((result["hours"] % 24).tolist(), result["mean"].tolist()))
+    assert by_hour[10] > 1.5 * by_hour[14] and by_hour[14] > 3 * by_hour[3]
+    assert (result["lower"] <= result["mean"]).all() and (result["mean"] <= result["upper"]).all()
+    assert (result["lower"] >= 0).all()
+
+
+def test_method_follows_history_length():
+    service = ForecastingService()
+    start, history = service.synthetic_history(end=END, hours=72, seed=1)
+    assert service.forecast(history, start)["method"] == "holt_winters_daily"
+
+    short = service.forecast(np.array([4.0, 6.0]), 0, horizon=3)
+    assert short["method"] == "mean" and short["mean"].tolist() == [5.0, 5.0, 5.0]
+
+
+def test_rush_hours_are_the_daytime_peaks():
+    service = ForecastingService()
+    start, history = service.synthetic_history(end=END, seed=5)
+    rush = service.forecast_summary(history, start, horizon=24)["rush_hours"]
+
+    assert {(w["start"], w["end"]) for w in rush} == {("10:00", "12:00"), ("17:00", "19:00")}
+    assert rush[0]["expected"] >= rush[1]["expected"]
+
+
+def test_no_rush_outside_open_hours():
+    service = ForecastingService()
+    hours = np.arange(hour_index(END), hour_index(END) + 6)  # 00:00-05:00
+    assert service.detect_rush_hours(hours, np.ones(6)) == []
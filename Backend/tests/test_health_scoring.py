@@ -0,0 +1,68 @@
+import numpy as np
+
+from app.services.health_scoring import HealthScoringEngine, SCORING_METRICS
+
+nan = np.nan
+engine = HealthScoringEngine()
+
+
+def healthy(days: int = 29) -> dict:
+    """One user's steady, healthy vitals"""
+    values = {"heart_rate": 72, "systolic": 115, "diastolic": 75, "blood_glucose": 90, "oxygen_saturation": 98,
+              "weight": 70, "mood_score": 8, "activity_minutes": 45, "sleep_hours": 7.5}
+    rng = np.random.default_rng(0)
+    return {m: values[m] + rng.normal(0, 0.5, (1, days)) for m in SCORING_METRICS}
+
+
+def test_nan_aware_row_statistics():
+    x = np.array([[1.0, nan, 3.0, nan], [nan, nan, nan, nan], [2.0, 4.0, 6.0, 8.0]])
+
+    assert np.allclose(engine.window_mean(x, 3), [3.0, nan, 6.0], equal_nan=True)
+    assert np.allclose(engine.latest(x), [3.0, nan, 8.0], equal_nan=True)
+    assert np.allclose(engine.slope(x, 4), [1.0, 0.0, 2.0])
+    assert np.allclose(engine.rolling_mean(x, 2)[0], [1.0, 1.0, 3.0, 3.0])
+
+
+def test_trend_labels_and_anomalies():
+    base = np.tile(np.array([101.0, 99.0, 100.0]), 10)[None, :]
+    rising = np.append(base[:, :-1], [[110.0]], axis=1)
+    falling = np.append(base[:, :-1], [[90.0]], axis=1)
+    x = np.vstack([base, rising, falling])
+
+    assert engine.trend_labels(x).tolist() == ["stable", "up", "down"]
+    z = engine.anomaly_scores(x)
+    assert abs(z[0]) < engine.anomaly_z and z[1] > engine.anomaly_z and z[2] < -engine.anomaly_z
+
+
+def test_bmi_categories():
+    bmi = engine.bmi(np.array([50.0, 70.0, 85.0, 110.0]), np.array([175.0] * 4))
+    assert engine.bmi_category(bmi).tolist() == ["Underweight", "Normal", "Overweight", "Obese"]
+
+
+def test_risk_tiers_and_flags():
+    good = healthy()
+    poor = healthy()
+    poor["systolic"] = poor["systolic"] + 35
+    poor["blood_glucose"] = poor["blood_glucose"] + 40
+    poor["mood_score"] = poor["mood_score"] - 4
+    poor["heart_rate"][0, -1] = 120.0  # acute reading on the latest day
+
+    cohort = {m: np.vstack([good[m], poor[m]]) for m in SCORING_METRICS}
+    result = engine.evaluate(cohort, np.array([175.0, 175.0]))
+
+    assert result["tier"].tolist() == ["low", "high"]
+    assert result["scores"]["overall"][0] > result["scores"]["overall"][1]
+    assert engine.flagged_metrics(result, 0) == [] and engine.flagged_metrics(result, 1) == ["heart_rate"]
+
+
+def test_cohort_rows_match_single_user_scoring():
+    rng = np.random.default_rng(1)
+    cohort = {m: healthy()[m] + rng.normal(0, 5, (20, 29)) for m in SCORING_METRICS}
+    cohort["systolic"][rng.random((20, 29)) < 0.2] = nan
+    heights = rng.normal(170, 8, 20)
+    batch = engine.evaluate(cohort, heights)
+
+    single = engine.evaluate({m: cohort[m][7:8] for m in SCORING_METRICS}, heights[7:8])
+    assert single["risk"][0] == batch["risk"][7]
+    assert single["trends"]["systolic"][0] == batch["trends"]["systolic"][7]
+    assert np.isclose(single["slopes"]["systolic"][0], batch["slopes"]["systolic"][7])
@@ -0,0 +1,57 @@
+import threading
+
+from app.services.hospital_snapshot_service import HospitalSnapshot, HospitalSnapshotService
+from app.util.priority_scheduler import current_priority
+
+
+class FakeHospitalAgent:
+    def __init__(self):
+        self.priorities = []
+        self.analysed = threading.Event()
+
+    def simulate_hospital_data(self):
+        return {"beds": 10}
+
+    def generate_analysis(self, data):
+        self.priorities.append(current_priority.get())
+        self.analysed.set()
+        return "report"
+
+
+def test_refresher_runs_at_background_priority():
+    agent = FakeHospitalAgent()
+    service = HospitalSnapshotService(agent, interval_seconds=60)
+    service.start()
+    try:
+        assert agent.analysed.wait(5)
+    finally:
+        service.stop()
+    assert agent.priorities == ["background"]
+    assert service.current().analysis_status == "ready"
+
+
+def test_snapshot_endpoint_answers_304_for_the_current_etag(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routes import hospital
+
+    monkeypatch.setattr(hospital.hospital_snapshot_service, "_snapshot",
+                        HospitalSnapshot({"beds": 10}, "report", "ready", 1))
+    app = FastAPI()
+    app.include_router(hospital.router)
+    client = TestClient(app)
+
+    first = client.get("/snapshot")
+    assert first.status_code == 200 and first.json()["analysis"] == "report"
+    cached = client.get("/snapshot", headers={"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304 and cached.content == b""
+    assert client.get("/snapshot", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_etag_matches_only_the_same_snapshot():
+    first = HospitalSnapshot({"beds": 10}, "report", "ready", 1)
+    assert first.matches(first.etag)
+    assert first.matches(f'"other", W/{first.etag}')
+    assert first.matches("*")
+    assert not first.matches(None)
+    assert not first.matches(HospitalSnapshot({"beds": 11}, "report", "ready", 2).etag)
@@ -0,0 +1,89 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.util.http_pool import HTTPPoolManager, READ_TIMEOUTS, CONNECT_TIMEOUT
+
+
+class _KeepAlive(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(0.1)
+        body = b"ok" * 1000
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAlive)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def pools():
+    manager = HTTPPoolManager(http2=False)
+    yield manager
+    manager.close()
+
+
+def test_sequential_calls_reuse_one_connection(pools, server):
+    client = pools.client("groq", pool_size=4)
+    for _ in range(5):
+        assert client.get(server).status_code == 200
+
+    stats = pools.get_stats()["groq"]
+    assert stats["requests"] == 5 and stats["connects"] == 1
+    assert stats["in_flight"] == 0 and stats["connections"] == {"active": 0, "idle": 1}
+
+
+def test_client_is_shared_per_provider(pools):
+    client = pools.client("groq", pool_size=4)
+    assert pools.client("groq", pool_size=16) is client
+    assert pools.get_stats()["groq"]["pool_size"] == 4
+    assert pools.client("vertex", pool_size=2) is not client
+
+
+def test_parallel_calls_are_capped_at_the_pool_size(pools, server):
+    client = pools.client("groq", pool_size=2)
+    with ThreadPoolExecutor(6) as executor:
+        statuses = list(executor.map(lambda _: client.get(f"{server}/slow").status_code, range(6)))
+
+    stats = pools.get_stats()["groq"]
+    assert statuses == [200] * 6
+    assert stats["connects"] == 2 and stats["peak_in_flight"] > 2  # the rest waited for a pooled connection
+
+
+def test_streams_hold_their_connection_until_closed(pools, server):
+    client = pools.client("groq", pool_size=2)
+    with client.stream("GET", server) as response:
+        next(response.iter_bytes())
+        assert pools.get_stats()["groq"]["in_flight"] == 1
+    assert pools.get_stats()["groq"]["in_flight"] == 0
+
+
+def test_timeouts_per_call_class():
+    for call_class in ("emergency", "interactive", "background", "stream"):
+        timeout = HTTPPoolManager.timeout(call_class)
+        assert timeout.read == READ_TIMEOUTS[call_class]
+        assert timeout.connect == timeout.pool == CONNECT_TIMEOUT
+    assert HTTPPoolManager.timeout(None).read == READ_TIMEOUTS["interactive"]
+
+
+def test_close_drops_clients(pools):
+    pools.client("groq", pool_size=2)
+    pools.close()
+    assert pools.get_stats() == {}
@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.interaction_index import InteractionIndex
+
+
+@pytest.fixture(scope="module")
+def index():
+    return InteractionIndex.from_csv()
+
+
+def test_sulfa_allergy_flags_sulfamethoxazole_alone(index):
+    screen = index.screen(["Sulfamethoxazole"], ["Sulfa"])
+    assert screen["risk"] == "high" and screen["escalate"]
+    assert screen["allergy_conflicts"][0]["drug"] == "Sulfamethoxazole"
+    assert screen["unrecognized"] == []
+
+
+def test_combination_still_resolves_to_itself(index):
+    entries = ["Sulfamethoxazole-Trimethoprim", "Bactrim DS 960mg BID", "Sulfamethoxazole/Trimethoprim 800/160mg",
+               "Trimethoprim-Sulfamethoxazole"]
+    screen = index.screen(entries, [])
+    assert set(screen["recognized"].values()) == {"Sulfamethoxazole-Trimethoprim"}
+
+
+def test_penicillin_allergy_cross_reacts_with_cephalosporins(index):
+    screen = index.screen(["Amoxicillin 500mg TID", "Cephalexin"], ["penicillin"])
+    severities = {c["drug"]: c["severity"] for c in screen["allergy_conflicts"]}
+    assert severities == {"Amoxicillin": "high", "Cephalexin": "moderate"}
+
+
+@pytest.mark.parametrize("meds", [["Warfarin", "Sulfamethoxazole"], ["Methotrexate", "Trimethoprim"],
+                                  ["Warfarin 5mg", "Bactrim"]])
+def test_major_interactions_escalate(index, meds):
+    screen = index.screen(meds, [])
+    assert screen["interactions"][0]["severity"] == "major"
+    assert screen["risk"] == "high" and screen["escalate"]
+
+
+@pytest.mark.parametrize("allergy", ["sulphur", "shellfish"])
+def test_unrelated_allergies_do_not_map_to_drug_classes(index, allergy):
+    screen = index.screen(["Bactrim", "Iodinated Contrast"], [allergy])
+    assert screen["allergy_conflicts"] == []
+    assert screen["unrecognized"] == [allergy]
+
+
+def test_unrecognized_drugs_are_reported_not_dropped(index):
+    screen = index.screen(["Zorblaxin 10mg", "Metformin"], [])
+    assert screen["unrecognized"] == ["Zorblaxin 10mg"]
+    assert screen["recognized"] == {"Metformin": "Metformin"}
+    assert screen["risk"] == "low" and not screen["escalate"]
@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.services.inventory_service import InventoryService
+
+DAY = 86400
+
+
+def service(stock, daily_use=10.0, lead_days=2.0, criticality=None) -> InventoryService:
+    """SKUs with deterministic demand (no safety stock), so reorder point = use x lead"""
+    n = len(stock)
+    engine = InventoryService()
+    engine.load([f"SKU-{i}" for i in range(n)], stock, np.full(n, daily_use), np.full(n, lead_days),
+                criticality, daily_use_std=np.zeros(n))
+    engine.updated_at = 0.0
+    return engine
+
+
+def test_status_bands():
+    result = service([100, 20, 5, 0]).analyze()
+
+    assert result["status"].tolist() == [0, 1, 2, 3]  # ok, reorder, critical, stockout
+    assert result["reorder_point"].tolist() == [20.0] * 4
+    assert result["days_to_stockout"].tolist() == [10.0, 2.0, 0.5, 0.0]
+    # Order up to lead time plus the review period
+    assert result["reorder_qty"].tolist() == [0.0, 70.0, 85.0, 90.0]
+
+
+def test_priority_weights_criticality_and_skips_healthy_items():
+    result = service([15, 15, 100], criticality=[1.0, 3.0, 3.0]).analyze()
+    assert result["order"].tolist()[:2] == [1, 0]
+    assert result["priority"][2] == 0.0
+
+
+def test_advance_orders_once_and_receives_after_lead_time():
+    engine = service([30])
+    engine.advance(now=1 * DAY)  # 20 left: at the reorder point
+    assert engine.on_order.tolist() == [70.0] and engine.stock.tolist() == [20.0]
+
+    engine.advance(now=1.5 * DAY)
+    assert engine.on_order.tolist() == [70.0]  # no second order while one is in flight
+
+    engine.advance(now=3 * DAY)
+    assert engine.stock.tolist() == [70.0] and engine.on_order.tolist() == [0.0]
+
+
+def test_in_flight_orders_lower_priority():
+    engine = service([15, 15])
+    engine.on_order[0] = 50.0
+    result = engine.analyze()
+    assert result["priority"][0] == result["priority"][1] * 0.25
+
+
+def test_report_filters_and_counts():
+    engine = service([100, 20, 5, 0])
+    report = engine.report()
+    assert report["counts"] == {"ok": 1, "reorder": 1, "critical": 1, "stockout": 1}
+    assert [row["item"] for row in report["reorders"]] == ["SKU-3", "SKU-2", "SKU-1"]
+    assert [row["item"] for row in engine.report(status="critical")["reorders"]] == ["SKU-2"]
+    assert "1 out of stock, 1 critical, 1 below reorder point" in engine.prompt_summary()
@@ -0,0 +1,152 @@
+import hashlib
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from app.services.job_queue import JobQueue, DegradedResult
+from app.util.smart_ai_client import smart_ai_client
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(smart_ai_client, db_path=str(tmp_path / "jobs.db"), attachment_dir=str(tmp_path / "files"),
+                     workers=1, max_attempts=2, retry_base_seconds=0)
+    queue.register("echo", lambda payload: {"echo": payload["text"]})
+    return queue
+
+
+def _drain(queue: JobQueue):
+    """Run every due job on the calling thread"""
+    while True:
+        row = queue._claim()
+        if row is None:
+            return
+        queue._execute(row)
+
+
+def test_identical_submissions_share_a_job(queue):
+    first, deduplicated = queue.submit("echo", {"text": "hi"})
+    assert not deduplicated
+    _drain(queue)
+    again, deduplicated = queue.submit("echo", {"text": "hi"})
+    assert deduplicated and again["job_id"] == first["job_id"]
+    assert again["status"] == "succeeded" and again["result"] == {"echo": "hi"}
+
+
+def test_failures_retry_then_fail(queue):
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload)
+        raise RuntimeError("provider down")
+
+    queue.register("flaky", flaky)
+    job, _ = queue.submit("flaky", {})
+    _drain(queue)
+    job = queue.get(job["job_id"])
+    assert len(calls) == 2
+    assert job["status"] == "failed" and job["error"] == "provider down"
+
+
+def test_degraded_results_are_not_reused(queue):
+    def fallback(payload):
+        raise DegradedResult({"plan": "formulary"}, "AI down")
+
+    queue.register("fallback", fallback)
+    job, _ = queue.submit("fallback", {"patient": 1})
+    _drain(queue)
+    job = queue.get(job["job_id"])
+    assert job["status"] == "failed"
+    assert job["result"] == {"plan": "formulary"}
+
+    retry, deduplicated = queue.submit("fallback", {"patient": 1})
+    assert not deduplicated and retry["job_id"] != job["job_id"]
+
+
+def test_unknown_kind_is_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit("nope", {})
+
+
+class _Receiver(BaseHTTPRequestHandler):
+    """Records callback POSTs; /redirect bounces to another path"""
+
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/redirect":
+            self.send_response(307)
+            self.send_header("Location", "/hook")
+        else:
+            type(self).received.append((dict(self.headers), body))
+            self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def receiver():
+    _Receiver.received = []
+    server = HTTPServer(("127.0.0.1", 0), _Receiver)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def signed_queue(tmp_path):
+    queue = JobQueue(smart_ai_client, db_path=str(tmp_path / "jobs.db"), attachment_dir=str(tmp_path / "files"),
+                     workers=1, max_attempts=1, webhook_secret="s3cret", callback_allowed_hosts=["127.0.0.1"])
+    queue.register("echo", lambda payload: {"echo": payload["text"]})
+    queue._stop.set()  # no backoff sleeps between delivery attempts
+    return queue
+
+
+def test_callbacks_are_signed(signed_queue, receiver):
+    job, _ = signed_queue.submit("echo", {"text": "hi"}, callback_url=f"{receiver}/hook")
+    _drain(signed_queue)
+
+    [(headers, body)] = _Receiver.received
+    expected = hmac.new(b"s3cret", headers["X-Webhook-Timestamp"].encode() + b"." + body, hashlib.sha256).hexdigest()
+    assert headers["X-Signature-256"] == f"sha256={expected}"
+    assert headers["X-Job-Id"] == job["job_id"] and json.loads(body)["result"] == {"echo": "hi"}
+    assert signed_queue.get(job["job_id"])["callback"] == "delivered"
+
+
+def test_callback_redirects_are_not_followed(signed_queue, receiver):
+    job, _ = signed_queue.submit("echo", {"text": "hi"}, callback_url=f"{receiver}/redirect")
+    _drain(signed_queue)
+
+    assert _Receiver.received == []
+    assert signed_queue.get(job["job_id"])["callback"] == "failed"
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook",
+    "http://localhost:8000/hook",
+    "http://10.0.0.5/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/hook",
+    "http://[::ffff:192.168.1.1]/hook",
+    "ftp://example.com/hook",
+    "not a url",
+])
+def test_internal_callback_targets_are_refused(queue, url):
+    with pytest.raises(ValueError):
+        queue.submit("echo", {"text": "hi"}, callback_url=url)
+
+
+def test_allow_list_limits_callback_hosts(signed_queue):
+    signed_queue.check_callback_url("http://127.0.0.1:9000/hook")
+    with pytest.raises(ValueError):
+        signed_queue.check_callback_url("https://example.com/hook")
+
+
+def test_unsigned_without_secret(queue):
+    assert queue.sign(b"{}", "0") is None
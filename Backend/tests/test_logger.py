@@ -0,0 +1,36 @@
+import json
+import logging
+import queue
+
+from app.util.logger import DroppingQueueHandler, JsonFormatter, StructuredLogger
+
+
+def _queued_json(emit) -> dict:
+    """Log through the queue handler and format what the listener would receive"""
+    log_queue = queue.Queue()
+    logger = logging.getLogger("app.tests.logger")
+    logger.propagate = False
+    handler = DroppingQueueHandler(log_queue)
+    logger.addHandler(handler)
+    try:
+        emit(StructuredLogger(logger))
+    finally:
+        logger.removeHandler(handler)
+    return json.loads(JsonFormatter().format(log_queue.get_nowait()))
+
+
+def test_traceback_survives_the_queue():
+    def emit(log):
+        try:
+            {}["missing"]
+        except KeyError:
+            log.error("job.failed", exc_info=True, job_id="abc")
+
+    entry = _queued_json(emit)
+    assert entry["event"] == "job.failed" and entry["job_id"] == "abc"
+    assert entry["exc"].startswith("Traceback") and "KeyError: 'missing'" in entry["exc"]
+
+
+def test_plain_records_have_no_exc_field():
+    entry = _queued_json(lambda log: log.warning("cache.miss", key="k"))
+    assert "exc" not in entry and entry["key"] == "k"
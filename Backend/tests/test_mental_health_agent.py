@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.agents import mental_health_agent
+from app.agents.mental_health_agent import MentalHealthAgent
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = MentalHealthAgent()
+    prompts = []
+
+    def reply(prompt, **kwargs):
+        prompts.append(prompt)
+        return "I hear you."
+
+    monkeypatch.setattr(agent.client, "simple_prompt", reply)
+    agent.prompts = prompts
+    return agent
+
+
+def test_history_stays_within_its_session(agent):
+    agent.chat("my exams are next week", session_id="a")
+    agent.chat("work has been busy", session_id="b")
+    agent.chat("still thinking about it", session_id="a")
+
+    assert "exams" in agent.prompts[2] and "work has been busy" not in agent.prompts[2]
+    assert [m["content"] for m in agent.history("b")] == ["work has been busy", "I hear you."]
+
+
+def test_concurrent_chats_keep_every_message(agent):
+    sessions = [f"s{i}" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda n: agent.chat(f"message {n}", session_id=sessions[n % 8]), range(80)))
+
+    for i, session in enumerate(sessions):
+        history = agent.history(session)
+        assert len(history) == 20
+        assert {m["content"] for m in history if m["role"] == "user"} == {f"message {n}" for n in range(i, 80, 8)}
+
+
+def test_least_recent_session_evicted(agent, monkeypatch):
+    monkeypatch.setattr(mental_health_agent, "MAX_SESSIONS", 2)
+    for session in ("a", "b", "a", "c"):
+        agent.chat("hello", session_id=session)
+    assert list(agent.sessions) == ["a", "c"]
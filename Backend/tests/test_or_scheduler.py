@@ -0,0 +1,59 @@
+from app.services.or_scheduler import ORScheduler
+
+H = 60
+
+
+def scheduler(theatres: int = 2) -> ORScheduler:
+    """Theatres open 08:00-12:00 with 30 minutes turnover"""
+    return ORScheduler(theatres=theatres, opens=8 * H, closes=12 * H, turnover=30)
+
+
+def test_best_fit_takes_the_tightest_gap():
+    s = scheduler()
+    s.book("General", 90, theatre_id=1, start=8 * H)  # busy until 10:00 incl. turnover
+    s.book("General", 30, theatre_id=1, start=11 * H)  # leaves a 10:00-11:00 gap
+
+    case = s.add_case("Emergency", 30)
+    assert (case.theatre, case.start) == (1, 10 * H)
+
+    roomy = s.add_case("General", 60)
+    assert (roomy.theatre, roomy.start) == (2, 8 * H)
+
+
+def test_earliest_start_is_respected():
+    case = scheduler().add_case("Emergency", 60, earliest=9 * H + 15)
+    assert case.start == 9 * H + 15
+
+
+def test_full_day_overruns_in_the_first_free_theatre():
+    s = scheduler()
+    s.book("Cardiac", 260, theatre_id=1, start=8 * H)  # ends 12:20, free at 12:50
+    s.book("Cardiac", 180, theatre_id=2, start=8 * H)  # free at 11:30
+
+    case = s.add_case("General", 60)
+    assert (case.theatre, case.start) == (2, 11 * H + 30)
+    assert s.overruns == {"OR-0001": 20, case.case_id: 30}
+    assert s.conflicts == {}
+
+
+def test_manual_overlap_is_recorded_and_cleared_on_cancel():
+    s = scheduler()
+    first = s.book("General", 90, theatre_id=1, start=8 * H)
+    clash = s.book("General", 60, theatre_id=1, start=9 * H)
+
+    assert s.conflicts == {clash.case_id: [first.case_id], first.case_id: [clash.case_id]}
+    assert s.cancel_case(clash.case_id) and s.conflicts == {}
+    assert not s.cancel_case(clash.case_id)
+    assert s.add_case("General", 60).start in (8 * H, 10 * H)
+
+
+def test_schedule_day_packs_longest_first_and_reports_utilization():
+    s = scheduler()
+    s.book("General", 60, theatre_id=1, start=8 * H)
+    s.schedule_day([("General", 60, 8 * H), ("Cardiac", 180, 8 * H), ("Orthopedic", 120, 8 * H)])
+
+    assert [(c["type"], c["theatre"], c["start"]) for c in s.schedule()] == [
+        ("Cardiac", 1, "08:00"), ("Orthopedic", 2, "08:00"), ("General", 2, "10:30")]
+    usage = s.utilization()
+    assert usage["cases"] == 3 and usage["overruns"] == []
+    assert usage["overall_utilization"] == round(100 * 360 / 480, 1)
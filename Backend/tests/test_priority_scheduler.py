@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from app.util.priority_scheduler import PriorityScheduler, current_priority, request_priority
+
+
+def wait_until(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.002)
+
+
+class Waiters:
+    """Queue labelled acquires one at a time (so tags follow arrival order) behind a held slot"""
+
+    def __init__(self, scheduler: PriorityScheduler):
+        self.scheduler = scheduler
+        self.results = []
+        self.threads = []
+
+    def add(self, priority: str, label: str):
+        # Queued or already answered (a preempted waiter leaves the queue)
+        pending = lambda: sum(self.scheduler.queue_depths().values()) + len(self.results)
+        before = pending()
+        thread = threading.Thread(
+            target=lambda: self.results.append((label, self.scheduler.acquire(priority, timeout=5))))
+        thread.start()
+        self.threads.append(thread)
+        wait_until(lambda: pending() > before)
+
+    def drain(self):
+        """Release the held slot once per waiter, recording grant order"""
+        while len(self.results) < len(self.threads):
+            before = len(self.results)
+            self.scheduler.release()
+            wait_until(lambda: len(self.results) > before)
+        for thread in self.threads:
+            thread.join()
+        return self.results
+
+
+def test_weighted_fair_queuing_serves_background_without_starving_it():
+    scheduler = PriorityScheduler(slots=1)
+    assert scheduler.acquire()
+    waiters = Waiters(scheduler)
+    for i in range(2):
+        waiters.add("background", f"bg{i}")
+    for i in range(8):
+        waiters.add("interactive", f"int{i}")
+
+    order = [label for label, ok in waiters.drain()]
+    assert order == ["int0", "int1", "int2", "int3", "bg0", "int4", "int5", "int6", "int7", "bg1"]
+
+
+def test_emergency_jumps_the_queue_and_preempts_background():
+    scheduler = PriorityScheduler(slots=1)
+    assert scheduler.acquire()
+    waiters = Waiters(scheduler)
+    waiters.add("background", "bg")
+    waiters.add("interactive", "int")
+    waiters.add("emergency", "er")
+
+    assert ("bg", False) in waiters.results  # preempted while queued, fails fast
+    results = waiters.drain()
+    assert [label for label, ok in results if ok] == ["er", "int"]
+    assert scheduler.get_stats()["preempted"] == 1
+
+
+def test_timeout_leaves_the_queue_clean():
+    scheduler = PriorityScheduler(slots=1)
+    assert scheduler.acquire()
+    assert not scheduler.acquire("interactive", timeout=0.02)
+    assert scheduler.queue_depths() == {"emergency": 0, "interactive": 0, "background": 0}
+    assert scheduler.get_stats()["timeouts"]["interactive"] == 1
+
+
+def test_resize_grants_queued_requests():
+    scheduler = PriorityScheduler(slots=1)
+    assert scheduler.acquire()
+    waiters = Waiters(scheduler)
+    waiters.add("interactive", "a")
+    waiters.add("interactive", "b")
+
+    scheduler.resize(3)
+    wait_until(lambda: len(waiters.results) == 2)
+    assert scheduler.get_stats()["in_use"] == 3
+
+
+def test_estimated_wait_grows_with_queued_work():
+    scheduler = PriorityScheduler(slots=1)
+    assert scheduler.estimated_wait() == 0.0
+    assert scheduler.acquire()
+    waiters = Waiters(scheduler)
+    idle_wait = scheduler.estimated_wait()
+    waiters.add("interactive", "a")
+
+    assert scheduler.estimated_wait("interactive") > idle_wait
+    assert scheduler.estimated_wait("emergency") == idle_wait
+    waiters.drain()
+
+
+def test_request_priority_scopes_the_context():
+    with request_priority("background"):
+        assert current_priority.get() == "background"
+        with request_priority("emergency"):
+            assert current_priority.get() == "emergency"
+        assert current_priority.get() == "background"
+    assert current_priority.get() == "interactive"
+    with pytest.raises(ValueError):
+        with request_priority("urgent"):
+            pass
@@ -0,0 +1,48 @@
+import pytest
+
+from app.prompts.registry import PromptRegistry, PromptTemplate, prompt_registry
+
+PATIENT = {"age": 40, "weight": 70.0, "condition": "hypertension", "history": "None",
+           "current_meds": "None", "allergies": "None"}
+
+
+def test_static_prefix_comes_first_and_is_shared_across_patients():
+    template = prompt_registry.get("treatment", "en")
+    first = template.render(**PATIENT)
+    second = template.render(**{**PATIENT, "age": 71, "condition": "asthma"})
+
+    assert first.startswith(template.static_prefix) and second.startswith(template.static_prefix)
+    assert "Age: 71 years" in second and "asthma" not in template.static_prefix
+    assert template.render_body(**PATIENT) == first[len(template.static_prefix):].lstrip("\n")
+
+
+def test_body_fields_are_discovered():
+    assert prompt_registry.get("treatment").fields == sorted(PATIENT)
+    assert prompt_registry.get("diagnostic").fields == []
+
+
+def test_unknown_language_falls_back_to_english():
+    assert prompt_registry.get("treatment", "fr") is prompt_registry.get("treatment", "en")
+    assert prompt_registry.get("treatment", "hi").language == "hi"
+    assert prompt_registry.languages("treatment") == ["en", "hi", "mr"]
+    with pytest.raises(KeyError):
+        prompt_registry.get("unknown")
+
+
+def test_key_changes_with_wording_and_version():
+    base = PromptTemplate("demo", "en", "v1", "system", "Static   instructions", "Hello {name}")
+    reworded = PromptTemplate("demo", "en", "v1", "system", "Static instructions, reworded", "Hello {name}")
+    bumped = PromptTemplate("demo", "en", "v2", "system", "Static   instructions", "Hello {name}")
+
+    assert base.key.startswith("demo/en/v1@")
+    assert len({base.key, reworded.key, bumped.key}) == 3
+    assert base.key == PromptTemplate("demo", "en", "v1", "system", "Static   instructions", "Hello {name}").key
+
+
+def test_register_replaces_previous_version():
+    registry = PromptRegistry()
+    registry.register(PromptTemplate("demo", "en", "v1", "system", "old"))
+    registry.register(PromptTemplate("demo", "en", "v2", "system", "new"))
+
+    assert registry.get("demo").version == "v2"
+    assert registry.get("demo").render() == "new"
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.util.smart_ai_client import smart_ai_client
+
+
+class FakeGroq:
+    """Records chat.completions.create kwargs and answers with a fixed JSON document"""
+
+    def __init__(self):
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        text = '{"ok": true}'
+        if kwargs.get("stream"):
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=None)
+
+
+@pytest.fixture
+def groq(monkeypatch):
+    fake = FakeGroq()
+    monkeypatch.setattr(smart_ai_client, "mock_provider", None)
+    monkeypatch.setattr(smart_ai_client, "vertex_gemini_model", None)
+    monkeypatch.setattr(smart_ai_client, "groq_client", fake)
+    return fake
+
+
+SCHEMA = {"type": "object", "properties": {"ok": {"type": "boolean"}}, "required": ["ok"]}
+
+
+def test_groq_json_mode_on_generate_and_stream(groq):
+    smart_ai_client._generate("p", None, None, None, 0.3, 100, "test", SCHEMA)
+    "".join(smart_ai_client._stream("p", None, None, None, 0.3, 100, "test", SCHEMA))
+    assert [call.get("response_format") for call in groq.calls] == [{"type": "json_object"}] * 2
+
+
+def test_groq_free_text_has_no_response_format(groq):
+    smart_ai_client._generate("p", None, None, None, 0.3, 100, "test")
+    "".join(smart_ai_client._stream("p", None, None, None, 0.3, 100, "test"))
+    assert all("response_format" not in call for call in groq.calls)
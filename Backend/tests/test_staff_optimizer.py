@@ -0,0 +1,61 @@
+import numpy as np
+
+from app.services.staff_optimizer import StaffMember, StaffOptimizer
+
+
+def nurse(staff_id, home, skills=None, shifts=("morning",)):
+    return StaffMember(staff_id, "nurse", home, tuple(skills or (home,)), shifts)
+
+
+def test_demand_staffs_the_peak_hour_with_minimums():
+    load = np.zeros(24)
+    load[10] = 41.0  # morning peak
+    demand = StaffOptimizer().shift_demand({"General": load, "Emergency": np.zeros(24)})
+
+    assert demand[("General", "morning", "doctor")] == 6  # ceil(41 / 8)
+    assert demand[("General", "morning", "nurse")] == 11  # ceil(41 / 4)
+    assert demand[("General", "night", "nurse")] == 2
+    assert demand[("Emergency", "night", "doctor")] == 2 and demand[("Emergency", "night", "nurse")] == 3
+
+
+def test_home_staff_before_cross_cover():
+    roster = [nurse("N1", "General", ("General", "Cardiology")), nurse("N2", "Cardiology"), nurse("N3", "Cardiology")]
+    plan = StaffOptimizer().solve({("Cardiology", "morning", "nurse"): 2, ("General", "morning", "nurse"): 1}, roster)
+
+    assert plan["assignments"]["N1"]["department"] == "General"
+    assert plan["cross_covers"] == 0 and plan["gaps"] == [] and plan["staff_idle"] == 0
+
+
+def test_cross_cover_needs_the_skill():
+    roster = [nurse("N1", "General"), nurse("N2", "General", ("General", "Emergency"))]
+    plan = StaffOptimizer().solve({("Emergency", "morning", "nurse"): 2}, roster)
+
+    assert plan["assignments"] == {"N2": {"department": "Emergency", "shift": "morning"}}
+    assert plan["cross_covers"] == 1 and plan["cost"] == 1
+    assert plan["gaps"] == [{"department": "Emergency", "shift": "morning", "role": "nurse", "short_by": 1}]
+
+
+def test_shortfall_is_shared_by_relative_need():
+    roster = [nurse(f"N{i}", "Float", ("A", "B")) for i in range(6)]
+    plan = StaffOptimizer().solve({("A", "morning", "nurse"): 8, ("B", "morning", "nurse"): 4}, roster)
+
+    assigned = {s["department"]: s["assigned"] for s in plan["slots"]}
+    assert assigned == {"A": 4, "B": 2}
+
+
+def test_each_member_works_one_shift_and_plans_repeat():
+    roster = [nurse(f"N{i}", "General", shifts=("morning", "evening")) for i in range(3)]
+    demand = {("General", "morning", "nurse"): 2, ("General", "evening", "nurse"): 2}
+    optimizer = StaffOptimizer()
+
+    plan = optimizer.solve(demand, roster)
+    assert plan["staff_assigned"] == 3 and sum(g["short_by"] for g in plan["gaps"]) == 1
+    assert plan["assignments"] == optimizer.solve(demand, list(reversed(roster)))["assignments"]
+
+
+def test_summary_lists_gaps():
+    optimizer = StaffOptimizer()
+    plan = optimizer.solve({("General", "night", "doctor"): 1, ("General", "night", "nurse"): 2}, [])
+    summary = optimizer.summarize(plan)
+    assert "night General: doctors 0/1, nurses 0/2" in summary
+    assert "General night short 2 nurse(s)" in summary
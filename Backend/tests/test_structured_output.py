@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from app.util.structured_output import IncrementalJSONParser, StructuredOutputError, parse_document
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"risk_level": {"type": "string"}, "a": {"type": "integer"}},
+}
+
+
+def test_invalid_scalar_raises_structured_output_error():
+    with pytest.raises(StructuredOutputError) as excinfo:
+        parse_document('{"risk_level": True}', SCHEMA)
+    assert excinfo.value.raw == '{"risk_level": True}'
+
+
+def test_truncated_literal_raises_structured_output_error():
+    with pytest.raises(StructuredOutputError):
+        parse_document('{"risk_level": tru}', SCHEMA)
+
+
+def test_second_value_without_comma_is_rejected():
+    with pytest.raises(StructuredOutputError):
+        parse_document('{"a": 1 2}', SCHEMA)
+    with pytest.raises(StructuredOutputError):
+        parse_document('{"risk_level": "low" "high"}', SCHEMA)
+
+
+def test_missing_colon_and_mismatched_brackets_are_rejected():
+    for text in ('{"a" 1}', '{"a": [1, 2}', '{,}'):
+        with pytest.raises(StructuredOutputError):
+            IncrementalJSONParser().feed(text)
+
+
+def test_chunked_document_matches_json_loads():
+    document = json.dumps({"a": [1, {"b": None, "c": 'x"y'}], "d": -1.5e3, "e": True, "f": {}})
+    for size in (1, 3, 7):
+        parser = IncrementalJSONParser()
+        for start in range(0, len(document), size):
+            parser.feed(document[start:start + size])
+        assert parser.done
+        assert parser.value == json.loads(document)
+
+
+def test_code_fence_and_trailing_text_are_ignored():
+    assert parse_document('```json\n{"a": 1}\n```\nDone.', SCHEMA) == {"a": 1}
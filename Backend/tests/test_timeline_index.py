@@ -0,0 +1,101 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.timeline_index import TimelineIndex, UserTimeline, decode_cursor, encode_cursor
+
+
+def timeline(events) -> UserTimeline:
+    t = UserTimeline()
+    for day, event_id, event_type in events:
+        t.insert(day, event_id, event_type, {"id": event_id, "type": event_type})
+    return t
+
+
+EVENTS = [(20260100 + d, f"E{d:02d}", "treatment" if d % 3 == 0 else "diagnostic") for d in range(1, 29)]
+
+
+def ids(items):
+    return [item["id"] for item in items]
+
+
+def test_cursor_pages_cover_everything_once_newest_first():
+    t = timeline(EVENTS)
+    seen, cursor = [], None
+    while True:
+        page, cursor, total = t.query(limit=5, cursor=cursor)
+        seen += ids(page)
+        if cursor is None:
+            break
+    assert total == 28
+    assert seen == [f"E{d:02d}" for d in range(28, 0, -1)]
+
+
+def test_range_and_type_filters():
+    t = timeline(EVENTS)
+    page, cursor, total = t.query(start=20260110, end=20260120, event_type="treatment")
+    assert ids(page) == ["E18", "E15", "E12"] and total == 3 and cursor is None
+
+    page, cursor, _ = t.query(start=20260110, end=20260120, limit=4)
+    assert ids(page) == ["E20", "E19", "E18", "E17"]
+    assert ids(t.query(start=20260110, end=20260120, limit=4, cursor=cursor)[0]) == ["E16", "E15", "E14", "E13"]
+
+
+def test_same_day_events_and_replacement():
+    t = timeline([(20260105, "B", "diagnostic"), (20260105, "A", "diagnostic"), (20260104, "C", "treatment")])
+    first, cursor, _ = t.query(limit=1)
+    assert ids(first) == ["B"] and ids(t.query(limit=5, cursor=cursor)[0]) == ["A", "C"]
+
+    t.insert(20260101, "B", "treatment", {"id": "B", "type": "treatment"})  # moved to an older date and type
+    assert ids(t.query()[0]) == ["A", "C", "B"]
+    assert ids(t.query(event_type="diagnostic")[0]) == ["A"]
+    assert t.remove("C") and not t.remove("C")
+
+
+def test_new_events_do_not_shift_later_pages():
+    t = timeline(EVENTS)
+    _, cursor, _ = t.query(limit=5)
+    t.insert(20260201, "NEW", "diagnostic", {"id": "NEW", "type": "diagnostic"})
+    assert ids(t.query(limit=3, cursor=cursor)[0]) == ["E23", "E22", "E21"]
+
+
+def test_index_loads_once_and_applies_writes():
+    calls = []
+
+    def loader(user_id):
+        calls.append(user_id)
+        return [(20260101, "E1", "diagnostic", {"id": "E1", "type": "diagnostic"})]
+
+    index = TimelineIndex(loader, max_users=1)
+    index.add("U1", 20260102, "E0", "diagnostic", {"id": "E0", "type": "diagnostic"})  # not loaded yet: ignored
+    assert ids(index.query("U1")[0]) == ["E1"]
+    index.add("U1", 20260102, "E2", "diagnostic", {"id": "E2", "type": "diagnostic"})
+    assert ids(index.query("U1")[0]) == ["E2", "E1"] and calls == ["U1"]
+
+    index.query("U2")  # evicts U1
+    index.query("U1")
+    assert calls == ["U1", "U2", "U1"]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor((20260105, "TX:1"))) == (20260105, "TX:1")
+    assert encode_cursor(None) is None
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_timeline_endpoint_pages_with_cursor():
+    from app.api.routes import user_health
+
+    app = FastAPI()
+    app.include_router(user_health.router)
+    client = TestClient(app)
+
+    everything = client.get("/timeline/USER001", params={"limit": 500}).json()
+    first = client.get("/timeline/USER001", params={"limit": 3}).json()
+    second = client.get("/timeline/USER001", params={"limit": 3, "cursor": first["next_cursor"]}).json()
+
+    assert first["total"] == everything["total"] > 3
+    assert first["timeline"] + second["timeline"] == everything["timeline"][:len(first["timeline"]) + len(second["timeline"])]
+    assert client.get("/timeline/USER001", params={"cursor": "!!"}).status_code == 400
+    assert client.get("/timeline/USER001", params={"type": "billing"}).status_code == 400
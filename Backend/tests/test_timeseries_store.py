@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.timeseries_store import RingSeries, TimeSeriesStore, from_timestamp, to_timestamp
+
+MONDAY = to_timestamp(datetime(2026, 3, 16))
+HOUR, DAY = 3600, 86400
+
+
+def test_ring_overwrites_oldest_and_stays_ordered():
+    series = RingSeries(4)
+    series.extend(np.arange(6), np.arange(6) * 10.0)
+
+    timestamps, values = series.ordered()
+    assert timestamps.tolist() == [2, 3, 4, 5] and values.tolist() == [20, 30, 40, 50]
+    assert series.range(3, 5)[0].tolist() == [3, 4]
+    with pytest.raises(ValueError):
+        series.extend(np.array([1]), np.array([0.0]))
+
+
+def test_downsample_buckets_by_calendar():
+    store = TimeSeriesStore(capacity=1000)
+    timestamps = MONDAY + np.arange(0, 9 * DAY, 6 * HOUR)  # four points a day for nine days
+    store.record_many("opd_visits", timestamps, np.ones(len(timestamps)))
+
+    days, totals = store.downsample("opd_visits", bucket="day", agg="sum")
+    assert len(days) == 9 and (totals == 4).all()
+    assert from_timestamp(days[1]) == datetime(2026, 3, 17)
+
+    weeks, counts = store.downsample("opd_visits", bucket="week", agg="count")
+    assert [from_timestamp(w).weekday() for w in weeks] == [0, 0]  # weeks start on Monday
+    assert counts.tolist() == [28, 8]
+
+
+def test_aggregates_within_range():
+    store = TimeSeriesStore()
+    store.record_many("er_arrivals", MONDAY + np.arange(5) * HOUR, np.array([3.0, 1.0, 4.0, 1.0, 5.0]))
+
+    window = dict(start=MONDAY + HOUR, end=MONDAY + 4 * HOUR)
+    assert store.aggregate("er_arrivals", "sum", **window) == 6.0
+    assert store.aggregate("er_arrivals", "max", **window) == 4.0
+    assert store.aggregate("er_arrivals", "last", **window) == 1.0
+    _, last = store.downsample("er_arrivals", bucket="day", agg="last")
+    assert last.tolist() == [5.0]
+    assert store.aggregate("unknown") == 0.0
+    with pytest.raises(ValueError):
+        store.downsample("er_arrivals", bucket="month")
+
+
+def test_departments_are_separate_series():
+    store = TimeSeriesStore()
+    store.record("department_patients", MONDAY, 5, department="Cardiology")
+    store.record("department_patients", MONDAY, 7, department="Pediatrics")
+
+    assert store.departments("department_patients") == ["Cardiology", "Pediatrics"]
+    assert store.aggregate("department_patients", department="Pediatrics") == 7.0
+
+
+def test_hourly_series_is_dense_and_zero_filled():
+    store = TimeSeriesStore()
+    start_hour = MONDAY // HOUR
+    store.record_many("opd_visits", np.array([MONDAY, MONDAY + 60, MONDAY + 2 * HOUR]), np.array([1.0, 2.0, 5.0]))
+    assert store.hourly_series("opd_visits", start_hour, start_hour + 4).tolist() == [3.0, 0.0, 5.0, 0.0]
+
+
+def test_seed_rolls_forward_without_duplicates():
+    store = TimeSeriesStore()
+    now = datetime(2026, 3, 18, 9)
+    store.seed_synthetic(now=now, hours=48)
+    store.seed_synthetic(now=now, hours=48)
+    assert len(store.range("opd_visits")[0]) == 48
+
+    store.seed_synthetic(now=datetime(2026, 3, 18, 12), hours=48)
+    timestamps, _ = store.range("opd_visits")
+    assert len(timestamps) == 51 and from_timestamp(timestamps[-1]) == datetime(2026, 3, 18, 11)
@@ -0,0 +1,38 @@
+from app.util.token_budget import TokenAccountant, estimate_tokens
+
+
+def _prompt(history_lines: int, message: str) -> str:
+    history = "\n".join(f"User: earlier message number {i} about sleep and stress" for i in range(history_lines))
+    return (f"Conversation History:\n{history}\n\nCurrent User Message: {message}\n\nRisk Level: LOW\n\n"
+            "Provide a compassionate, supportive response using CBT techniques.")
+
+
+def test_long_current_message_is_clipped_not_dropped():
+    accountant = TokenAccountant()
+    message = "I have been feeling anxious about work. " * 200
+    prompt = accountant._elide_middle(_prompt(40, message), 300)
+    assert "Current User Message: I have been feeling anxious about work." in prompt
+    assert "Risk Level: LOW" in prompt
+    assert "[... omitted to fit token budget ...]" in prompt
+    assert estimate_tokens(prompt) <= 300 + 10
+
+
+def test_oversized_line_is_clipped_to_the_remaining_budget():
+    accountant = TokenAccountant()
+    prompt = "Patient summary:\n" + "word " * 2000 + "\nRespond briefly."
+    elided = accountant._elide_middle(prompt, 200)
+    assert elided.startswith("Patient summary:") and elided.endswith("Respond briefly.")
+    assert "word word" in elided and elided.count("word") < 2000
+
+
+def test_history_is_dropped_before_the_current_message():
+    accountant = TokenAccountant()
+    prompt, _ = accountant.apply_budget("mental_health", _prompt(400, "Can you help me sleep?"), None, 800)
+    assert "Current User Message: Can you help me sleep?" in prompt
+    assert "earlier message number 200" not in prompt
+
+
+def test_treatment_output_budget_allows_the_requested_lengths():
+    accountant = TokenAccountant()
+    assert accountant.apply_budget("treatment", "short", None, 3000)[1] == 3000
+    assert accountant.apply_budget("treatment", "short", None, 2200)[1] == 2200
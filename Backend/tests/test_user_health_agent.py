@@ -0,0 +1,16 @@
+from app.agents.user_health_agent import UserHealthAgent
+
+
+def test_insight_prompt_contains_patient_data():
+    agent = UserHealthAgent()
+    data = agent.generate_user_health_data("USER001")
+    prompt = agent.describe_health_data(data)
+
+    assert prompt is not None
+    assert data["user_profile"]["name"] in prompt
+    assert f"Overall: {data['health_score']['overall']}/100" in prompt
+    assert f"{data['vitals']['heart_rate']['current']} bpm" in prompt
+    for treatment in data["treatments"]:
+        assert treatment["medication"] in prompt
+    for diagnostic in data["diagnostics"][:3]:
+        assert diagnostic["type"] in prompt
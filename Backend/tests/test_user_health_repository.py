@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+
+from app.services.user_health_repository import UserHealthRepository
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return UserHealthRepository(str(tmp_path / "health.db"))
+
+
+def test_seeding_is_deterministic_and_persisted(repo, tmp_path):
+    profile = repo.get_sections("USER007", ["user_profile"])["user_profile"]
+    other = UserHealthRepository(str(tmp_path / "other.db"))
+    assert other.get_sections("USER007", ["user_profile"])["user_profile"] == profile
+
+    reopened = UserHealthRepository(str(tmp_path / "health.db"))
+    assert reopened.list_users() == ["USER007"]
+    assert reopened.get_sections("USER007", ["user_profile"])["user_profile"] == profile
+
+
+def test_only_requested_sections_are_built_and_then_cached(repo):
+    first = repo.get_sections("USER001", ["vitals", "health_score"])
+    assert set(first) == {"vitals", "health_score"} and repo.misses == 2
+
+    assert repo.get_sections("USER001", ["vitals"]) == {"vitals": first["vitals"]}
+    assert (repo.hits, repo.misses) == (1, 2)
+    with pytest.raises(KeyError):
+        repo.get_sections("USER001", ["unknown"])
+
+
+def test_writes_invalidate_dependent_sections(repo):
+    before = repo.get_sections("USER001", ["treatments", "vitals"])
+    repo.add_event("USER001", "tx-new", date.today(), "treatment",
+                   {"medication": "Atorvastatin", "dosage": "10mg", "frequency": "Once daily",
+                    "duration_days": 30, "adherence": 100, "purpose": "Cholesterol"})
+
+    after = repo.get_sections("USER001", ["treatments", "vitals"])
+    assert "Atorvastatin" in [t["medication"] for t in after["treatments"]]
+    assert len(after["treatments"]) == len(before["treatments"]) + 1
+    assert after["vitals"] is before["vitals"]  # untouched section still served from cache
+
+    repo.record_vitals("USER001", date.today(), {"heart_rate": 140})
+    assert repo.section("USER001", "vitals")["heart_rate"]["current"] == 140
+
+
+def test_cache_is_bounded(tmp_path):
+    repo = UserHealthRepository(str(tmp_path / "health.db"), cache_max_entries=2)
+    for user_id in ("USER001", "USER002", "USER003"):
+        repo.get_sections(user_id, ["user_profile"])
+    assert repo.get_stats()["cached_sections"] == 2
+
+    repo.get_sections("USER001", ["user_profile"])
+    assert repo.misses == 4  # the oldest entry was evicted
@@ -4,6 +4,7 @@ const MentalHealth = () => {
     const [messages, setMessages] = useState([]);
     const [input, setInput] = useState('');
     const [loading, setLoading] = useState(false);
+    const [sessionId] = useState(() => crypto.randomUUID());
 
     const sendMessage = async (e) => {
         e.preventDefault();
@@ -18,7 +19,7 @@ const MentalHealth = () => {
             const response = await fetch('http://localhost:8000/api/v1/mental-health/chat', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ message: input }),
+                body: JSON.stringify({ message: input, session_id: sessionId }),
             });
             const data = await response.json();
             const botMsg = { role: 'bot', content: data.response };